@@ -2,17 +2,38 @@
 Halo 3C Dashboard - FastAPI Backend
 """
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import sensors, events, auth, system, beacons, occupancy, log, integrations
-from .websocket import router as websocket_router
+from .routes import sensors, events, auth, system, beacons, occupancy, log, integrations, export
+from .websocket import (
+    router as websocket_router, start_event_bus, stop_event_bus, start_topic_hub, stop_topic_hub
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start/stopp av bakgrundsarbete i API:t"""
+    # Hämta enhetsinformation i bakgrunden så att första sidladdningen inte väntar på Halo
+    system.warm_device_info_cache()
+    # Events från collectorn (annan process) till WebSocket-klienterna
+    await start_event_bus()
+    # Live-push av sensorvärden m.m. till klienter som prenumererar
+    start_topic_hub()
+    yield
+    await stop_topic_hub()
+    await stop_event_bus()
+    from services.influxdb import get_query_executor
+    get_query_executor().shutdown()
+
 
 app = FastAPI(
     title="Tekniklokaler Dashboard API",
     description="Backend API for Tekniklokaler - Smart Sensor Monitoring for Technical Spaces",
     version="2.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware - konfigureras för frontend
@@ -36,6 +57,7 @@ app.include_router(system.router, prefix="/api/system", tags=["system"])
 app.include_router(beacons.router, prefix="/api/beacons", tags=["beacons"])
 app.include_router(occupancy.router, prefix="/api/occupancy", tags=["occupancy"])
 app.include_router(log.router, prefix="/api/log", tags=["log"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
 app.include_router(integrations.router, prefix="/api/integrations", tags=["integrations"])
 app.include_router(websocket_router, tags=["websocket"])
 
@@ -0,0 +1,116 @@
+"""
+Replay - Ringbuffer med senaste event-meddelanden så att klienter kan återuppta strömmen
+"""
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Antal senaste event-meddelanden som hålls för återuppspelning
+WS_REPLAY_BUFFER = int(os.getenv("WS_REPLAY_BUFFER", "1000"))
+# Max antal events som hämtas från InfluxDB när luckan är större än bufferten
+WS_CATCHUP_LIMIT = int(os.getenv("WS_CATCHUP_LIMIT", "500"))
+
+MODE_BUFFER = "buffer"
+MODE_CATCHUP = "catchup"
+MODE_RESET = "reset"
+
+
+class ReplayBuffer:
+    """
+    Ringbuffer med serialiserade event-meddelanden och löpande seq
+
+    Varje meddelande får ett seq som ökar med ett per meddelande, så
+    bufferten täcker alltid ett sammanhängande intervall. epoch byts vid
+    omstart av API:t; en klient med annan epoch kan inte använda sitt seq.
+    """
+
+    def __init__(self, size: int = WS_REPLAY_BUFFER, epoch: Optional[str] = None):
+        """
+        Initiera ReplayBuffer
+
+        Args:
+            size: Max antal meddelanden i bufferten
+            epoch: Identifierar denna ström (default: slumpat vid start)
+        """
+        self.epoch = epoch or uuid.uuid4().hex[:12]
+        self.seq = 0
+        self._messages: Deque[Tuple[int, str]] = deque(maxlen=size)
+
+        # Metrics
+        self.replays = 0
+        self.replayed_messages = 0
+        self.misses = 0
+
+    def append(self, message: Dict) -> str:
+        """
+        Sätt nästa seq på meddelandet, serialisera och spara det
+
+        Returns:
+            Serialiserat meddelande
+        """
+        self.seq += 1
+        message["seq"] = self.seq
+        text = json.dumps(message, default=str)
+        self._messages.append((self.seq, text))
+        return text
+
+    def since(self, seq: int, epoch: Optional[str] = None) -> Optional[List[str]]:
+        """
+        Meddelanden efter seq
+
+        Args:
+            seq: Senaste seq klienten har sett
+            epoch: Klientens epoch (None = samma som bufferten)
+
+        Returns:
+            Lista med serialiserade meddelanden, eller None om luckan inte
+            täcks av bufferten (annan epoch eller för gammalt seq)
+        """
+        if (epoch is not None and epoch != self.epoch) or seq < 0 or seq > self.seq:
+            self.misses += 1
+            return None
+
+        oldest = self._messages[0][0] if self._messages else self.seq + 1
+        if seq + 1 < oldest:
+            self.misses += 1
+            return None
+
+        messages = [text for _, text in islice(self._messages, seq + 1 - oldest, None)]
+        self.replays += 1
+        self.replayed_messages += len(messages)
+        return messages
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för bufferten"""
+        return {
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "size": self._messages.maxlen,
+            "buffered": len(self._messages),
+            "replays": self.replays,
+            "replayed_messages": self.replayed_messages,
+            "misses": self.misses,
+        }
+
+
+def replay_message(mode: str, epoch: str, seq: int, messages: List[str], truncated: bool = False) -> str:
+    """
+    Bygg ett replay-meddelande av redan serialiserade meddelanden
+
+    Skickas som ett enda WebSocket-meddelande så att en stor lucka inte
+    fyller klientens utkö.
+    """
+    header = json.dumps({
+        "type": "replay",
+        "mode": mode,
+        "epoch": epoch,
+        "seq": seq,
+        "truncated": truncated,
+    })
+    return f'{header[:-1]},"messages":[{",".join(messages)}]}}'
@@ -7,6 +7,7 @@ from datetime import datetime
 import logging
 
 from services.beacons import BeaconService
+from services.influxdb import run_blocking
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -35,7 +36,7 @@ async def get_all_beacons(device_id: Optional[str] = None) -> List[dict]:
     """
     try:
         service = get_beacon_service()
-        beacons = service.get_all_beacons(device_id=device_id)
+        beacons = await run_blocking(service.get_all_beacons, device_id=device_id)
         return beacons
     except Exception as e:
         logger.error(f"Failed to get all beacons: {e}", exc_info=True)
@@ -56,7 +57,7 @@ async def get_beacon_details(beacon_id: str, device_id: Optional[str] = None) ->
     """
     try:
         service = get_beacon_service()
-        beacon = service.get_beacon_details(beacon_id, device_id=device_id)
+        beacon = await run_blocking(service.get_beacon_details, beacon_id, device_id=device_id)
 
         if beacon is None:
             raise HTTPException(status_code=404, detail=f"Beacon {beacon_id} not found")
@@ -92,7 +93,8 @@ async def get_beacon_history(
     """
     try:
         service = get_beacon_service()
-        history = service.get_beacon_history(
+        history = await run_blocking(
+            service.get_beacon_history,
             beacon_id=beacon_id,
             from_time=from_time,
             to_time=to_time,
@@ -128,7 +130,8 @@ async def get_beacon_alerts(
     """
     try:
         service = get_beacon_service()
-        alerts = service.get_beacon_alerts(
+        alerts = await run_blocking(
+            service.get_beacon_alerts,
             beacon_id=beacon_id,
             from_time=from_time,
             to_time=to_time,
@@ -154,7 +157,7 @@ async def get_current_presence(device_id: Optional[str] = None) -> List[dict]:
     """
     try:
         service = get_beacon_service()
-        beacons = service.get_current_presence(device_id=device_id)
+        beacons = await run_blocking(service.get_current_presence, device_id=device_id)
         return beacons
     except Exception as e:
         logger.error(f"Failed to get current presence: {e}", exc_info=True)
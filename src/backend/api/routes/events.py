@@ -9,6 +9,7 @@ import os
 
 from models.events import Event, EventStatus, EventType, EventSeverity
 from services.events import EventService
+from services.influxdb import run_blocking
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +44,7 @@ async def get_latest_events(limit: int = Query(50, ge=1, le=1000)) -> List[Event
     """
     try:
         service = get_event_service()
-        events = service.get_latest_events(limit=limit)
+        events = await run_blocking(service.get_latest_events, limit=limit)
         return events
     except Exception as e:
         logger.error(f"Failed to get latest events: {e}", exc_info=True)
@@ -77,7 +78,8 @@ async def get_events(
     """
     try:
         service = get_event_service()
-        events = service.get_events(
+        events = await run_blocking(
+            service.get_events,
             from_time=from_time,
             to_time=to_time,
             event_type=event_type,
@@ -105,7 +107,7 @@ async def acknowledge_event(event_id: str) -> dict:
     """
     try:
         service = get_event_service()
-        success = service.acknowledge_event(event_id)
+        success = await run_blocking(service.acknowledge_event, event_id)
 
         if success:
             return {"message": f"Event {event_id} acknowledged", "status": "success"}
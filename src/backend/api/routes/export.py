@@ -0,0 +1,119 @@
+"""
+Export routes - Strömmande export av sensorhistorik och loggdata (NDJSON/CSV)
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import datetime, timedelta
+import logging
+
+from services.downsampling import is_valid_resolution
+from services.export import EXPORT_FORMATS, MEDIA_TYPES, ExportService
+from services.influxdb import iterate_blocking
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Initiera Export Service
+_export_service: Optional[ExportService] = None
+
+def get_export_service() -> ExportService:
+    """Get or create Export Service instance"""
+    global _export_service
+    if _export_service is None:
+        _export_service = ExportService()
+    return _export_service
+
+
+def _check_format(export_format: str) -> None:
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format: {export_format} (ndjson, csv)")
+
+
+def _streaming_response(chunks, export_format: str, name: str) -> StreamingResponse:
+    """Strömma block från en blockerande iterator som nedladdning"""
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.{export_format}"
+    return StreamingResponse(
+        iterate_blocking(chunks),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/sensors")
+async def export_sensor_history(
+    sensor_id: List[str] = Query(..., description="Sensor ID, kan anges flera gånger"),
+    from_time: Optional[datetime] = None,
+    to_time: Optional[datetime] = None,
+    device_id: Optional[str] = None,
+    resolution: Optional[str] = Query(None, description="Aggregeringsfönster, t.ex. 1m, 1h (default: rådata)"),
+    format: str = Query("ndjson", description="ndjson eller csv")
+):
+    """
+    Exportera sensorhistorik utan radgräns
+
+    Args:
+        sensor_id: Sensor ID (upprepad query-parameter, max 100)
+        from_time: Starttid (ISO8601, default: 24 timmar före to_time)
+        to_time: Sluttid (ISO8601, default: nu)
+        device_id: Device ID (optional)
+        resolution: Aggregeringsfönster istället för rådata
+        format: ndjson (en JSON-rad per värde) eller csv
+
+    Returns:
+        Strömmande nedladdning med timestamp, device_id, sensor_id, value
+    """
+    _check_format(format)
+    if resolution is not None and not is_valid_resolution(resolution):
+        raise HTTPException(status_code=400, detail=f"Invalid resolution: {resolution}")
+    sensor_ids = list(dict.fromkeys(sensor_id))
+    if len(sensor_ids) > 100:
+        raise HTTPException(status_code=400, detail="Max 100 sensor_id per request")
+
+    chunks = get_export_service().export_sensor_history(
+        format,
+        sensor_ids,
+        from_time=from_time,
+        to_time=to_time,
+        device_id=device_id,
+        resolution=resolution
+    )
+    return _streaming_response(chunks, format, "sensor-history")
+
+
+@router.get("/log")
+async def export_log_data(
+    measurement: Optional[str] = Query(None, description="Measurement-typ (events, sensor, beacon_presence, heartbeat, all)"),
+    from_time: Optional[datetime] = None,
+    to_time: Optional[datetime] = None,
+    hours: Optional[int] = Query(None, ge=1, description="Antal timmar bakåt (om from_time saknas)"),
+    device_id: Optional[str] = None,
+    format: str = Query("ndjson", description="ndjson eller csv")
+):
+    """
+    Exportera rådata för loggen utan radgräns (en rad per fält)
+
+    Args:
+        measurement: Measurement-typ att filtrera på
+        from_time: Starttid (ISO8601)
+        to_time: Sluttid (ISO8601, default: nu)
+        hours: Antal timmar bakåt när from_time saknas (default: 24)
+        device_id: Device ID (optional)
+        format: ndjson eller csv
+
+    Returns:
+        Strömmande nedladdning med timestamp, measurement, field, value och taggar
+    """
+    _check_format(format)
+    if from_time is None and hours is not None:
+        from_time = (to_time or datetime.utcnow()) - timedelta(hours=hours)
+
+    chunks = get_export_service().export_log(
+        format,
+        measurement=measurement,
+        from_time=from_time,
+        to_time=to_time,
+        device_id=device_id
+    )
+    return _streaming_response(chunks, format, "log-data")
@@ -9,6 +9,8 @@ import logging
 import os
 import socket
 
+from .system import get_halo_client
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
@@ -63,24 +65,6 @@ class BACnetConfigUpdate(BaseModel):
         return v
 
 
-def get_halo_client():
-    """Skapa HaloClient instans"""
-    from collector.halo_client import HaloClient
-
-    halo_ip = os.getenv("HALO_IP", "REDACTED_HALO_IP")
-    halo_user = os.getenv("HALO_USER", "admin")
-    halo_pass = os.getenv("HALO_PASS", "")
-
-    if not halo_pass:
-        return None
-
-    return HaloClient(
-        ip=halo_ip,
-        username=halo_user,
-        password=halo_pass
-    )
-
-
 def test_port_open(ip: str, port: int, protocol: str = "TCP") -> bool:
     """
     Testa om en port är öppen
@@ -6,6 +6,7 @@ from typing import Optional
 import logging
 
 from services.log import LogService
+from services.influxdb import run_blocking
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +47,8 @@ async def get_log_data(
     """
     try:
         service = get_log_service()
-        result = service.get_log_data(
+        result = await run_blocking(
+            service.get_log_data,
             measurement=measurement,
             hours=hours,
             limit=limit
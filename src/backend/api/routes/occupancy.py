@@ -23,10 +23,12 @@ async def get_occupancy_status(
         OccupancyStatus med state (occupied/vacant/uncertain), score och detaljer
     """
     try:
+        from services.influxdb import run_blocking
         from services.occupancy import get_occupancy_service
 
         service = get_occupancy_service()
-        status = service.get_occupancy_status(
+        status = await run_blocking(
+            service.get_occupancy_status,
             device_id=device_id,
             include_details=include_details
         )
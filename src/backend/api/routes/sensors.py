@@ -9,6 +9,8 @@ import logging
 from pathlib import Path
 
 from services.sensors import SensorService
+from services.downsampling import is_valid_resolution
+from services.influxdb import run_blocking
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -107,7 +109,7 @@ async def get_latest_sensor_values(device_id: Optional[str] = None):
     """
     try:
         service = get_sensor_service()
-        result = service.get_latest_sensor_values(device_id=device_id)
+        result = await run_blocking(service.get_latest_sensor_values, device_id=device_id)
         return result
     except Exception as e:
         logger.error(f"Failed to get latest sensor values: {e}", exc_info=True)
@@ -120,7 +122,9 @@ async def get_sensor_history(
     from_time: Optional[datetime] = None,
     to_time: Optional[datetime] = None,
     limit: int = Query(1000, ge=1, le=10000),
-    device_id: Optional[str] = None
+    device_id: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    resolution: Optional[str] = Query(None, description="Aggregeringsfönster, t.ex. 30s, 5m, 1h")
 ):
     """
     Hämta historik för en specifik sensor
@@ -131,16 +135,22 @@ async def get_sensor_history(
         to_time: Sluttid (ISO8601, optional)
         limit: Max antal datapoints (1-10000)
         device_id: Device ID (optional)
+        max_points: Nedsampla hela intervallet till högst så många punkter (aggregateWindow + LTTB)
+        resolution: Fast aggregeringsfönster istället för automatiskt
 
     Returns:
         Lista med historiska värden
     """
+    if resolution is not None and not is_valid_resolution(resolution):
+        raise HTTPException(status_code=400, detail=f"Invalid resolution: {resolution}")
+
     try:
         service = get_sensor_service()
 
         # Specialhantering för heartbeat
         if sensor_id == "heartbeat/status" or sensor_id == "heartbeat":
-            history = service.get_heartbeat_history(
+            history = await run_blocking(
+                service.get_heartbeat_history,
                 from_time=from_time,
                 to_time=to_time,
                 limit=limit,
@@ -148,12 +158,15 @@ async def get_sensor_history(
             )
             return history
 
-        history = service.get_sensor_history(
+        history = await run_blocking(
+            service.get_sensor_history,
             sensor_id=sensor_id,
             from_time=from_time,
             to_time=to_time,
             limit=limit,
-            device_id=device_id
+            device_id=device_id,
+            max_points=max_points,
+            resolution=resolution
         )
         return history
     except Exception as e:
@@ -161,6 +174,46 @@ async def get_sensor_history(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/history/batch")
+async def get_sensor_history_batch(
+    sensor_id: List[str] = Query(..., description="Sensor ID, kan anges flera gånger"),
+    from_time: Optional[datetime] = None,
+    to_time: Optional[datetime] = None,
+    points: int = Query(50, ge=1, le=2000),
+    device_id: Optional[str] = None
+):
+    """
+    Hämta nedsamplad historik för flera sensorer i en request (sparklines)
+
+    Args:
+        sensor_id: Sensor ID (upprepad query-parameter, max 100)
+        from_time: Starttid (ISO8601, default: 1 timme sedan)
+        to_time: Sluttid (ISO8601, optional)
+        points: Önskat antal punkter per sensor (1-2000)
+        device_id: Device ID (optional)
+
+    Returns:
+        window_s och series: {sensor_id: [[timestamp_ms, value], ...]}
+    """
+    sensor_ids = list(dict.fromkeys(sensor_id))
+    if len(sensor_ids) > 100:
+        raise HTTPException(status_code=400, detail="Max 100 sensor_id per request")
+
+    try:
+        service = get_sensor_service()
+        return await run_blocking(
+            service.get_sensor_history_batch,
+            sensor_ids=sensor_ids,
+            from_time=from_time,
+            to_time=to_time,
+            points=points,
+            device_id=device_id
+        )
+    except Exception as e:
+        logger.error(f"Failed to get sensor history batch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/heartbeat/history")
 async def get_heartbeat_history(
     from_time: Optional[datetime] = None,
@@ -182,7 +235,8 @@ async def get_heartbeat_history(
     """
     try:
         service = get_sensor_service()
-        history = service.get_heartbeat_history(
+        history = await run_blocking(
+            service.get_heartbeat_history,
             from_time=from_time,
             to_time=to_time,
             limit=limit,
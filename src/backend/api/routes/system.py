@@ -19,8 +19,16 @@ _heartbeat_data = {
 }
 
 
+# Delad HaloClient så att keep-alive-anslutningar återanvänds mellan requests
+_halo_client = None
+
+
 def get_halo_client():
-    """Skapa HaloClient instans"""
+    """Get or create HaloClient instance"""
+    global _halo_client
+    if _halo_client is not None:
+        return _halo_client
+
     from collector.halo_client import HaloClient
 
     halo_ip = os.getenv("HALO_IP", "REDACTED_HALO_IP")
@@ -30,22 +38,110 @@ def get_halo_client():
     if not halo_pass:
         return None
 
-    return HaloClient(
+    _halo_client = HaloClient(
         ip=halo_ip,
         username=halo_user,
-        password=halo_pass
+        password=halo_pass,
+        pool_size=int(os.getenv("HALO_POOL_SIZE", "4")),
+        breaker_threshold=int(os.getenv("HALO_BREAKER_THRESHOLD", "3")),
+        breaker_cooldown=float(os.getenv("HALO_BREAKER_COOLDOWN", "30")),
+        capability_ttl=float(os.getenv("HALO_CAPABILITY_TTL", "3600"))
+    )
+    return _halo_client
+
+
+# Cachad enhetsinformation (stale-while-revalidate) så att sidladdningar inte väntar på Halo
+_device_info_cache = None
+
+
+def get_device_info_cache():
+    """Get or create DeviceInfoCache instance (None om Halo inte är konfigurerad)"""
+    global _device_info_cache
+    if _device_info_cache is not None:
+        return _device_info_cache
+
+    halo_client = get_halo_client()
+    if not halo_client:
+        return None
+
+    from services.device_info import DeviceInfoCache
+
+    _device_info_cache = DeviceInfoCache(
+        fetch=halo_client.get_device_info,
+        ttl=float(os.getenv("DEVICE_INFO_TTL", "30")),
+        max_stale=float(os.getenv("DEVICE_INFO_MAX_STALE", "600"))
+    )
+    return _device_info_cache
+
+
+def warm_device_info_cache():
+    """Starta första hämtningen av enhetsinformation i bakgrunden"""
+    cache = get_device_info_cache()
+    if cache:
+        cache.refresh_in_background()
+
+
+def get_live_heartbeat(device_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Heartbeat från collectorns live-snapshot
+
+    Returns:
+        Heartbeat-status, eller None om live-snapshot saknas eller är inaktuell
+    """
+    from services.live_store import get_live_store
+    from collector.halo_client import heartbeat_status
+
+    store = get_live_store()
+    if store is None:
+        return None
+
+    heartbeat = store.get_heartbeat(device_id or os.getenv("DEVICE_ID", "halo-device-1"))
+    if heartbeat is None:
+        return None
+
+    last_contact = heartbeat.get("last_contact")
+    status = heartbeat_status(
+        datetime.fromisoformat(last_contact) if last_contact else None,
+        heartbeat.get("error")
     )
+    # Senaste cykeln misslyckades även om senaste kontakt är färsk
+    if not heartbeat.get("connected") and status["status"] == "healthy":
+        status["status"] = "degraded"
+        status["error"] = heartbeat.get("error")
+    return status
+
+
+def get_collector_breakers(device_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Collectorns circuit breakers från live-snapshot
+
+    Returns:
+        Breaker-tillstånd per endpoint, eller None om live-snapshot saknas eller är inaktuell
+    """
+    from services.live_store import get_live_store
+
+    store = get_live_store()
+    if store is None:
+        return None
+    return store.get_circuit_breakers(device_id or os.getenv("DEVICE_ID", "halo-device-1"))
 
 
 @router.get("/heartbeat")
-async def get_heartbeat():
+async def get_heartbeat(device_id: Optional[str] = None):
     """
     Hämta Halo sensor heartbeat-status
 
+    Läses från collectorns live-snapshot när den är aktuell, annars från
+    API:ts egen kontakt med Halo.
+
     Returns:
         Heartbeat-status med senaste kontakttid
     """
     try:
+        live = get_live_heartbeat(device_id)
+        if live is not None:
+            return live
+
         from collector.halo_client import get_heartbeat_status
         return get_heartbeat_status()
     except ImportError:
@@ -77,7 +173,7 @@ async def get_system_status():
     Hamta systemstatus for alla komponenter
 
     Returns:
-        Status for backend, InfluxDB, Collector, Halo sensor, Heartbeat
+        Status for backend, InfluxDB, Collector, Halo sensor (inkl. circuit breakers), Heartbeat
     """
     status = {
         "backend": "healthy",
@@ -91,23 +187,24 @@ async def get_system_status():
     # Hämta heartbeat-status
     try:
         from collector.halo_client import get_heartbeat_status
-        status["heartbeat"] = get_heartbeat_status()
+        status["heartbeat"] = get_live_heartbeat() or get_heartbeat_status()
     except ImportError:
         status["heartbeat"] = _heartbeat_data
 
     # Test InfluxDB connection
     try:
-        from services.influxdb import InfluxDBService
+        from services.influxdb import InfluxDBService, get_query_executor, run_blocking
         influxdb = InfluxDBService()
 
         try:
             buckets_api = influxdb.client.buckets_api()
-            buckets = buckets_api.find_buckets()
+            buckets = await run_blocking(buckets_api.find_buckets)
             status["influxdb"] = {
                 "status": "connected",
                 "url": os.getenv("INFLUXDB_URL", "http://influxdb:8086"),
                 "org": os.getenv("INFLUXDB_ORG", "halo-org"),
-                "bucket": os.getenv("INFLUXDB_BUCKET", "halo-sensors")
+                "bucket": os.getenv("INFLUXDB_BUCKET", "halo-sensors"),
+                "query_executor": get_query_executor().get_metrics()
             }
         except Exception as e:
             logger.warning(f"InfluxDB connection test failed: {e}")
@@ -124,11 +221,12 @@ async def get_system_status():
 
     # Test Halo sensor connection
     try:
+        from services.influxdb import run_blocking
         halo_client = get_halo_client()
         halo_ip = os.getenv("HALO_IP", "REDACTED_HALO_IP")
 
         if halo_client:
-            if halo_client.health_check():
+            if await run_blocking(halo_client.health_check):
                 status["halo_sensor"] = {
                     "status": "connected",
                     "ip": halo_ip
@@ -138,6 +236,8 @@ async def get_system_status():
                     "status": "disconnected",
                     "ip": halo_ip
                 }
+            # Collectorns breakers (API:ts egen HaloClient pollar inte enheten)
+            status["halo_sensor"]["circuit_breakers"] = get_collector_breakers()
         else:
             status["halo_sensor"] = {
                 "status": "not_configured",
@@ -150,6 +250,27 @@ async def get_system_status():
             "error": str(e)
         }
 
+    try:
+        from services.live_store import get_live_store
+        from services.sensors import get_latest_cache
+        status["caches"] = {"latest_values": get_latest_cache().get_metrics()}
+        live_store = get_live_store()
+        if live_store is not None:
+            status["caches"]["live_snapshot"] = live_store.get_metrics()
+    except Exception as e:
+        logger.warning(f"Failed to read cache metrics: {e}")
+
+    try:
+        from api.websocket import get_event_bus, hub, manager, replay
+        status["websocket"] = manager.get_metrics()
+        status["websocket"]["topics"] = hub.get_metrics()
+        status["websocket"]["replay"] = replay.get_metrics()
+        event_bus = get_event_bus()
+        if event_bus is not None:
+            status["websocket"]["event_bus"] = event_bus.get_metrics()
+    except Exception as e:
+        logger.warning(f"Failed to read WebSocket metrics: {e}")
+
     status["collector"] = {
         "status": "unknown",
         "note": "Check collector logs for detailed status"
@@ -169,15 +290,15 @@ async def get_device_info():
         Enhetsinformation inkl. drifttimmar, natverksinfo, etc.
     """
     try:
-        halo_client = get_halo_client()
+        cache = get_device_info_cache()
 
-        if not halo_client:
+        if not cache:
             raise HTTPException(
                 status_code=503,
                 detail="Halo sensor not configured. Set HALO_PASS environment variable."
             )
 
-        info = halo_client.get_device_info()
+        info = await cache.get()
 
         if info is None:
             raise HTTPException(
@@ -185,6 +306,9 @@ async def get_device_info():
                 detail="Could not connect to Halo sensor"
             )
 
+        # Kopiera så att det cachade värdet inte ändras
+        info = dict(info)
+
         # Formatera drifttid om tillgangligt
         if info.get("lifetime_hours"):
             hours = info["lifetime_hours"]
@@ -257,15 +381,15 @@ async def get_device_network_info():
         Natverksinfo (IP, MAC, etc.)
     """
     try:
-        halo_client = get_halo_client()
+        cache = get_device_info_cache()
 
-        if not halo_client:
+        if not cache:
             raise HTTPException(
                 status_code=503,
                 detail="Halo sensor not configured"
             )
 
-        info = halo_client.get_device_info()
+        info = await cache.get()
 
         if info is None:
             raise HTTPException(
@@ -0,0 +1,346 @@
+"""
+Topics - Prenumerationer och live-push av sensorvärden m.m. över WebSocket
+"""
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Sekunder mellan pushar (default: samma takt som collectorn)
+WS_PUSH_INTERVAL = float(os.getenv("WS_PUSH_INTERVAL", os.getenv("COLLECTION_INTERVAL", "10")))
+
+TOPIC_EVENTS = "events"
+TOPIC_SENSORS = "sensors"
+TOPIC_BEACONS = "beacons"
+TOPIC_HEARTBEAT = "heartbeat"
+TOPIC_OCCUPANCY = "occupancy"
+
+# Topics som pushas som state (snapshot + delta); events är en ren ström
+STATE_TOPICS = (TOPIC_SENSORS, TOPIC_BEACONS, TOPIC_HEARTBEAT, TOPIC_OCCUPANCY)
+
+# Klienter som inte prenumererar får events som tidigare
+DEFAULT_TOPICS = (TOPIC_EVENTS,)
+
+
+def parse_topic(topic: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Dela upp "sensors:halo-1" i (bas, device_id)
+
+    Returns:
+        (bas, device_id eller None), eller None om topicen är okänd
+    """
+    if not isinstance(topic, str):
+        return None
+    base, _, device_id = topic.partition(":")
+    if base != TOPIC_EVENTS and base not in STATE_TOPICS:
+        return None
+    if base == TOPIC_EVENTS and device_id:
+        return None
+    return base, device_id or None
+
+
+def diff_state(old: Dict, new: Dict) -> Tuple[Dict, List[List[str]]]:
+    """
+    Fältvis diff mellan två state-dictionaries
+
+    Nästlade dictionaries jämförs rekursivt, övriga värden (även listor)
+    ersätts i sin helhet.
+
+    Returns:
+        (changed, removed) där changed är en partiell dictionary med ändrade
+        och nya fält och removed är sökvägar (listor av nycklar) som tagits bort
+    """
+    changed: Dict = {}
+    removed: List[List[str]] = []
+    for key, value in new.items():
+        if key not in old:
+            changed[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            sub_changed, sub_removed = diff_state(old[key], value)
+            if sub_changed:
+                changed[key] = sub_changed
+            removed.extend([key] + path for path in sub_removed)
+        elif old[key] != value:
+            changed[key] = value
+    removed.extend([key] for key in old if key not in new)
+    return changed, removed
+
+
+def apply_delta(state: Dict, changed: Dict, removed: List[List[str]]) -> Dict:
+    """Applicera en delta från diff_state (samma logik som frontend)"""
+    result = dict(state)
+    for path in removed:
+        target = result
+        for key in path[:-1]:
+            target[key] = dict(target[key])
+            target = target[key]
+        target.pop(path[-1], None)
+    for key, value in changed.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = apply_delta(result[key], value, [])
+        else:
+            result[key] = value
+    return result
+
+
+def _dumps(message: Dict) -> str:
+    return json.dumps(message, separators=(",", ":"), default=str)
+
+
+class TopicState:
+    """Senaste state för en topic samt serialiserade snapshot/delta-meddelanden"""
+
+    def __init__(self, topic: str):
+        self.topic = topic
+        self.version = 0
+        self.state: Optional[Dict] = None
+        self.snapshot_message: Optional[str] = None
+        self.delta_message: Optional[str] = None
+
+    def update(self, state: Dict) -> bool:
+        """
+        Sätt nytt state
+
+        Returns:
+            True om state ändrades (version ökas)
+        """
+        if self.state is None:
+            self.delta_message = None
+        else:
+            changed, removed = diff_state(self.state, state)
+            if not changed and not removed:
+                return False
+            self.delta_message = _dumps({
+                "type": "delta",
+                "topic": self.topic,
+                "version": self.version + 1,
+                "changed": changed,
+                "removed": removed,
+            })
+        self.version += 1
+        self.state = state
+        self.snapshot_message = _dumps({
+            "type": "snapshot",
+            "topic": self.topic,
+            "version": self.version,
+            "data": state,
+        })
+        return True
+
+
+Loader = Callable[[str, Optional[str]], Awaitable[Optional[Dict]]]
+
+
+class TopicHub:
+    """
+    Pushar state-topics till prenumererande klienter
+
+    State hämtas en gång per topic och intervall oavsett antal klienter.
+    Varje klient håller bara vilken version den senast fick: är den exakt
+    en version efter skickas den gemensamma (en gång serialiserade) deltan,
+    annars en full snapshot. Har klientens kö släppt meddelanden skickas
+    också snapshot, eftersom klientens state då inte längre stämmer.
+    """
+
+    def __init__(self, manager, loader: Optional[Loader] = None, interval: float = WS_PUSH_INTERVAL):
+        """
+        Initiera TopicHub
+
+        Args:
+            manager: ConnectionManager med anslutna klienter
+            loader: Async funktion (bas, device_id) -> state (default: load_topic_state)
+            interval: Sekunder mellan pushar
+        """
+        self.manager = manager
+        self.loader = loader or load_topic_state
+        self.interval = interval
+        self.topics: Dict[str, TopicState] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.pushes = 0
+        self.snapshots = 0
+        self.deltas = 0
+        self.load_errors = 0
+
+    def subscribe(self, client, topics: List[str]) -> List[str]:
+        """
+        Prenumerera en klient på topics (okända ignoreras)
+
+        Returns:
+            Accepterade topics
+        """
+        accepted = []
+        for topic in topics:
+            parsed = parse_topic(topic)
+            if parsed is None:
+                continue
+            accepted.append(topic)
+            if topic in client.topics:
+                continue
+            client.topics[topic] = 0
+            if parsed[0] != TOPIC_EVENTS:
+                # Skicka senaste kända state direkt istället för att vänta ett intervall
+                state = self.topics.get(topic)
+                if state is not None and state.snapshot_message is not None:
+                    self._send(client, state)
+        return accepted
+
+    def unsubscribe(self, client, topics: List[str]):
+        """Avsluta prenumerationer"""
+        for topic in topics:
+            client.topics.pop(topic, None)
+
+    def subscribed_topics(self) -> List[str]:
+        """State-topics som minst en klient prenumererar på"""
+        topics = set()
+        for client in self.manager.clients.values():
+            topics.update(topic for topic in client.topics if topic != TOPIC_EVENTS)
+        return sorted(topics)
+
+    def publish(self, topic: str, state: Dict):
+        """Uppdatera en topic och skicka till klienter som inte har senaste versionen"""
+        topic_state = self.topics.get(topic)
+        if topic_state is None:
+            topic_state = self.topics[topic] = TopicState(topic)
+        topic_state.update(state)
+
+        for client in list(self.manager.clients.values()):
+            if topic in client.topics:
+                self._send(client, topic_state)
+
+    def _send(self, client, topic_state: TopicState):
+        """Skicka delta eller snapshot beroende på klientens version"""
+        if client.dropped != client.synced_drops:
+            # Något meddelande har släppts ur kön, börja om med snapshots
+            client.synced_drops = client.dropped
+            for topic in client.topics:
+                client.topics[topic] = 0
+
+        version = client.topics.get(topic_state.topic, 0)
+        if version == topic_state.version:
+            return
+        if version == topic_state.version - 1 and version > 0 and topic_state.delta_message is not None:
+            message = topic_state.delta_message
+            self.deltas += 1
+        else:
+            message = topic_state.snapshot_message
+            self.snapshots += 1
+        client.topics[topic_state.topic] = topic_state.version
+        if not client.enqueue(message):
+            self.manager.disconnect_slow(client)
+
+    def forget_unused(self):
+        """Släpp state för topics utan prenumeranter"""
+        active = set(self.subscribed_topics())
+        for topic in list(self.topics):
+            if topic not in active:
+                del self.topics[topic]
+
+    async def push_once(self):
+        """Hämta och pusha alla prenumererade state-topics en gång"""
+        topics = self.subscribed_topics()
+        if not topics:
+            self.forget_unused()
+            return
+
+        async def load(topic: str):
+            base, device_id = parse_topic(topic)
+            try:
+                return topic, await self.loader(base, device_id)
+            except Exception as e:
+                self.load_errors += 1
+                logger.warning(f"Failed to load topic {topic}: {e}")
+                return topic, None
+
+        for topic, state in await asyncio.gather(*(load(topic) for topic in topics)):
+            if state is not None:
+                self.publish(topic, state)
+        self.pushes += 1
+        self.forget_unused()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.push_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Topic push failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starta push-loopen"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Topic hub started (push interval {self.interval}s)")
+
+    async def stop(self):
+        """Stoppa push-loopen"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för topic-push"""
+        return {
+            "interval_s": self.interval,
+            "topics": {topic: state.version for topic, state in self.topics.items()},
+            "pushes": self.pushes,
+            "snapshots": self.snapshots,
+            "deltas": self.deltas,
+            "load_errors": self.load_errors,
+        }
+
+
+async def load_topic_state(base: str, device_id: Optional[str]) -> Optional[Dict]:
+    """
+    Hämta aktuellt state för en topic via samma services som REST-routerna
+
+    Returns:
+        State-dictionary eller None om inget finns
+    """
+    from services.influxdb import run_blocking
+
+    if base == TOPIC_SENSORS:
+        from api.routes.sensors import get_sensor_service
+        latest = await run_blocking(get_sensor_service().get_latest_sensor_values, device_id=device_id)
+        if not latest or not latest.get('sensors'):
+            return None
+        # Keyat per sensor så att deltan blir fältvis; tidsstämpel bara på toppnivå
+        return {
+            'device_id': latest.get('device_id'),
+            'timestamp': latest.get('timestamp'),
+            'sensors': {sensor['sensor_id']: sensor['values'] for sensor in latest['sensors']},
+        }
+
+    if base == TOPIC_BEACONS:
+        from api.routes.beacons import get_beacon_service
+        beacons = await run_blocking(get_beacon_service().get_all_beacons, device_id=device_id)
+        return {'beacons': {beacon.get('beacon_id') or beacon.get('id'): beacon for beacon in beacons or []}}
+
+    if base == TOPIC_HEARTBEAT:
+        from api.routes.system import get_live_heartbeat
+        heartbeat = await run_blocking(get_live_heartbeat, device_id)
+        if heartbeat is None:
+            from collector.halo_client import get_heartbeat_status
+            heartbeat = get_heartbeat_status()
+        return heartbeat
+
+    if base == TOPIC_OCCUPANCY:
+        from services.occupancy import get_occupancy_service
+        status = await run_blocking(
+            get_occupancy_service().get_occupancy_status,
+            device_id=device_id or os.getenv("DEVICE_ID", "halo-device-1"),
+            include_details=True
+        )
+        return status
+
+    return None
@@ -2,57 +2,218 @@
 WebSocket endpoint för real-time event stream
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Set, Optional
+from collections import deque
+from typing import Deque, Dict, Set, Optional
 import json
 import logging
 import asyncio
-from datetime import datetime
+import os
+from datetime import datetime, timezone
 
 from models.events import Event
+from services.event_bus import EVENT_BUS_SOCKET, EventBusServer, event_message
+from .replay import (
+    MODE_BUFFER, MODE_CATCHUP, MODE_RESET, WS_CATCHUP_LIMIT, ReplayBuffer, replay_message
+)
+from .topics import DEFAULT_TOPICS, TOPIC_EVENTS, TopicHub
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Max antal köade meddelanden per klient innan slow-client-policyn slår till
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+# drop_oldest: släpp äldsta köade meddelandet, disconnect: koppla bort klienten
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+# Max sekunder för en enskild send innan klienten räknas som död
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DISCONNECT = "disconnect"
+
+
+class ClientConnection:
+    """
+    En WebSocket-klient med egen begränsad utkö och writer-task
+
+    broadcast lägger bara meddelandet i kön, så en långsam klient bromsar
+    aldrig övriga klienter. När kön är full släpps äldsta meddelandet
+    (drop_oldest) eller så kopplas klienten bort (disconnect).
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int = WS_QUEUE_SIZE,
+        policy: str = WS_SLOW_CLIENT_POLICY,
+        send_timeout: float = WS_SEND_TIMEOUT
+    ):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.queue: Deque[str] = deque()
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        # Topic -> senast skickade version (se TopicHub)
+        self.topics: Dict[str, int] = {topic: 0 for topic in DEFAULT_TOPICS}
+        self.synced_drops = 0
+
+        # Metrics
+        self.sent = 0
+        self.dropped = 0
+
+    def enqueue(self, message: str) -> bool:
+        """
+        Lägg ett serialiserat meddelande i kön
+
+        Returns:
+            False om klienten är stängd eller ska kopplas bort (disconnect-policy)
+        """
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            if self.policy == POLICY_DISCONNECT:
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message)
+        self._ready.set()
+        return True
+
+    async def run(self):
+        """Skicka köade meddelanden tills klienten stängs"""
+        while not self.closed:
+            await self._ready.wait()
+            while self.queue and not self.closed:
+                message = self.queue.popleft()
+                await asyncio.wait_for(self.websocket.send_text(message), self.send_timeout)
+                self.sent += 1
+            self._ready.clear()
+
+    def close(self):
+        """Stoppa writer-tasken och töm kön"""
+        self.closed = True
+        self.queue.clear()
+        self._ready.set()
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+
 # Håll koll på aktiva WebSocket-anslutningar
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+    def __init__(
+        self,
+        max_queue: int = WS_QUEUE_SIZE,
+        policy: str = WS_SLOW_CLIENT_POLICY,
+        send_timeout: float = WS_SEND_TIMEOUT
+    ):
+        if policy not in (POLICY_DROP_OLDEST, POLICY_DISCONNECT):
+            logger.warning(f"Unknown WS_SLOW_CLIENT_POLICY '{policy}', using {POLICY_DROP_OLDEST}")
+            policy = POLICY_DROP_OLDEST
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.clients: Dict[WebSocket, ClientConnection] = {}
         self.event_service: Optional[EventService] = None
 
+        # Metrics (ackumulerat för bortkopplade klienter)
+        self.broadcasts = 0
+        self.dropped = 0
+        self.sent = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+
+    @property
+    def active_connections(self) -> Set[WebSocket]:
+        return set(self.clients)
+
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.add(websocket)
-        logger.info(f"WebSocket client connected. Total connections: {len(self.active_connections)}")
+        client = ClientConnection(websocket, self.max_queue, self.policy, self.send_timeout)
+        client.task = asyncio.create_task(self._writer(client))
+        self.clients[websocket] = client
+        logger.info(f"WebSocket client connected. Total connections: {len(self.clients)}")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.discard(websocket)
-        logger.info(f"WebSocket client disconnected. Total connections: {len(self.active_connections)}")
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self.dropped += client.dropped
+        self.sent += client.sent
+        client.close()
+        logger.info(f"WebSocket client disconnected. Total connections: {len(self.clients)}")
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
+    async def _writer(self, client: ClientConnection):
+        """Writer-task per klient"""
         try:
-            await websocket.send_text(message)
+            await client.run()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"Error sending message to WebSocket: {e}")
-            self.disconnect(websocket)
+            self.send_errors += 1
+            logger.warning(f"Error sending to WebSocket, disconnecting client: {e!r}")
+            self.disconnect(client.websocket)
+            await self._close_socket(client.websocket)
 
-    async def broadcast(self, message: str):
-        """Broadcast message till alla anslutna klienter"""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to WebSocket: {e}")
-                disconnected.append(connection)
+    async def _close_socket(self, websocket: WebSocket, code: int = 1000):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        """Köa ett meddelande till en klient (samma ordning som broadcasts)"""
+        client = self.clients.get(websocket)
+        if client is not None and not client.enqueue(message):
+            self.disconnect_slow(client)
+
+    def disconnect_slow(self, client: ClientConnection):
+        """Koppla bort en klient som inte hinner med (disconnect-policy)"""
+        self.slow_disconnects += 1
+        logger.warning(f"WebSocket client queue full ({client.max_queue}), disconnecting slow client")
+        self.disconnect(client.websocket)
+        # 1013 = Try Again Later; klienten återansluter och laddar om
+        asyncio.create_task(self._close_socket(client.websocket, code=1013))
 
-        # Ta bort disconnectade anslutningar
-        for connection in disconnected:
-            self.disconnect(connection)
+    async def broadcast(self, message: str, topic: Optional[str] = None):
+        """
+        Köa ett redan serialiserat meddelande hos alla anslutna klienter
 
+        Args:
+            message: Serialiserat meddelande
+            topic: Skicka bara till klienter som prenumererar på topicen
+        """
+        self.broadcasts += 1
+        slow = [
+            client for client in self.clients.values()
+            if (topic is None or topic in client.topics) and not client.enqueue(message)
+        ]
+        for client in slow:
+            self.disconnect_slow(client)
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för WebSocket-fan-out"""
+        depths = [len(client.queue) for client in self.clients.values()]
+        return {
+            "connections": len(self.clients),
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "queue_depth": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "broadcasts": self.broadcasts,
+            "sent": self.sent + sum(client.sent for client in self.clients.values()),
+            "dropped": self.dropped + sum(client.dropped for client in self.clients.values()),
+            "slow_disconnects": self.slow_disconnects,
+            "send_errors": self.send_errors,
+        }
 
 
 manager = ConnectionManager()
+hub = TopicHub(manager)
+# Senaste event-meddelanden för klienter som återansluter
+replay = ReplayBuffer()
 
 
 @router.websocket("/api/events/stream")
@@ -70,7 +231,9 @@ async def websocket_endpoint(websocket: WebSocket):
             json.dumps({
                 "type": "connected",
                 "message": "Connected to event stream",
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow().isoformat(),
+                "epoch": replay.epoch,
+                "seq": replay.seq
             }),
             websocket
         )
@@ -91,7 +254,11 @@ async def websocket_endpoint(websocket: WebSocket):
                             }),
                             websocket
                         )
-                except json.JSONDecodeError:
+                    elif message.get("type") in ("subscribe", "unsubscribe"):
+                        await handle_subscription(websocket, message)
+                    elif message.get("type") == "resume":
+                        await handle_resume(websocket, message)
+                except (json.JSONDecodeError, AttributeError):
                     pass
             except WebSocketDisconnect:
                 break
@@ -100,12 +267,103 @@ async def websocket_endpoint(websocket: WebSocket):
                 break
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {e}", exc_info=True)
+    finally:
+        # Stoppar även klientens writer-task
         manager.disconnect(websocket)
 
 
+async def handle_subscription(websocket: WebSocket, message: dict):
+    """
+    Hantera subscribe/unsubscribe från en klient
+
+    Meddelandet har formen {"type": "subscribe", "topics": ["sensors:halo-1", "heartbeat"]}.
+    Svaret listar klientens aktuella topics.
+    """
+    client = manager.clients.get(websocket)
+    topics = message.get("topics")
+    if client is None or not isinstance(topics, list):
+        return
+    if message["type"] == "subscribe":
+        hub.subscribe(client, topics)
+    else:
+        hub.unsubscribe(client, topics)
+    await manager.send_personal_message(
+        json.dumps({"type": "subscribed", "topics": sorted(client.topics)}),
+        websocket
+    )
+
+
+def _parse_since(value) -> Optional[datetime]:
+    """Tolka klientens senaste event-tid (ISO 8601) som naiv UTC"""
+    if not isinstance(value, str):
+        return None
+    try:
+        since = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+async def handle_resume(websocket: WebSocket, message: dict):
+    """
+    Återuppta event-strömmen efter en återanslutning
+
+    Klienten skickar {"type": "resume", "epoch": ..., "last_seq": N, "since": <tid>}.
+    Täcker ringbufferten luckan skickas bara meddelandena efter N. Annars
+    hämtas högst WS_CATCHUP_LIMIT events sedan "since" från InfluxDB
+    (truncated = fler fanns), och utan "since" får klienten ladda om (reset).
+    Allt skickas som ett replay-meddelande.
+    """
+    last_seq = message.get("last_seq")
+    messages = None
+    if isinstance(last_seq, int):
+        messages = replay.since(last_seq, epoch=message.get("epoch"))
+
+    if messages is not None:
+        text = replay_message(MODE_BUFFER, replay.epoch, replay.seq, messages)
+    else:
+        since = _parse_since(message.get("since"))
+        if since is None:
+            text = replay_message(MODE_RESET, replay.epoch, replay.seq, [])
+        else:
+            from services.influxdb import run_blocking
+            from .routes.events import get_event_service
+            events = await run_blocking(
+                get_event_service().get_events,
+                from_time=since,
+                limit=WS_CATCHUP_LIMIT + 1
+            )
+            truncated = len(events) > WS_CATCHUP_LIMIT
+            events = sorted(events[:WS_CATCHUP_LIMIT], key=lambda event: event.timestamp)
+            text = replay_message(
+                MODE_CATCHUP,
+                replay.epoch,
+                replay.seq,
+                [json.dumps(event_message(event), default=str) for event in events],
+                truncated=truncated
+            )
+
+    await manager.send_personal_message(text, websocket)
+
+
+async def broadcast_message(message: dict):
+    """
+    Broadcast ett färdigt meddelande (t.ex. från event bus) till klienter som
+    prenumererar på events
+
+    Meddelandet får ett seq och sparas i replay-bufferten.
+
+    Args:
+        message: JSON-serialiserbar dictionary
+    """
+    await manager.broadcast(replay.append(message), topic=TOPIC_EVENTS)
+
+
 async def broadcast_new_event(event: Event):
     """
     Broadcast ett nytt event till alla anslutna WebSocket-klienter
@@ -114,25 +372,47 @@ async def broadcast_new_event(event: Event):
         event: Event att broadcasta
     """
     try:
-        message = json.dumps({
-            "type": "new_event",
-            "event": {
-                "id": event.id,
-                "timestamp": event.timestamp.isoformat(),
-                "type": event.type.value,
-                "severity": event.severity.value,
-                "source": event.source,
-                "summary": event.summary,
-                "details": event.details,
-                "status": event.status.value,
-                "device_id": event.device_id,
-                "location": event.location,
-                "sensor_metadata_id": event.sensor_metadata_id,
-                "threshold_value": event.threshold_value,
-                "current_value": event.current_value
-            }
-        })
-        await manager.broadcast(message)
+        await broadcast_message(event_message(event))
         logger.debug(f"Broadcasted new event: {event.id}")
     except Exception as e:
         logger.error(f"Failed to broadcast event: {e}", exc_info=True)
+
+
+# Event bus som tar emot events från collectorn (annan process)
+_event_bus: Optional[EventBusServer] = None
+
+
+def get_event_bus() -> Optional[EventBusServer]:
+    """Hämta event bus-servern (None om den inte startats)"""
+    return _event_bus
+
+
+async def start_event_bus():
+    """Starta event bus-servern om EVENT_BUS_SOCKET är satt"""
+    global _event_bus
+    if not EVENT_BUS_SOCKET or _event_bus is not None:
+        return
+    server = EventBusServer(EVENT_BUS_SOCKET, on_message=broadcast_message)
+    try:
+        await server.start()
+        _event_bus = server
+    except OSError as e:
+        logger.error(f"Failed to start event bus on {EVENT_BUS_SOCKET}: {e}")
+
+
+async def stop_event_bus():
+    """Stoppa event bus-servern"""
+    global _event_bus
+    if _event_bus is not None:
+        await _event_bus.stop()
+        _event_bus = None
+
+
+def start_topic_hub():
+    """Starta push av prenumererade topics"""
+    hub.start()
+
+
+async def stop_topic_hub():
+    """Stoppa push av prenumererade topics"""
+    await hub.stop()
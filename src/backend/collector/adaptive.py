@@ -0,0 +1,130 @@
+"""
+Adaptive Interval - Anpassar pollintervallet per enhet efter aktivitet och nåbarhet
+"""
+from typing import Dict, List, Optional
+import logging
+
+from services.deadband import DeadbandRule
+from services.sensor_data import SensorReading
+
+logger = logging.getLogger(__name__)
+
+MODE_FAST = "fast"
+MODE_NORMAL = "normal"
+MODE_SLOW = "slow"
+MODE_BACKOFF = "backoff"
+
+
+class AdaptiveInterval:
+    """
+    Väljer nästa pollintervall för en enhet
+
+    - Aktiva Halo-events eller snabbt ändrade värden: fast
+    - Stabila värden i stable_cycles cykler i rad: slow
+    - Enheten svarar inte: exponentiell backoff från base upp till max_backoff
+    - Annars: base
+
+    "Snabbt ändrade" betyder att någon sensor med deadband-regel rört sig
+    mer än change_factor gånger sin deadband-tolerans sedan förra cykeln.
+    """
+
+    def __init__(
+        self,
+        base: float,
+        fast: Optional[float] = None,
+        slow: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        stable_cycles: int = 6,
+        change_rules: Optional[Dict[str, DeadbandRule]] = None,
+        change_factor: float = 3.0
+    ):
+        """
+        Initiera AdaptiveInterval
+
+        Args:
+            base: Normalt intervall i sekunder (COLLECTION_INTERVAL)
+            fast: Intervall vid aktiva events/snabba ändringar (default: base / 5, minst 1s)
+            slow: Intervall när värdena är stabila (default: base * 3)
+            max_backoff: Max intervall när enheten inte svarar (default: 300s)
+            stable_cycles: Antal stabila cykler innan slow används
+            change_rules: Deadband-regler per sensor_id för att avgöra snabba ändringar
+            change_factor: Hur många deadband-toleranser en ändring måste vara för att räknas som snabb
+        """
+        self.base = base
+        self.fast = fast if fast is not None else max(1.0, base / 5)
+        self.slow = slow if slow is not None else base * 3
+        self.max_backoff = max_backoff if max_backoff is not None else max(300.0, base)
+        self.stable_cycles = stable_cycles
+        self.change_rules = change_rules or {}
+        self.change_factor = change_factor
+
+        self.mode = MODE_NORMAL
+        self.interval = base
+        self.consecutive_failures = 0
+        self._stable_count = 0
+        self._previous: Dict[str, float] = {}
+
+    def observe_readings(self, readings: List[SensorReading]) -> bool:
+        """
+        Jämför med förra cykelns värden
+
+        Returns:
+            True om någon sensor ändrats snabbt
+        """
+        changing = False
+        for reading in readings:
+            rule = self.change_rules.get(reading.sensor_id)
+            previous = self._previous.get(reading.sensor_id)
+            self._previous[reading.sensor_id] = reading.value
+            if rule is None or previous is None:
+                continue
+            tolerance = max(rule.absolute, rule.relative * abs(previous))
+            if tolerance > 0 and abs(reading.value - previous) > tolerance * self.change_factor:
+                changing = True
+        return changing
+
+    def next_interval(self, reachable: bool, active_events: bool = False, changing: bool = False) -> float:
+        """
+        Beräkna intervall till nästa cykel
+
+        Args:
+            reachable: True om enheten svarade i cykeln
+            active_events: True om något Halo-event är aktivt
+            changing: True om värden ändrats snabbt (från observe_readings)
+
+        Returns:
+            Intervall i sekunder
+        """
+        if not reachable:
+            self.consecutive_failures += 1
+            self._stable_count = 0
+            # Första misslyckade försöket görs om på normalt intervall, sedan dubbla
+            self.interval = min(self.base * 2 ** (self.consecutive_failures - 1), self.max_backoff)
+            mode = MODE_BACKOFF if self.consecutive_failures > 1 else MODE_NORMAL
+        else:
+            self.consecutive_failures = 0
+            if active_events or changing:
+                self._stable_count = 0
+                self.interval = self.fast
+                mode = MODE_FAST
+            else:
+                self._stable_count += 1
+                if self._stable_count >= self.stable_cycles:
+                    self.interval = self.slow
+                    mode = MODE_SLOW
+                else:
+                    self.interval = self.base
+                    mode = MODE_NORMAL
+
+        if mode != self.mode:
+            logger.debug(f"Polling mode {self.mode} -> {mode} (interval {self.interval}s)")
+            self.mode = mode
+        return self.interval
+
+    def get_stats(self) -> Dict:
+        """Hämta aktuellt läge"""
+        return {
+            "poll_mode": self.mode,
+            "poll_interval_s": self.interval,
+            "consecutive_failures": self.consecutive_failures,
+        }
@@ -0,0 +1,229 @@
+"""
+Circuit Breaker - Felbudget och kapabilitetscache per Halo-endpoint
+"""
+from typing import Callable, Dict, Optional, Tuple
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Statuskoder som betyder att enheten saknar en valfri endpoint (inte att den är trasig)
+UNSUPPORTED_STATUS_CODES = frozenset({404, 405, 501})
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Endpointen hoppas över eftersom dess breaker är öppen"""
+
+
+class EndpointUnsupportedError(requests.exceptions.RequestException):
+    """Endpointen finns inte på enheten (kapabilitetscache)"""
+
+
+class CircuitBreaker:
+    """
+    Breaker för en endpoint (closed -> open -> half_open -> closed)
+
+    - closed: requests släpps igenom, failure_threshold fel i rad öppnar breakern
+    - open: requests avvisas direkt tills cooldown gått ut
+    - half_open: en provrequest släpps igenom; lyckas den stängs breakern,
+      annars öppnas den igen med dubblad cooldown (upp till max_cooldown)
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initiera CircuitBreaker
+
+        Args:
+            name: Namn för loggning (t.ex. "10.0.0.10/latest")
+            failure_threshold: Antal fel i rad innan breakern öppnas
+            cooldown: Sekunder i open innan en provrequest släpps igenom
+            max_cooldown: Max cooldown efter upprepade misslyckade prov
+            clock: Monoton klocka (för tester)
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self.state = STATE_CLOSED
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        # Metrics
+        self.rejected = 0
+        self.opened = 0
+        self.last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        """
+        Avgör om en request får skickas
+
+        Returns:
+            True om requesten får skickas
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN and self._clock() - self._opened_at >= self.cooldown:
+                self.state = STATE_HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Registrera lyckad request"""
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                logger.info(f"Circuit {self.name} closed after {self.consecutive_failures} failure(s)")
+            self.state = STATE_CLOSED
+            self.cooldown = self.base_cooldown
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Optional[str] = None):
+        """Registrera misslyckad request"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.state == STATE_HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == STATE_CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        """Öppna breakern (anropas med låset taget)"""
+        logger.warning(
+            f"Circuit {self.name} open for {self.cooldown:.0f}s after "
+            f"{self.consecutive_failures} failure(s): {self.last_error}"
+        )
+        self.state = STATE_OPEN
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self.opened += 1
+
+    def get_state(self) -> Dict:
+        """Hämta breakerns tillstånd"""
+        with self._lock:
+            retry_in = None
+            if self.state == STATE_OPEN:
+                retry_in = round(max(0.0, self.cooldown - (self._clock() - self._opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "cooldown_s": self.cooldown,
+                "retry_in_s": retry_in,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+
+class EndpointGuard:
+    """
+    Breakers och kapabilitetscache för en enhet
+
+    Varje logisk endpoint ("latest", "ble", ...) har en egen breaker så att
+    en långsam endpoint inte stänger av de andra. Valfria sökvägar som svarat
+    404/405/501 sparas som ej stödda per (metod, sökväg) och hoppas över
+    direkt tills capability_ttl gått ut (t.ex. efter en firmwareuppgradering).
+    En 405 på POST gör alltså inte GET mot samma sökväg ej stödd.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+        capability_ttl: float = 3600.0,
+        name: str = "",
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initiera EndpointGuard
+
+        Args:
+            failure_threshold: Antal fel i rad innan en endpoints breaker öppnas
+            cooldown: Sekunder innan en öppen breaker provas igen
+            max_cooldown: Max cooldown efter upprepade misslyckade prov
+            capability_ttl: Sekunder som en ej stödd sökväg hoppas över
+            name: Enhetens namn för loggning (t.ex. IP)
+            clock: Monoton klocka (för tester)
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.capability_ttl = capability_ttl
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._unsupported: Dict[Tuple[str, str], float] = {}
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """Hämta (eller skapa) breakern för en endpoint"""
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(
+                    name=f"{self.name}/{endpoint}" if self.name else endpoint,
+                    failure_threshold=self.failure_threshold,
+                    cooldown=self.cooldown,
+                    max_cooldown=self.max_cooldown,
+                    clock=self._clock
+                )
+            return breaker
+
+    def is_unsupported(self, method: str, path: str) -> bool:
+        """True om metoden mot sökvägen nyligen svarat att den inte stöds"""
+        key = (method.upper(), path)
+        with self._lock:
+            marked_at = self._unsupported.get(key)
+            if marked_at is None:
+                return False
+            if self._clock() - marked_at >= self.capability_ttl:
+                del self._unsupported[key]
+                return False
+            return True
+
+    def mark_unsupported(self, method: str, path: str):
+        """Spara att metoden mot sökvägen inte stöds av enheten"""
+        key = (method.upper(), path)
+        with self._lock:
+            if key not in self._unsupported:
+                logger.info(
+                    f"Endpoint {key[0]} {path} not supported by {self.name or 'device'}, "
+                    f"skipping for {self.capability_ttl:.0f}s"
+                )
+            self._unsupported[key] = self._clock()
+
+    def get_states(self) -> Dict:
+        """Hämta tillstånd för alla breakers och ej stödda sökvägar"""
+        with self._lock:
+            breakers = dict(self._breakers)
+            unsupported = [f"{method} {path}" for method, path in sorted(self._unsupported)]
+        return {
+            "endpoints": {name: breaker.get_state() for name, breaker in sorted(breakers.items())},
+            "unsupported": unsupported,
+        }
@@ -0,0 +1,540 @@
+"""
+Collector Engine - Asynkron insamling från en flotta Halo 3C-enheter
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from collector.adaptive import AdaptiveInterval
+from collector.pipeline import CollectionPipeline
+from collector.scheduler import TickScheduler, device_phase
+from models.events import Event
+from services.event_bus import event_message
+from services.live_store import build_live_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def load_device_configs() -> List[Dict]:
+    """
+    Läs enhetslistan från miljövariabler
+
+    HALO_DEVICES_FILE pekar på en JSON-fil med en lista av enheter och
+    HALO_DEVICES kan innehålla samma lista direkt. Varje enhet anges som
+    {"device_id": ..., "ip": ..., "username": ..., "password": ...} där
+    username/password faller tillbaka på HALO_USER/HALO_PASS.
+    Saknas båda används HALO_IP/DEVICE_ID som en enda enhet.
+
+    Returns:
+        Lista med enhetskonfigurationer
+    """
+    default_user = os.getenv("HALO_USER", "admin")
+    default_pass = os.getenv("HALO_PASS", "")
+
+    raw_devices = None
+    devices_file = os.getenv("HALO_DEVICES_FILE")
+    if devices_file:
+        with open(devices_file, "r", encoding="utf-8") as f:
+            raw_devices = json.load(f)
+    elif os.getenv("HALO_DEVICES"):
+        raw_devices = json.loads(os.getenv("HALO_DEVICES"))
+
+    if raw_devices is None:
+        raw_devices = [{
+            "device_id": os.getenv("DEVICE_ID", "halo-device-1"),
+            "ip": os.getenv("HALO_IP", "REDACTED_HALO_IP"),
+        }]
+
+    # Tillåt både {"devices": [...]} och en ren lista
+    if isinstance(raw_devices, dict):
+        raw_devices = raw_devices.get("devices", [])
+
+    devices = []
+    seen_ids = set()
+    for entry in raw_devices:
+        device_id = entry.get("device_id")
+        ip = entry.get("ip")
+        if not device_id or not ip:
+            logger.warning(f"Skipping device entry without device_id/ip: {entry}")
+            continue
+        if device_id in seen_ids:
+            logger.warning(f"Duplicate device_id {device_id} in device list, skipping")
+            continue
+        seen_ids.add(device_id)
+        devices.append({
+            "device_id": device_id,
+            "ip": ip,
+            "username": entry.get("username", default_user),
+            "password": entry.get("password", default_pass),
+        })
+
+    return devices
+
+
+class DeviceCollector:
+    """Håller per-enhet-state (Halo-klient, beacon-state och event-state)"""
+
+    def __init__(self, device_id: str, halo_client, beacon_handler, event_generator, event_bus=None):
+        """
+        Initiera DeviceCollector
+
+        Args:
+            device_id: Device-ID som används som tag i InfluxDB
+            halo_client: HaloClient för enheten
+            beacon_handler: BeaconHandler med enhetens beacon-state
+            event_generator: EventGenerator med enhetens event-state (delar beacon_handler)
+            event_bus: EventBusPublisher för nya events till API:t (delas mellan enheter)
+        """
+        self.device_id = device_id
+        self.halo_client = halo_client
+        self.beacon_handler = beacon_handler
+        self.event_generator = event_generator
+        self.event_bus = event_bus
+        self.pipeline = CollectionPipeline(device_id, beacon_handler, event_generator)
+
+        # Svarade Halo i senaste cykeln (None innan första cykeln)
+        self.reachable: Optional[bool] = None
+        self.last_contact: Optional[datetime] = None
+
+        # Statistik för cykler
+        self.cycles = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.last_cycle_ms: Optional[float] = None
+
+        # Executor-jobb som fortfarande körs (kan inte avbrytas vid deadline)
+        self._pending: Set[Future] = set()
+
+    @property
+    def busy(self) -> bool:
+        """True om ett tidigare executor-jobb för enheten fortfarande körs"""
+        return any(not f.done() for f in self._pending)
+
+    def _submit(self, executor: Executor, fn, *args) -> "asyncio.Future":
+        """Kör blockerande funktion i executor och spåra jobbet"""
+        future = executor.submit(fn, *args)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return asyncio.wrap_future(future)
+
+    async def run_cycle(self, executor: Executor, sensor_data_service, event_service) -> bool:
+        """
+        Kör en insamlingscykel för enheten
+
+        gstate/latest och event_state hämtas parallellt så att cykeln
+        kostar ungefär en round trip, och resultaten processas när båda finns.
+
+        Args:
+            executor: Executor för blockerande I/O
+            sensor_data_service: Delad SensorDataService
+            event_service: Delad EventService
+
+        Returns:
+            True om Halo svarade och data skrevs
+        """
+        cycle_start = time.monotonic()
+        try:
+            fetches = [self._submit(executor, self.fetch_latest)]
+            if self.event_generator.halo_client is not None:
+                fetches.append(self._submit(executor, self.halo_client.get_event_state))
+
+            results = await asyncio.gather(*fetches)
+            halo_state, fetch_time_ms, fetch_error = results[0]
+            # Tom dict betyder att hämtningen redan gjorts (och misslyckats)
+            event_state = (results[1] or {}) if len(results) > 1 else None
+
+            return await self._submit(
+                executor,
+                self.process,
+                halo_state,
+                fetch_time_ms,
+                event_state,
+                sensor_data_service,
+                event_service,
+                fetch_error
+            )
+        finally:
+            self.last_cycle_ms = (time.monotonic() - cycle_start) * 1000
+
+    def fetch_latest(self) -> Tuple[Optional[Dict], float, Optional[str]]:
+        """
+        Hämta gstate/latest och mät responstid (blockerande)
+
+        Returns:
+            (state, responstid i ms, felmeddelande om state saknas)
+        """
+        fetch_start = time.monotonic()
+        halo_state = self.halo_client.get_latest_state()
+        fetch_time_ms = (time.monotonic() - fetch_start) * 1000
+        error = self.halo_client.last_error if halo_state is None else None
+        return halo_state, fetch_time_ms, error
+
+    def process(
+        self,
+        halo_state: Optional[Dict],
+        fetch_time_ms: float,
+        event_state: Optional[Dict],
+        sensor_data_service,
+        event_service,
+        fetch_error: Optional[str] = None
+    ) -> bool:
+        """
+        Processa och skriv en hämtad cykel (blockerande, körs i executor)
+
+        Args:
+            halo_state: State från gstate/latest (None om Halo ej nåbar)
+            fetch_time_ms: Responstid för gstate/latest
+            event_state: Hämtad event_state ({} vid fel, None = hoppa över Halo-events)
+            sensor_data_service: Delad SensorDataService
+            event_service: Delad EventService
+            fetch_error: Felmeddelande från gstate/latest
+
+        Returns:
+            True om Halo svarade och data skrevs
+        """
+        try:
+            timestamp = datetime.utcnow()
+
+            self.reachable = halo_state is not None
+
+            # Logga heartbeat till InfluxDB
+            if halo_state is None:
+                sensor_data_service.write_heartbeat(
+                    is_connected=False,
+                    error=fetch_error or self.halo_client.last_error,
+                    timestamp=timestamp,
+                    device_id=self.device_id
+                )
+                logger.warning(f"[{self.device_id}] Failed to fetch Halo state, retrying next cycle")
+                self.failures += 1
+                return False
+
+            # parse -> derive -> detect -> write
+            created_events = self.pipeline.run(
+                halo_state,
+                event_state,
+                fetch_time_ms,
+                sensor_data_service,
+                event_service,
+                timestamp=timestamp
+            )
+            for created_event in created_events:
+                self._broadcast_event(created_event)
+
+            self.last_contact = timestamp
+            self.cycles += 1
+            logger.debug(f"[{self.device_id}] Collection cycle completed at {timestamp.isoformat()}")
+            return True
+
+        except Exception as e:
+            logger.error(f"[{self.device_id}] Error in collection cycle: {e}", exc_info=True)
+            self.failures += 1
+            return False
+
+    def _broadcast_event(self, event: Event):
+        """Skicka event till API:ts WebSocket-klienter via event bus"""
+        if self.event_bus is None:
+            return
+        if not self.event_bus.publish(event_message(event)):
+            logger.debug(f"[{self.device_id}] Event {event.id} buffered, event bus not reachable")
+
+    def get_stats(self) -> Dict:
+        """Hämta cykelstatistik för enheten"""
+        return {
+            "device_id": self.device_id,
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "last_cycle_ms": self.last_cycle_ms,
+        }
+
+
+class CollectorEngine:
+    """Pollar alla enheter samtidigt med deadline per enhet och delad InfluxDB-writer"""
+
+    def __init__(
+        self,
+        devices: List[DeviceCollector],
+        sensor_data_service,
+        event_service,
+        interval: float = 10,
+        deadline: Optional[float] = None,
+        max_workers: Optional[int] = None,
+        write_pipeline=None,
+        deadband=None,
+        metrics_interval: float = 60,
+        jitter: Optional[float] = None,
+        phase_spread: bool = True,
+        adaptive_factory: Optional[Callable[[], AdaptiveInterval]] = None,
+        live_publisher=None
+    ):
+        """
+        Initiera CollectorEngine
+
+        Args:
+            devices: Lista med DeviceCollector, en per Halo-enhet
+            sensor_data_service: Delad SensorDataService för alla enheter
+            event_service: Delad EventService för alla enheter
+            interval: Insamlingsintervall i sekunder
+            deadline: Max tid per enhetscykel i sekunder (default: aktuellt intervall - 1, aldrig över intervallet)
+            max_workers: Antal trådar för blockerande I/O (default baserat på antal enheter)
+            write_pipeline: Delad WritePipeline som flushas efter varje enhetscykel
+            deadband: DeadbandFilter vars metrics loggas
+            metrics_interval: Sekunder mellan loggning av metrics (0 = av)
+            jitter: Max slumpmässig fördröjning per tick i sekunder (default: 5% av intervallet, max 0.5)
+            phase_spread: Sprid enheternas tick över intervallet med fas-offset per device_id
+            adaptive_factory: Skapar en AdaptiveInterval per enhet (default: fast intervall)
+            live_publisher: LiveSnapshotPublisher som får enhetens snapshot efter varje cykel
+        """
+        self.devices = devices
+        self.sensor_data_service = sensor_data_service
+        self.event_service = event_service
+        self.interval = interval
+        self._configured_deadline = deadline
+        self.deadline = self._cycle_deadline(interval)
+        self.write_pipeline = write_pipeline
+        self.deadband = deadband
+        self.metrics_interval = metrics_interval
+        self.jitter = jitter if jitter is not None else min(0.5, interval * 0.05)
+        self.phase_spread = phase_spread
+        self._schedulers: Dict[str, TickScheduler] = {}
+        self.adaptive_factory = adaptive_factory
+        self._adaptive: Dict[str, AdaptiveInterval] = {}
+        self.live_publisher = live_publisher
+
+        if max_workers is None:
+            max_workers = min(64, len(devices) * 2 + 4)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="collector"
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+    async def check_devices(self) -> Dict[str, bool]:
+        """
+        Kör health check mot alla enheter samtidigt
+
+        Returns:
+            Dictionary device_id -> True om enheten svarade
+        """
+        async def check(device: DeviceCollector) -> bool:
+            try:
+                return await asyncio.wait_for(
+                    device._submit(self._executor, device.halo_client.health_check),
+                    timeout=self.deadline
+                )
+            except asyncio.TimeoutError:
+                return False
+
+        results = await asyncio.gather(*(check(d) for d in self.devices))
+        return {d.device_id: ok for d, ok in zip(self.devices, results)}
+
+    async def run(self):
+        """Kör insamlingsloopen tills stop() anropas"""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+
+        tasks = [
+            asyncio.create_task(self._run_device(device), name=f"collect-{device.device_id}")
+            for device in self.devices
+        ]
+        if self.metrics_interval > 0:
+            tasks.append(asyncio.create_task(self._report_metrics(), name="collector-metrics"))
+        logger.info(f"Collector engine started for {len(tasks)} device(s)")
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._executor.shutdown(wait=False)
+            logger.info("Collector engine stopped")
+
+    def stop(self):
+        """Begär att engine stoppas (trådsäker, kan anropas från signal handler)"""
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def _run_device(self, device: DeviceCollector):
+        """Insamlingsloop för en enhet"""
+        loop = asyncio.get_running_loop()
+        scheduler = TickScheduler(
+            interval=self.interval,
+            start=loop.time(),
+            phase=device_phase(device.device_id, self.interval) if self.phase_spread else 0.0,
+            jitter=self.jitter
+        )
+        self._schedulers[device.device_id] = scheduler
+        adaptive = self.adaptive_factory() if self.adaptive_factory is not None else None
+        if adaptive is not None:
+            self._adaptive[device.device_id] = adaptive
+
+        while not self._stop_event.is_set():
+            # Vänta till enhetens nästa tick eller tills stop begärs
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=scheduler.delay(loop.time()))
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            interval = adaptive.interval if adaptive is not None else self.interval
+            lateness = scheduler.begin(loop.time())
+            if lateness > scheduler.late_tolerance:
+                logger.warning(f"[{device.device_id}] Collection tick started {lateness * 1000:.0f}ms late")
+
+            if device.busy:
+                # Föregående cykel hänger fortfarande i executor - hoppa över
+                device.skipped += 1
+                logger.warning(f"[{device.device_id}] Previous cycle still running, skipping")
+            else:
+                timed_out = False
+                deadline = self._cycle_deadline(interval)
+                try:
+                    await asyncio.wait_for(
+                        device.run_cycle(self._executor, self.sensor_data_service, self.event_service),
+                        timeout=deadline
+                    )
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    device.timeouts += 1
+                    logger.warning(f"[{device.device_id}] Collection cycle exceeded deadline ({deadline:g}s)")
+
+                if adaptive is not None:
+                    interval = self._next_interval(device, adaptive, timed_out)
+
+                if self.live_publisher is not None:
+                    await self._publish_live(device)
+
+                # En skrivning per cykel: allt enheten köat skickas i samma batch
+                if self.write_pipeline is not None:
+                    self.write_pipeline.flush()
+
+            missed = scheduler.advance(loop.time(), interval)
+            if missed:
+                logger.warning(f"[{device.device_id}] Missed {missed} collection tick(s)")
+
+    def _cycle_deadline(self, interval: float) -> float:
+        """Deadline för en cykel med givet intervall (adaptivt fast-läge får kortare deadline)"""
+        if self._configured_deadline is not None:
+            return min(self._configured_deadline, interval)
+        return max(1.0, interval - 1)
+
+    def _next_interval(self, device: DeviceCollector, adaptive: AdaptiveInterval, timed_out: bool) -> float:
+        """Välj intervall till enhetens nästa cykel"""
+        reachable = bool(device.reachable) and not timed_out
+        changing = False
+        snapshot = device.pipeline.last_snapshot
+        if reachable and snapshot is not None:
+            changing = adaptive.observe_readings(snapshot.readings)
+
+        previous_mode = adaptive.mode
+        interval = adaptive.next_interval(
+            reachable=reachable,
+            active_events=reachable and device.event_generator.has_active_events(),
+            changing=changing
+        )
+        if adaptive.mode != previous_mode:
+            logger.info(f"[{device.device_id}] Polling mode {previous_mode} -> {adaptive.mode} (interval {interval:g}s)")
+        return interval
+
+    async def _publish_live(self, device: DeviceCollector):
+        """
+        Publicera enhetens senaste snapshot till API:t
+
+        När enheten inte svarade publiceras bara heartbeat: gamla värden ska
+        inte se färska ut, så API:t faller tillbaka på InfluxDB för sensorerna.
+        Filskrivningen görs i executorn så att event-loopen inte blockeras.
+        """
+        try:
+            snapshot = device.pipeline.last_snapshot
+            connected = bool(device.reachable)
+            live = build_live_snapshot(
+                device_id=device.device_id,
+                timestamp=snapshot.timestamp if snapshot is not None else datetime.utcnow(),
+                readings=(snapshot.readings if snapshot is not None else []) if connected else None,
+                connected=connected,
+                last_contact=device.last_contact,
+                response_time_ms=snapshot.response_time_ms if connected and snapshot is not None else None,
+                error=None if connected else device.halo_client.last_error,
+                circuit_breakers=device.halo_client.get_breaker_states()
+            )
+        except Exception as e:
+            logger.warning(f"[{device.device_id}] Failed to build live snapshot: {e}")
+            return
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.live_publisher.publish, live)
+
+    async def _report_metrics(self):
+        """Logga cykel- och write-metrics med jämna mellanrum"""
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.metrics_interval)
+            except asyncio.TimeoutError:
+                pass
+            metrics = self.get_metrics()
+            cycles = sum(d["cycles"] for d in metrics["devices"])
+            failures = sum(d["failures"] for d in metrics["devices"])
+            timeouts = sum(d["timeouts"] for d in metrics["devices"])
+            skipped = sum(d["skipped"] for d in metrics["devices"])
+            missed = sum(d.get("missed_ticks", 0) for d in metrics["devices"])
+            late = sum(d.get("late_ticks", 0) for d in metrics["devices"])
+            message = (
+                f"Collector metrics: cycles={cycles} failures={failures} timeouts={timeouts}"
+                f" skipped={skipped} missed_ticks={missed} late_ticks={late}"
+            )
+            write_metrics = metrics.get("write_pipeline")
+            if write_metrics:
+                message += (
+                    f" write_queue={write_metrics['queue_depth']}"
+                    f" flushes={write_metrics['flushes']}"
+                    f" last_flush_ms={write_metrics['last_flush_latency_ms']}"
+                    f" write_errors={write_metrics['write_errors']}"
+                    f" write_rejected={write_metrics['rejected']}"
+                )
+                wal_metrics = write_metrics.get("wal")
+                if wal_metrics:
+                    message += (
+                        f" wal_backlog_bytes={wal_metrics['backlog_bytes']}"
+                        f" wal_segments={wal_metrics['backlog_segments']}"
+                        f" wal_evicted={wal_metrics['evicted_segments']}"
+                    )
+            deadband_metrics = metrics.get("deadband")
+            if deadband_metrics:
+                message += (
+                    f" deadband_passed={deadband_metrics['passed']}"
+                    f" deadband_suppressed={deadband_metrics['suppressed']}"
+                )
+            logger.info(message)
+
+    def get_stats(self) -> List[Dict]:
+        """Hämta cykel- och schemastatistik för alla enheter"""
+        stats = []
+        for device in self.devices:
+            device_stats = device.get_stats()
+            scheduler = self._schedulers.get(device.device_id)
+            if scheduler is not None:
+                device_stats.update(scheduler.get_stats())
+            adaptive = self._adaptive.get(device.device_id)
+            if adaptive is not None:
+                device_stats.update(adaptive.get_stats())
+            stats.append(device_stats)
+        return stats
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för enheter och write-pipeline"""
+        metrics = {"devices": self.get_stats()}
+        if self.write_pipeline is not None:
+            metrics["write_pipeline"] = self.write_pipeline.get_metrics()
+        if self.deadband is not None:
+            metrics["deadband"] = self.deadband.get_metrics()
+        if self.live_publisher is not None:
+            metrics["live_snapshot"] = self.live_publisher.get_metrics()
+        return metrics
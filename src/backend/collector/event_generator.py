@@ -12,16 +12,22 @@ logger = logging.getLogger(__name__)
 class EventGenerator:
     """Genererar events baserat på sensor-data och tröskelvärden"""
 
-    def __init__(self, halo_client=None):
-        self.beacon_handler = BeaconHandler()
+    def __init__(self, halo_client=None, beacon_handler: Optional[BeaconHandler] = None):
+        # Dela BeaconHandler med collectorn så att det bara finns ett BeaconState per enhet
+        self.beacon_handler = beacon_handler or BeaconHandler()
         self.halo_client = halo_client
         self._last_event_states = {}  # Track last known event states to detect changes
         self._last_vibration_magnitude = 0.0  # Track last vibration magnitude
 
+    def has_active_events(self) -> bool:
+        """True om något Halo-event var aktivt i senaste event_state"""
+        return any(self._last_event_states.values())
+
     def generate_events_from_sensor_data(
         self,
         sensor_data: Dict,
-        device_id: str = "halo-device-1"
+        device_id: str = "halo-device-1",
+        event_state: Optional[Dict] = None
     ) -> List[Dict]:
         """
         Generera events från sensor-data
@@ -29,6 +35,7 @@ class EventGenerator:
         Args:
             sensor_data: Sensor-data från Halo 3C
             device_id: Device-ID
+            event_state: Redan hämtad event_state (None = hämta via halo_client)
 
         Returns:
             Lista med events
@@ -46,7 +53,7 @@ class EventGenerator:
 
         # Processa Halo event_state för Vape/THC och andra events
         try:
-            halo_events = self._process_halo_event_state(device_id)
+            halo_events = self._process_halo_event_state(device_id, event_state)
             events.extend(halo_events)
         except Exception as e:
             logger.error(f"Error processing Halo event state: {e}", exc_info=True)
@@ -60,23 +67,25 @@ class EventGenerator:
 
         return events
 
-    def _process_halo_event_state(self, device_id: str) -> List[Dict]:
+    def _process_halo_event_state(self, device_id: str, event_state: Optional[Dict] = None) -> List[Dict]:
         """
         Processa Halo event_state för att detektera aktiva events (Vape, THC, etc.)
 
         Args:
             device_id: Device-ID
+            event_state: Redan hämtad event_state (None = hämta via halo_client)
 
         Returns:
             Lista med events
         """
         events = []
 
-        if not self.halo_client:
+        if event_state is None and not self.halo_client:
             return events
 
         try:
-            event_state = self.halo_client.get_event_state()
+            if event_state is None:
+                event_state = self.halo_client.get_event_state()
             if not event_state:
                 return events
 
@@ -181,7 +190,6 @@ class EventGenerator:
             Lista med events
         """
         events = []
-        vibration_threshold = 1500.0  # milli g - tröskel för skakningsdetektion
 
         try:
             # Extrahera accelerometer-data
@@ -196,35 +204,61 @@ class EventGenerator:
 
                     # Beräkna magnitud: sqrt(x² + y² + z²)
                     magnitude = math.sqrt(x*x + y*y + z*z)
-
-                    # Logga skakning om magnitud > tröskel OCH move == 1
-                    if move == 1 and magnitude > vibration_threshold:
-                        # Kolla om det är en ny skakning (magnitud ökade signifikant)
-                        if magnitude > self._last_vibration_magnitude * 1.2:  # 20% ökning
-                            events.append({
-                                'type': 'TAMPER',
-                                'severity': 'WARNING',
-                                'source': 'accsensor/vibration',
-                                'summary': f'Skakning detekterad (magnitud: {magnitude:.1f} milli g)',
-                                'details': {
-                                    'magnitude': magnitude,
-                                    'x': x,
-                                    'y': y,
-                                    'z': z,
-                                    'move': move,
-                                    'threshold': vibration_threshold
-                                },
-                                'device_id': device_id,
-                                'current_value': magnitude,
-                                'threshold_value': vibration_threshold
-                            })
-                            logger.info(f"Vibration detected: magnitude={magnitude:.1f} milli g")
-
-                    # Uppdatera last vibration magnitude
-                    self._last_vibration_magnitude = magnitude
+                    events = self.detect_vibration(magnitude, move, x, y, z, device_id)
 
         except Exception as e:
             logger.error(f"Error processing accelerometer vibration: {e}", exc_info=True)
 
         return events
 
+    def detect_vibration(
+        self,
+        magnitude: float,
+        move: int,
+        x: float,
+        y: float,
+        z: float,
+        device_id: str
+    ) -> List[Dict]:
+        """
+        Detektera skakning från redan beräknad accelerometer-magnitud
+
+        Args:
+            magnitude: Magnitud i milli g
+            move: Halos rörelseflagga (0/1)
+            x, y, z: Råvärden från accelerometern
+            device_id: Device-ID
+
+        Returns:
+            Lista med events
+        """
+        events = []
+        vibration_threshold = 1500.0  # milli g - tröskel för skakningsdetektion
+
+        # Logga skakning om magnitud > tröskel OCH move == 1
+        if move == 1 and magnitude > vibration_threshold:
+            # Kolla om det är en ny skakning (magnitud ökade signifikant)
+            if magnitude > self._last_vibration_magnitude * 1.2:  # 20% ökning
+                events.append({
+                    'type': 'TAMPER',
+                    'severity': 'WARNING',
+                    'source': 'accsensor/vibration',
+                    'summary': f'Skakning detekterad (magnitud: {magnitude:.1f} milli g)',
+                    'details': {
+                        'magnitude': magnitude,
+                        'x': x,
+                        'y': y,
+                        'z': z,
+                        'move': move,
+                        'threshold': vibration_threshold
+                    },
+                    'device_id': device_id,
+                    'current_value': magnitude,
+                    'threshold_value': vibration_threshold
+                })
+                logger.info(f"Vibration detected: magnitude={magnitude:.1f} milli g")
+
+        # Uppdatera last vibration magnitude
+        self._last_vibration_magnitude = magnitude
+
+        return events
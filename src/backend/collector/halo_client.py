@@ -1,13 +1,24 @@
 """
 Halo Client - Hämtar data från Halo 3C sensor
 """
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
+import ssl
 from datetime import datetime
+from urllib.parse import urlsplit
 import urllib3
 
+from collector.circuit_breaker import (
+    UNSUPPORTED_STATUS_CODES,
+    CircuitOpenError,
+    EndpointGuard,
+    EndpointUnsupportedError,
+)
+
 # Disable SSL warnings for self-signed certificates
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -17,22 +28,48 @@ logger = logging.getLogger(__name__)
 _last_successful_contact: Optional[datetime] = None
 _last_contact_error: Optional[str] = None
 
+# Read-timeout per endpoint i sekunder (kan överskridas via HaloClient(timeouts=...))
+DEFAULT_ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "latest": 5,
+    "event_state": 5,
+    "workers": 5,
+    "netinfo": 5,
+    "timeinfo": 5,
+    "cloud": 5,
+    "about": 5,
+    "ble": 3,
+    "config": 10,
+    "config_update": 15,
+}
+
 
 def get_heartbeat_status() -> Dict:
     """Hämta heartbeat-status för Halo-sensorn"""
-    global _last_successful_contact, _last_contact_error
+    return heartbeat_status(_last_successful_contact, _last_contact_error)
+
+
+def heartbeat_status(last_contact: Optional[datetime], error: Optional[str]) -> Dict:
+    """
+    Heartbeat-status utifrån senaste lyckade kontakt
+
+    Args:
+        last_contact: Tid (UTC) för senaste lyckade kontakt
+        error: Senaste felmeddelande
 
+    Returns:
+        Dictionary med status (healthy/degraded/offline/unknown)
+    """
     now = datetime.utcnow()
 
-    if _last_successful_contact is None:
+    if last_contact is None:
         return {
             "status": "unknown",
             "last_contact": None,
             "seconds_since_contact": None,
-            "error": _last_contact_error
+            "error": error
         }
 
-    seconds_since = (now - _last_successful_contact).total_seconds()
+    seconds_since = (now - last_contact).total_seconds()
 
     # Status baserat på tid sedan senaste kontakt
     if seconds_since < 30:
@@ -44,12 +81,34 @@ def get_heartbeat_status() -> Dict:
 
     return {
         "status": status,
-        "last_contact": _last_successful_contact.isoformat(),
+        "last_contact": last_contact.isoformat(),
         "seconds_since_contact": int(seconds_since),
-        "error": _last_contact_error if status != "healthy" else None
+        "error": error if status != "healthy" else None
     }
 
 
+class _HaloHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter med delad SSL-kontext för Halos self-signed certifikat
+
+    Alla anslutningar i poolen använder samma SSLContext så att TLS-inställningar
+    bara byggs en gång, och keep-alive gör att handskakningen sker en gång per
+    anslutning istället för per request.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs["ssl_context"] = self._ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
+
+
 class HaloClient:
     """Client för att kommunicera med Halo 3C sensor"""
 
@@ -59,7 +118,13 @@ class HaloClient:
         username: str,
         password: str,
         use_https: bool = False,
-        timeout: int = 10
+        timeout: int = 10,
+        pool_size: int = 4,
+        connect_timeout: float = 3.0,
+        timeouts: Optional[Dict[str, float]] = None,
+        breaker_threshold: int = 3,
+        breaker_cooldown: float = 30.0,
+        capability_ttl: float = 3600.0
     ):
         """
         Initiera Halo Client
@@ -69,16 +134,166 @@ class HaloClient:
             username: HTTP Basic Auth username
             password: HTTP Basic Auth password
             use_https: Använd HTTPS istället för HTTP
-            timeout: Request timeout i sekunder
+            timeout: Read-timeout i sekunder för endpoints utan egen timeout
+            pool_size: Max antal keep-alive-anslutningar till enheten
+            connect_timeout: Timeout för TCP/TLS-uppkoppling i sekunder
+            timeouts: Read-timeout per endpoint (överskrider DEFAULT_ENDPOINT_TIMEOUTS)
+            breaker_threshold: Antal fel i rad innan en endpoint hoppas över
+            breaker_cooldown: Sekunder innan en avstängd endpoint provas igen
+            capability_ttl: Sekunder som en endpoint som svarat 404 hoppas över
         """
         self.ip = ip
         self.username = username
         self.password = password
         self.protocol = "https" if use_https else "http"
         self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.timeouts = {**DEFAULT_ENDPOINT_TIMEOUTS, **(timeouts or {})}
         self.auth = HTTPBasicAuth(username, password)
         self.base_url = f"{self.protocol}://{ip}/api/config/gstate"
 
+        # Persistent session med anslutningspool (keep-alive)
+        self.session = self._create_session(pool_size)
+
+        # Delad executor för parallella hämtningar, högst en tråd per poolad anslutning
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="halo-info")
+
+        # Circuit breaker per endpoint och cache för endpoints enheten saknar
+        self.guard = EndpointGuard(
+            failure_threshold=breaker_threshold,
+            cooldown=breaker_cooldown,
+            capability_ttl=capability_ttl,
+            name=ip
+        )
+
+        # Heartbeat per klient (de globala värdena speglar senaste klient)
+        self.last_successful_contact: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """Skapa session med anslutningspool och delad SSL-kontext"""
+        # Halo använder self-signed certifikat
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+        adapter = _HaloHTTPAdapter(
+            ssl_context=ssl_context,
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=0
+        )
+
+        session = requests.Session()
+        session.auth = self.auth
+        session.verify = False
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _timeout(self, endpoint: str) -> Tuple[float, float]:
+        """Hämta (connect, read)-timeout för en endpoint"""
+        return (self.connect_timeout, self.timeouts.get(endpoint, self.timeout))
+
+    def _get(
+        self,
+        url: str,
+        endpoint: str,
+        breaker: Optional[str] = None,
+        optional: bool = False
+    ) -> requests.Response:
+        """
+        GET mot Halo via den poolade sessionen
+
+        Args:
+            url: Fullständig URL
+            endpoint: Logiskt endpoint-namn (för timeout och circuit breaker)
+            breaker: Eget breaker-namn (default: endpoint)
+            optional: Endpoint som inte alla enheter har (se _request)
+
+        Returns:
+            Response-objekt
+        """
+        return self._request("GET", url, endpoint, breaker=breaker, optional=optional)
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        endpoint: str,
+        breaker: Optional[str] = None,
+        optional: bool = False,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Request mot Halo via circuit breakern
+
+        Endpoints vars breaker är öppen avvisas direkt med CircuitOpenError
+        istället för att vänta ut timeouten. Valfria endpoints (BLE-scan,
+        extra enhetsinformation) som svarat 404/405/501 sparas per metod och
+        sökväg och avvisas med EndpointUnsupportedError tills capability_ttl
+        gått ut. För övriga endpoints räknas 404/405 som fel i breakern, så
+        t.ex. en enhet som startar om bara ger en kort cooldown.
+
+        Args:
+            method: HTTP-metod ("GET" eller "POST")
+            url: Fullständig URL
+            endpoint: Logiskt endpoint-namn (för timeout och circuit breaker)
+            breaker: Eget breaker-namn när flera URL:er delar timeout (default: endpoint)
+            optional: Använd kapabilitetscachen för endpointen
+
+        Returns:
+            Response-objekt
+        """
+        path = urlsplit(url).path
+        if optional and self.guard.is_unsupported(method, path):
+            raise EndpointUnsupportedError(f"{method} {path} not supported by {self.ip}")
+
+        breaker_name = breaker or endpoint
+        breaker = self.guard.breaker(breaker_name)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {self.ip}/{breaker_name}: {breaker.last_error}")
+
+        try:
+            send = getattr(self.session, method.lower())
+            response = send(url, timeout=self._timeout(endpoint), **kwargs)
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure(str(e))
+            raise
+
+        if optional and response.status_code in UNSUPPORTED_STATUS_CODES:
+            # Enheten svarade - endpointen finns bara inte
+            self.guard.mark_unsupported(method, path)
+            breaker.record_success()
+        elif response.status_code >= 500 or response.status_code in UNSUPPORTED_STATUS_CODES:
+            breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            breaker.record_success()
+        return response
+
+    def get_breaker_states(self) -> Dict:
+        """Hämta circuit breaker-tillstånd per endpoint"""
+        return self.guard.get_states()
+
+    def close(self):
+        """Stäng sessionen och dess anslutningar"""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _mark_contact(self):
+        """Registrera lyckad kontakt med Halo"""
+        global _last_successful_contact, _last_contact_error
+        self.last_successful_contact = datetime.utcnow()
+        self.last_error = None
+        _last_successful_contact = self.last_successful_contact
+        _last_contact_error = None
+
+    def _mark_error(self, error: Exception):
+        """Registrera misslyckad kontakt med Halo"""
+        global _last_contact_error
+        self.last_error = str(error)
+        _last_contact_error = self.last_error
+
     def get_latest_state(self) -> Optional[Dict]:
         """
         Hämta senaste sensor-state från Halo 3C
@@ -86,32 +301,24 @@ class HaloClient:
         Returns:
             Dictionary med alla sensorvärden, eller None vid fel
         """
-        global _last_successful_contact, _last_contact_error
-
         try:
             url = f"{self.base_url}/latest"
-            response = requests.get(
-                url,
-                auth=self.auth,
-                timeout=self.timeout,
-                verify=False
-            )
+            response = self._get(url, "latest")
             response.raise_for_status()
             data = response.json()
 
             # Uppdatera heartbeat
-            _last_successful_contact = datetime.utcnow()
-            _last_contact_error = None
+            self._mark_contact()
 
             logger.debug(f"Successfully fetched Halo state from {url}")
             return data
 
         except requests.exceptions.RequestException as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Failed to fetch Halo state: {e}")
             return None
         except Exception as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Unexpected error fetching Halo state: {e}", exc_info=True)
             return None
 
@@ -183,85 +390,41 @@ class HaloClient:
         """
         Hamta enhetsinformation fran Halo 3C
 
+        Delarna (workers, natverk, tid, cloud, about) hamtas parallellt sa att
+        total tid blir den langsammaste delen istallet for summan. Klientens
+        executor har pool_size tradar, sa fler samtidiga hamtningar an
+        anslutningspoolen rymmer kors aldrig.
+
         Returns:
             Dictionary med enhetsinformation eller None vid fel
         """
+        parts = [
+            ("workers", f"{self.protocol}://{self.ip}/api/config/gstate/workers", "workers"),
+            ("network", f"{self.protocol}://{self.ip}/api/device/netinfo", "netinfo"),
+            ("time_info", f"{self.protocol}://{self.ip}/api/device/gettimeinfo", "timeinfo"),
+            ("cloud", f"{self.protocol}://{self.ip}/api/config/gstate/cloud", "cloud"),
+            ("about", f"{self.protocol}://{self.ip}/api/config/gstate/hidden/about", "about"),
+        ]
+
         try:
             info = {}
 
-            # Hamta workers info (drifttimmar, starttid)
-            workers_url = f"{self.protocol}://{self.ip}/api/config/gstate/workers"
-            try:
-                response = requests.get(
-                    workers_url,
-                    auth=self.auth,
-                    timeout=self.timeout,
-                    verify=False
-                )
-                if response.ok:
-                    workers = response.json()
-                    info["workers"] = workers
-                    # Extrahera specifika varden
-                    info["lifetime_hours"] = workers.get("lifetimehrs")
-                    info["start_time"] = workers.get("starttime")
-            except Exception as e:
-                logger.warning(f"Failed to fetch workers info: {e}")
+            futures = {key: self._executor.submit(self._fetch_json, url, endpoint) for key, url, endpoint in parts}
 
-            # Hamta natverksinfo
-            netinfo_url = f"{self.protocol}://{self.ip}/api/device/netinfo"
-            try:
-                response = requests.get(
-                    netinfo_url,
-                    auth=self.auth,
-                    timeout=self.timeout,
-                    verify=False
-                )
-                if response.ok:
-                    info["network"] = response.json()
-            except Exception as e:
-                logger.warning(f"Failed to fetch network info: {e}")
+            for key, future in futures.items():
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to fetch {key} info: {e}")
+                    continue
+                if data is not None:
+                    info[key] = data
 
-            # Hamta tidsinfo
-            timeinfo_url = f"{self.protocol}://{self.ip}/api/device/gettimeinfo"
-            try:
-                response = requests.get(
-                    timeinfo_url,
-                    auth=self.auth,
-                    timeout=self.timeout,
-                    verify=False
-                )
-                if response.ok:
-                    info["time_info"] = response.json()
-            except Exception as e:
-                logger.warning(f"Failed to fetch time info: {e}")
-
-            # Hamta cloud status
-            cloud_url = f"{self.protocol}://{self.ip}/api/config/gstate/cloud"
-            try:
-                response = requests.get(
-                    cloud_url,
-                    auth=self.auth,
-                    timeout=self.timeout,
-                    verify=False
-                )
-                if response.ok:
-                    info["cloud"] = response.json()
-            except Exception as e:
-                logger.warning(f"Failed to fetch cloud status: {e}")
-
-            # Hamta hidden/about (sensorkalibrering, serienummer)
-            about_url = f"{self.protocol}://{self.ip}/api/config/gstate/hidden/about"
-            try:
-                response = requests.get(
-                    about_url,
-                    auth=self.auth,
-                    timeout=self.timeout,
-                    verify=False
-                )
-                if response.ok:
-                    info["about"] = response.json()
-            except Exception as e:
-                logger.warning(f"Failed to fetch about info: {e}")
+            # Extrahera specifika varden fran workers (drifttimmar, starttid)
+            workers = info.get("workers")
+            if isinstance(workers, dict):
+                info["lifetime_hours"] = workers.get("lifetimehrs")
+                info["start_time"] = workers.get("starttime")
 
             info["ip"] = self.ip
             info["fetched_at"] = datetime.utcnow().isoformat()
@@ -272,6 +435,13 @@ class HaloClient:
             logger.error(f"Failed to get device info: {e}", exc_info=True)
             return None
 
+    def _fetch_json(self, url: str, endpoint: str) -> Optional[Dict]:
+        """GET och returnera JSON, None om svaret inte är OK"""
+        response = self._get(url, endpoint, optional=True)
+        if not response.ok:
+            return None
+        return response.json()
+
     def get_raw_state(self) -> Optional[Dict]:
         """
         Hamta radata fran Halo (senaste state utan bearbetning)
@@ -291,8 +461,6 @@ class HaloClient:
         Returns:
             Lista med BLE-enheter eller None om ej tillgängligt
         """
-        global _last_successful_contact, _last_contact_error
-
         # Försök flera möjliga endpoints för BLE-scanning
         ble_endpoints = [
             "/api/config/gstate/blebcn",
@@ -305,17 +473,12 @@ class HaloClient:
         for endpoint in ble_endpoints:
             try:
                 url = f"{self.protocol}://{self.ip}{endpoint}"
-                response = requests.get(
-                    url,
-                    auth=self.auth,
-                    timeout=self.timeout,
-                    verify=False
-                )
+                # Egen breaker per URL: en saknad/trasig väg ska inte stänga av de andra
+                response = self._get(url, "ble", breaker=f"ble:{endpoint}", optional=True)
 
                 if response.ok:
                     data = response.json()
-                    _last_successful_contact = datetime.utcnow()
-                    _last_contact_error = None
+                    self._mark_contact()
 
                     # Extrahera enheter beroende på response-format
                     if isinstance(data, list):
@@ -371,32 +534,24 @@ class HaloClient:
         Returns:
             Dictionary med event states eller None vid fel
         """
-        global _last_successful_contact, _last_contact_error
-
         try:
             url = f"{self.protocol}://{self.ip}/api/config/gstate/event_state"
-            response = requests.get(
-                url,
-                auth=self.auth,
-                timeout=self.timeout,
-                verify=False
-            )
+            response = self._get(url, "event_state")
             response.raise_for_status()
             data = response.json()
 
             # Uppdatera heartbeat
-            _last_successful_contact = datetime.utcnow()
-            _last_contact_error = None
+            self._mark_contact()
 
             logger.debug(f"Successfully fetched event state from {url}")
             return data
 
         except requests.exceptions.RequestException as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Failed to fetch event state: {e}")
             return None
         except Exception as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Unexpected error fetching event state: {e}", exc_info=True)
             return None
 
@@ -407,32 +562,24 @@ class HaloClient:
         Returns:
             Dictionary med hela konfigurationen, eller None vid fel
         """
-        global _last_successful_contact, _last_contact_error
-
         try:
             url = f"{self.protocol}://{self.ip}/api/config"
-            response = requests.get(
-                url,
-                auth=self.auth,
-                timeout=self.timeout,
-                verify=False
-            )
+            response = self._get(url, "config")
             response.raise_for_status()
             data = response.json()
 
             # Uppdatera heartbeat
-            _last_successful_contact = datetime.utcnow()
-            _last_contact_error = None
+            self._mark_contact()
 
             logger.debug(f"Successfully fetched full config from {url}")
             return data
 
         except requests.exceptions.RequestException as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Failed to fetch full config: {e}")
             return None
         except Exception as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Unexpected error fetching full config: {e}", exc_info=True)
             return None
 
@@ -446,32 +593,23 @@ class HaloClient:
         Returns:
             True om uppdateringen lyckades, False annars
         """
-        global _last_successful_contact, _last_contact_error
-
         try:
             url = f"{self.protocol}://{self.ip}/api/config"
-            response = requests.post(
-                url,
-                auth=self.auth,
-                json=config,
-                timeout=self.timeout,
-                verify=False
-            )
+            response = self._request("POST", url, "config_update", json=config)
             response.raise_for_status()
 
             # Uppdatera heartbeat
-            _last_successful_contact = datetime.utcnow()
-            _last_contact_error = None
+            self._mark_contact()
 
             logger.info(f"Successfully updated Halo config")
             return True
 
         except requests.exceptions.RequestException as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Failed to update config: {e}")
             return False
         except Exception as e:
-            _last_contact_error = str(e)
+            self._mark_error(e)
             logger.error(f"Unexpected error updating config: {e}", exc_info=True)
             return False
 
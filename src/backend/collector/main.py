@@ -1,19 +1,27 @@
 """
-Collector Main - Huvudprocess som pollar Halo 3C sensor och skriver till InfluxDB
+Collector Main - Huvudprocess som pollar Halo 3C-sensorer och skriver till InfluxDB
 """
+import asyncio
+import json
 import os
-import time
 import logging
 import signal
 import sys
-from datetime import datetime
 from typing import Optional
 
 from collector.halo_client import HaloClient
 from collector.beacon_handler import BeaconHandler
 from collector.event_generator import EventGenerator
+from collector.engine import CollectorEngine, DeviceCollector, load_device_configs
+from collector.adaptive import AdaptiveInterval
+from services.influxdb import InfluxDBService
 from services.sensor_data import SensorDataService
 from services.events import EventService
+from services.write_pipeline import WritePipeline
+from services.wal import WriteAheadLog
+from services.deadband import DeadbandFilter, load_deadband_rules
+from services.event_bus import EventBusPublisher
+from services.live_store import LiveSnapshotPublisher
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,35 +32,79 @@ logger = logging.getLogger(__name__)
 # Global shutdown flag
 shutdown = False
 
+# Aktiv engine (för signal handler)
+_engine: Optional[CollectorEngine] = None
+
 
 def signal_handler(sig, frame):
     """Hantera shutdown-signaler"""
     global shutdown
     logger.info("Shutdown signal received, stopping collector...")
     shutdown = True
+    if _engine is not None:
+        _engine.stop()
+
+
+async def run_engine(engine: CollectorEngine):
+    """Kör health check mot alla enheter och starta insamlingen"""
+    logger.info("Performing health check...")
+    health = await engine.check_devices()
+    for device_id, ok in health.items():
+        if ok:
+            logger.info(f"  {device_id}: health check passed")
+        else:
+            logger.warning(f"  {device_id}: health check failed - Halo sensor not accessible")
+
+    if not any(health.values()):
+        # Starta ändå - enheter som inte svarar pollas med exponentiell backoff
+        logger.warning("Health check failed - no Halo sensor accessible, starting with backoff")
+
+    if shutdown:
+        return
+
+    logger.info(f"Starting collection loop (interval: {engine.interval}s, deadline: {engine.deadline}s)")
+    await engine.run()
 
 
 def main():
     """Huvudfunktion för collector service"""
+    global _engine
+
     # Registrera signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
     # Läs miljövariabler
-    halo_ip = os.getenv("HALO_IP", "REDACTED_HALO_IP")
-    halo_user = os.getenv("HALO_USER", "admin")
-    halo_pass = os.getenv("HALO_PASS", "")
-    device_id = os.getenv("DEVICE_ID", "halo-device-1")
     collection_interval = int(os.getenv("COLLECTION_INTERVAL", "10"))
+    collection_deadline = os.getenv("COLLECTION_DEADLINE")
+    collection_jitter = os.getenv("COLLECTION_JITTER")
+    max_workers = os.getenv("COLLECTOR_MAX_WORKERS")
+    halo_pool_size = int(os.getenv("HALO_POOL_SIZE", "4"))
+    halo_connect_timeout = float(os.getenv("HALO_CONNECT_TIMEOUT", "3"))
+    halo_timeouts = json.loads(os.getenv("HALO_TIMEOUTS", "{}"))
+    halo_breaker_threshold = int(os.getenv("HALO_BREAKER_THRESHOLD", "3"))
+    halo_breaker_cooldown = float(os.getenv("HALO_BREAKER_COOLDOWN", "30"))
+    halo_capability_ttl = float(os.getenv("HALO_CAPABILITY_TTL", "3600"))
 
     influxdb_url = os.getenv("INFLUXDB_URL", "http://influxdb:8086")
     influxdb_token = os.getenv("INFLUXDB_TOKEN", "")
     influxdb_org = os.getenv("INFLUXDB_ORG", "halo-org")
     influxdb_bucket = os.getenv("INFLUXDB_BUCKET", "halo-sensors")
 
+    try:
+        device_configs = load_device_configs()
+    except Exception as e:
+        logger.error(f"Failed to load device list: {e}", exc_info=True)
+        sys.exit(1)
+
     # Validera kritiska miljövariabler
-    if not halo_pass:
-        logger.error("HALO_PASS environment variable is required")
+    if not device_configs:
+        logger.error("No Halo devices configured (HALO_DEVICES_FILE, HALO_DEVICES or HALO_IP)")
+        sys.exit(1)
+
+    missing_pass = [d["device_id"] for d in device_configs if not d["password"]]
+    if missing_pass:
+        logger.error(f"HALO_PASS (or per-device password) is required for: {', '.join(missing_pass)}")
         sys.exit(1)
 
     if not influxdb_token:
@@ -60,160 +112,127 @@ def main():
         sys.exit(1)
 
     logger.info(f"Starting Halo 3C Collector Service")
-    logger.info(f"  Halo IP: {halo_ip}")
-    logger.info(f"  Device ID: {device_id}")
+    logger.info(f"  Devices: {len(device_configs)}")
+    for config in device_configs:
+        logger.info(f"    {config['device_id']} ({config['ip']})")
     logger.info(f"  Collection Interval: {collection_interval}s")
     logger.info(f"  InfluxDB: {influxdb_url}")
 
     # Initiera klienter och services
     try:
-        # Halo använder HTTPS med self-signed certifikat
-        halo_client = HaloClient(
-            ip=halo_ip,
-            username=halo_user,
-            password=halo_pass,
-            use_https=True
+        # Nya events till API:ts WebSocket-klienter
+        event_bus = None
+        if os.getenv("EVENT_BUS_SOCKET"):
+            event_bus = EventBusPublisher(os.getenv("EVENT_BUS_SOCKET"))
+            logger.info(f"Publishing events to event bus at {event_bus.path}")
+
+        devices = []
+        for config in device_configs:
+            # Halo använder HTTPS med self-signed certifikat
+            halo_client = HaloClient(
+                ip=config["ip"],
+                username=config["username"],
+                password=config["password"],
+                use_https=True,
+                pool_size=halo_pool_size,
+                connect_timeout=halo_connect_timeout,
+                timeouts=halo_timeouts,
+                breaker_threshold=halo_breaker_threshold,
+                breaker_cooldown=halo_breaker_cooldown,
+                capability_ttl=halo_capability_ttl
+            )
+            beacon_handler = BeaconHandler()
+            devices.append(DeviceCollector(
+                device_id=config["device_id"],
+                halo_client=halo_client,
+                beacon_handler=beacon_handler,
+                event_generator=EventGenerator(halo_client=halo_client, beacon_handler=beacon_handler),
+                event_bus=event_bus
+            ))
+        logger.info(f"Initialized {len(devices)} device collector(s) (HTTPS mode)")
+
+        # Delad write-pipeline: alla points från en cykel skrivs i en batch
+        # Med WAL_DIR skrivs allt till disk först så att inget tappas när InfluxDB är nere
+        wal = None
+        if os.getenv("WAL_DIR"):
+            wal = WriteAheadLog(influxdb=InfluxDBService(), wal_dir=os.getenv("WAL_DIR"))
+            logger.info(f"Write-ahead log enabled at {wal.wal_dir} (max {wal.max_bytes} bytes)")
+        write_pipeline = WritePipeline(wal=wal)
+        logger.info(
+            f"Write pipeline initialized (batch size: {write_pipeline.batch_size}, "
+            f"flush interval: {write_pipeline.flush_interval}s)"
         )
-        logger.info("Halo client initialized (HTTPS mode)")
 
-        beacon_handler = BeaconHandler()
-        logger.info("Beacon handler initialized")
+        # Delade writers för alla enheter
+        # Change-only-skrivning med deadband från sensor_metadata.json
+        deadband = None
+        if os.getenv("SENSOR_DEADBAND", "true").lower() in ("1", "true", "yes"):
+            deadband = DeadbandFilter.from_metadata()
+            logger.info(f"Deadband filter enabled for {len(deadband.rules)} sensor(s)")
 
-        event_generator = EventGenerator(halo_client=halo_client)
-        logger.info("Event generator initialized")
-
-        sensor_data_service = SensorDataService()
-        logger.info("Sensor data service initialized")
+        sensor_data_service = SensorDataService(write_pipeline=write_pipeline, deadband=deadband)
+        logger.info(f"Sensor data service initialized (schema: {sensor_data_service.schema})")
 
         event_service = EventService(
             url=influxdb_url,
             token=influxdb_token,
             org=influxdb_org,
-            bucket=influxdb_bucket
+            bucket=influxdb_bucket,
+            write_pipeline=write_pipeline
         )
         logger.info("Event service initialized")
 
+        # Adaptiv polling: snabbare vid aktiva events, långsammare vid stabila värden eller offline
+        adaptive_factory = None
+        if os.getenv("COLLECTION_ADAPTIVE", "true").lower() in ("1", "true", "yes"):
+            change_rules = deadband.rules if deadband is not None else load_deadband_rules()
+            fast_interval = os.getenv("COLLECTION_FAST_INTERVAL")
+            slow_interval = os.getenv("COLLECTION_SLOW_INTERVAL")
+            max_backoff = os.getenv("COLLECTION_MAX_BACKOFF")
+
+            def adaptive_factory():
+                return AdaptiveInterval(
+                    base=collection_interval,
+                    fast=float(fast_interval) if fast_interval else None,
+                    slow=float(slow_interval) if slow_interval else None,
+                    max_backoff=float(max_backoff) if max_backoff else None,
+                    change_rules=change_rules
+                )
+
+            sample = adaptive_factory()
+            logger.info(
+                f"Adaptive polling enabled (fast: {sample.fast:g}s, slow: {sample.slow:g}s, "
+                f"max backoff: {sample.max_backoff:g}s)"
+            )
+
+        # Senaste snapshot per enhet till API:t via delad katalog
+        live_publisher = None
+        if os.getenv("LIVE_SNAPSHOT_DIR"):
+            live_publisher = LiveSnapshotPublisher(os.getenv("LIVE_SNAPSHOT_DIR"))
+            logger.info(f"Publishing live snapshots to {live_publisher.directory}")
+
+        _engine = CollectorEngine(
+            devices=devices,
+            sensor_data_service=sensor_data_service,
+            event_service=event_service,
+            interval=collection_interval,
+            deadline=float(collection_deadline) if collection_deadline else None,
+            max_workers=int(max_workers) if max_workers else None,
+            write_pipeline=write_pipeline,
+            deadband=deadband,
+            metrics_interval=float(os.getenv("COLLECTOR_METRICS_INTERVAL", "60")),
+            jitter=float(collection_jitter) if collection_jitter else None,
+            phase_spread=os.getenv("COLLECTION_PHASE_SPREAD", "true").lower() in ("1", "true", "yes"),
+            adaptive_factory=adaptive_factory,
+            live_publisher=live_publisher
+        )
+
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}", exc_info=True)
         sys.exit(1)
 
-    # Health check
-    logger.info("Performing health check...")
-    if not halo_client.health_check():
-        logger.error("Health check failed - Halo sensor not accessible")
-        sys.exit(1)
-    logger.info("Health check passed")
-
-    # Huvudloop
-    logger.info(f"Starting collection loop (interval: {collection_interval}s)")
-    last_collection_time = 0
-
     try:
-        while not shutdown:
-            current_time = time.time()
-
-            # Vänta till nästa collection-intervall
-            time_since_last = current_time - last_collection_time
-            if time_since_last < collection_interval:
-                sleep_time = collection_interval - time_since_last
-                time.sleep(sleep_time)
-                continue
-
-            try:
-                # Hämta sensor-data från Halo och mät responstid
-                logger.debug(f"Fetching sensor data from Halo...")
-                fetch_start = time.time()
-                halo_state = halo_client.get_latest_state()
-                fetch_time_ms = (time.time() - fetch_start) * 1000
-
-                timestamp = datetime.utcnow()
-
-                # Logga heartbeat till InfluxDB
-                if halo_state is None:
-                    # Halo ej nåbar
-                    from collector.halo_client import _last_contact_error
-                    sensor_data_service.write_heartbeat(
-                        is_connected=False,
-                        error=_last_contact_error,
-                        timestamp=timestamp
-                    )
-                    logger.warning("Failed to fetch Halo state, retrying next cycle")
-                    last_collection_time = time.time()
-                    continue
-                else:
-                    # Halo nåbar - logga med responstid
-                    sensor_data_service.write_heartbeat(
-                        is_connected=True,
-                        response_time_ms=fetch_time_ms,
-                        timestamp=timestamp
-                    )
-
-                # Skriv sensor-data till InfluxDB
-                logger.debug("Writing sensor data to InfluxDB...")
-                sensor_data_service.write_sensor_data(halo_state, timestamp)
-
-                # Processa BLE Beacon-data
-                logger.debug("Processing beacon data...")
-                beacons = beacon_handler.extract_beacon_data(halo_state)
-                if beacons:
-                    beacon_presence_data, beacon_events = beacon_handler.process_beacons(
-                        beacons, device_id
-                    )
-
-                    # Skriv beacon presence-data till InfluxDB
-                    if beacon_presence_data:
-                        sensor_data_service.write_beacon_data(beacon_presence_data)
-
-                    # Generera och lagra beacon-events
-                    for event_dict in beacon_events:
-                        try:
-                            from models.events import Event
-                            event = Event(**event_dict)
-                            event_service.create_event(event)
-                            logger.info(f"Created beacon event: {event.type.value} - {event.summary}")
-                        except Exception as e:
-                            logger.error(f"Failed to create beacon event: {e}", exc_info=True)
-
-                # Generera events från sensor-data
-                logger.debug("Generating events from sensor data...")
-                events = event_generator.generate_events_from_sensor_data(halo_state, device_id)
-
-                # Skriv events till InfluxDB och broadcast via WebSocket
-                for event_dict in events:
-                    try:
-                        from models.events import Event
-                        event = Event(**event_dict)
-                        created_event = event_service.create_event(event)
-                        logger.info(f"Created event: {created_event.type.value} - {created_event.summary}")
-
-                        # Broadcast event via WebSocket
-                        try:
-                            from api.websocket import broadcast_new_event
-                            import asyncio
-                            # Skapa async task för broadcast
-                            try:
-                                loop = asyncio.get_running_loop()
-                                asyncio.create_task(broadcast_new_event(created_event))
-                            except RuntimeError:
-                                # Ingen loop körs, skapa ny
-                                loop = asyncio.new_event_loop()
-                                asyncio.set_event_loop(loop)
-                                loop.run_until_complete(broadcast_new_event(created_event))
-                                loop.close()
-                        except Exception as ws_error:
-                            logger.warning(f"Failed to broadcast event via WebSocket: {ws_error}")
-                    except Exception as e:
-                        logger.error(f"Failed to create event: {e}", exc_info=True)
-
-                last_collection_time = time.time()
-                logger.debug(f"Collection cycle completed at {timestamp.isoformat()}")
-
-            except Exception as e:
-                logger.error(f"Error in collection cycle: {e}", exc_info=True)
-                last_collection_time = time.time()
-                # Fortsätt trots fel
-                continue
-
+        asyncio.run(run_engine(_engine))
         logger.info("Collector service stopped")
 
     except KeyboardInterrupt:
@@ -225,6 +244,11 @@ def main():
         # Cleanup
         logger.info("Cleaning up...")
         try:
+            for device in _engine.devices:
+                device.halo_client.close()
+            write_pipeline.close()
+            if event_bus is not None:
+                event_bus.close()
             event_service.close()
             sensor_data_service.influxdb.close()
         except:
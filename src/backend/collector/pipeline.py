@@ -0,0 +1,193 @@
+"""
+Collection Pipeline - Avkodar varje Halo-payload en gång och kör parse -> derive -> detect -> write
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+
+from collector.serializer import PayloadSerializer
+from models.events import Event
+from services.sensor_data import SensorReading, accelerometer_magnitude
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HaloSnapshot:
+    """Typad ögonblicksbild av en insamlingscykel för en enhet"""
+    device_id: str
+    timestamp: datetime
+    raw: Dict
+    event_state: Optional[Dict]
+    response_time_ms: float
+    readings: List[SensorReading] = field(default_factory=list)
+    beacons: List[Dict] = field(default_factory=list)
+    accelerometer: Optional[Dict] = None
+
+    # Fylls i av derive/detect
+    acc_magnitude: Optional[float] = None
+    beacon_points: List[Dict] = field(default_factory=list)
+    events: List[Dict] = field(default_factory=list)
+
+    def get_value(self, sensor_id: str) -> Optional[float]:
+        """Hämta ett sensorvärde via sensor_id (t.ex. "htsensor/ctemp")"""
+        for reading in self.readings:
+            if reading.sensor_id == sensor_id:
+                return reading.value
+        return None
+
+
+# En detector tar en snapshot och returnerar event-dicts
+Detector = Callable[[HaloSnapshot], List[Dict]]
+
+
+class CollectionPipeline:
+    """
+    Pipeline för en enhet: parse -> derive -> detect -> write
+
+    Payloaden avkodas en gång i parse och alla senare steg läser från
+    HaloSnapshot, så nya detectors kostar inte en ny genomgång av payloaden.
+    """
+
+    def __init__(self, device_id: str, beacon_handler, event_generator, detectors: Optional[List[Detector]] = None):
+        """
+        Initiera CollectionPipeline
+
+        Args:
+            device_id: Device-ID
+            beacon_handler: BeaconHandler med enhetens (enda) BeaconState
+            event_generator: EventGenerator med enhetens event-state
+            detectors: Detectors att köra (default: beacons, Halo event_state, vibration)
+        """
+        self.device_id = device_id
+        self.beacon_handler = beacon_handler
+        self.event_generator = event_generator
+        self.serializer = PayloadSerializer()
+        self.last_snapshot: Optional[HaloSnapshot] = None
+        self.detectors: List[Detector] = detectors if detectors is not None else [
+            self.detect_beacons,
+            self.detect_halo_events,
+            self.detect_vibration,
+        ]
+
+    def parse(
+        self,
+        halo_state: Dict,
+        event_state: Optional[Dict],
+        response_time_ms: float,
+        timestamp: Optional[datetime] = None
+    ) -> HaloSnapshot:
+        """Avkoda Halo-payload till en HaloSnapshot"""
+        acc_data = halo_state.get('accsensor', {})
+        acc_data = acc_data.get('data') if isinstance(acc_data, dict) else None
+
+        return HaloSnapshot(
+            device_id=self.device_id,
+            timestamp=timestamp or datetime.utcnow(),
+            raw=halo_state,
+            event_state=event_state,
+            response_time_ms=response_time_ms,
+            readings=self.serializer.readings(halo_state),
+            beacons=self.beacon_handler.extract_beacon_data(halo_state),
+            accelerometer=acc_data if isinstance(acc_data, dict) else None,
+        )
+
+    def derive(self, snapshot: HaloSnapshot):
+        """Beräkna härledda värden (accelerometer-magnitud)"""
+        if snapshot.accelerometer is not None:
+            magnitude = accelerometer_magnitude(snapshot.accelerometer)
+            if magnitude is not None:
+                snapshot.acc_magnitude = magnitude
+                snapshot.readings.append(
+                    SensorReading("accsensor", "accsensor/magnitude", "magnitude", float(magnitude))
+                )
+
+    def detect(self, snapshot: HaloSnapshot) -> List[Dict]:
+        """Kör alla detectors mot snapshot"""
+        for detector in self.detectors:
+            try:
+                snapshot.events.extend(detector(snapshot))
+            except Exception as e:
+                logger.error(f"[{self.device_id}] Detector {getattr(detector, '__name__', detector)} failed: {e}", exc_info=True)
+        return snapshot.events
+
+    def write(self, snapshot: HaloSnapshot, sensor_data_service, event_service) -> List[Event]:
+        """
+        Skriv heartbeat, sensorvärden, beacon-data och events
+
+        Returns:
+            Lista med skapade events
+        """
+        sensor_data_service.write_heartbeat(
+            is_connected=True,
+            response_time_ms=snapshot.response_time_ms,
+            timestamp=snapshot.timestamp,
+            device_id=self.device_id
+        )
+        sensor_data_service.write_sensor_readings(
+            snapshot.readings,
+            snapshot.timestamp,
+            device_id=self.device_id,
+            encoder=self.serializer.encode
+        )
+
+        if snapshot.beacon_points:
+            sensor_data_service.write_beacon_data(snapshot.beacon_points)
+
+        created_events = []
+        for event_dict in snapshot.events:
+            try:
+                event = Event(**event_dict)
+                created_events.append(event_service.create_event(event))
+                logger.info(f"[{self.device_id}] Created event: {event.type.value} - {event.summary}")
+            except Exception as e:
+                logger.error(f"[{self.device_id}] Failed to create event: {e}", exc_info=True)
+
+        return created_events
+
+    def run(
+        self,
+        halo_state: Dict,
+        event_state: Optional[Dict],
+        response_time_ms: float,
+        sensor_data_service,
+        event_service,
+        timestamp: Optional[datetime] = None
+    ) -> List[Event]:
+        """Kör hela pipelinen för en payload och returnera skapade events"""
+        snapshot = self.parse(halo_state, event_state, response_time_ms, timestamp)
+        self.last_snapshot = snapshot
+        self.derive(snapshot)
+        self.detect(snapshot)
+        return self.write(snapshot, sensor_data_service, event_service)
+
+    # Detectors
+
+    def detect_beacons(self, snapshot: HaloSnapshot) -> List[Dict]:
+        """Beacon-närvaro och beacon-events (panikknapp, ankomst, avfärd, batteri)"""
+        if not snapshot.beacons:
+            return []
+        presence_data, events = self.beacon_handler.process_beacons(snapshot.beacons, self.device_id)
+        snapshot.beacon_points.extend(presence_data)
+        return events
+
+    def detect_halo_events(self, snapshot: HaloSnapshot) -> List[Dict]:
+        """Aktiva Halo-events från event_state (Vape, THC, etc.)"""
+        if snapshot.event_state is None:
+            return []
+        return self.event_generator._process_halo_event_state(self.device_id, snapshot.event_state)
+
+    def detect_vibration(self, snapshot: HaloSnapshot) -> List[Dict]:
+        """Skakning från accelerometer-magnitud"""
+        if snapshot.acc_magnitude is None:
+            return []
+        acc = snapshot.accelerometer
+        return self.event_generator.detect_vibration(
+            snapshot.acc_magnitude,
+            acc.get('move', 0),
+            acc.get('x', 0),
+            acc.get('y', 0),
+            acc.get('z', 0),
+            self.device_id
+        )
@@ -0,0 +1,126 @@
+"""
+Tick Scheduler - Driftfria insamlingstick med fas-offset och jitter per enhet
+"""
+from typing import Dict, Optional
+import random
+import zlib
+
+
+def device_phase(device_id: str, interval: float) -> float:
+    """
+    Stabil fas-offset för en enhet inom intervallet
+
+    Offseten härleds från device_id så att den är densamma efter omstart
+    och sprider enheter även mellan flera collectors.
+
+    Args:
+        device_id: Device ID
+        interval: Insamlingsintervall i sekunder
+
+    Returns:
+        Offset i sekunder (0 <= offset < interval)
+    """
+    return (zlib.crc32(device_id.encode("utf-8")) / 2**32) * interval
+
+
+class TickScheduler:
+    """
+    Schemalägger tick på monotona deadlines
+
+    Tick n infaller på start + phase + n * interval oavsett hur lång tid
+    cyklerna tar, så intervallet driver inte. Jitter läggs på varje tick
+    utan att flytta grid:en. Om en cykel drar över nästa tick räknas de
+    överhoppade tick som missade och schemat hoppar fram till nästa tick i
+    framtiden istället för att köra ikapp i en skur.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        start: float,
+        phase: float = 0.0,
+        jitter: float = 0.0,
+        late_tolerance: Optional[float] = None,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Initiera TickScheduler
+
+        Args:
+            interval: Intervall i sekunder
+            start: Monoton starttid (t.ex. loop.time())
+            phase: Fas-offset i sekunder för första ticket
+            jitter: Max slumpmässig fördröjning per tick i sekunder
+            late_tolerance: Fördröjning utöver jitter innan ett tick räknas som sent (default: 10% av intervallet)
+            rng: Slumpgenerator (för tester)
+        """
+        self.interval = interval
+        self.phase = phase
+        self.jitter = min(jitter, interval / 2)
+        self.late_tolerance = late_tolerance if late_tolerance is not None else interval * 0.1
+        self._rng = rng or random.Random()
+
+        self.next_tick = start + phase
+        self._target = self.next_tick + self._draw_jitter()
+
+        # Metrics
+        self.ticks = 0
+        self.missed = 0
+        self.late = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def _draw_jitter(self) -> float:
+        """Slumpa jitter för nästa tick"""
+        return self._rng.uniform(0.0, self.jitter) if self.jitter > 0 else 0.0
+
+    def delay(self, now: float) -> float:
+        """Sekunder kvar till nästa tick"""
+        return max(0.0, self._target - now)
+
+    def begin(self, now: float) -> float:
+        """
+        Markera att ett tick startar
+
+        Returns:
+            Hur sent ticket startade i sekunder
+        """
+        lateness = max(0.0, now - self._target)
+        self.ticks += 1
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        if lateness > self.late_tolerance:
+            self.late += 1
+        return lateness
+
+    def advance(self, now: float, interval: Optional[float] = None) -> int:
+        """
+        Gå vidare till nästa tick efter en cykel
+
+        Args:
+            now: Monoton tid när cykeln blev klar
+            interval: Intervall till nästa tick (default: schemats intervall)
+
+        Returns:
+            Antal tick som missades (cykeln drog över dem)
+        """
+        interval = interval or self.interval
+        self.next_tick += interval
+        missed = 0
+        if now >= self.next_tick:
+            missed = int((now - self.next_tick) // interval) + 1
+            self.next_tick += missed * interval
+            self.missed += missed
+        self._target = self.next_tick + self._draw_jitter()
+        return missed
+
+    def get_stats(self) -> Dict:
+        """Hämta schemastatistik"""
+        return {
+            "phase_s": round(self.phase, 3),
+            "ticks": self.ticks,
+            "missed_ticks": self.missed,
+            "late_ticks": self.late,
+            "last_lateness_ms": round(self.last_lateness * 1000, 1),
+            "max_lateness_ms": round(self.max_lateness * 1000, 1),
+        }
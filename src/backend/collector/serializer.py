@@ -0,0 +1,275 @@
+"""
+Payload Serializer - Cachad plan för att avkoda Halo-payloads och skriva line protocol
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import logging
+import math
+
+from services.sensor_data import (
+    RESERVED_FIELDS,
+    SCHEMA_NARROW,
+    SCHEMA_WIDE,
+    SensorReading,
+    extract_sensor_readings,
+)
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Typer som räknas som numeriska (samma som isinstance(v, (int, float)))
+NUMERIC_TYPES = (int, float, bool)
+
+_ESCAPE_MEASUREMENT = str.maketrans({',': r'\,', ' ': r'\ ', '\n': r'\n', '\t': r'\t', '\r': r'\r'})
+_ESCAPE_KEY = str.maketrans({',': r'\,', '=': r'\=', ' ': r'\ ', '\n': r'\n', '\t': r'\t', '\r': r'\r'})
+
+
+class ShapeChanged(Exception):
+    """Payloaden matchar inte den inlärda planen"""
+
+
+class SensorPlan(NamedTuple):
+    """Inlärd plan för en sensor i payloaden"""
+    name: str                                 # Nyckel i payloaden
+    sensor_key: str                           # sensor-key (value['key'] eller name)
+    field_count: int                          # Antal fält i data vid inlärning
+    fields: Tuple[Tuple[str, str], ...]       # Numeriska fält: (field, sensor_id)
+    skipped: Tuple[str, ...]                  # Icke-numeriska fält som ska förbli icke-numeriska
+    scalar: bool                              # data är direkt ett numeriskt värde
+
+
+def _escape_tag_value(value: str) -> str:
+    """Escape tag-värde enligt line protocol"""
+    escaped = value.translate(_ESCAPE_KEY)
+    if escaped.endswith('\\'):
+        escaped += ' '
+    return escaped
+
+
+def _format_float(value: float) -> Optional[str]:
+    """Formatera float som influxdb_client.Point (utan avslutande .0)"""
+    if not math.isfinite(value):
+        return None
+    text = str(value)
+    return text[:-2] if text.endswith('.0') else text
+
+
+def timestamp_ns(timestamp: datetime) -> int:
+    """Timestamp i nanosekunder (naiva datetimes tolkas som UTC)"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    delta = timestamp - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+class PayloadSerializer:
+    """
+    Avkodar Halo gstate-payloads via en cachad plan och skriver line protocol
+
+    Första payloaden gås igenom som i extract_sensor_readings och formen
+    sparas som en plan (vilka sensorer och fält som är numeriska). Följande
+    payloads läses direkt via planen utan isinstance-genomgång av alla
+    nivåer. Ändras formen (ny sensor, nytt fält, typbyte) lärs planen om.
+
+    Line protocol-prefix (measurement, tags och fältnyckel) cachas per
+    (device_id, sensor_id) så att en cykel bara formaterar värden och tid.
+    """
+
+    def __init__(self):
+        self._plan: Optional[List[SensorPlan]] = None
+        self._payload_size = 0
+        self._prefixes: Dict[Tuple[str, str, str], str] = {}
+        self._wide_prefixes: Dict[Tuple[str, str], str] = {}
+        self._field_keys: Dict[str, str] = {}
+
+        # Metrics
+        self.plan_hits = 0
+        self.relearns = 0
+
+    def readings(self, payload: Dict) -> List[SensorReading]:
+        """
+        Avkoda numeriska sensorvärden från payload (utan härledda värden)
+
+        Args:
+            payload: gstate/latest från Halo
+
+        Returns:
+            Lista med SensorReading i samma ordning som extract_sensor_readings
+        """
+        if self._plan is not None:
+            try:
+                result = self._apply_plan(payload)
+                self.plan_hits += 1
+                return result
+            except (ShapeChanged, KeyError, TypeError, AttributeError):
+                logger.info("Halo payload shape changed, relearning serializer plan")
+
+        self._learn(payload)
+        try:
+            return self._apply_plan(payload)
+        except (ShapeChanged, KeyError, TypeError, AttributeError):
+            # Ska inte hända direkt efter inlärning - använd den generella vägen
+            self._plan = None
+            return extract_sensor_readings(payload, include_derived=False)
+
+    def _learn(self, payload: Dict):
+        """Lär in planen från en payload"""
+        plan = []
+        for name, value in payload.items():
+            if not isinstance(value, dict):
+                continue
+            sensor_key = value.get('key', name)
+            data = value.get('data', {})
+
+            if isinstance(data, dict):
+                fields = []
+                skipped = []
+                for field_name, field_value in data.items():
+                    if field_name in RESERVED_FIELDS or not isinstance(field_value, (int, float)):
+                        skipped.append(field_name)
+                    else:
+                        fields.append((field_name, f"{sensor_key}/{field_name}"))
+                plan.append(SensorPlan(name, sensor_key, len(data), tuple(fields), tuple(skipped), False))
+            elif isinstance(data, (int, float)):
+                plan.append(SensorPlan(name, sensor_key, 0, (), (), True))
+
+        self._plan = plan
+        self._payload_size = len(payload)
+        self.relearns += 1
+
+    def _apply_plan(self, payload: Dict) -> List[SensorReading]:
+        """Läs värden via planen, ShapeChanged om payloaden inte matchar"""
+        if len(payload) != self._payload_size:
+            raise ShapeChanged()
+
+        result = []
+        append = result.append
+        for sensor in self._plan:
+            value = payload[sensor.name]
+            if value.get('key', sensor.name) != sensor.sensor_key:
+                raise ShapeChanged()
+            data = value['data']
+
+            if sensor.scalar:
+                if data.__class__ not in NUMERIC_TYPES:
+                    raise ShapeChanged()
+                append(SensorReading(sensor.sensor_key, sensor.sensor_key, "value", float(data)))
+                continue
+
+            if len(data) != sensor.field_count:
+                raise ShapeChanged()
+            for field_name in sensor.skipped:
+                if field_name not in RESERVED_FIELDS and data[field_name].__class__ in NUMERIC_TYPES:
+                    raise ShapeChanged()
+            for field_name, sensor_id in sensor.fields:
+                field_value = data[field_name]
+                if field_value.__class__ not in NUMERIC_TYPES:
+                    raise ShapeChanged()
+                append(SensorReading(sensor.sensor_key, sensor_id, field_name, float(field_value)))
+
+        return result
+
+    def encode(
+        self,
+        readings: List[SensorReading],
+        timestamp: datetime,
+        device_id: str,
+        schema: str = SCHEMA_NARROW
+    ) -> List[str]:
+        """
+        Skriv sensorvärden som line protocol-rader
+
+        Ger samma rader som build_sensor_points(...).to_line_protocol().
+
+        Args:
+            readings: Lista med SensorReading
+            timestamp: Timestamp för alla rader
+            device_id: Device ID
+            schema: SCHEMA_NARROW eller SCHEMA_WIDE
+
+        Returns:
+            Lista med line protocol-rader
+        """
+        ts = f" {timestamp_ns(timestamp)}"
+        lines = []
+
+        if schema == SCHEMA_WIDE:
+            # Wide-rader hamnar där sensorns första fält dyker upp (som i build_sensor_points)
+            entries = []
+            wide: Dict[str, List[Tuple[str, str]]] = {}
+            for reading in readings:
+                value = _format_float(reading.value)
+                if value is None:
+                    continue
+                if reading.sensor_id == f"{reading.sensor_key}/{reading.field}":
+                    fields = wide.get(reading.sensor_key)
+                    if fields is None:
+                        fields = wide[reading.sensor_key] = []
+                        entries.append((reading.sensor_key, fields))
+                    fields.append((reading.field, value))
+                else:
+                    entries.append(self._narrow_prefix(device_id, reading) + value + ts)
+
+            for entry in entries:
+                if isinstance(entry, str):
+                    lines.append(entry)
+                else:
+                    sensor_key, fields = entry
+                    field_set = ",".join(f"{self._field_key(field)}={value}" for field, value in sorted(fields))
+                    lines.append(self._wide_prefix(device_id, sensor_key) + field_set + ts)
+            return lines
+
+        for reading in readings:
+            value = _format_float(reading.value)
+            if value is not None:
+                lines.append(self._narrow_prefix(device_id, reading) + value + ts)
+        return lines
+
+    def serialize(
+        self,
+        payload: Dict,
+        timestamp: datetime,
+        device_id: str,
+        schema: str = SCHEMA_NARROW
+    ) -> bytes:
+        """Avkoda payload och returnera line protocol som bytes"""
+        return "\n".join(self.encode(self.readings(payload), timestamp, device_id, schema)).encode("utf-8")
+
+    def _field_key(self, field: str) -> str:
+        """Escapad fältnyckel (cachad)"""
+        key = self._field_keys.get(field)
+        if key is None:
+            key = self._field_keys[field] = field.translate(_ESCAPE_KEY)
+        return key
+
+    def _narrow_prefix(self, device_id: str, reading: SensorReading) -> str:
+        """Cachat prefix "sensor_<key>,device_id=..,sensor_id=.. <field>=" """
+        cache_key = (device_id, reading.sensor_id, reading.field)
+        prefix = self._prefixes.get(cache_key)
+        if prefix is None:
+            measurement = f"sensor_{reading.sensor_key}".translate(_ESCAPE_MEASUREMENT)
+            prefix = (
+                f"{measurement},device_id={_escape_tag_value(device_id)},"
+                f"sensor_id={_escape_tag_value(reading.sensor_id)} {self._field_key(reading.field)}="
+            )
+            self._prefixes[cache_key] = prefix
+        return prefix
+
+    def _wide_prefix(self, device_id: str, sensor_key: str) -> str:
+        """Cachat prefix "sensor_<key>,device_id=.. " """
+        cache_key = (device_id, sensor_key)
+        prefix = self._wide_prefixes.get(cache_key)
+        if prefix is None:
+            measurement = f"sensor_{sensor_key}".translate(_ESCAPE_MEASUREMENT)
+            prefix = f"{measurement},device_id={_escape_tag_value(device_id)} "
+            self._wide_prefixes[cache_key] = prefix
+        return prefix
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för serializern"""
+        return {
+            "plan_hits": self.plan_hits,
+            "relearns": self.relearns,
+            "cached_prefixes": len(self._prefixes) + len(self._wide_prefixes),
+        }
@@ -0,0 +1,211 @@
+"""
+Benchmark Flux Decode - Jämför CSV-avkodning till kolumner (flux_csv) mot
+FluxRecord-vägen (query_api.query + table.records) för sensorhistorik och logg
+
+Båda vägarna läser samma annoterade CSV från minnet, så skillnaden är ren
+parsning + konvertering till API-format (ingen InfluxDB behövs).
+
+Kör: python scripts/benchmark_flux_decode.py --rows 10000 --runs 5
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from influxdb_client.client.flux_csv_parser import FluxCsvParser, FluxSerializationMode
+
+from services.log import LogService
+from services.sensors import SensorService
+
+START = datetime(2025, 1, 1)
+
+LOG_TAGS = {
+    'device_id', 'sensor_id', 'event_id', 'beacon_id', 'beacon_name',
+    'type', 'severity', 'status', 'source', 'location', 'sensor_metadata_id'
+}
+LOG_INTERNAL = {'_time', '_measurement', '_start', '_stop', 'result', 'table', '_field', '_value'}
+
+
+def annotated_csv(columns, datatypes, rows) -> str:
+    """Bygg ett annoterat CSV-svar (en tabell) som InfluxDB returnerar det"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerow(["#datatype", "string", "long"] + datatypes)
+    writer.writerow(["#group", "false", "false"] + ["false"] * len(columns))
+    writer.writerow(["#default", "_result", ""] + [""] * len(columns))
+    writer.writerow(["", "result", "table"] + columns)
+    writer.writerows(["", "", "0"] + row for row in rows)
+    return buffer.getvalue()
+
+
+def history_csv(rows: int) -> str:
+    """Rått svar för en sensor (_time, _value, _field + taggar)"""
+    stamps = [(START + timedelta(seconds=10 * i)).strftime('%Y-%m-%dT%H:%M:%SZ') for i in range(rows)]
+    return annotated_csv(
+        ["_start", "_stop", "_time", "_value", "_field", "_measurement", "device_id", "sensor_id"],
+        ["dateTime:RFC3339"] * 3 + ["double"] + ["string"] * 4,
+        [[stamps[0], stamps[-1], stamp, f"{20 + (i % 50) / 10:.1f}", "value", "sensor_htsensor",
+          "halo-device-1", "htsensor/ctemp"] for i, stamp in enumerate(stamps)]
+    )
+
+
+def log_csv(rows: int) -> str:
+    """Pivoterat loggsvar (en rad per tid + measurement, fält som kolumner)"""
+    stamps = [(START + timedelta(seconds=10 * i)).strftime('%Y-%m-%dT%H:%M:%SZ') for i in range(rows)]
+    return annotated_csv(
+        ["_start", "_stop", "_time", "_measurement", "device_id", "sensor_id", "value", "unit", "time"],
+        ["dateTime:RFC3339"] * 3 + ["string"] * 3 + ["double", "string", "long"],
+        [[stamps[0], stamps[-1], stamp, "sensor_htsensor", "halo-device-1", f"htsensor/f{i % 8}",
+          f"{i % 97}.5", "C" if i % 3 else "", str(1764498035 + i)] for i, stamp in enumerate(stamps)]
+    )
+
+
+class FakeQueryApi:
+    """query() via FluxCsvParser (som influxdb-client) och query_csv() via csv.reader"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def query(self, query: str):
+        response = SimpleNamespace(closed=True, data=self.text.encode("utf-8"), close=lambda: None)
+        parser = FluxCsvParser(response=response, serialization_mode=FluxSerializationMode.tables)
+        with parser:
+            list(parser.generator())
+        return parser.table_list()
+
+    def query_csv(self, query: str):
+        return (row for row in csv.reader(io.StringIO(self.text)) if row)
+
+
+def record_history(query_api, sensor_id: str, device_id: str) -> list:
+    """Tidigare loop i SensorService.get_sensor_history (rått läge)"""
+    history = []
+    for table in query_api.query(query=""):
+        for record in table.records:
+            history.append({
+                'timestamp': record.get_time().isoformat(),
+                'field': record.get_field(),
+                'value': record.get_value(),
+                'sensor_id': sensor_id,
+                'device_id': device_id
+            })
+    return history
+
+
+def record_log(query_api) -> list:
+    """Tidigare loop i LogService.get_log_data (inkl. huvudvärde och sortering)"""
+    log_entries = []
+    seen_entries = {}
+    for table in query_api.query(query=""):
+        for record in table.records:
+            timestamp = record.get_time()
+            measurement_name = record.values.get('_measurement', 'unknown')
+            tags = {}
+            fields = {}
+            id_value = None
+            for key_name, value in record.values.items():
+                if key_name in LOG_INTERNAL:
+                    continue
+                if key_name in LOG_TAGS:
+                    tags[key_name] = value
+                    if key_name in ['sensor_id', 'event_id', 'beacon_id']:
+                        id_value = value
+                elif value is not None:
+                    fields[key_name] = value
+            if not id_value:
+                id_value = tags.get('source', tags.get('beacon_name', tags.get('sensor_id', 'unknown')))
+            key = f"{timestamp.isoformat()}_{measurement_name}_{id_value}"
+            if key in seen_entries:
+                seen_entries[key]['fields'].update(fields)
+            else:
+                entry = {
+                    'timestamp': timestamp.isoformat(),
+                    'measurement': measurement_name,
+                    'id': id_value or 'unknown',
+                    'tags': tags,
+                    'fields': fields
+                }
+                seen_entries[key] = entry
+                log_entries.append(entry)
+    for entry in log_entries:
+        value = None
+        if 'value' in entry['fields']:
+            value = entry['fields']['value']
+        elif 'summary' in entry['fields']:
+            value = entry['fields']['summary']
+        elif 'current_value' in entry['fields']:
+            value = entry['fields']['current_value']
+        elif entry['fields']:
+            value = list(entry['fields'].values())[0]
+        entry['value'] = value
+    log_entries.sort(key=lambda x: x['timestamp'], reverse=True)
+    return log_entries
+
+
+def best_of(runs: int, fn) -> float:
+    """Bästa tiden i ms av runs körningar"""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark för Flux CSV-avkodning")
+    parser.add_argument("--rows", type=int, default=10000, help="Rader per svar")
+    parser.add_argument("--runs", type=int, default=5, help="Körningar per väg (bästa tiden visas)")
+    args = parser.parse_args()
+
+    sensors = SensorService()
+    logs = LogService()
+    history_api = FakeQueryApi(history_csv(args.rows))
+    log_api = FakeQueryApi(log_csv(args.rows))
+
+    def csv_history():
+        sensors.influxdb = SimpleNamespace(query_api=history_api)
+        return sensors.get_sensor_history(
+            "htsensor/ctemp", from_time=START, to_time=START + timedelta(days=30),
+            limit=args.rows, device_id="halo-device-1"
+        )
+
+    def csv_log():
+        logs.influxdb = SimpleNamespace(query_api=log_api)
+        return logs.get_log_data(measurement="sensor", hours=168, limit=args.rows, device_id="halo-device-1")['data']
+
+    # Kontrollera att båda vägarna ger samma resultat
+    if csv_history() != record_history(history_api, "htsensor/ctemp", "halo-device-1"):
+        print("ERROR: history output differs between CSV and FluxRecord path")
+        sys.exit(1)
+    if csv_log() != record_log(log_api):
+        print("ERROR: log output differs between CSV and FluxRecord path")
+        sys.exit(1)
+
+    results = [
+        ("get_sensor_history", best_of(args.runs, lambda: record_history(history_api, "htsensor/ctemp", "halo-device-1")),
+         best_of(args.runs, csv_history)),
+        ("get_log_data", best_of(args.runs, lambda: record_log(log_api)), best_of(args.runs, csv_log)),
+    ]
+
+    print("=" * 60)
+    print("Halo Dashboard - Flux Decode Benchmark")
+    print("=" * 60)
+    print(f"  Rows per response: {args.rows:,}")
+    print(f"  Runs: {args.runs} (best time)")
+    print()
+    print(f"  {'':20} {'FluxRecord':>12} {'CSV columns':>12} {'Speedup':>8}")
+    for name, record_ms, csv_ms in results:
+        print(f"  {name:20} {record_ms:9.1f} ms {csv_ms:9.1f} ms {record_ms / csv_ms:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
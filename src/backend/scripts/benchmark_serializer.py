@@ -0,0 +1,104 @@
+"""
+Benchmark Serializer - Jämför PayloadSerializer mot write_sensor_data-vägen
+(extract_sensor_readings + Point + to_line_protocol) för en flotta enheter
+
+Kör: python scripts/benchmark_serializer.py --devices 200 --cycles 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collector.serializer import PayloadSerializer
+from services.sensor_data import SCHEMA_NARROW, SCHEMA_WIDE, build_sensor_points, extract_sensor_readings
+
+
+def make_payload() -> dict:
+    """Halo gstate/latest med ungefär samma form som en riktig enhet"""
+    return {
+        "htsensor": {"key": "htsensor", "data": {
+            "ctemp": round(random.uniform(20, 24), 1), "humidity": round(random.uniform(30, 50), 1),
+            "press": 29.9, "millibar": 1013.2, "time": 1764498035}},
+        "co2sensor": {"key": "co2sensor", "data": {"co2": random.randint(400, 900), "co2fo": 420, "tvoc": 120, "time": 1764498035}},
+        "AQI": {"key": "AQI", "data": {"value": 12, "src": 1}},
+        "pmsensor": {"key": "pmsensor", "data": {"pm2p5conc": 3.2, "pm10conc": 5.1, "raw": {"0": 1, "1": 2, "2": 3}}},
+        "audsensor": {"key": "audsensor", "data": {"sum": round(random.uniform(30, 60), 1)}},
+        "luxsensor": {"key": "luxsensor", "data": {"alux": 180.5, "aluxfilt": 178.0}},
+        "HealthIndex": {"key": "HealthIndex", "data": {"val": 1}},
+        "gassensor": {"key": "gassensor", "data": {"co": 0.4, "no2": 12.0, "nh3": 1.1}},
+        "pir": {"key": "pir", "data": {"max": 0}},
+        "accsensor": {"key": "accsensor", "data": {"x": 3, "y": -2, "z": 1001, "move": 0}},
+        "blebcn": {"data": {"alert": {"id": "beacon-001", "rssi": -60}}},
+        "fw": "2.5.1",
+    }
+
+
+def bench_points(payloads, timestamp, schema) -> float:
+    """Nuvarande väg: isinstance-genomgång + Point-objekt + serialisering"""
+    start = time.perf_counter()
+    for device_id, payload in payloads:
+        readings = extract_sensor_readings(payload, include_derived=False)
+        points = build_sensor_points(readings, timestamp, device_id, schema)
+        "\n".join(p.to_line_protocol() for p in points).encode("utf-8")
+    return time.perf_counter() - start
+
+
+def bench_serializer(serializers, payloads, timestamp, schema) -> float:
+    """PayloadSerializer: cachad plan + cachade prefix"""
+    start = time.perf_counter()
+    for serializer, (device_id, payload) in zip(serializers, payloads):
+        serializer.serialize(payload, timestamp, device_id, schema)
+    return time.perf_counter() - start
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark för PayloadSerializer")
+    parser.add_argument("--devices", type=int, default=200, help="Antal enheter per cykel")
+    parser.add_argument("--cycles", type=int, default=50, help="Antal cykler")
+    parser.add_argument("--schema", choices=[SCHEMA_NARROW, SCHEMA_WIDE], default=SCHEMA_NARROW)
+    args = parser.parse_args()
+
+    random.seed(1)
+    payloads = [(f"halo-{i:04d}", make_payload()) for i in range(args.devices)]
+    serializers = [PayloadSerializer() for _ in payloads]
+    timestamp = datetime.utcnow()
+
+    # Kontrollera att båda vägarna ger samma line protocol
+    device_id, payload = payloads[0]
+    expected = [p.to_line_protocol() for p in build_sensor_points(
+        extract_sensor_readings(payload, include_derived=False), timestamp, device_id, args.schema)]
+    actual = serializers[0].encode(serializers[0].readings(payload), timestamp, device_id, args.schema)
+    if expected != actual:
+        print("ERROR: serializer output differs from Point output")
+        sys.exit(1)
+
+    points_total = 0.0
+    serializer_total = 0.0
+    for _ in range(args.cycles):
+        points_total += bench_points(payloads, timestamp, args.schema)
+        serializer_total += bench_serializer(serializers, payloads, timestamp, args.schema)
+
+    points_ms = points_total / args.cycles * 1000
+    serializer_ms = serializer_total / args.cycles * 1000
+
+    print("=" * 60)
+    print("Halo Dashboard - Serializer Benchmark")
+    print("=" * 60)
+    print(f"  Devices per cycle: {args.devices}")
+    print(f"  Cycles: {args.cycles}")
+    print(f"  Schema: {args.schema}")
+    print(f"  Lines per device: {len(expected)}")
+    print()
+    print(f"  Point path:      {points_ms:8.2f} ms/cycle")
+    print(f"  Serializer path: {serializer_ms:8.2f} ms/cycle")
+    print(f"  Speedup:         {points_ms / serializer_ms:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Migrate Sensor Schema - Skriver om narrow sensor-data (en point per fält med
+sensor_id-tag) till wide-schema (en point per sensor med alla fält)
+
+Kör inuti backend-containern:
+    python scripts/migrate_sensor_schema.py --start 2025-01-01 --dry-run
+    python scripts/migrate_sensor_schema.py --start 2025-01-01 --delete-narrow
+
+Sätt SENSOR_SCHEMA=wide på collectorn innan migreringen så att ny data
+skrivs i wide-schema. Läsarna i services/sensors.py förstår båda layouterna,
+så migreringen kan köras i omgångar (t.ex. en månad i taget).
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Set, Tuple
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from influxdb_client import InfluxDBClient, Point
+from influxdb_client.client.write_api import SYNCHRONOUS
+
+
+# InfluxDB configuration
+INFLUXDB_URL = os.getenv("INFLUXDB_URL", "http://halo-influxdb:8086")
+INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "")
+INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "halo-org")
+INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET", "halo-sensors")
+
+BATCH_SIZE = 5000
+
+
+def parse_time(value: str) -> datetime:
+    """Parsa datum/tid (ISO-format, t.ex. 2025-01-01 eller 2025-01-01T12:00:00)"""
+    return datetime.fromisoformat(value)
+
+
+def flux_time(dt: datetime) -> str:
+    """Konvertera datetime till Flux-time format"""
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def migrate_chunk(
+    client: InfluxDBClient,
+    start: datetime,
+    stop: datetime,
+    device_id: str = None,
+    dry_run: bool = False
+) -> Tuple[int, int, Set[Tuple[str, str]]]:
+    """
+    Migrera ett tidsintervall
+
+    Returns:
+        (antal lästa narrow-rader, antal skrivna wide-points, migrerade (measurement, sensor_id))
+    """
+    device_filter = f'|> filter(fn: (r) => r["device_id"] == "{device_id}")' if device_id else ''
+    query = f'''
+    from(bucket: "{INFLUXDB_BUCKET}")
+      |> range(start: {flux_time(start)}, stop: {flux_time(stop)})
+      |> filter(fn: (r) => r["_measurement"] =~ /^sensor_/)
+      |> filter(fn: (r) => exists r["sensor_id"])
+      {device_filter}
+    '''
+
+    rows: Dict[Tuple[str, str, datetime], Dict[str, float]] = {}
+    migrated: Set[Tuple[str, str]] = set()
+    read = 0
+
+    for record in client.query_api().query_stream(query=query, org=INFLUXDB_ORG):
+        read += 1
+        measurement = record.get_measurement()
+        sensor_id = record.values.get("sensor_id", "")
+        value = record.get_value()
+
+        # Skalära sensorer (sensor_id utan fält) behåller narrow-layouten
+        if "/" not in sensor_id or not isinstance(value, (int, float)):
+            continue
+        sensor_key, field = sensor_id.split("/", 1)
+        if measurement != f"sensor_{sensor_key}":
+            continue
+
+        key = (measurement, record.values.get("device_id", ""), record.get_time())
+        rows.setdefault(key, {})[field] = float(value)
+        migrated.add((measurement, sensor_id))
+
+    points = []
+    for (measurement, row_device_id, timestamp), fields in rows.items():
+        point = Point(measurement).tag("device_id", row_device_id).time(timestamp)
+        for field, value in fields.items():
+            point.field(field, value)
+        points.append(point)
+
+    if not dry_run and points:
+        write_api = client.write_api(write_options=SYNCHRONOUS)
+        for i in range(0, len(points), BATCH_SIZE):
+            write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG, record=points[i:i + BATCH_SIZE])
+
+    return read, len(points), migrated
+
+
+def delete_narrow(
+    client: InfluxDBClient,
+    start: datetime,
+    stop: datetime,
+    migrated: Set[Tuple[str, str]],
+    device_id: str = None
+):
+    """Ta bort migrerade narrow-serier i intervallet"""
+    delete_api = client.delete_api()
+    for measurement, sensor_id in sorted(migrated):
+        predicate = f'_measurement="{measurement}" AND sensor_id="{sensor_id}"'
+        if device_id:
+            predicate += f' AND device_id="{device_id}"'
+        delete_api.delete(start, stop, predicate, bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Migrera sensor-data från narrow- till wide-schema")
+    parser.add_argument("--start", type=parse_time, required=True, help="Starttid (ISO, UTC)")
+    parser.add_argument("--stop", type=parse_time, default=None, help="Sluttid (ISO, UTC, default: nu)")
+    parser.add_argument("--chunk-hours", type=int, default=24, help="Timmar per query (default: 24)")
+    parser.add_argument("--device-id", default=None, help="Migrera bara en enhet")
+    parser.add_argument("--delete-narrow", action="store_true", help="Ta bort narrow-serier efter migrering")
+    parser.add_argument("--dry-run", action="store_true", help="Läs och räkna utan att skriva")
+    args = parser.parse_args()
+
+    stop = args.stop or datetime.utcnow()
+
+    print("=" * 60)
+    print("Halo Dashboard - Sensor Schema Migration (narrow -> wide)")
+    print("=" * 60)
+    print(f"  URL: {INFLUXDB_URL}")
+    print(f"  Bucket: {INFLUXDB_BUCKET}")
+    print(f"  Range: {flux_time(args.start)} -> {flux_time(stop)}")
+    print(f"  Mode: {'dry-run' if args.dry_run else 'write'}{' + delete narrow' if args.delete_narrow else ''}")
+    print()
+
+    try:
+        client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG, timeout=120000)
+        health = client.health()
+        print(f"InfluxDB connection: {health.status}")
+        print()
+    except Exception as e:
+        print(f"ERROR: Failed to connect to InfluxDB: {e}")
+        sys.exit(1)
+
+    total_read = 0
+    total_written = 0
+    try:
+        chunk_start = args.start
+        while chunk_start < stop:
+            chunk_stop = min(chunk_start + timedelta(hours=args.chunk_hours), stop)
+            read, written, migrated = migrate_chunk(client, chunk_start, chunk_stop, args.device_id, args.dry_run)
+
+            if args.delete_narrow and not args.dry_run and migrated:
+                delete_narrow(client, chunk_start, chunk_stop, migrated, args.device_id)
+
+            total_read += read
+            total_written += written
+            print(f"  {flux_time(chunk_start)}: {read:,} narrow rows -> {written:,} wide points")
+            chunk_start = chunk_stop
+
+        print()
+        print(f"Completed! {total_read:,} narrow rows -> {total_written:,} wide points")
+
+    except Exception as e:
+        print(f"ERROR: Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
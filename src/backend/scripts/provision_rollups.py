@@ -0,0 +1,156 @@
+"""
+Provision Rollups - Skapar rollup-buckets och InfluxDB-tasks för 1m/1h-aggregat
+
+Kör inuti backend-containern:
+    python scripts/provision_rollups.py --dry-run
+    python scripts/provision_rollups.py --backfill-days 30
+
+Tasken för 1m-nivån läser rå bucket och tasken för 1h-nivån läser 1m-nivån.
+Varje rad får samma measurement, fält och taggar som rådatan plus taggen agg
+(mean/min/max/last). Sätt INFLUXDB_ROLLUPS=true på API:t när buckets och
+tasks finns, så börjar nedsamplade queries använda dem (services/query_router.py).
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from influxdb_client import BucketRetentionRules, InfluxDBClient, TaskCreateRequest, TaskUpdateRequest
+
+from services.query_router import get_rollup_tiers, rollup_task_flux, rollup_task_name
+
+
+# InfluxDB configuration
+INFLUXDB_URL = os.getenv("INFLUXDB_URL", "http://halo-influxdb:8086")
+INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "")
+INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "halo-org")
+INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET", "halo-sensors")
+
+
+def flux_time(dt: datetime) -> str:
+    """Konvertera datetime till Flux-time format"""
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def ensure_bucket(client: InfluxDBClient, name: str, retention_days: int, dry_run: bool = False) -> None:
+    """Skapa bucket om den saknas"""
+    buckets_api = client.buckets_api()
+    if buckets_api.find_bucket_by_name(name):
+        print(f"  Bucket {name}: exists")
+        return
+
+    retention = f"{retention_days}d" if retention_days > 0 else "infinite"
+    if dry_run:
+        print(f"  Bucket {name}: would create (retention {retention})")
+        return
+
+    rules = []
+    if retention_days > 0:
+        rules.append(BucketRetentionRules(type="expire", every_seconds=retention_days * 86400))
+    buckets_api.create_bucket(bucket_name=name, retention_rules=rules, org=INFLUXDB_ORG)
+    print(f"  Bucket {name}: created (retention {retention})")
+
+
+def ensure_task(client: InfluxDBClient, name: str, flux: str, dry_run: bool = False) -> None:
+    """Skapa task eller uppdatera dess Flux om den redan finns"""
+    tasks_api = client.tasks_api()
+    existing = tasks_api.find_tasks(name=name)
+
+    if dry_run:
+        print(f"  Task {name}: would {'update' if existing else 'create'}")
+        print()
+        print(flux)
+        return
+
+    if existing:
+        tasks_api.update_task_request(existing[0].id, TaskUpdateRequest(flux=flux, status="active"))
+        print(f"  Task {name}: updated")
+    else:
+        tasks_api.create_task(task_create_request=TaskCreateRequest(
+            org=INFLUXDB_ORG,
+            flux=flux,
+            status="active",
+            description="Halo dashboard rollup (mean/min/max/last)"
+        ))
+        print(f"  Task {name}: created")
+
+
+def backfill(client: InfluxDBClient, days: int, chunk_hours: int) -> None:
+    """Fyll rollup-nivåerna med historik (finast först, grövre läser från finare)"""
+    stop = datetime.utcnow()
+    source_bucket, source_tier = INFLUXDB_BUCKET, None
+    for tier in get_rollup_tiers(INFLUXDB_BUCKET):
+        chunk_start = stop - timedelta(days=days)
+        if tier.retention_days > 0:
+            chunk_start = max(chunk_start, stop - timedelta(days=tier.retention_days))
+        # Börja på en fönstergräns så att första fönstret blir komplett
+        chunk_start = datetime.utcfromtimestamp(chunk_start.timestamp() // tier.every * tier.every)
+
+        while chunk_start < stop:
+            chunk_stop = min(chunk_start + timedelta(hours=chunk_hours), stop)
+            client.query_api().query(
+                query=rollup_task_flux(tier, source_bucket, source_tier, flux_time(chunk_start), flux_time(chunk_stop)),
+                org=INFLUXDB_ORG
+            )
+            print(f"  {tier.name}: {flux_time(chunk_start)} -> {flux_time(chunk_stop)}")
+            chunk_start = chunk_stop
+        source_bucket, source_tier = tier.bucket, tier
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Skapa rollup-buckets och tasks i InfluxDB")
+    parser.add_argument("--backfill-days", type=int, default=0, help="Fyll rollups med så många dagars historik")
+    parser.add_argument("--chunk-hours", type=int, default=24, help="Timmar per backfill-query (default: 24)")
+    parser.add_argument("--dry-run", action="store_true", help="Visa vad som skulle skapas utan att skriva")
+    args = parser.parse_args()
+
+    tiers = get_rollup_tiers(INFLUXDB_BUCKET)
+
+    print("=" * 60)
+    print("Halo Dashboard - Rollup Provisioning")
+    print("=" * 60)
+    print(f"  URL: {INFLUXDB_URL}")
+    print(f"  Source bucket: {INFLUXDB_BUCKET}")
+    for tier in tiers:
+        print(f"  Tier {tier.name}: {tier.bucket} ({tier.retention_days or 'infinite'} days)")
+    print()
+
+    try:
+        client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG, timeout=120000)
+        health = client.health()
+        print(f"InfluxDB connection: {health.status}")
+        print()
+    except Exception as e:
+        print(f"ERROR: Failed to connect to InfluxDB: {e}")
+        sys.exit(1)
+
+    try:
+        source_bucket, source_tier = INFLUXDB_BUCKET, None
+        for tier in tiers:
+            ensure_bucket(client, tier.bucket, tier.retention_days, args.dry_run)
+            ensure_task(client, rollup_task_name(tier), rollup_task_flux(tier, source_bucket, source_tier), args.dry_run)
+            source_bucket, source_tier = tier.bucket, tier
+
+        if args.backfill_days and not args.dry_run:
+            print()
+            print(f"Backfilling {args.backfill_days} days...")
+            backfill(client, args.backfill_days, args.chunk_hours)
+
+        print()
+        print("Completed! Set INFLUXDB_ROLLUPS=true on the API to use the rollups.")
+
+    except Exception as e:
+        print(f"ERROR: Provisioning failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
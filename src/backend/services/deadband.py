@@ -0,0 +1,139 @@
+"""
+Deadband Filter - Skriv bara sensorvärden som ändrats mer än toleransen
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import json
+import logging
+import threading
+
+from .sensor_data import SensorReading
+
+logger = logging.getLogger(__name__)
+
+# Path: src/backend/services/deadband.py -> src/backend/data/sensor_metadata.json
+DEFAULT_METADATA_PATH = Path(__file__).parent.parent / "data" / "sensor_metadata.json"
+
+
+class DeadbandRule(NamedTuple):
+    """Tolerans för en sensor"""
+    absolute: float = 0.0       # Minsta absoluta ändring som skrivs
+    relative: float = 0.0       # Minsta relativa ändring (andel av senast skrivna värde)
+    max_silence: float = 300.0  # Skriv alltid efter så många sekunder (keep-alive)
+
+
+def load_deadband_rules(metadata_path: Optional[Path] = None) -> Dict[str, DeadbandRule]:
+    """
+    Läs deadband-regler från sensor_metadata.json
+
+    Varje sensor kan ha t.ex. "deadband": {"absolute": 0.1, "relative": 0.05,
+    "max_silence": 300}. Sensorer utan deadband skrivs varje cykel.
+
+    Args:
+        metadata_path: Sökväg till sensor_metadata.json (default: data/sensor_metadata.json)
+
+    Returns:
+        Dictionary technical_name -> DeadbandRule
+    """
+    metadata_path = metadata_path or DEFAULT_METADATA_PATH
+
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        sensors = json.load(f).get("sensors", [])
+
+    rules = {}
+    for sensor in sensors:
+        config = sensor.get("deadband")
+        sensor_id = sensor.get("technical_name")
+        if not config or not sensor_id:
+            continue
+        rules[sensor_id] = DeadbandRule(
+            absolute=float(config.get("absolute", 0.0)),
+            relative=float(config.get("relative", 0.0)),
+            max_silence=float(config.get("max_silence", 300.0)),
+        )
+    return rules
+
+
+class DeadbandFilter:
+    """
+    Change-only filter för sensorvärden
+
+    Ett värde skrivs om det skiljer sig från senast skrivna värde med mer än
+    max(absolute, relative * |senaste|), eller om max_silence sekunder gått
+    sedan senaste skrivningen. State hålls per (device_id, sensor_id).
+    """
+
+    def __init__(self, rules: Dict[str, DeadbandRule]):
+        """
+        Initiera DeadbandFilter
+
+        Args:
+            rules: Dictionary sensor_id -> DeadbandRule
+        """
+        self.rules = rules
+        self._last_written: Dict[Tuple[str, str], Tuple[float, datetime]] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.passed = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_metadata(cls, metadata_path: Optional[Path] = None) -> "DeadbandFilter":
+        """Skapa filter med regler från sensor_metadata.json"""
+        return cls(load_deadband_rules(metadata_path))
+
+    def filter(self, readings: List[SensorReading], timestamp: datetime, device_id: str) -> List[SensorReading]:
+        """
+        Filtrera bort värden inom deadband
+
+        Args:
+            readings: Avkodade sensorvärden för en cykel
+            timestamp: Cykelns timestamp
+            device_id: Device ID
+
+        Returns:
+            Värden som ska skrivas
+        """
+        result = []
+        with self._lock:
+            for reading in readings:
+                rule = self.rules.get(reading.sensor_id)
+                if rule is None:
+                    result.append(reading)
+                    continue
+
+                key = (device_id, reading.sensor_id)
+                last = self._last_written.get(key)
+                if last is not None:
+                    last_value, last_time = last
+                    tolerance = max(rule.absolute, rule.relative * abs(last_value))
+                    silence = (timestamp - last_time).total_seconds()
+                    if abs(reading.value - last_value) <= tolerance and silence < rule.max_silence:
+                        self.suppressed += 1
+                        continue
+
+                self._last_written[key] = (reading.value, timestamp)
+                result.append(reading)
+
+        self.passed += len(result)
+        return result
+
+    def reset(self, device_id: Optional[str] = None):
+        """Glöm senast skrivna värden (för en enhet eller alla)"""
+        with self._lock:
+            if device_id is None:
+                self._last_written.clear()
+            else:
+                for key in [k for k in self._last_written if k[0] == device_id]:
+                    del self._last_written[key]
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för filtret"""
+        total = self.passed + self.suppressed
+        return {
+            "passed": self.passed,
+            "suppressed": self.suppressed,
+            "suppressed_ratio": round(self.suppressed / total, 3) if total else 0.0,
+        }
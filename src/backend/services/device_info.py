@@ -0,0 +1,127 @@
+"""
+Device Info Cache - TTL-cache med stale-while-revalidate för Halo-enhetsinformation
+"""
+from typing import Callable, Dict, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceInfoCache:
+    """
+    Cachar resultatet av en långsam, blockerande hämtning (t.ex. HaloClient.get_device_info)
+
+    - Yngre än ttl: cachat värde returneras direkt
+    - Äldre än ttl men yngre än max_stale: cachat värde returneras direkt och
+      en uppdatering startas i bakgrunden (stale-while-revalidate)
+    - Saknas eller äldre än max_stale: anroparen väntar på en hämtning
+
+    Samtidiga anrop delar på samma hämtning (single-flight). Misslyckas en
+    hämtning behålls det tidigare värdet.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Optional[Dict]],
+        ttl: float = 30.0,
+        max_stale: float = 600.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initiera DeviceInfoCache
+
+        Args:
+            fetch: Blockerande funktion som hämtar värdet (körs i executor)
+            ttl: Sekunder som ett värde räknas som färskt
+            max_stale: Max ålder i sekunder för att returnera ett gammalt värde utan att vänta
+            clock: Monoton klocka (för tester)
+        """
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max(ttl, max_stale)
+        self._clock = clock
+
+        self._value: Optional[Dict] = None
+        self._fetched_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def age(self) -> Optional[float]:
+        """Ålder på cachat värde i sekunder (None om inget finns)"""
+        if self._fetched_at is None:
+            return None
+        return self._clock() - self._fetched_at
+
+    async def get(self) -> Optional[Dict]:
+        """
+        Hämta värdet enligt TTL/stale-while-revalidate
+
+        Returns:
+            Cachat eller nyhämtat värde, None om inget värde kunnat hämtas
+        """
+        age = self.age()
+        if self._value is not None and age < self.ttl:
+            self.hits += 1
+            return self._value
+
+        if self._value is not None and age < self.max_stale:
+            self.stale_hits += 1
+            self.refresh_in_background()
+            return self._value
+
+        self.misses += 1
+        return await self.refresh()
+
+    async def refresh(self) -> Optional[Dict]:
+        """Hämta nytt värde (delar pågående hämtning)"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._do_refresh())
+        return await asyncio.shield(self._refresh_task)
+
+    def refresh_in_background(self):
+        """Starta en uppdatering utan att vänta på den"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._do_refresh())
+
+    async def _do_refresh(self) -> Optional[Dict]:
+        """Kör fetch i executor och uppdatera cachen"""
+        loop = asyncio.get_running_loop()
+        self.refreshes += 1
+        try:
+            value = await loop.run_in_executor(None, self._fetch)
+        except Exception as e:
+            value = None
+            logger.warning(f"Device info refresh failed: {e}")
+
+        if value is None:
+            self.refresh_errors += 1
+            return self._value
+
+        self._value = value
+        self._fetched_at = self._clock()
+        return value
+
+    def invalidate(self):
+        """Släng cachat värde"""
+        self._value = None
+        self._fetched_at = None
+
+    def get_metrics(self) -> Dict:
+        """Hämta cache-metrics"""
+        age = self.age()
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "age_s": round(age, 1) if age is not None else None,
+        }
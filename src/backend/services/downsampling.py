@@ -0,0 +1,92 @@
+"""
+Downsampling - Välj aggregeringsfönster och förfina serier med LTTB
+"""
+from datetime import datetime
+from typing import Optional
+import math
+import re
+
+import numpy as np
+
+# aggregateWindow ger ungefär så här många gånger fler punkter än max_points,
+# LTTB väljer sedan ut de visuellt viktigaste
+LTTB_OVERSAMPLE = 4
+
+# Flux-duration som får skickas in som resolution (t.ex. "30s", "5m", "1h")
+RESOLUTION_PATTERN = re.compile(r"^[1-9][0-9]{0,5}(s|m|h|d)$")
+
+
+def is_valid_resolution(resolution: str) -> bool:
+    """Kontrollera att resolution är en enkel Flux-duration"""
+    return bool(RESOLUTION_PATTERN.match(resolution))
+
+
+def resolution_seconds(resolution: str) -> int:
+    """Konvertera en giltig resolution (t.ex. "5m") till sekunder"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    return int(resolution[:-1]) * units[resolution[-1]]
+
+
+def choose_window(from_time: datetime, to_time: datetime, points: int) -> Optional[int]:
+    """
+    Välj aggregateWindow-fönster i sekunder så att intervallet ger högst points punkter
+
+    Returns:
+        Fönster i sekunder, eller None om intervallet är så kort att
+        aggregering inte behövs (under 1 sekund per punkt)
+    """
+    seconds = (to_time - from_time).total_seconds()
+    if points <= 0 or seconds <= points:
+        return None
+    return int(math.ceil(seconds / points))
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: index för de punkter som bäst bevarar kurvans form
+
+    Första och sista punkten behålls alltid. Övriga punkter delas i
+    threshold - 2 buckets och ur varje väljs punkten som bildar största
+    triangeln med föregående vald punkt och medelpunkten i nästa bucket.
+
+    Args:
+        x: Tider (numeriska, stigande)
+        y: Värden
+        threshold: Antal punkter att behålla
+
+    Returns:
+        Stigande index (int-array) i x/y
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=int)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (np.floor(np.arange(threshold - 1) * every) + 1).astype(int)
+    edges[-1] = n - 1
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = end, edges[i + 2]
+        else:
+            # Sista bucketen jämförs mot sista punkten
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
@@ -0,0 +1,305 @@
+"""
+Event Bus - Meddelanden från collectorn till API:ts WebSocket-klienter via Unix-socket
+"""
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Unix-socket som API:t lyssnar på och collectorn skickar till (avstängt om ej satt)
+EVENT_BUS_SOCKET = os.getenv("EVENT_BUS_SOCKET")
+
+
+def event_message(event) -> Dict:
+    """
+    Bygg ett new_event-meddelande för WebSocket-klienter
+
+    Args:
+        event: Event (models.events)
+
+    Returns:
+        JSON-serialiserbar dictionary
+    """
+    return {
+        "type": "new_event",
+        "event": {
+            "id": event.id,
+            "timestamp": event.timestamp.isoformat(),
+            "type": event.type.value,
+            "severity": event.severity.value,
+            "source": event.source,
+            "summary": event.summary,
+            "details": event.details,
+            "status": event.status.value,
+            "device_id": event.device_id,
+            "location": event.location,
+            "sensor_metadata_id": event.sensor_metadata_id,
+            "threshold_value": event.threshold_value,
+            "current_value": event.current_value
+        }
+    }
+
+
+class EventBusPublisher:
+    """
+    Skickar meddelanden till API:ts event bus (collector-sidan)
+
+    Meddelanden skickas som en JSON-rad per meddelande. Är API:t nere buffras
+    upp till max_pending meddelanden (äldsta släpps först). En bakgrundstråd
+    försöker skicka bufferten var retry_interval sekund tills den är tom, så
+    buffrade events inte väntar på nästa publish(). Nya anslutningsförsök från
+    publish() görs högst en gång per retry_interval så att en nere API inte
+    bromsar insamlingen. Misslyckas en skrivning på en befintlig anslutning
+    (API:t har startats om) återansluts direkt och bufferten skickas igen.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_pending: int = 1000,
+        retry_interval: float = 5.0,
+        timeout: float = 1.0
+    ):
+        """
+        Initiera EventBusPublisher
+
+        Args:
+            path: Sökväg till Unix-socketen
+            max_pending: Max antal buffrade meddelanden när API:t inte nås
+            retry_interval: Sekunder mellan anslutningsförsök
+            timeout: Timeout i sekunder för anslutning och skrivning
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._pending: Deque[bytes] = deque()
+        self._last_attempt = 0.0
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # Metrics
+        self.published = 0
+        self.dropped = 0
+        self.connect_errors = 0
+
+    def publish(self, message: Dict) -> bool:
+        """
+        Publicera ett meddelande
+
+        Returns:
+            True om meddelandet (och eventuell buffert) skickades
+        """
+        line = (json.dumps(message, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            self._pending.append(line)
+            if self._send_pending():
+                return True
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._start_flusher()
+            return False
+
+    def _send_pending(self, force: bool = False) -> bool:
+        """
+        Skicka buffrade meddelanden (anropas med låset taget)
+
+        Args:
+            force: Anslut utan att vänta ut retry_interval
+        """
+        stale = self._sock is not None
+        if not stale and not self._connect(force):
+            return False
+        try:
+            self._write_pending()
+            return True
+        except OSError as e:
+            self._close()
+            if not stale:
+                logger.warning(f"Event bus send failed, buffering {len(self._pending)} message(s): {e}")
+                return False
+
+        # Anslutningen var från före en omstart av API:t (t.ex. EPIPE): återanslut direkt
+        if not self._connect(force=True):
+            return False
+        try:
+            self._write_pending()
+            return True
+        except OSError as e:
+            logger.warning(f"Event bus send failed, buffering {len(self._pending)} message(s): {e}")
+            self._close()
+            return False
+
+    def _write_pending(self):
+        """Skriv bufferten på socketen (OSError propageras)"""
+        while self._pending:
+            self._sock.sendall(self._pending[0])
+            self._pending.popleft()
+            self.published += 1
+
+    def _start_flusher(self):
+        """Starta bakgrundstråden som tömmer bufferten (anropas med låset taget)"""
+        if self._flusher is not None or self._stop.is_set():
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="event-bus-flush", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        """Försök skicka bufferten var retry_interval sekund tills den är tom"""
+        interval = max(self.retry_interval, 0.05)
+        while not self._stop.wait(interval):
+            with self._lock:
+                if self._pending:
+                    self._send_pending(force=True)
+                if not self._pending:
+                    self._flusher = None
+                    return
+        with self._lock:
+            self._flusher = None
+
+    def _connect(self, force: bool = False) -> bool:
+        """Anslut till socketen (högst en gång per retry_interval om inte force)"""
+        now = time.monotonic()
+        if not force and now - self._last_attempt < self.retry_interval:
+            return False
+        self._last_attempt = now
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            self.connect_errors += 1
+            logger.debug(f"Event bus not available at {self.path}: {e}")
+            return False
+        self._sock = sock
+        logger.info(f"Connected to event bus at {self.path}")
+        return True
+
+    def _close(self):
+        """Stäng socketen (anropas med låset taget)"""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def close(self):
+        """Stäng anslutningen och stoppa bakgrundstråden"""
+        self._stop.set()
+        with self._lock:
+            flusher = self._flusher
+            self._close()
+        if flusher is not None:
+            flusher.join(timeout=self.timeout + 1)
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för publiceringen"""
+        with self._lock:
+            return {
+                "connected": self._sock is not None,
+                "published": self.published,
+                "pending": len(self._pending),
+                "dropped": self.dropped,
+                "connect_errors": self.connect_errors,
+            }
+
+
+class EventBusServer:
+    """
+    Tar emot meddelanden från collectors på en Unix-socket (API-sidan)
+
+    Meddelandena lämnas i mottagningsordning till on_message.
+    """
+
+    def __init__(self, path: str, on_message: Callable[[Dict], Awaitable[None]]):
+        """
+        Initiera EventBusServer
+
+        Args:
+            path: Sökväg till Unix-socketen
+            on_message: Async callback för varje meddelande
+        """
+        self.path = path
+        self.on_message = on_message
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        # Metrics
+        self.received = 0
+        self.invalid = 0
+        self.publishers = 0
+
+    async def start(self):
+        """Börja lyssna på socketen"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            # Kvar från en tidigare process
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info(f"Event bus listening on {self.path}")
+
+    async def stop(self):
+        """Sluta lyssna och ta bort socketen"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Läs meddelanden från en collector-anslutning"""
+        self.publishers += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.invalid += 1
+                    continue
+                if not isinstance(message, dict):
+                    self.invalid += 1
+                    continue
+                await self.dispatch(message)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Servern stängs (API:t stängs av), anslutningen avslutas tyst
+            pass
+        finally:
+            self.publishers -= 1
+            writer.close()
+
+    async def dispatch(self, message: Dict):
+        """Lämna meddelandet vidare"""
+        self.received += 1
+        try:
+            await self.on_message(message)
+        except Exception as e:
+            logger.error(f"Event bus handler failed: {e}", exc_info=True)
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för servern"""
+        return {
+            "received": self.received,
+            "invalid": self.invalid,
+            "publishers": self.publishers,
+        }
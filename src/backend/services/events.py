@@ -24,7 +24,8 @@ class EventService:
         url: str,
         token: str,
         org: str,
-        bucket: str
+        bucket: str,
+        write_pipeline=None
     ):
         """
         Initiera Event Service
@@ -34,11 +35,13 @@ class EventService:
             token: InfluxDB token
             org: InfluxDB organization
             bucket: InfluxDB bucket för events
+            write_pipeline: Delad WritePipeline (default: skriv direkt med write_api)
         """
         self.url = url
         self.token = token
         self.org = org
         self.bucket = bucket
+        self.write_pipeline = write_pipeline
         self.client = None
         self.write_api = None
         self.query_api = None
@@ -96,8 +99,11 @@ class EventService:
             # Lägg till event ID som field för enkel querying
             point = point.field("event_id", event.id)
 
-            # Skriv till InfluxDB
-            self.write_api.write(bucket=self.bucket, record=point)
+            # Skriv till InfluxDB (via write-pipelinen om den finns)
+            if self.write_pipeline is not None:
+                self.write_pipeline.add(point, bucket=self.bucket)
+            else:
+                self.write_api.write(bucket=self.bucket, record=point)
 
             logger.info(f"Event created: {event.id} ({event.type.value})")
 
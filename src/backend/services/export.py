@@ -0,0 +1,224 @@
+"""
+Export Service - Strömmar sensorhistorik och loggdata som NDJSON eller CSV
+
+Raderna läses med query_api.query_stream() (en FluxRecord i taget) och kodas
+i block om EXPORT_CHUNK_ROWS rader, så minnesanvändningen är konstant oavsett
+intervallets längd och första blocket kan skickas innan queryn är klar.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import csv
+import io
+import json
+import logging
+import os
+
+from .influxdb import InfluxDBService
+from .sensor_data import flux_sensors_filter, resolve_sensor_id
+
+logger = logging.getLogger(__name__)
+
+# Antal rader per block i export-strömmen
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+EXPORT_FORMATS = (FORMAT_NDJSON, FORMAT_CSV)
+
+MEDIA_TYPES = {
+    FORMAT_NDJSON: "application/x-ndjson",
+    FORMAT_CSV: "text/csv; charset=utf-8",
+}
+
+SENSOR_EXPORT_COLUMNS = ["timestamp", "device_id", "sensor_id", "value"]
+
+# Loggexporten är "lång": en rad per fält med vanliga taggar som egna kolumner
+LOG_EXPORT_TAGS = ["device_id", "sensor_id", "beacon_id", "event_id", "source"]
+LOG_EXPORT_COLUMNS = ["timestamp", "measurement", "field", "value"] + LOG_EXPORT_TAGS
+
+# Kolumner i FluxRecord som inte är taggar
+RECORD_COLUMNS = {"result", "table", "_start", "_stop", "_time", "_measurement", "_field", "_value"}
+
+
+def encode_ndjson(rows: Iterable[Dict[str, Any]], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Koda rader som NDJSON (en JSON-rad per rad) i block"""
+    lines: List[str] = []
+    for row in rows:
+        lines.append(json.dumps(row, default=str))
+        if len(lines) >= chunk_rows:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def encode_csv(
+    rows: Iterable[Dict[str, Any]],
+    columns: List[str],
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """Koda rader som CSV i block; rubrikraden skickas direkt"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore", lineterminator="\r\n")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= chunk_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield buffer.getvalue().encode("utf-8")
+
+
+def flatten_log_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Lyft vanliga taggar till egna kolumner (för CSV)"""
+    flat = {key: row[key] for key in ("timestamp", "measurement", "field", "value")}
+    for tag in LOG_EXPORT_TAGS:
+        flat[tag] = row['tags'].get(tag)
+    return flat
+
+
+class ExportService:
+    """Service för strömmande export från InfluxDB"""
+
+    def __init__(self):
+        self.influxdb = InfluxDBService()
+        self.bucket = self.influxdb.get_bucket()
+        self.device_id = "halo-device-1"  # TODO: Lägg till som parameter
+
+    def _datetime_to_flux_time(self, dt: datetime) -> str:
+        """Konvertera datetime till Flux time string"""
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _time_range(self, from_time: Optional[datetime], to_time: Optional[datetime]) -> str:
+        to_time = to_time or datetime.utcnow()
+        from_time = from_time or to_time - timedelta(hours=24)
+        return f'range(start: {self._datetime_to_flux_time(from_time)}, stop: {self._datetime_to_flux_time(to_time)})'
+
+    def _stream(self, query: str) -> Iterator[Any]:
+        """
+        Strömma FluxRecords
+
+        Fel loggas och propageras, så att svaret avbryts i stället för att
+        klienten får en tyst avkortad fil med status 200.
+        """
+        try:
+            yield from self.influxdb.query_api.query_stream(query=query)
+        except Exception as e:
+            logger.error(f"Export query failed: {e}", exc_info=True)
+            raise
+
+    def sensor_history_rows(
+        self,
+        sensor_ids: List[str],
+        from_time: Optional[datetime] = None,
+        to_time: Optional[datetime] = None,
+        device_id: Optional[str] = None,
+        resolution: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Strömma historik för en eller flera sensorer
+
+        Args:
+            sensor_ids: Lista med sensor ID
+            from_time: Starttid (default: 24 timmar före to_time)
+            to_time: Sluttid (default: nu)
+            device_id: Device ID
+            resolution: Aggregeringsfönster (Flux-duration) eller None för rådata
+
+        Yields:
+            {timestamp, device_id, sensor_id, value} i tidsordning per sensor
+        """
+        device_id = device_id or self.device_id
+        reduce = f'|> aggregateWindow(every: {resolution}, fn: mean, createEmpty: false)' if resolution else ''
+
+        query = f'''
+        from(bucket: "{self.bucket}")
+          |> {self._time_range(from_time, to_time)}
+          {flux_sensors_filter(sensor_ids)}
+          |> filter(fn: (r) => r["device_id"] == "{device_id}")
+          {reduce}
+          |> keep(columns: ["_time", "_value", "_measurement", "_field", "sensor_id"])
+        '''
+
+        for record in self._stream(query):
+            value = record.get_value()
+            if value is None:
+                continue
+            yield {
+                'timestamp': record.get_time().isoformat(),
+                'device_id': device_id,
+                'sensor_id': resolve_sensor_id(
+                    record.get_measurement(), record.get_field(), record.values.get('sensor_id')
+                ),
+                'value': value
+            }
+
+    def log_rows(
+        self,
+        measurement: Optional[str] = None,
+        from_time: Optional[datetime] = None,
+        to_time: Optional[datetime] = None,
+        device_id: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Strömma rådata för loggexport (samma filter som LogService.get_log_data)
+
+        Ingen sortering, limit eller pivot görs, så InfluxDB kan strömma
+        svaret direkt. Varje fält blir en egen rad.
+
+        Args:
+            measurement: Measurement-typ (events, sensor, beacon_presence, heartbeat, all)
+            from_time: Starttid (default: 24 timmar före to_time)
+            to_time: Sluttid (default: nu)
+            device_id: Device ID
+
+        Yields:
+            {timestamp, measurement, field, value, tags: {tag: värde}}
+        """
+        device_id = device_id or self.device_id
+
+        measurement_filter = ''
+        if measurement and measurement != "all":
+            if measurement == "sensor":
+                measurement_filter = '|> filter(fn: (r) => r["_measurement"] =~ /^sensor_/)'
+            else:
+                measurement_filter = f'|> filter(fn: (r) => r["_measurement"] == "{measurement}")'
+
+        query = f'''
+        from(bucket: "{self.bucket}")
+          |> {self._time_range(from_time, to_time)}
+          {measurement_filter}
+          |> filter(fn: (r) => not exists r["device_id"] or r["device_id"] == "{device_id}")
+        '''
+
+        for record in self._stream(query):
+            yield {
+                'timestamp': record.get_time().isoformat(),
+                'measurement': record.get_measurement(),
+                'field': record.get_field(),
+                'value': record.get_value(),
+                'tags': {key: value for key, value in record.values.items() if key not in RECORD_COLUMNS}
+            }
+
+    def export_sensor_history(self, export_format: str, sensor_ids: List[str], **kwargs) -> Iterator[bytes]:
+        """Sensorhistorik som NDJSON- eller CSV-block (kwargs till sensor_history_rows)"""
+        rows = self.sensor_history_rows(sensor_ids, **kwargs)
+        if export_format == FORMAT_CSV:
+            return encode_csv(rows, SENSOR_EXPORT_COLUMNS)
+        return encode_ndjson(rows)
+
+    def export_log(self, export_format: str, **kwargs) -> Iterator[bytes]:
+        """Loggdata som NDJSON- eller CSV-block (kwargs till log_rows)"""
+        rows = self.log_rows(**kwargs)
+        if export_format == FORMAT_CSV:
+            return encode_csv((flatten_log_row(row) for row in rows), LOG_EXPORT_COLUMNS)
+        return encode_ndjson(rows)
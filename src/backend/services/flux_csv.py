@@ -0,0 +1,157 @@
+"""
+Flux CSV - Avkodar annoterad CSV från InfluxDB direkt till kolumnlistor
+
+query_api.query() bygger ett FluxRecord-objekt (med en values-dict) per rad
+och typkonverterar varje kolumn. För historik- och loggqueries med tiotusentals
+rader dominerar det svarstiden. Här läses CSV-strömmen från query_csv() och
+bara de kolumner som efterfrågas konverteras, till en lista per kolumn och
+tabell. Värden konverteras på samma sätt som FluxCsvParser (tom sträng ->
+default-annotation eller None).
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+import base64
+
+from influxdb_client.client.flux_csv_parser import FluxQueryException
+
+# Kolumner som InfluxDB lägger till i varje tabell
+INTERNAL_COLUMNS = frozenset({"result", "table", "_start", "_stop", "_time", "_measurement", "_field", "_value"})
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def _parse_bool(value: str) -> bool:
+    return value == "true"
+
+
+CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "string": str,
+    "boolean": _parse_bool,
+    "long": int,
+    "unsignedLong": int,
+    "duration": int,
+    "double": float,
+    "base64Binary": base64.b64decode,
+    "dateTime:RFC3339": _parse_time,
+    "dateTime:RFC3339Nano": _parse_time,
+}
+
+
+def _convert_column(values: List[str], datatype: str, default: str) -> List[Any]:
+    """Konvertera en kolumn av strängar"""
+    convert = CONVERTERS.get(datatype, str)
+    default_value = convert(default) if default else None
+    if convert is str:
+        return [value if value else default_value for value in values]
+    return [convert(value) if value else default_value for value in values]
+
+
+class _TableBuilder:
+    """Samlar råa strängar per kolumn för en tabell"""
+
+    def __init__(
+        self,
+        header: List[str],
+        datatypes: List[str],
+        defaults: List[str],
+        columns: Optional[Sequence[str]],
+        exclude: Sequence[str]
+    ):
+        # Första CSV-kolumnen är alltid tom (annotationskolumnen)
+        wanted = [
+            name for name in header[1:]
+            if (columns is None or name in columns) and name not in exclude
+        ]
+        self.positions = [(name, header.index(name)) for name in wanted]
+        self.types = {name: (datatypes[index], defaults[index]) for name, index in self.positions}
+        self.raw: Dict[str, List[str]] = {name: [] for name, _ in self.positions}
+
+    def add(self, row: List[str]) -> None:
+        for name, index in self.positions:
+            self.raw[name].append(row[index])
+
+    def build(self) -> Dict[str, List[Any]]:
+        return {
+            name: _convert_column(values, *self.types[name])
+            for name, values in self.raw.items()
+        }
+
+
+def decode_tables(
+    rows: Iterable[List[str]],
+    columns: Optional[Sequence[str]] = None,
+    exclude: Sequence[str] = ()
+) -> List[Dict[str, List[Any]]]:
+    """
+    Avkoda annoterad Flux-CSV till en dict med kolumnlistor per tabell
+
+    Args:
+        rows: CSV-rader (t.ex. från query_api.query_csv())
+        columns: Kolumner att ta med (None = alla utom annotationskolumnen)
+        exclude: Kolumner att hoppa över (konverteras inte)
+
+    Returns:
+        Lista med tabeller i svarsordning, {kolumn: [värde per rad]}. Alla
+        listor i en tabell har samma längd.
+
+    Raises:
+        FluxQueryException: Om InfluxDB returnerade ett fel i svaret
+    """
+    wanted = frozenset(columns) if columns is not None else None
+    excluded = frozenset(exclude)
+    tables: List[Dict[str, List[Any]]] = []
+    datatypes: List[str] = []
+    defaults: List[str] = []
+    header: Optional[List[str]] = None
+    table_pos = 0
+    current: Optional[_TableBuilder] = None
+    current_id = None
+
+    for row in rows:
+        if not row:
+            continue
+        first = row[0]
+        if first == "#datatype":
+            if current is not None:
+                tables.append(current.build())
+                current = None
+            datatypes = row
+            defaults = [""] * len(row)
+            header = None
+            continue
+        if first == "#default":
+            defaults = row
+            continue
+        if first.startswith("#"):
+            continue
+
+        if header is None:
+            header = row
+            if "error" in header and "reference" in header:
+                continue
+            table_pos = header.index("table")
+            continue
+
+        if "error" in header and "reference" in header:
+            raise FluxQueryException(row[header.index("error")], row[header.index("reference")])
+
+        table_id = (row[1], row[table_pos])
+        if current is None or table_id != current_id:
+            if current is not None:
+                tables.append(current.build())
+            current = _TableBuilder(header, datatypes, defaults, wanted, excluded)
+            current_id = table_id
+        current.add(row)
+
+    if current is not None:
+        tables.append(current.build())
+    return tables
+
+
+def table_rows(table: Dict[str, List[Any]]) -> int:
+    """Antal rader i en avkodad tabell"""
+    for values in table.values():
+        return len(values)
+    return 0
@@ -1,15 +1,23 @@
 """
 InfluxDB Service - Centraliserad hantering av InfluxDB-anslutning
 """
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 from influxdb_client.client.query_api import QueryApi
+import asyncio
+import functools
 import logging
 import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Max antal samtidiga blockerande InfluxDB-anrop från async-kod (API-routes)
+INFLUXDB_QUERY_CONCURRENCY = int(os.getenv("INFLUXDB_QUERY_CONCURRENCY", "8"))
+
 
 class InfluxDBService:
     """Centraliserad service för InfluxDB-anslutning"""
@@ -30,6 +38,7 @@ class InfluxDBService:
             self._token = os.getenv("INFLUXDB_TOKEN", "")
             self._org = os.getenv("INFLUXDB_ORG", "halo-org")
             self._bucket = os.getenv("INFLUXDB_BUCKET", "halo-sensors")
+            self._enable_gzip = os.getenv("INFLUXDB_GZIP", "false").lower() in ("1", "true", "yes")
             self._connect()
 
     def _connect(self):
@@ -39,7 +48,8 @@ class InfluxDBService:
                 url=self._url,
                 token=self._token,
                 org=self._org,
-                timeout=30000  # 30 sekunder timeout
+                timeout=30000,  # 30 sekunder timeout
+                enable_gzip=self._enable_gzip
             )
             self._write_api = self._client.write_api(write_options=SYNCHRONOUS)
             self._query_api = self._client.query_api()
@@ -83,3 +93,206 @@ class InfluxDBService:
             self._write_api.close()
         if self._client:
             self._client.close()
+
+
+def is_rejected_write(error: Exception) -> bool:
+    """
+    True om InfluxDB avvisade en skrivning permanent
+
+    4xx (utom 429 Too Many Requests) betyder att raderna i sig är fel,
+    t.ex. 400 "unable to parse" eller 422 "field type conflict", och att
+    samma request aldrig kommer att lyckas. Anslutningsfel, 5xx och 429
+    är tillfälliga.
+    """
+    status = getattr(error, "status", None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+
+def write_isolating_rejects(write_api, bucket: str, lines: List[str]) -> Tuple[List[str], Optional[Exception]]:
+    """
+    Skriv line protocol och sortera ut rader som InfluxDB avvisar permanent
+
+    En avvisad batch halveras tills de felaktiga raderna hittats, så att
+    giltiga rader i samma batch ändå skrivs. Points som redan skrivits i en
+    tidigare halva skrivs över med identiska värden.
+
+    Args:
+        write_api: InfluxDB write API
+        bucket: Bucket att skriva till
+        lines: Rader i line protocol
+
+    Returns:
+        (avvisade rader, senaste avvisningsfel)
+
+    Raises:
+        Exception: Tillfälliga fel (se is_rejected_write) propageras
+    """
+    try:
+        write_api.write(bucket=bucket, record=lines)
+        return [], None
+    except Exception as e:
+        if not is_rejected_write(e):
+            raise
+        if len(lines) == 1:
+            return list(lines), e
+        middle = len(lines) // 2
+        rejected, error = write_isolating_rejects(write_api, bucket, lines[:middle])
+        rejected_tail, error_tail = write_isolating_rejects(write_api, bucket, lines[middle:])
+        return rejected + rejected_tail, error_tail or error
+
+
+class QueryExecutor:
+    """
+    Begränsad executor för blockerande InfluxDB-anrop från async-kod
+
+    influxdb-client är synkron, så en query direkt i en async route blockerar
+    hela event-loopen (inklusive WebSocket-klienter). Anropen körs istället i
+    en egen trådpool med max_workers trådar; fler samtidiga anrop köas utan
+    att blockera loopen.
+    """
+
+    def __init__(self, max_workers: int = INFLUXDB_QUERY_CONCURRENCY):
+        """
+        Initiera QueryExecutor
+
+        Args:
+            max_workers: Max antal samtidiga anrop mot InfluxDB
+        """
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="influxdb-query")
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.active = 0
+        self.pending = 0
+        self.completed = 0
+        self.errors = 0
+        self.max_wait = 0.0
+        self.max_duration = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Kör ett blockerande anrop i trådpoolen
+
+        Args:
+            fn: Funktion att köra (t.ex. service.get_latest_sensor_values)
+            *args, **kwargs: Argument till fn
+
+        Returns:
+            Returvärdet från fn (undantag propageras)
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.pending += 1
+        return await loop.run_in_executor(self._executor, self._call, time.monotonic(), functools.partial(fn, *args, **kwargs))
+
+    def _call(self, queued_at: float, call: Callable):
+        """Kör anropet i en worker-tråd och uppdatera metrics"""
+        started = time.monotonic()
+        with self._lock:
+            self.pending -= 1
+            self.active += 1
+            self.max_wait = max(self.max_wait, started - queued_at)
+        try:
+            return call()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self.max_duration = max(self.max_duration, time.monotonic() - started)
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för executorn"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "pending": self.pending,
+                "completed": self.completed,
+                "errors": self.errors,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "max_duration_ms": round(self.max_duration * 1000, 1),
+            }
+
+    def shutdown(self):
+        """Stäng trådpoolen"""
+        self._executor.shutdown(wait=False)
+
+
+_query_executor: Optional[QueryExecutor] = None
+
+
+def get_query_executor() -> QueryExecutor:
+    """Get or create QueryExecutor instance"""
+    global _query_executor
+    if _query_executor is None:
+        _query_executor = QueryExecutor()
+    return _query_executor
+
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """
+    Kör ett blockerande InfluxDB-anrop utan att blockera event-loopen
+
+    Används av async routes för alla service-anrop som går mot InfluxDB:
+        values = await run_blocking(service.get_latest_sensor_values, device_id=device_id)
+    """
+    return await get_query_executor().run(fn, *args, **kwargs)
+
+
+class _BlockingStream:
+    """
+    Blockerande iterator som kan stängas från en annan tråd
+
+    next() och close() tar samma lås, så close() väntar ut ett pågående
+    next() (en generator som körs kan inte stängas) och inga fler element
+    hämtas efter close().
+    """
+
+    def __init__(self, iterator: Iterator):
+        self._iterator = iter(iterator)
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def next(self, default):
+        with self._lock:
+            if self.closed:
+                return default
+            return next(self._iterator, default)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            close = getattr(self._iterator, "close", None)
+            if close is not None:
+                close()
+
+
+async def iterate_blocking(iterator: Iterator) -> AsyncIterator:
+    """
+    Iterera en blockerande iterator (t.ex. från query_stream) utan att blockera event-loopen
+
+    Varje next() körs via QueryExecutor, så en lång export tar bara en
+    worker-tråd per block och andra queries kan köras emellan. Kopplar
+    klienten ner (tasken avbryts) stängs iteratorn i trådpoolen när ett
+    pågående next() är klart, och därmed HTTP-svaret från InfluxDB.
+    """
+    stream = _BlockingStream(iterator)
+    done = object()
+    try:
+        while True:
+            item = await run_blocking(stream.next, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        # Stängningen körs klart i trådpoolen även om väntan nedan avbryts
+        closing = asyncio.ensure_future(run_blocking(stream.close))
+        try:
+            await asyncio.shield(closing)
+        except asyncio.CancelledError:
+            pass
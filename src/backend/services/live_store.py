@@ -0,0 +1,239 @@
+"""
+Live Store - Senaste snapshot per enhet från collectorn till API:t via delad katalog
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from .sensor_data import SensorReading
+
+logger = logging.getLogger(__name__)
+
+# Delad katalog mellan collector och API (avstängt om ej satt)
+LIVE_SNAPSHOT_DIR = os.getenv("LIVE_SNAPSHOT_DIR")
+
+# Äldre snapshots räknas som inaktuella och API:t faller tillbaka på InfluxDB
+LIVE_SNAPSHOT_MAX_AGE = float(os.getenv("LIVE_SNAPSHOT_MAX_AGE", "60"))
+
+
+def build_live_snapshot(
+    device_id: str,
+    timestamp: datetime,
+    readings: Optional[Iterable[SensorReading]],
+    connected: bool,
+    last_contact: Optional[datetime],
+    response_time_ms: Optional[float] = None,
+    error: Optional[str] = None,
+    circuit_breakers: Optional[Dict] = None
+) -> Dict:
+    """
+    Bygg en live-snapshot
+
+    sensors har samma form som SensorService.get_latest_sensor_values så att
+    API:t kan returnera den direkt.
+
+    Args:
+        device_id: Device ID
+        timestamp: Tid för värdena
+        readings: Sensorvärden från senaste lyckade cykel (None = utelämna sensors)
+        connected: True om Halo svarade i cykeln
+        last_contact: Tid för senaste lyckade kontakt
+        response_time_ms: Responstid för gstate/latest
+        error: Felmeddelande om Halo inte svarade
+        circuit_breakers: Collectorns breaker-tillstånd (HaloClient.get_breaker_states)
+
+    Returns:
+        JSON-serialiserbar dictionary
+    """
+    sensors: Dict[str, Dict] = {}
+    iso_timestamp = timestamp.isoformat()
+    for reading in readings or ():
+        sensor = sensors.get(reading.sensor_id)
+        if sensor is None:
+            sensor = sensors[reading.sensor_id] = {
+                'sensor_id': reading.sensor_id,
+                'timestamp': iso_timestamp,
+                'values': {}
+            }
+        sensor['values'][reading.field] = reading.value
+
+    snapshot = {
+        'device_id': device_id,
+        'timestamp': iso_timestamp,
+        'published_at': time.time(),
+        'heartbeat': {
+            'connected': connected,
+            'last_contact': last_contact.isoformat() if last_contact else None,
+            'response_time_ms': response_time_ms,
+            'error': error,
+        },
+        'circuit_breakers': circuit_breakers,
+    }
+    if readings is not None:
+        snapshot['sensors'] = list(sensors.values())
+    return snapshot
+
+
+class LiveSnapshotPublisher:
+    """
+    Skriver snapshots till {directory}/{device_id}.json (collector-sidan)
+
+    Filen skrivs till en temporär fil och byts in med os.replace så att
+    API:t aldrig läser en halvskriven snapshot.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initiera LiveSnapshotPublisher
+
+        Args:
+            directory: Delad katalog (t.ex. /app/live)
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        # Metrics
+        self.published = 0
+        self.errors = 0
+
+    def publish(self, snapshot: Dict) -> bool:
+        """
+        Publicera en snapshot
+
+        Returns:
+            True om snapshoten skrevs
+        """
+        path = os.path.join(self.directory, f"{snapshot['device_id']}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+            self.published += 1
+            return True
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Failed to publish live snapshot for {snapshot.get('device_id')}: {e}")
+            return False
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för publiceringen"""
+        return {
+            "published": self.published,
+            "errors": self.errors,
+        }
+
+
+class LiveStore:
+    """
+    In-process store med senaste snapshot per enhet (API-sidan)
+
+    Filen läses bara om när dess mtime ändrats, så de flesta anrop kostar
+    en stat(). Snapshots äldre än max_age returneras inte (anroparen faller
+    då tillbaka på InfluxDB).
+    """
+
+    def __init__(self, directory: str, max_age: float = LIVE_SNAPSHOT_MAX_AGE):
+        """
+        Initiera LiveStore
+
+        Args:
+            directory: Delad katalog som collectorn publicerar till
+            max_age: Max ålder i sekunder för en snapshot
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, Tuple[int, Dict]] = {}
+
+        # Metrics
+        self.hits = 0
+        self.stale = 0
+        self.missing = 0
+        self.reloads = 0
+
+    def get(self, device_id: str) -> Optional[Dict]:
+        """
+        Hämta senaste snapshot för en enhet
+
+        Returns:
+            Snapshot eller None om den saknas eller är inaktuell
+        """
+        path = os.path.join(self.directory, f"{device_id}.json")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self.missing += 1
+            return None
+
+        with self._lock:
+            cached = self._snapshots.get(device_id)
+        if cached is not None and cached[0] == mtime:
+            snapshot = cached[1]
+        else:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read live snapshot {path}: {e}")
+                with self._lock:
+                    self.missing += 1
+                return None
+            with self._lock:
+                self._snapshots[device_id] = (mtime, snapshot)
+                self.reloads += 1
+
+        with self._lock:
+            if time.time() - snapshot.get('published_at', 0) > self.max_age:
+                self.stale += 1
+                return None
+            self.hits += 1
+        return snapshot
+
+    def get_latest(self, device_id: str) -> Optional[Dict]:
+        """Senaste sensorvärden i samma form som SensorService.get_latest_sensor_values (None utan sensors)"""
+        snapshot = self.get(device_id)
+        if snapshot is None or 'sensors' not in snapshot:
+            return None
+        return {
+            'device_id': snapshot['device_id'],
+            'timestamp': snapshot['timestamp'],
+            'sensors': snapshot['sensors'],
+        }
+
+    def get_heartbeat(self, device_id: str) -> Optional[Dict]:
+        """Heartbeat från senaste snapshot (None om inaktuell)"""
+        snapshot = self.get(device_id)
+        return snapshot['heartbeat'] if snapshot is not None else None
+
+    def get_circuit_breakers(self, device_id: str) -> Optional[Dict]:
+        """Collectorns circuit breaker-tillstånd från senaste snapshot (None om inaktuell)"""
+        snapshot = self.get(device_id)
+        return snapshot.get('circuit_breakers') if snapshot is not None else None
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för store"""
+        with self._lock:
+            return {
+                "max_age_s": self.max_age,
+                "hits": self.hits,
+                "stale": self.stale,
+                "missing": self.missing,
+                "reloads": self.reloads,
+            }
+
+
+_live_store: Optional[LiveStore] = None
+
+
+def get_live_store() -> Optional[LiveStore]:
+    """Get or create LiveStore instance (None om LIVE_SNAPSHOT_DIR inte är satt)"""
+    global _live_store
+    if _live_store is None and LIVE_SNAPSHOT_DIR:
+        _live_store = LiveStore(LIVE_SNAPSHOT_DIR)
+    return _live_store
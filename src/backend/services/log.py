@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import logging
 import json
 
+from .flux_csv import INTERNAL_COLUMNS, decode_tables
 from .influxdb import InfluxDBService
 
 logger = logging.getLogger(__name__)
@@ -89,8 +90,11 @@ class LogService:
             # Final limit efter pivot
             query += f'|> limit(n: {limit})'
 
-            # Kör query
-            result = self.influxdb.query_api.query(query=query)
+            # Kör query och avkoda CSV-svaret direkt till kolumner
+            tables = decode_tables(
+                self.influxdb.query_api.query_csv(query=query),
+                exclude=('result', 'table', '_start', '_stop')
+            )
 
             # Konvertera till log-format
             # Efter pivot har vi en rad per timestamp+measurement med alla fields som kolumner
@@ -103,50 +107,44 @@ class LogService:
                 'type', 'severity', 'status', 'source', 'location', 'sensor_metadata_id'
             }
 
-            for table in result:
-                for record in table.records:
-                    timestamp = record.get_time()
-                    measurement_name = record.values.get('_measurement', 'unknown')
-
-                    # Extrahera tags och fields från pivoterad data
-                    tags = {}
-                    fields = {}
-                    id_value = None
-
-                    # Gå igenom alla värden i record
-                    # Ignorera InfluxDB-interna kolumner
-                    internal_columns = {'_time', '_measurement', '_start', '_stop', 'result', 'table', '_field', '_value'}
-
-                    for key_name, value in record.values.items():
-                        if key_name in internal_columns:
-                            continue
-
-                        # Identifiera om det är en tag eller field
-                        if key_name in known_tags:
-                            tags[key_name] = value
-                            # Identifiera ID från tags
-                            if key_name in ['sensor_id', 'event_id', 'beacon_id']:
-                                id_value = value
-                        else:
-                            # Detta är ett field
-                            if value is not None:  # Skippa None-värden
-                                fields[key_name] = value
+            for table in tables:
+                # Dela upp kolumnerna i tags och fields en gång per tabell
+                # (InfluxDB-interna kolumner ignoreras)
+                tag_columns = [
+                    (name, table[name]) for name in table
+                    if name in known_tags and name not in INTERNAL_COLUMNS
+                ]
+                field_columns = [
+                    (name, table[name]) for name in table
+                    if name not in known_tags and name not in INTERNAL_COLUMNS
+                ]
+                # Sista ID-taggen i kolumnordning identifierar raden
+                id_columns = [values for name, values in tag_columns if name in ('sensor_id', 'event_id', 'beacon_id')]
+                times = table.get('_time', [])
+                measurements = table.get('_measurement') or ['unknown'] * len(times)
+
+                for row, timestamp in enumerate(times):
+                    measurement_name = measurements[row]
+
+                    tags = {name: values[row] for name, values in tag_columns}
+                    fields = {name: values[row] for name, values in field_columns if values[row] is not None}
+
+                    id_value = id_columns[-1][row] if id_columns else None
 
                     # Om inget ID hittades, försök hitta från source eller andra taggar
                     if not id_value:
                         id_value = tags.get('source', tags.get('beacon_name', tags.get('sensor_id', 'unknown')))
 
                     # Skapa unik nyckel för timestamp + measurement + id
-                    key = f"{timestamp.isoformat()}_{measurement_name}_{id_value}"
+                    iso_timestamp = timestamp.isoformat()
+                    key = f"{iso_timestamp}_{measurement_name}_{id_value}"
 
                     # Om vi redan har denna kombination, uppdatera fields
                     if key in seen_entries:
-                        entry = seen_entries[key]
-                        # Lägg till nya fields (Python dict merge)
-                        entry['fields'].update(fields)
+                        seen_entries[key]['fields'].update(fields)
                     else:
                         entry = {
-                            'timestamp': timestamp.isoformat(),
+                            'timestamp': iso_timestamp,
                             'measurement': measurement_name,
                             'id': id_value or 'unknown',
                             'tags': tags,
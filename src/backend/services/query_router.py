@@ -0,0 +1,213 @@
+"""
+Query Router - Väljer rå bucket eller rollup-bucket utifrån tidsintervall och upplösning
+
+Rollups underhålls av InfluxDB-tasks (se scripts/provision_rollups.py):
+1-minuts- och 1-timmesaggregat med mean/min/max/last. Raderna har samma
+measurement, fält och taggar som rådata plus taggen "agg", så befintliga
+filter (t.ex. flux_sensor_filter) fungerar oförändrade mot rollup-buckets.
+"""
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Rollups används bara när de är provisionerade
+INFLUXDB_ROLLUPS = os.getenv("INFLUXDB_ROLLUPS", "false").lower() == "true"
+
+# Retention för rå bucket i dagar (0 = obegränsad), avgör när rollups måste användas
+INFLUXDB_RAW_RETENTION_DAYS = int(os.getenv("INFLUXDB_RAW_RETENTION_DAYS", "0"))
+
+ROLLUP_AGGREGATES = ("mean", "min", "max", "last")
+
+# Measurements som rullas upp (numeriska fält). beacon_presence ingår inte:
+# beacon-historiken läses som enskilda mätningar (med is_present) och har
+# ingen aggregerad vy, så den läses alltid från rå bucket.
+ROLLUP_MEASUREMENTS = r"/^sensor_|^halo_heartbeat$/"
+
+
+class RollupTier(NamedTuple):
+    """En rollup-nivå"""
+    name: str
+    bucket: str
+    every: int  # Fönster i sekunder
+    retention_days: int  # 0 = obegränsad
+
+
+class QuerySource(NamedTuple):
+    """Var en query ska köras"""
+    bucket: str
+    tier: Optional[RollupTier] = None
+
+    def agg_filter(self, agg: str = "mean") -> str:
+        """Flux-filter på aggregat (tomt för rå bucket)"""
+        if self.tier is None:
+            return ""
+        return f'|> filter(fn: (r) => r["agg"] == "{agg}")'
+
+
+def get_rollup_tiers(raw_bucket: Optional[str] = None) -> List[RollupTier]:
+    """
+    Konfigurerade rollup-nivåer, finast först
+
+    Args:
+        raw_bucket: Rå bucket (default: INFLUXDB_BUCKET), används för default-namn
+    """
+    raw_bucket = raw_bucket or os.getenv("INFLUXDB_BUCKET", "halo-sensors")
+    return [
+        RollupTier(
+            name="1m",
+            bucket=os.getenv("INFLUXDB_ROLLUP_1M_BUCKET", f"{raw_bucket}-1m"),
+            every=60,
+            retention_days=int(os.getenv("INFLUXDB_ROLLUP_1M_RETENTION_DAYS", "90")),
+        ),
+        RollupTier(
+            name="1h",
+            bucket=os.getenv("INFLUXDB_ROLLUP_1H_BUCKET", f"{raw_bucket}-1h"),
+            every=3600,
+            retention_days=int(os.getenv("INFLUXDB_ROLLUP_1H_RETENTION_DAYS", "0")),
+        ),
+    ]
+
+
+class QueryRouter:
+    """
+    Väljer grövsta källan som räcker för ett intervall och en upplösning
+
+    En rollup-nivå kan användas om dess fönster är högst det begärda och
+    dess retention täcker starttiden. Täcker rå bucket inte starttiden
+    används den finaste rollup-nivån som gör det, även om den är grövre än
+    begärt (rådatan finns inte längre).
+    """
+
+    def __init__(
+        self,
+        raw_bucket: str,
+        tiers: Optional[List[RollupTier]] = None,
+        raw_retention_days: int = INFLUXDB_RAW_RETENTION_DAYS,
+        enabled: bool = INFLUXDB_ROLLUPS
+    ):
+        """
+        Initiera QueryRouter
+
+        Args:
+            raw_bucket: Bucket med rådata
+            tiers: Rollup-nivåer (default: get_rollup_tiers)
+            raw_retention_days: Retention för rå bucket (0 = obegränsad)
+            enabled: False = alltid rå bucket
+        """
+        self.raw_bucket = raw_bucket
+        self.tiers = sorted(tiers if tiers is not None else get_rollup_tiers(raw_bucket), key=lambda t: t.every)
+        self.raw_retention_days = raw_retention_days
+        self.enabled = enabled
+
+    def _covers(self, retention_days: int, from_time: datetime, now: datetime) -> bool:
+        return retention_days <= 0 or from_time >= now - timedelta(days=retention_days)
+
+    def route(
+        self,
+        from_time: datetime,
+        window_s: Optional[int] = None,
+        now: Optional[datetime] = None
+    ) -> QuerySource:
+        """
+        Välj källa
+
+        Args:
+            from_time: Starttid för queryn (naiv UTC)
+            window_s: Aggregeringsfönster i sekunder (None = rådata krävs)
+            now: Aktuell tid (för tester)
+
+        Returns:
+            QuerySource med bucket och eventuell rollup-nivå
+        """
+        raw = QuerySource(self.raw_bucket)
+        if not self.enabled or not self.tiers:
+            return raw
+
+        now = now or datetime.utcnow()
+        if window_s:
+            for tier in reversed(self.tiers):
+                if tier.every <= window_s and self._covers(tier.retention_days, from_time, now):
+                    return QuerySource(tier.bucket, tier)
+
+        if self._covers(self.raw_retention_days, from_time, now):
+            return raw
+
+        for tier in self.tiers:
+            if self._covers(tier.retention_days, from_time, now):
+                return QuerySource(tier.bucket, tier)
+        return raw
+
+
+def rollup_task_name(tier: RollupTier) -> str:
+    """Namn på InfluxDB-tasken för en rollup-nivå"""
+    return f"rollup-{tier.bucket}"
+
+
+def rollup_task_flux(
+    tier: RollupTier,
+    source_bucket: str,
+    source_tier: Optional[RollupTier] = None,
+    start: Optional[str] = None,
+    stop: Optional[str] = None
+) -> str:
+    """
+    Flux för InfluxDB-tasken som underhåller en rollup-nivå
+
+    Tasken läser de två senaste fönstren (sena punkter kommer med i nästa
+    körning; samma tidsstämpel skrivs över) och skriver mean/min/max/last
+    med taggen agg. Från en finare rollup-nivå aggregeras respektive
+    aggregat (mean av mean, min av min osv.).
+
+    Args:
+        tier: Nivån som ska skrivas
+        source_bucket: Bucket att läsa från
+        source_tier: Nivån source_bucket innehåller (None = rådata)
+        start: Fast starttid (Flux-time) för backfill i stället för en task
+        stop: Fast sluttid (Flux-time) för backfill
+    """
+    every = f"{tier.every}s"
+    lines = ['import "experimental"', 'import "types"', '']
+    if start:
+        time_range = f'range(start: {start}, stop: {stop})' if stop else f'range(start: {start})'
+    else:
+        lines += [f'option task = {{name: "{rollup_task_name(tier)}", every: {every}, offset: 30s}}', '']
+        time_range = f'range(start: -{tier.every * 2}s)'
+    lines += [
+        'data = from(bucket: "{}")'.format(source_bucket),
+        f'  |> {time_range}',
+        f'  |> filter(fn: (r) => r["_measurement"] =~ {ROLLUP_MEASUREMENTS})',
+        '  |> filter(fn: (r) => types.isNumeric(v: r._value))',
+        '',
+    ]
+    for agg in ROLLUP_AGGREGATES:
+        source = "data"
+        if source_tier is not None:
+            source = f'data |> filter(fn: (r) => r["agg"] == "{agg}") |> drop(columns: ["agg"])'
+        lines += [
+            f'{source}',
+            f'  |> aggregateWindow(every: {every}, fn: {agg}, createEmpty: false)',
+            f'  |> set(key: "agg", value: "{agg}")',
+            '  |> experimental.group(columns: ["agg"], mode: "extend")',
+            f'  |> to(bucket: "{tier.bucket}")',
+            '',
+        ]
+    return "\n".join(lines)
+
+
+_query_router: Optional[QueryRouter] = None
+
+
+def get_query_router() -> QueryRouter:
+    """Get or create QueryRouter instance"""
+    global _query_router
+    if _query_router is None:
+        _query_router = QueryRouter(os.getenv("INFLUXDB_BUCKET", "halo-sensors"))
+        if _query_router.enabled:
+            logger.info(
+                "Query router using rollups: "
+                + ", ".join(f"{tier.name} -> {tier.bucket}" for tier in _query_router.tiers)
+            )
+    return _query_router
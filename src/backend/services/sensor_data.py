@@ -1,7 +1,7 @@
 """
 Sensor Data Service - Skriver sensor-data till InfluxDB
 """
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional
 from datetime import datetime
 from influxdb_client import Point
 import logging
@@ -13,18 +13,243 @@ from .influxdb import InfluxDBService
 logger = logging.getLogger(__name__)
 
 
+# Reserverade fältnamn i InfluxDB som inte skrivs som sensorvärden
+RESERVED_FIELDS = ('time', '_time', 'timestamp')
+
+# Schema för sensor-measurements
+# narrow: en point per fält med tag sensor_id (t.ex. "htsensor/ctemp")
+# wide:   en point per sensor med alla fält och utan sensor_id-tag
+SCHEMA_NARROW = "narrow"
+SCHEMA_WIDE = "wide"
+
+
+class SensorReading(NamedTuple):
+    """Ett numeriskt sensorvärde avkodat från Halo-payload"""
+    sensor_key: str  # t.ex. "htsensor" -> measurement "sensor_htsensor"
+    sensor_id: str   # t.ex. "htsensor/ctemp"
+    field: str       # t.ex. "ctemp"
+    value: float
+
+
+def accelerometer_magnitude(data: Dict) -> Optional[float]:
+    """
+    Beräkna accelerometerns magnitud sqrt(x² + y² + z²)
+
+    Args:
+        data: accsensor/data från Halo
+
+    Returns:
+        Magnitud i milli g, eller None om x/y/z inte är numeriska
+    """
+    x = data.get('x', 0)
+    y = data.get('y', 0)
+    z = data.get('z', 0)
+    if isinstance(x, (int, float)) and isinstance(y, (int, float)) and isinstance(z, (int, float)):
+        return math.sqrt(x*x + y*y + z*z)
+    return None
+
+
+def extract_sensor_readings(sensor_data: Dict, include_derived: bool = True) -> List[SensorReading]:
+    """
+    Avkoda alla numeriska sensorvärden från en Halo-payload
+
+    Args:
+        sensor_data: Dictionary med sensor-data från Halo 3C (gstate/latest)
+        include_derived: Inkludera härledda värden (accelerometer-magnitud)
+
+    Returns:
+        Lista med SensorReading
+    """
+    readings = []
+
+    for key, value in sensor_data.items():
+        if not isinstance(value, dict):
+            continue
+
+        # Hantera sensor-struktur
+        sensor_key = value.get('key', key)
+        data = value.get('data', {})
+
+        # Extrahera alla numeriska värden från data
+        if isinstance(data, dict):
+            # Specialhantering för accelerometer - logga magnitud som separat field
+            if include_derived and sensor_key == 'accsensor':
+                magnitude = accelerometer_magnitude(data)
+                if magnitude is not None:
+                    readings.append(SensorReading(sensor_key, "accsensor/magnitude", "magnitude", float(magnitude)))
+
+            for field_name, field_value in data.items():
+                if field_name in RESERVED_FIELDS:
+                    continue
+                if isinstance(field_value, (int, float)):
+                    readings.append(SensorReading(
+                        sensor_key, f"{sensor_key}/{field_name}", field_name, float(field_value)
+                    ))
+
+        # Om data är direkt ett numeriskt värde
+        elif isinstance(data, (int, float)):
+            readings.append(SensorReading(sensor_key, sensor_key, "value", float(data)))
+
+    return readings
+
+
+def resolve_sensor_id(measurement: str, field: str, sensor_id: Optional[str] = None) -> str:
+    """
+    Härled sensor_id för en rad oavsett schema
+
+    Narrow-rader har sensor_id som tag. Wide-rader saknar taggen och
+    sensor_id blir "<key>/<field>" där key är measurement utan "sensor_".
+
+    Args:
+        measurement: Measurement (t.ex. "sensor_htsensor")
+        field: Fältnamn (t.ex. "ctemp")
+        sensor_id: Värdet på sensor_id-taggen om den finns
+
+    Returns:
+        sensor_id (t.ex. "htsensor/ctemp")
+    """
+    if sensor_id:
+        return sensor_id
+    return f"{measurement[len('sensor_'):]}/{field}"
+
+
+def flux_sensor_filter(sensor_id: str) -> str:
+    """
+    Flux-filter som matchar en sensor i både narrow- och wide-schema
+
+    Args:
+        sensor_id: Sensor ID (t.ex. "htsensor/ctemp")
+
+    Returns:
+        Flux-rader med filter på measurement och sensor
+    """
+    if "/" not in sensor_id:
+        return (
+            f'|> filter(fn: (r) => r["_measurement"] =~ /^sensor_/)\n'
+            f'|> filter(fn: (r) => r["sensor_id"] == "{sensor_id}")'
+        )
+
+    sensor_key, field = sensor_id.split("/", 1)
+    return (
+        f'|> filter(fn: (r) => r["_measurement"] == "sensor_{sensor_key}")\n'
+        f'|> filter(fn: (r) => r["sensor_id"] == "{sensor_id}" or '
+        f'(not exists r["sensor_id"] and r["_field"] == "{field}"))'
+    )
+
+
+def flux_sensor_predicate(sensor_id: str) -> str:
+    """
+    Flux-uttryck (för filter-funktion) som matchar en sensor i båda scheman
+
+    Args:
+        sensor_id: Sensor ID (t.ex. "htsensor/ctemp")
+
+    Returns:
+        Uttryck på r, t.ex. för att kombineras med "or"
+    """
+    if "/" not in sensor_id:
+        return f'(r["_measurement"] =~ /^sensor_/ and r["sensor_id"] == "{sensor_id}")'
+
+    sensor_key, field = sensor_id.split("/", 1)
+    return (
+        f'(r["_measurement"] == "sensor_{sensor_key}" and '
+        f'(r["sensor_id"] == "{sensor_id}" or '
+        f'(not exists r["sensor_id"] and r["_field"] == "{field}")))'
+    )
+
+
+def flux_sensors_filter(sensor_ids: List[str]) -> str:
+    """
+    Flux-filter som matchar flera sensorer i en query
+
+    Args:
+        sensor_ids: Lista med sensor ID
+
+    Returns:
+        Flux-rad med ett filter
+    """
+    predicates = " or ".join(flux_sensor_predicate(sensor_id) for sensor_id in sensor_ids)
+    return f'|> filter(fn: (r) => {predicates})'
+
+
+def build_sensor_points(
+    readings: List[SensorReading],
+    timestamp: datetime,
+    device_id: str,
+    schema: str = SCHEMA_NARROW
+) -> List[Point]:
+    """
+    Bygg InfluxDB-points för sensorvärden
+
+    Args:
+        readings: Lista med SensorReading
+        timestamp: Timestamp för alla points
+        device_id: Device ID
+        schema: SCHEMA_NARROW eller SCHEMA_WIDE
+
+    Returns:
+        Lista med points
+    """
+    points = []
+    wide_points: Dict[str, Point] = {}
+
+    for reading in readings:
+        # Skalära sensorer (sensor_id utan fält) behåller sensor_id-taggen även i wide
+        if schema == SCHEMA_WIDE and reading.sensor_id == f"{reading.sensor_key}/{reading.field}":
+            point = wide_points.get(reading.sensor_key)
+            if point is None:
+                point = Point(f"sensor_{reading.sensor_key}") \
+                    .tag("device_id", device_id) \
+                    .time(timestamp)
+                wide_points[reading.sensor_key] = point
+                points.append(point)
+            point.field(reading.field, reading.value)
+        else:
+            points.append(
+                Point(f"sensor_{reading.sensor_key}")
+                .tag("sensor_id", reading.sensor_id)
+                .tag("device_id", device_id)
+                .field(reading.field, reading.value)
+                .time(timestamp)
+            )
+
+    return points
+
+
 class SensorDataService:
     """Service för att skriva sensor-data till InfluxDB"""
 
-    def __init__(self):
+    def __init__(self, write_pipeline=None, deadband=None, schema: Optional[str] = None):
+        """
+        Initiera SensorDataService
+
+        Args:
+            write_pipeline: Delad WritePipeline (default: skriv direkt med write_api)
+            deadband: DeadbandFilter för change-only-skrivning (default: skriv alla värden)
+            schema: SCHEMA_NARROW eller SCHEMA_WIDE (default: SENSOR_SCHEMA eller narrow)
+        """
         self.influxdb = InfluxDBService()
         self.bucket = os.getenv("INFLUXDB_BUCKET", "halo-sensors")
         self.device_id = os.getenv("DEVICE_ID", "halo-device-1")
+        self.write_pipeline = write_pipeline
+        self.deadband = deadband
+        self.schema = (schema or os.getenv("SENSOR_SCHEMA", SCHEMA_NARROW)).lower()
+        if self.schema not in (SCHEMA_NARROW, SCHEMA_WIDE):
+            logger.warning(f"Unknown SENSOR_SCHEMA '{self.schema}', using {SCHEMA_NARROW}")
+            self.schema = SCHEMA_NARROW
+
+    def _write(self, records):
+        """Köa points i write-pipelinen, eller skriv direkt om ingen pipeline finns"""
+        if self.write_pipeline is not None:
+            self.write_pipeline.add(records, bucket=self.bucket)
+        else:
+            self.influxdb.write_api.write(bucket=self.bucket, record=records)
 
     def write_sensor_data(
         self,
         sensor_data: Dict,
-        timestamp: Optional[datetime] = None
+        timestamp: Optional[datetime] = None,
+        device_id: Optional[str] = None
     ) -> bool:
         """
         Skriv sensor-data till InfluxDB
@@ -32,72 +257,60 @@ class SensorDataService:
         Args:
             sensor_data: Dictionary med sensor-data från Halo 3C
             timestamp: Timestamp för data (default: nu)
+            device_id: Device ID (default från service)
+
+        Returns:
+            True om framgångsrikt
+        """
+        try:
+            readings = extract_sensor_readings(sensor_data)
+        except Exception as e:
+            logger.error(f"Failed to parse sensor data: {e}", exc_info=True)
+            return False
+
+        return self.write_sensor_readings(readings, timestamp, device_id)
+
+    def write_sensor_readings(
+        self,
+        readings: List[SensorReading],
+        timestamp: Optional[datetime] = None,
+        device_id: Optional[str] = None,
+        encoder: Optional[Callable[[List[SensorReading], datetime, str, str], List[str]]] = None
+    ) -> bool:
+        """
+        Skriv redan avkodade sensorvärden till InfluxDB
+
+        Args:
+            readings: Lista med SensorReading (från extract_sensor_readings)
+            timestamp: Timestamp för data (default: nu)
+            device_id: Device ID (default från service)
+            encoder: Funktion som ger line protocol-rader, t.ex. PayloadSerializer.encode
+                     (default: bygg Point-objekt)
 
         Returns:
             True om framgångsrikt
         """
         if timestamp is None:
             timestamp = datetime.utcnow()
+        device_id = device_id or self.device_id
 
         try:
-            points = []
+            if self.deadband is not None:
+                readings = self.deadband.filter(readings, timestamp, device_id)
 
-            # Extrahera alla sensorvärden från state
-            for key, value in sensor_data.items():
-                if isinstance(value, dict):
-                    # Hantera sensor-struktur
-                    sensor_key = value.get('key', key)
-                    data = value.get('data', {})
-
-                    # Specialhantering för accelerometer - beräkna och logga magnitud
-                    if sensor_key == 'accsensor' and isinstance(data, dict):
-                        x = data.get('x', 0)
-                        y = data.get('y', 0)
-                        z = data.get('z', 0)
-                        if isinstance(x, (int, float)) and isinstance(y, (int, float)) and isinstance(z, (int, float)):
-                            # Beräkna magnitud: sqrt(x² + y² + z²)
-                            magnitude = math.sqrt(x*x + y*y + z*z)
-                            # Logga magnitud som separat field
-                            point = Point("sensor_accsensor") \
-                                .tag("sensor_id", "accsensor/magnitude") \
-                                .tag("device_id", self.device_id) \
-                                .field("magnitude", float(magnitude)) \
-                                .time(timestamp)
-                            points.append(point)
-
-                    # Skapa measurement baserat på sensor-typ
-                    measurement = f"sensor_{sensor_key}"
-
-                    # Extrahera alla numeriska värden från data
-                    if isinstance(data, dict):
-                        for field_name, field_value in data.items():
-                            # Skippa reserverade fältnamn i InfluxDB
-                            if field_name in ('time', '_time', 'timestamp'):
-                                continue
-                            if isinstance(field_value, (int, float)):
-                                point = Point(measurement) \
-                                    .tag("sensor_id", f"{sensor_key}/{field_name}") \
-                                    .tag("device_id", self.device_id) \
-                                    .field(field_name, float(field_value)) \
-                                    .time(timestamp)
-                                points.append(point)
-
-                    # Om data är direkt ett numeriskt värde
-                    elif isinstance(data, (int, float)):
-                        point = Point(measurement) \
-                            .tag("sensor_id", sensor_key) \
-                            .tag("device_id", self.device_id) \
-                            .field("value", float(data)) \
-                            .time(timestamp)
-                        points.append(point)
+            if encoder is not None:
+                points = encoder(readings, timestamp, device_id, self.schema)
+            else:
+                points = build_sensor_points(readings, timestamp, device_id, self.schema)
 
             # Skriv alla points till InfluxDB
             if points:
-                self.influxdb.write_api.write(bucket=self.bucket, record=points)
+                self._write(points)
                 logger.debug(f"Wrote {len(points)} sensor data points to InfluxDB")
                 return True
 
-            return False
+            # Alla värden inom deadband räknas som lyckad skrivning
+            return self.deadband is not None
 
         except Exception as e:
             logger.error(f"Failed to write sensor data: {e}", exc_info=True)
@@ -160,7 +373,7 @@ class SensorDataService:
 
             # Skriv alla points till InfluxDB
             if points:
-                self.influxdb.write_api.write(bucket=self.bucket, record=points)
+                self._write(points)
                 logger.debug(f"Wrote {len(points)} beacon data points to InfluxDB")
                 return True
 
@@ -175,7 +388,8 @@ class SensorDataService:
         is_connected: bool,
         response_time_ms: Optional[float] = None,
         error: Optional[str] = None,
-        timestamp: Optional[datetime] = None
+        timestamp: Optional[datetime] = None,
+        device_id: Optional[str] = None
     ) -> bool:
         """
         Skriv heartbeat-status till InfluxDB för att spåra Halo-kontakt över tid.
@@ -185,16 +399,18 @@ class SensorDataService:
             response_time_ms: Responstid i millisekunder (om connected)
             error: Felmeddelande om disconnected
             timestamp: Timestamp för data (default: nu)
+            device_id: Device ID (default från service)
 
         Returns:
             True om framgångsrikt
         """
         if timestamp is None:
             timestamp = datetime.utcnow()
+        device_id = device_id or self.device_id
 
         try:
             point = Point("halo_heartbeat") \
-                .tag("device_id", self.device_id) \
+                .tag("device_id", device_id) \
                 .tag("sensor_id", "heartbeat/status") \
                 .field("connected", 1.0 if is_connected else 0.0) \
                 .time(timestamp)
@@ -205,7 +421,11 @@ class SensorDataService:
             if error:
                 point = point.tag("error", error[:100])  # Begränsa error-längd
 
-            self.influxdb.write_api.write(bucket=self.bucket, record=point)
+            # Efter ett avbrott ska första värdena skrivas oavsett deadband
+            if not is_connected and self.deadband is not None:
+                self.deadband.reset(device_id)
+
+            self._write(point)
             logger.debug(f"Wrote heartbeat: connected={is_connected}, response_time={response_time_ms}ms")
             return True
 
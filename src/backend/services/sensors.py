@@ -4,13 +4,33 @@ Sensor Service - Hämtar sensor-data från InfluxDB
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import logging
+import os
 from influxdb_client import Point
 from influxdb_client.client.query_api import QueryApi
 
+from .downsampling import LTTB_OVERSAMPLE, choose_window, lttb_indices, resolution_seconds
+from .flux_csv import decode_tables
 from .influxdb import InfluxDBService
+from .live_store import get_live_store
+from .query_router import get_query_router
+from .sensor_data import flux_sensor_filter, flux_sensors_filter, resolve_sensor_id
+from .snapshot_cache import SnapshotCache
 
 logger = logging.getLogger(__name__)
 
+# Senaste värden cachas per enhet i ett insamlingsintervall (delas av alla SensorService-instanser)
+LATEST_CACHE_TTL = float(os.getenv("LATEST_CACHE_TTL", os.getenv("COLLECTION_INTERVAL", "10")))
+
+_latest_cache: Optional[SnapshotCache] = None
+
+
+def get_latest_cache() -> SnapshotCache:
+    """Get or create cache för senaste sensorvärden"""
+    global _latest_cache
+    if _latest_cache is None:
+        _latest_cache = SnapshotCache(ttl=LATEST_CACHE_TTL)
+    return _latest_cache
+
 
 class SensorService:
     """Service för att hämta sensor-data från InfluxDB"""
@@ -24,6 +44,10 @@ class SensorService:
         """
         Hämta senaste värden för alla sensorer
 
+        Läses från collectorns live-snapshot när den är aktuell. Annars
+        frågas InfluxDB; resultatet cachas per enhet i LATEST_CACHE_TTL
+        sekunder och samtidiga missar delar på en query.
+
         Args:
             device_id: Device ID (optional, default från service)
 
@@ -32,45 +56,15 @@ class SensorService:
         """
         device_id = device_id or self.device_id
 
-        try:
-            # Query för att hämta senaste värden per sensor
-            # Flux query: Hämta senaste datapoint per sensor_id
-            query = f'''
-            from(bucket: "{self.bucket}")
-              |> range(start: -1h)
-              |> filter(fn: (r) => r["_measurement"] =~ /^sensor_/)
-              |> filter(fn: (r) => r["device_id"] == "{device_id}")
-              |> group(columns: ["sensor_id"])
-              |> last()
-            '''
-
-            result = self.influxdb.query_api.query(query=query)
-
-            # Organisera data per sensor
-            sensor_values = {}
-
-            for table in result:
-                for record in table.records:
-                    sensor_id = record.values.get('sensor_id', 'unknown')
-                    field = record.get_field()
-                    value = record.get_value()
-                    timestamp = record.get_time()
-
-                    if sensor_id not in sensor_values:
-                        sensor_values[sensor_id] = {
-                            'sensor_id': sensor_id,
-                            'timestamp': timestamp.isoformat(),
-                            'values': {}
-                        }
-
-                    sensor_values[sensor_id]['values'][field] = value
-
-            return {
-                'device_id': device_id,
-                'timestamp': datetime.utcnow().isoformat(),
-                'sensors': list(sensor_values.values())
-            }
+        # Collectorns live-snapshot när den är aktuell (ingen query alls)
+        live_store = get_live_store()
+        if live_store is not None:
+            live = live_store.get_latest(device_id)
+            if live is not None:
+                return live
 
+        try:
+            return get_latest_cache().get(device_id, lambda: self._query_latest_sensor_values(device_id))
         except Exception as e:
             logger.error(f"Failed to get latest sensor values: {e}", exc_info=True)
             return {
@@ -79,23 +73,79 @@ class SensorService:
                 'sensors': []
             }
 
+    def _query_latest_sensor_values(self, device_id: str) -> Dict[str, Any]:
+        """Hämta senaste värden från InfluxDB (utan cache, undantag propageras)"""
+        # Query för att hämta senaste värden per sensor
+        # Flux query: Hämta senaste datapoint per sensor och fält
+        # (sensor_id-tag i narrow-schema, measurement + fält i wide-schema)
+        query = f'''
+        from(bucket: "{self.bucket}")
+          |> range(start: -1h)
+          |> filter(fn: (r) => r["_measurement"] =~ /^sensor_/)
+          |> filter(fn: (r) => r["device_id"] == "{device_id}")
+          |> group(columns: ["_measurement", "sensor_id", "_field"])
+          |> last()
+        '''
+
+        result = self.influxdb.query_api.query(query=query)
+
+        # Organisera data per sensor
+        sensor_values = {}
+
+        for table in result:
+            for record in table.records:
+                field = record.get_field()
+                sensor_id = resolve_sensor_id(
+                    record.get_measurement(), field, record.values.get('sensor_id')
+                )
+                value = record.get_value()
+                timestamp = record.get_time()
+
+                if sensor_id not in sensor_values:
+                    sensor_values[sensor_id] = {
+                        'sensor_id': sensor_id,
+                        'timestamp': timestamp.isoformat(),
+                        'values': {}
+                    }
+                elif timestamp.isoformat() > sensor_values[sensor_id]['timestamp']:
+                    sensor_values[sensor_id]['timestamp'] = timestamp.isoformat()
+
+                sensor_values[sensor_id]['values'][field] = value
+
+        return {
+            'device_id': device_id,
+            'timestamp': datetime.utcnow().isoformat(),
+            'sensors': list(sensor_values.values())
+        }
+
     def get_sensor_history(
         self,
         sensor_id: str,
         from_time: Optional[datetime] = None,
         to_time: Optional[datetime] = None,
         limit: int = 1000,
-        device_id: Optional[str] = None
+        device_id: Optional[str] = None,
+        max_points: Optional[int] = None,
+        resolution: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Hämta historik för en specifik sensor
 
+        Utan max_points/resolution returneras råa punkter (de första limit
+        punkterna i tidsordning). Med max_points medelvärdesbildas serien i
+        InfluxDB (aggregateWindow) till ungefär LTTB_OVERSAMPLE * max_points
+        punkter och förfinas sedan med LTTB till max_points, så att hela
+        intervallet täcks oavsett längd. Nedsamplade queries körs mot
+        grövsta rollup-bucket som räcker (se QueryRouter).
+
         Args:
             sensor_id: Sensor ID (t.ex. "co2sensor_co2")
             from_time: Starttid
             to_time: Sluttid
-            limit: Max antal datapoints
+            limit: Max antal datapoints (rått läge)
             device_id: Device ID
+            max_points: Max antal punkter per serie (nedsamplat läge)
+            resolution: Fast aggregeringsfönster som Flux-duration (t.ex. "5m")
 
         Returns:
             Lista med historiska värden
@@ -107,31 +157,63 @@ class SensorService:
         if to_time is None:
             to_time = datetime.utcnow()
 
+        if resolution:
+            window = resolution
+            window_s = resolution_seconds(resolution)
+        elif max_points:
+            window_s = choose_window(from_time, to_time, max_points * LTTB_OVERSAMPLE)
+            window = f"{window_s}s" if window_s else None
+        else:
+            window = None
+            window_s = None
+
+        source = get_query_router().route(from_time, window_s)
+
+        if window:
+            # Nedsamplat läge: täck hela intervallet
+            reduce = f'|> aggregateWindow(every: {window}, fn: mean, createEmpty: false)'
+        else:
+            # Rått läge: sortera före limit så att de första punkterna returneras
+            reduce = f'|> sort(columns: ["_time"])\n              |> limit(n: {limit})'
+
         try:
             # Flux query för sensor-historik
             query = f'''
-            from(bucket: "{self.bucket}")
+            from(bucket: "{source.bucket}")
               |> range(start: {self._datetime_to_flux_time(from_time)}, stop: {self._datetime_to_flux_time(to_time)})
-              |> filter(fn: (r) => r["_measurement"] =~ /^sensor_/)
-              |> filter(fn: (r) => r["sensor_id"] == "{sensor_id}")
+              {flux_sensor_filter(sensor_id)}
               |> filter(fn: (r) => r["device_id"] == "{device_id}")
-              |> limit(n: {limit})
-              |> sort(columns: ["_time"])
+              {source.agg_filter("mean")}
+              {reduce}
             '''
 
-            result = self.influxdb.query_api.query(query=query)
+            # Avkoda CSV-svaret direkt till kolumner (snabbare än FluxRecord per rad)
+            tables = decode_tables(
+                self.influxdb.query_api.query_csv(query=query),
+                columns=("_time", "_field", "_value")
+            )
 
             history = []
 
-            for table in result:
-                for record in table.records:
-                    history.append({
-                        'timestamp': record.get_time().isoformat(),
-                        'field': record.get_field(),
-                        'value': record.get_value(),
+            for table in tables:
+                rows = [
+                    (timestamp, field, value)
+                    for timestamp, field, value in zip(table["_time"], table["_field"], table["_value"])
+                    if value is not None or not window
+                ]
+                if max_points and len(rows) > max_points:
+                    indices = lttb_indices([row[0].timestamp() for row in rows], [row[2] for row in rows], max_points)
+                    rows = [rows[i] for i in indices]
+                history.extend(
+                    {
+                        'timestamp': timestamp.isoformat(),
+                        'field': field,
+                        'value': value,
                         'sensor_id': sensor_id,
                         'device_id': device_id
-                    })
+                    }
+                    for timestamp, field, value in rows
+                )
 
             return history
 
@@ -139,6 +221,80 @@ class SensorService:
             logger.error(f"Failed to get sensor history: {e}", exc_info=True)
             return []
 
+    def get_sensor_history_batch(
+        self,
+        sensor_ids: List[str],
+        from_time: Optional[datetime] = None,
+        to_time: Optional[datetime] = None,
+        points: int = 50,
+        device_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Hämta nedsamplad historik för flera sensorer i en query (t.ex. sparklines)
+
+        Varje serie medelvärdesbildas i fönster så att den får högst ungefär
+        points punkter. Queryn körs mot grövsta rollup-bucket som räcker.
+
+        Args:
+            sensor_ids: Lista med sensor ID
+            from_time: Starttid (default: 1 timme sedan)
+            to_time: Sluttid
+            points: Önskat antal punkter per sensor
+            device_id: Device ID
+
+        Returns:
+            Dictionary med window_s och series: {sensor_id: [[timestamp_ms, value], ...]}
+        """
+        device_id = device_id or self.device_id
+
+        if to_time is None:
+            to_time = datetime.utcnow()
+        if from_time is None:
+            from_time = to_time - timedelta(hours=1)
+
+        window = max(int((to_time - from_time).total_seconds() // max(points, 1)), 1)
+        series: Dict[str, List[List[Any]]] = {sensor_id: [] for sensor_id in sensor_ids}
+        source = get_query_router().route(from_time, window)
+
+        try:
+            query = f'''
+            from(bucket: "{source.bucket}")
+              |> range(start: {self._datetime_to_flux_time(from_time)}, stop: {self._datetime_to_flux_time(to_time)})
+              {flux_sensors_filter(sensor_ids)}
+              |> filter(fn: (r) => r["device_id"] == "{device_id}")
+              {source.agg_filter("mean")}
+              |> aggregateWindow(every: {window}s, fn: mean, createEmpty: false)
+              |> keep(columns: ["_time", "_value", "_measurement", "_field", "sensor_id"])
+            '''
+
+            result = self.influxdb.query_api.query(query=query)
+
+            for table in result:
+                for record in table.records:
+                    sensor_id = resolve_sensor_id(
+                        record.get_measurement(), record.get_field(), record.values.get('sensor_id')
+                    )
+                    if sensor_id not in series or record.get_value() is None:
+                        continue
+                    series[sensor_id].append([
+                        int(record.get_time().timestamp() * 1000),
+                        record.get_value()
+                    ])
+
+            for values in series.values():
+                values.sort(key=lambda point: point[0])
+
+        except Exception as e:
+            logger.error(f"Failed to get sensor history batch: {e}", exc_info=True)
+
+        return {
+            'device_id': device_id,
+            'from': from_time.isoformat(),
+            'to': to_time.isoformat(),
+            'window_s': window,
+            'series': series
+        }
+
     def _datetime_to_flux_time(self, dt: datetime) -> str:
         """Konvertera datetime till Flux-time format"""
         return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -170,11 +326,14 @@ class SensorService:
             to_time = datetime.utcnow()
 
         try:
+            # Rådata så länge den finns kvar, därefter medelvärden från rollup
+            source = get_query_router().route(from_time)
             query = f'''
-            from(bucket: "{self.bucket}")
+            from(bucket: "{source.bucket}")
               |> range(start: {self._datetime_to_flux_time(from_time)}, stop: {self._datetime_to_flux_time(to_time)})
               |> filter(fn: (r) => r["_measurement"] == "halo_heartbeat")
               |> filter(fn: (r) => r["device_id"] == "{device_id}")
+              {source.agg_filter("mean")}
               |> limit(n: {limit})
               |> sort(columns: ["_time"])
             '''
@@ -0,0 +1,112 @@
+"""
+Snapshot Cache - Trådsäker TTL-cache per nyckel med single-flight
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """
+    TTL-cache för dyra läsningar (t.ex. senaste sensorvärden per enhet)
+
+    Värden är färska i ttl sekunder. Vid miss laddar bara den första
+    anroparen värdet; samtidiga anropare för samma nyckel väntar på samma
+    laddning (single-flight) istället för att köra en egen query. Fel
+    cachas inte utan propageras till alla som väntade på laddningen.
+
+    Anropen kommer från flera trådar (QueryExecutor), därför threading-lås.
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Initiera SnapshotCache
+
+        Args:
+            ttl: Sekunder som ett värde räknas som färskt (0 stänger av cachen)
+            clock: Monoton klocka (för tester)
+        """
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.load_errors = 0
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Hämta värdet för nyckeln, ladda via load() vid miss
+
+        Args:
+            key: Cachenyckel (t.ex. device_id)
+            load: Blockerande funktion som laddar värdet
+
+        Returns:
+            Cachat eller nyladdat värde (undantag från load propageras)
+        """
+        if self.ttl <= 0:
+            return load()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = load()
+        except BaseException as e:
+            with self._lock:
+                self.load_errors += 1
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Släng en nyckel, eller alla om key är None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_metrics(self) -> Dict:
+        """Hämta cache-metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "ttl_s": self.ttl,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "load_errors": self.load_errors,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+            }
@@ -0,0 +1,347 @@
+"""
+Write-Ahead Log - Diskbuffrad kö för InfluxDB-skrivningar
+"""
+from typing import Dict, List, Optional, Tuple
+import glob
+import logging
+import os
+import threading
+import time
+
+from .influxdb import write_isolating_rejects
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".wal"
+OPEN_SUFFIX = ".wal.open"
+
+# Rader som InfluxDB avvisat permanent (4xx) flyttas hit, i samma format som segmenten
+REJECTED_FILE = "wal.rejected"
+
+
+class WriteAheadLog:
+    """
+    Append-only WAL med segmenterade filer
+
+    Line protocol skrivs först till det aktiva segmentet. Segmentet
+    förseglas (fsync) när det nått segment_bytes eller är äldre än
+    seal_interval, så en flush per insamlingscykel ger inte ett segment per
+    cykel. Drainer-tråden slår ihop förseglade segment till writes om upp
+    till drain_batch_size rader och tar bort segmenten först när alla rader
+    skrivits. Är InfluxDB nere ligger segmenten kvar på disk och
+    spelas upp när databasen svarar igen, även efter omstart av collectorn.
+
+    Varje rad lagras som "<bucket>\\t<line protocol>". Ett segment som
+    spelas upp två gånger (t.ex. krasch mitt i en drain) ger identiska
+    points som InfluxDB skriver över, så uppspelningen är idempotent.
+
+    Rader som InfluxDB avvisar permanent (4xx utom 429) flyttas till
+    REJECTED_FILE så att de inte blockerar resten av backloggen.
+    """
+
+    def __init__(
+        self,
+        influxdb,
+        wal_dir: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        drain_batch_size: Optional[int] = None,
+        seal_interval: Optional[float] = None,
+        max_backoff: float = 30.0
+    ):
+        """
+        Initiera WriteAheadLog
+
+        Args:
+            influxdb: InfluxDBService (eller objekt med write_api)
+            wal_dir: Katalog för segmentfiler (default: WAL_DIR eller /app/wal)
+            segment_bytes: Max storlek per segment (default: WAL_SEGMENT_BYTES eller 8 MB)
+            max_bytes: Max total storlek innan äldsta segment släpps (default: WAL_MAX_BYTES eller 512 MB)
+            drain_batch_size: Antal rader per write vid uppspelning (default: WAL_DRAIN_BATCH_SIZE eller 10000)
+            seal_interval: Max ålder i sekunder för aktivt segment (default: WAL_SEAL_INTERVAL eller 5)
+            max_backoff: Max väntetid i sekunder mellan försök när InfluxDB är nere
+        """
+        self.influxdb = influxdb
+        self.wal_dir = wal_dir or os.getenv("WAL_DIR", "/app/wal")
+        self.segment_bytes = segment_bytes or int(os.getenv("WAL_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+        self.max_bytes = max_bytes or int(os.getenv("WAL_MAX_BYTES", str(512 * 1024 * 1024)))
+        self.drain_batch_size = drain_batch_size or int(os.getenv("WAL_DRAIN_BATCH_SIZE", "10000"))
+        self.seal_interval = seal_interval or float(os.getenv("WAL_SEAL_INTERVAL", "5"))
+        self.max_backoff = max_backoff
+
+        os.makedirs(self.wal_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+
+        # Förseglade segment i ordning (äldst först): (sekvensnummer, storlek)
+        self._segments: List[Tuple[int, int]] = []
+        self._next_seq = 0
+        self._active_file = None
+        self._active_seq: Optional[int] = None
+        self._active_bytes = 0
+        self._active_opened = 0.0
+
+        # Metrics
+        self._drained_points = 0
+        self._drain_errors = 0
+        self._rejected_points = 0
+        self._evicted_segments = 0
+        self._evicted_bytes = 0
+        self._last_drain_latency_ms: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._healthy = True
+
+        self._recover()
+
+        self._thread = threading.Thread(target=self._run, name="wal-drainer", daemon=True)
+        self._thread.start()
+
+    def _segment_path(self, seq: int, suffix: str = SEGMENT_SUFFIX) -> str:
+        """Sökväg till segmentfil"""
+        return os.path.join(self.wal_dir, f"{seq:012d}{suffix}")
+
+    def _recover(self):
+        """Läs in segment som finns kvar från tidigare körning"""
+        # Aktiva segment från en avbruten körning förseglas som de är
+        for path in glob.glob(os.path.join(self.wal_dir, f"*{OPEN_SUFFIX}")):
+            os.replace(path, path[:-len(".open")])
+
+        for path in sorted(glob.glob(os.path.join(self.wal_dir, f"*{SEGMENT_SUFFIX}"))):
+            name = os.path.basename(path)[:-len(SEGMENT_SUFFIX)]
+            try:
+                seq = int(name)
+            except ValueError:
+                logger.warning(f"Ignoring unknown file in WAL dir: {path}")
+                continue
+            self._segments.append((seq, os.path.getsize(path)))
+            self._next_seq = max(self._next_seq, seq + 1)
+
+        if self._segments:
+            backlog = sum(size for _, size in self._segments)
+            logger.info(f"WAL recovered {len(self._segments)} segment(s) ({backlog} bytes) from {self.wal_dir}")
+            self._wakeup.set()
+
+    def append(self, lines: List[Tuple[str, str]]):
+        """
+        Lägg till rader i aktivt segment
+
+        Raderna skrivs till filen direkt (överlever en krasch i processen);
+        fsync görs när segmentet förseglas på storlek eller ålder.
+
+        Args:
+            lines: Lista med (bucket, line protocol)
+        """
+        if not lines:
+            return
+
+        data = "".join(f"{bucket}\t{line}\n" for bucket, line in lines).encode("utf-8")
+        with self._lock:
+            if self._active_file is None:
+                self._active_seq = self._next_seq
+                self._next_seq += 1
+                self._active_file = open(self._segment_path(self._active_seq, OPEN_SUFFIX), "ab")
+                self._active_bytes = 0
+                self._active_opened = time.monotonic()
+
+            self._active_file.write(data)
+            self._active_file.flush()
+            self._active_bytes += len(data)
+
+            sealed = self._seal_if_due_locked()
+        if sealed:
+            self._wake_drainer()
+
+    def seal(self):
+        """Försegla aktivt segment och väck drainern"""
+        with self._lock:
+            self._seal_locked()
+        self._wake_drainer()
+
+    def _wake_drainer(self):
+        """Väck drainern, utom när InfluxDB är nere (då gäller backoff)"""
+        if self._healthy:
+            self._wakeup.set()
+
+    def _seal_if_due_locked(self) -> bool:
+        """Försegla aktivt segment om det nått segment_bytes eller seal_interval (kräver self._lock)"""
+        if self._active_file is None:
+            return False
+        if (self._active_bytes >= self.segment_bytes
+                or time.monotonic() - self._active_opened >= self.seal_interval):
+            self._seal_locked()
+            return True
+        return False
+
+    def _seal_locked(self):
+        """Försegla aktivt segment (kräver self._lock)"""
+        if self._active_file is None:
+            return
+
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+        self._active_file.close()
+        os.replace(self._segment_path(self._active_seq, OPEN_SUFFIX), self._segment_path(self._active_seq))
+
+        self._segments.append((self._active_seq, self._active_bytes))
+        self._active_file = None
+        self._active_seq = None
+        self._active_bytes = 0
+
+        self._evict_locked()
+
+    def _evict_locked(self):
+        """Släpp äldsta segment tills WAL ryms inom max_bytes (kräver self._lock)"""
+        total = sum(size for _, size in self._segments)
+        # Behåll alltid det senaste segmentet
+        while total > self.max_bytes and len(self._segments) > 1:
+            seq, size = self._segments.pop(0)
+            try:
+                os.remove(self._segment_path(seq))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._evicted_segments += 1
+            self._evicted_bytes += size
+            logger.warning(f"WAL full ({self.max_bytes} bytes), evicted oldest segment {seq} ({size} bytes)")
+
+    def close(self, timeout: float = 10.0):
+        """Försegla aktivt segment, försök tömma WAL och stoppa drainern"""
+        self.seal()
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join(timeout=timeout)
+
+    def get_metrics(self) -> Dict:
+        """Hämta backlog-metrics för WAL"""
+        with self._lock:
+            backlog_segments = len(self._segments)
+            backlog_bytes = sum(size for _, size in self._segments) + self._active_bytes
+        return {
+            "backlog_segments": backlog_segments,
+            "backlog_bytes": backlog_bytes,
+            "drained_points": self._drained_points,
+            "drain_errors": self._drain_errors,
+            "rejected_points": self._rejected_points,
+            "evicted_segments": self._evicted_segments,
+            "evicted_bytes": self._evicted_bytes,
+            "last_drain_latency_ms": self._last_drain_latency_ms,
+            "healthy": self._healthy,
+            "last_error": self._last_error,
+        }
+
+    def _run(self):
+        """Drainer-loop: spela upp förseglade segment till InfluxDB"""
+        backoff = 1.0
+        while True:
+            self._wakeup.wait(timeout=backoff if not self._healthy else min(5.0, self.seal_interval))
+            self._wakeup.clear()
+
+            # Aktivt segment utan nya rader förseglas här när det blivit för gammalt
+            with self._lock:
+                self._seal_if_due_locked()
+
+            while True:
+                with self._lock:
+                    pending = [seq for seq, _ in self._segments]
+                if not pending:
+                    break
+
+                seqs, lines = self._read_batch(pending)
+                if self._drain(lines):
+                    drained = set(seqs)
+                    with self._lock:
+                        self._segments = [s for s in self._segments if s[0] not in drained]
+                    for seq in seqs:
+                        try:
+                            os.remove(self._segment_path(seq))
+                        except FileNotFoundError:
+                            pass
+                    backoff = 1.0
+                else:
+                    self._healthy = False
+                    backoff = min(backoff * 2, self.max_backoff)
+                    break
+
+                if self._stopping:
+                    break
+
+            if self._stopping:
+                break
+
+    def _read_segment(self, seq: int) -> List[Tuple[str, str]]:
+        """Läs ett segment som (bucket, line protocol); tomt om segmentet redan är borta"""
+        try:
+            with open(self._segment_path(seq), "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            # Släppt av eviction under tiden
+            return []
+
+        lines = []
+        for raw_line in raw.decode("utf-8", errors="replace").split("\n"):
+            bucket, sep, line = raw_line.partition("\t")
+            if not sep or not line:
+                # Tom eller avhuggen rad (t.ex. krasch mitt i en append)
+                continue
+            lines.append((bucket, line))
+        return lines
+
+    def _read_batch(self, pending: List[int]) -> Tuple[List[int], List[Tuple[str, str]]]:
+        """
+        Läs äldsta segmenten tills minst drain_batch_size rader samlats
+
+        Returns:
+            (sekvensnummer som lästes, rader i ordning)
+        """
+        seqs: List[int] = []
+        lines: List[Tuple[str, str]] = []
+        for seq in pending:
+            seqs.append(seq)
+            lines.extend(self._read_segment(seq))
+            if len(lines) >= self.drain_batch_size:
+                break
+        return seqs, lines
+
+    def _drain(self, lines: List[Tuple[str, str]]) -> bool:
+        """
+        Skriv rader till InfluxDB, en write per bucket och drain_batch_size rader
+
+        Returns:
+            True om alla rader skrevs eller flyttades till REJECTED_FILE
+        """
+        by_bucket: Dict[str, List[str]] = {}
+        for bucket, line in lines:
+            by_bucket.setdefault(bucket, []).append(line)
+
+        start = time.monotonic()
+        try:
+            for bucket, lines in by_bucket.items():
+                for i in range(0, len(lines), self.drain_batch_size):
+                    batch = lines[i:i + self.drain_batch_size]
+                    rejected, error = write_isolating_rejects(self.influxdb.write_api, bucket, batch)
+                    if rejected:
+                        self._quarantine(bucket, rejected, error)
+                    self._drained_points += len(batch) - len(rejected)
+        except Exception as e:
+            self._drain_errors += 1
+            self._last_error = str(e)
+            if self._healthy:
+                logger.error(f"InfluxDB write failed, buffering in WAL ({self.wal_dir}): {e}")
+            return False
+
+        self._last_drain_latency_ms = (time.monotonic() - start) * 1000
+        if not self._healthy:
+            logger.info("InfluxDB reachable again, replaying WAL backlog")
+            self._healthy = True
+        return True
+
+    def _quarantine(self, bucket: str, lines: List[str], error: Optional[Exception]):
+        """Flytta rader som InfluxDB avvisat till REJECTED_FILE"""
+        path = os.path.join(self.wal_dir, REJECTED_FILE)
+        with open(path, "ab") as f:
+            f.write("".join(f"{bucket}\t{line}\n" for line in lines).encode("utf-8"))
+        self._rejected_points += len(lines)
+        self._last_error = str(error)
+        logger.warning(f"InfluxDB rejected {len(lines)} line(s), moved to {path}: {error}")
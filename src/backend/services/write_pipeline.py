@@ -0,0 +1,241 @@
+"""
+Write Pipeline - Samlar InfluxDB-points från alla writers och skriver dem i batchar
+"""
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
+from influxdb_client import Point
+import logging
+import os
+import threading
+import time
+
+from .influxdb import InfluxDBService, write_isolating_rejects
+
+logger = logging.getLogger(__name__)
+
+Record = Union[str, Point]
+
+
+class WritePipeline:
+    """
+    Delad write-pipeline för InfluxDB
+
+    Writers (sensor-data, heartbeat, beacons, events) lägger till points med
+    add(). En bakgrundstråd skriver allt som samlats i en HTTP-request per
+    bucket när batch-storleken nås, när flush-intervallet löper ut eller när
+    flush() anropas (t.ex. i slutet av en insamlingscykel). Med en WAL skrivs
+    batchen till disk först och WAL:ens drainer skriver den till InfluxDB.
+
+    Utan WAL läggs en batch tillbaka i kön bara vid tillfälliga fel
+    (anslutning, 5xx, 429). Rader som InfluxDB avvisar permanent (4xx)
+    släpps och räknas som rejected.
+    """
+
+    def __init__(
+        self,
+        influxdb: Optional[InfluxDBService] = None,
+        bucket: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue_size: Optional[int] = None,
+        wal=None
+    ):
+        """
+        Initiera WritePipeline
+
+        Args:
+            influxdb: InfluxDBService (default: delad instans)
+            bucket: Default-bucket för points utan egen bucket
+            batch_size: Antal points som triggar flush (default: WRITE_BATCH_SIZE eller 5000)
+            flush_interval: Max tid i sekunder mellan flushar (default: WRITE_FLUSH_INTERVAL eller 1.0)
+            max_queue_size: Max antal köade points innan äldsta släpps (default: WRITE_MAX_QUEUE eller 100000)
+            wal: WriteAheadLog som batcharna skrivs till först (default: skriv direkt till InfluxDB)
+        """
+        self.influxdb = influxdb or InfluxDBService()
+        self.bucket = bucket or self.influxdb.get_bucket()
+        self.batch_size = batch_size or int(os.getenv("WRITE_BATCH_SIZE", "5000"))
+        self.flush_interval = flush_interval or float(os.getenv("WRITE_FLUSH_INTERVAL", "1.0"))
+        self.max_queue_size = max_queue_size or int(os.getenv("WRITE_MAX_QUEUE", "100000"))
+        self.wal = wal
+
+        self._queue: Deque[Tuple[str, str]] = deque()  # (bucket, line protocol)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flushed = threading.Condition(self._lock)
+        self._flush_generation = 0
+        self._flushing = False
+        self._stopping = False
+
+        # Metrics
+        self._flushes = 0
+        self._points_written = 0
+        self._write_errors = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._last_flush_latency_ms: Optional[float] = None
+        self._max_flush_latency_ms = 0.0
+        self._last_error: Optional[str] = None
+
+        self._thread = threading.Thread(target=self._run, name="influx-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, records: Union[Record, List[Record]], bucket: Optional[str] = None):
+        """
+        Lägg till points i kön
+
+        Args:
+            records: Point, line protocol-sträng eller lista av dessa
+            bucket: Bucket att skriva till (default: pipelinens bucket)
+        """
+        if not isinstance(records, list):
+            records = [records]
+        bucket = bucket or self.bucket
+
+        lines = []
+        for record in records:
+            line = record.to_line_protocol() if isinstance(record, Point) else record
+            if line:
+                lines.append((bucket, line))
+
+        with self._lock:
+            self._queue.extend(lines)
+            overflow = len(self._queue) - self.max_queue_size
+            if overflow > 0:
+                for _ in range(overflow):
+                    self._queue.popleft()
+                self._dropped += overflow
+                logger.warning(f"Write queue full, dropped {overflow} oldest points")
+            queue_depth = len(self._queue)
+
+        if queue_depth >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self, wait: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        Begär flush av kön
+
+        Args:
+            wait: Vänta tills kön har skrivits
+            timeout: Max väntetid i sekunder om wait=True
+
+        Returns:
+            True om kön skrevs (alltid True om wait=False)
+        """
+        if not wait:
+            self._wakeup.set()
+            return True
+
+        with self._lock:
+            # En pågående flush kan ha tagit kön innan våra points lades till
+            target = self._flush_generation + (2 if self._flushing else 1)
+            self._wakeup.set()
+            return self._flushed.wait_for(
+                lambda: self._flush_generation >= target or self._stopping,
+                timeout=timeout
+            )
+
+    def close(self, timeout: float = 10.0):
+        """Skriv kvarvarande points och stoppa bakgrundstråden"""
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join(timeout=timeout)
+        if self.wal is not None:
+            self.wal.close(timeout=timeout)
+
+    def get_metrics(self) -> Dict:
+        """Hämta metrics för pipelinen"""
+        with self._lock:
+            queue_depth = len(self._queue)
+        metrics = {
+            "queue_depth": queue_depth,
+            "flushes": self._flushes,
+            "points_written": self._points_written,
+            "write_errors": self._write_errors,
+            "dropped": self._dropped,
+            "rejected": self._rejected,
+            "last_flush_latency_ms": self._last_flush_latency_ms,
+            "max_flush_latency_ms": self._max_flush_latency_ms,
+            "last_error": self._last_error,
+        }
+        if self.wal is not None:
+            metrics["wal"] = self.wal.get_metrics()
+        return metrics
+
+    def _run(self):
+        """Bakgrundsloop som flushar på storlek, intervall eller begäran"""
+        while True:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            stopping = self._stopping
+
+            with self._lock:
+                self._flushing = True
+            self._flush_once()
+
+            with self._lock:
+                self._flushing = False
+                self._flush_generation += 1
+                self._flushed.notify_all()
+
+            if stopping:
+                break
+
+    def _flush_once(self):
+        """Skriv allt i kön, en request per bucket"""
+        with self._lock:
+            if not self._queue:
+                return
+            batch = list(self._queue)
+            self._queue.clear()
+
+        if self.wal is not None:
+            start = time.monotonic()
+            try:
+                # WAL:en förseglar själv på storlek/ålder, inte ett segment per flush
+                self.wal.append(batch)
+                latency_ms = (time.monotonic() - start) * 1000
+                self._flushes += 1
+                self._points_written += len(batch)
+                self._last_flush_latency_ms = latency_ms
+                self._max_flush_latency_ms = max(self._max_flush_latency_ms, latency_ms)
+                return
+            except Exception as e:
+                # Disk full eller liknande - skriv direkt till InfluxDB istället
+                self._last_error = str(e)
+                logger.error(f"Failed to append {len(batch)} points to WAL, writing directly: {e}")
+
+        by_bucket: Dict[str, List[str]] = {}
+        for bucket, line in batch:
+            by_bucket.setdefault(bucket, []).append(line)
+
+        for bucket, lines in by_bucket.items():
+            start = time.monotonic()
+            try:
+                rejected, error = write_isolating_rejects(self.influxdb.write_api, bucket, lines)
+                if rejected:
+                    self._rejected += len(rejected)
+                    self._last_error = str(error)
+                    logger.warning(f"InfluxDB rejected {len(rejected)} point(s) for {bucket}, dropping: {error}")
+                latency_ms = (time.monotonic() - start) * 1000
+                self._flushes += 1
+                self._points_written += len(lines) - len(rejected)
+                self._last_flush_latency_ms = latency_ms
+                self._max_flush_latency_ms = max(self._max_flush_latency_ms, latency_ms)
+                logger.debug(f"Flushed {len(lines)} points to {bucket} in {latency_ms:.1f}ms")
+            except Exception as e:
+                self._write_errors += 1
+                self._last_error = str(e)
+                logger.error(f"Failed to flush {len(lines)} points to InfluxDB: {e}")
+                self._requeue(bucket, lines)
+
+    def _requeue(self, bucket: str, lines: List[str]):
+        """Lägg tillbaka misslyckade points först i kön (begränsat av max_queue_size)"""
+        with self._lock:
+            room = self.max_queue_size - len(self._queue)
+            if room <= 0:
+                self._dropped += len(lines)
+                return
+            if len(lines) > room:
+                self._dropped += len(lines) - room
+                lines = lines[-room:]
+            self._queue.extendleft((bucket, line) for line in reversed(lines))
@@ -17,6 +17,7 @@
 import React, { useEffect, useState, useCallback } from 'react';
 import { Card } from '../ui/Card';
 import { apiService } from '../../services/api';
+import { useTopic } from '../../hooks/useTopic';
 
 interface ActivityLevel {
   level: 'none' | 'low' | 'medium' | 'high';
@@ -110,6 +111,17 @@ export const ActivityIndicator: React.FC<ActivityIndicatorProps> = ({
   const [activityHistory, setActivityHistory] = useState<ActivityLevel[]>([]);
   const [loading, setLoading] = useState(true);
 
+  const applySoundValue = useCallback((soundValue: number) => {
+    const newActivity = getActivityLevel(soundValue);
+    setActivity(newActivity);
+
+    // Uppdatera historik (behåll senaste 12 värden = 2 minuter vid 10s intervall)
+    setActivityHistory((prev) => {
+      const updated = [...prev, newActivity].slice(-12);
+      return updated;
+    });
+  }, []);
+
   const fetchActivity = useCallback(async () => {
     try {
       const response = await apiService.getLatestSensors();
@@ -121,28 +133,31 @@ export const ActivityIndicator: React.FC<ActivityIndicatorProps> = ({
       );
 
       if (soundSensor) {
-        const soundValue = Object.values(soundSensor.values)[0] as number;
-        const newActivity = getActivityLevel(soundValue);
-        setActivity(newActivity);
-
-        // Uppdatera historik (behåll senaste 12 värden = 2 minuter vid 10s intervall)
-        setActivityHistory((prev) => {
-          const updated = [...prev, newActivity].slice(-12);
-          return updated;
-        });
+        applySoundValue(Object.values(soundSensor.values)[0] as number);
       }
     } catch (error) {
       console.error('Failed to fetch activity data:', error);
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [applySoundValue]);
+
+  // Live-uppdateringar via WebSocket (topic 'sensors'), polling bara när de inte är tillgängliga
+  const { data: liveSensors, live } = useTopic<{ sensors: Record<string, Record<string, number>> }>('sensors');
+
+  useEffect(() => {
+    const sound = liveSensors?.sensors['audsensor/sum'];
+    if (!sound) return;
+    applySoundValue(Object.values(sound)[0]);
+    setLoading(false);
+  }, [liveSensors, applySoundValue]);
 
   useEffect(() => {
+    if (live) return;
     fetchActivity();
     const interval = setInterval(fetchActivity, refreshInterval);
     return () => clearInterval(interval);
-  }, [fetchActivity, refreshInterval]);
+  }, [fetchActivity, refreshInterval, live]);
 
   if (loading || !activity) {
     return null;
@@ -5,6 +5,7 @@ import React, { useState, useEffect, useMemo } from 'react';
 import { BeaconCard } from './BeaconCard';
 import { BeaconHistoryChart } from './BeaconHistoryChart';
 import { apiService } from '../../services/api';
+import { useTopic } from '../../hooks/useTopic';
 
 interface Beacon {
   beacon_id: string;
@@ -24,9 +25,18 @@ export const BeaconList: React.FC = () => {
   const [filter, setFilter] = useState<'all' | 'present' | 'absent'>('all');
   const [sortBy, setSortBy] = useState<'name' | 'rssi' | 'battery'>('name');
   const [selectedBeacon, setSelectedBeacon] = useState<string | null>(null);
+  const { data: liveBeacons, live } = useTopic<{ beacons: Record<string, Beacon> }>('beacons');
 
-  // Ladda beacons
+  // Live-uppdateringar via WebSocket
   useEffect(() => {
+    if (!liveBeacons) return;
+    setBeacons(Object.values(liveBeacons.beacons));
+    setLoading(false);
+  }, [liveBeacons]);
+
+  // Ladda beacons (polling bara när WebSocket inte levererar)
+  useEffect(() => {
+    if (live) return;
     const loadBeacons = async () => {
       try {
         setLoading(true);
@@ -43,7 +53,7 @@ export const BeaconList: React.FC = () => {
     // Uppdatera varje 10 sekunder
     const interval = setInterval(loadBeacons, 10000);
     return () => clearInterval(interval);
-  }, []);
+  }, [live]);
 
   const filteredAndSortedBeacons = useMemo(() => {
     // Normalisera beacons (hantera både 'beacon_id' och 'id' från backend)
@@ -6,6 +6,7 @@ import React, { useEffect, useState, useCallback } from 'react';
 import { Card } from '../ui/Card';
 import { apiService, OccupancyStatus } from '../../services/api';
 import { useTheme } from '../../theme/ThemeProvider';
+import { useTopic } from '../../hooks/useTopic';
 
 interface OccupancyCardProps {
   refreshInterval?: number; // ms, default 30000
@@ -35,11 +36,22 @@ export const OccupancyCard: React.FC<OccupancyCardProps> = ({
     }
   }, []);
 
+  // Live-uppdateringar via WebSocket, polling bara när de inte är tillgängliga
+  const { data: liveStatus, live } = useTopic<OccupancyStatus>('occupancy');
+
+  useEffect(() => {
+    if (!liveStatus) return;
+    setStatus(liveStatus);
+    setError(null);
+    setLoading(false);
+  }, [liveStatus]);
+
   useEffect(() => {
+    if (live) return;
     loadStatus();
     const interval = setInterval(loadStatus, refreshInterval);
     return () => clearInterval(interval);
-  }, [loadStatus, refreshInterval]);
+  }, [loadStatus, refreshInterval, live]);
 
   const getStateColor = (state: string) => {
     // Anpassade färger för mörkt tema med CSS-variabler som fallback
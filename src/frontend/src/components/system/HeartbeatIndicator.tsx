@@ -3,6 +3,7 @@
  * Indikerar när vi senast hade kontakt med Halo-enheten
  */
 import React, { useEffect, useState, useCallback } from 'react';
+import { useTopic } from '../../hooks/useTopic';
 
 interface HeartbeatStatus {
   status: 'healthy' | 'degraded' | 'offline' | 'unknown';
@@ -125,11 +126,21 @@ export const HeartbeatIndicator: React.FC<HeartbeatIndicatorProps> = ({
     }
   }, []);
 
+  // Live-uppdateringar via WebSocket, polling bara när de inte är tillgängliga
+  const { data: liveHeartbeat, live } = useTopic<HeartbeatStatus>('heartbeat');
+
+  useEffect(() => {
+    if (!liveHeartbeat) return;
+    setHeartbeat(liveHeartbeat);
+    setLoading(false);
+  }, [liveHeartbeat]);
+
   useEffect(() => {
+    if (live) return;
     fetchHeartbeat();
     const interval = setInterval(fetchHeartbeat, refreshInterval);
     return () => clearInterval(interval);
-  }, [fetchHeartbeat, refreshInterval]);
+  }, [fetchHeartbeat, refreshInterval, live]);
 
   // Hämta systemstatus när popup öppnas
   useEffect(() => {
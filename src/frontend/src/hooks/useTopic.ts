@@ -0,0 +1,35 @@
+/**
+ * useTopic - Hooks för live-topics över den delade WebSocket-anslutningen
+ */
+import { useEffect, useRef, useState } from 'react';
+import { liveTopics } from '../services/liveTopics';
+
+/**
+ * Senaste state för en topic (t.ex. 'sensors', 'heartbeat').
+ * live är true när anslutningen är uppe och state har tagits emot, så att
+ * komponenter bara behöver falla tillbaka på REST-polling annars.
+ */
+export const useTopic = <T,>(topic: string | null): { data: T | null; live: boolean } => {
+  const [data, setData] = useState<T | null>(null);
+  const [connected, setConnected] = useState(liveTopics.connected);
+
+  useEffect(() => liveTopics.onConnectionChange(setConnected), []);
+
+  useEffect(() => {
+    if (!topic) return;
+    setData(null);
+    return liveTopics.subscribe(topic, setData);
+  }, [topic]);
+
+  return { data, live: connected && data !== null };
+};
+
+/**
+ * Anropa handler för varje meddelande på en ström-topic (t.ex. 'events')
+ */
+export const useTopicListener = (topic: string, handler: (message: any) => void) => {
+  const handlerRef = useRef(handler);
+  handlerRef.current = handler;
+
+  useEffect(() => liveTopics.subscribe(topic, (message) => handlerRef.current(message)), [topic]);
+};
@@ -1,5 +1,9 @@
 /**
  * useWebSocket - Hook för WebSocket-anslutning
+ *
+ * Håller reda på position (epoch/seq) i event-strömmen och skickar resume
+ * vid återanslutning, så att servern bara skickar events som missades
+ * (ett "replay"-meddelande).
  */
 import { useEffect, useRef, useState } from 'react';
 
@@ -18,10 +22,50 @@ export const useWebSocket = (
   const [readyState, setReadyState] = useState<number>(WebSocket.CONNECTING);
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+  // Position i event-strömmen för återupptagning efter återanslutning
+  const streamRef = useRef<{ epoch: string | null; seq: number; since: string | null }>({
+    epoch: null,
+    seq: 0,
+    since: null,
+  });
 
   const { onOpen, onClose, onError, reconnectInterval = 5000 } = options;
 
   useEffect(() => {
+    const trackStreamPosition = (ws: WebSocket, raw: string) => {
+      let data: any;
+      try {
+        data = JSON.parse(raw);
+      } catch {
+        return;
+      }
+      const stream = streamRef.current;
+
+      if (data.type === 'connected' && data.epoch) {
+        if (stream.epoch !== null) {
+          ws.send(JSON.stringify({ type: 'resume', epoch: stream.epoch, last_seq: stream.seq, since: stream.since }));
+        } else {
+          stream.epoch = data.epoch;
+          stream.seq = data.seq ?? 0;
+          stream.since = data.timestamp ?? null;
+        }
+        return;
+      }
+
+      if (data.type === 'replay') {
+        stream.epoch = data.epoch;
+        stream.seq = Math.max(stream.seq, data.seq);
+        for (const message of data.messages || []) {
+          if (message.event?.timestamp) stream.since = message.event.timestamp;
+        }
+        if (data.mode !== 'buffer') stream.seq = data.seq;
+        return;
+      }
+
+      if (typeof data.seq === 'number') stream.seq = Math.max(stream.seq, data.seq);
+      if (data.type === 'new_event' && data.event?.timestamp) stream.since = data.event.timestamp;
+    };
+
     const connect = () => {
       try {
         const ws = new WebSocket(url);
@@ -33,6 +77,7 @@ export const useWebSocket = (
         };
 
         ws.onmessage = (event) => {
+          trackStreamPosition(ws, event.data);
           setLastMessage(event);
         };
 
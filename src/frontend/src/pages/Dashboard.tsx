@@ -9,7 +9,7 @@ import { TrendAlerts } from '../components/alerts/TrendAlerts';
 import { DegradationAlerts } from '../components/alerts/DegradationAlerts';
 import { OccupancyCard } from '../components/occupancy/OccupancyCard';
 import { ActivityIndicator } from '../components/activity/ActivityIndicator';
-import { useWebSocket } from '../hooks/useWebSocket';
+import { useTopic, useTopicListener } from '../hooks/useTopic';
 import { useToast } from '../hooks/useToast';
 import { ToastContainer } from '../components/ui/Toast';
 
@@ -33,6 +33,13 @@ interface LatestSensorsResponse {
   sensors: SensorData[];
 }
 
+// State för topic 'sensors' (WebSocket), keyat per sensor
+interface LiveSensorsState {
+  device_id: string;
+  timestamp: string;
+  sensors: Record<string, Record<string, number>>;
+}
+
 // Prioriterad whitelist - de BÄSTA sensorerna för varje typ
 // Om flera sensorer finns för samma mätvärde, väljs den första i listan
 const SENSOR_PRIORITY_CONFIG: { [key: string]: { displayName: string; unit: string; category: string; normalRange?: { min: number; max: number } } } = {
@@ -95,6 +102,24 @@ const filterDashboardSensors = (sensors: SensorData[]): SensorData[] => {
   });
 };
 
+// Beräkna trender genom att jämföra med föregående värden (2% ändring)
+const addTrends = (sensors: SensorData[], previous: SensorData[]): SensorData[] =>
+  sensors.map(sensor => {
+    const currentValue = Object.values(sensor.values)[0];
+    const prevSensor = previous.find(p => p.sensor_id === sensor.sensor_id);
+    const prevValue = prevSensor ? Object.values(prevSensor.values)[0] : undefined;
+
+    let trend: 'up' | 'down' | 'stable' = 'stable';
+    if (prevValue !== undefined && currentValue !== undefined) {
+      const diff = currentValue - prevValue;
+      const threshold = Math.abs(prevValue) * 0.02;
+      if (diff > threshold) trend = 'up';
+      else if (diff < -threshold) trend = 'down';
+    }
+
+    return { ...sensor, previousValue: prevValue, trend };
+  });
+
 export const Dashboard: React.FC = () => {
   const [sensors, setSensors] = useState<SensorData[]>([]);
   const [previousSensors, setPreviousSensors] = useState<SensorData[]>([]);
@@ -105,27 +130,8 @@ export const Dashboard: React.FC = () => {
   const [lastRefresh, setLastRefresh] = useState<Date | null>(null);
   const { toasts, showToast, removeToast } = useToast();
 
-  // WebSocket connection för real-time events
-  // Dynamisk URL-konstruktion baserat på window.location
-  const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-  const wsHost = window.location.hostname;
-
-  // Om vi är i produktion (inte localhost), använd relativa URL
-  // så att nginx kan proxya WebSocket till backend
-  // Annars använd samma port som frontend (för utveckling)
-  let wsUrl: string;
-  if (wsHost !== 'localhost' && wsHost !== '127.0.0.1') {
-    // Produktion med nginx proxy: använd relativa URL
-    // Nginx proxar /api/events/stream till backend:8000
-    wsUrl = `${wsProtocol}//${wsHost}${window.location.port ? `:${window.location.port}` : ''}/api/events/stream`;
-  } else {
-    // Utveckling: använd samma host och port
-    const defaultPort = window.location.protocol === 'https:' ? '443' : '80';
-    const wsPort = window.location.port || defaultPort;
-    const portSuffix = wsPort && wsPort !== '80' && wsPort !== '443' ? `:${wsPort}` : '';
-    wsUrl = `${wsProtocol}//${wsHost}${portSuffix}/api/events/stream`;
-  }
-  const { lastMessage } = useWebSocket(wsUrl);
+  // Live sensorvärden via WebSocket (REST-polling används bara när anslutningen är nere)
+  const { data: liveSensors, live: sensorsLive } = useTopic<LiveSensorsState>('sensors');
 
   // Ladda sensor metadata
   useEffect(() => {
@@ -149,29 +155,26 @@ export const Dashboard: React.FC = () => {
       const now = new Date();
       const oneHourAgo = new Date(now.getTime() - 60 * 60 * 1000);
 
-      // Hämta historik för varje sensor
-      await Promise.all(
-        sensors.map(async (sensor) => {
-          try {
-            const sensorHistory = await apiService.getSensorHistory(
-              sensor.sensor_id,
-              oneHourAgo.toISOString(),
-              now.toISOString(),
-              50 // Max 50 datapunkter för sparkline
-            );
-
-            if (sensorHistory && sensorHistory.length > 0) {
-              history[sensor.sensor_id] = sensorHistory.map((item: any) => ({
-                timestamp: new Date(item.timestamp || item._time).getTime(),
-                value: Number(item.value ?? item._value ?? Object.values(item.values || {})[0] ?? 0),
-              })).filter((p: SparklineDataPoint) => !isNaN(p.value));
-            }
-          } catch (error) {
-            // Ignorera fel för enskilda sensorer
-            console.debug(`Failed to load history for ${sensor.sensor_id}`);
+      // Hämta historik för alla sensorer i en request (max 50 datapunkter per sparkline)
+      try {
+        const batch = await apiService.getSensorHistoryBatch(
+          sensors.map((sensor) => sensor.sensor_id),
+          oneHourAgo.toISOString(),
+          now.toISOString(),
+          50
+        );
+
+        Object.entries(batch.series).forEach(([sensorId, points]) => {
+          if (points.length > 0) {
+            history[sensorId] = points
+              .map(([timestamp, value]) => ({ timestamp, value: Number(value) }))
+              .filter((p: SparklineDataPoint) => !isNaN(p.value));
           }
-        })
-      );
+        });
+      } catch (error) {
+        console.debug('Failed to load sparkline history');
+        return;
+      }
 
       setSparklineHistory(history);
     };
@@ -192,21 +195,7 @@ export const Dashboard: React.FC = () => {
       const rawSensors = response.sensors || [];
       const filteredSensors = filterDashboardSensors(rawSensors);
 
-      const sensorsWithTrends = filteredSensors.map(sensor => {
-        const currentValue = Object.values(sensor.values)[0];
-        const prevSensor = previousSensors.find(p => p.sensor_id === sensor.sensor_id);
-        const prevValue = prevSensor ? Object.values(prevSensor.values)[0] : undefined;
-
-        let trend: 'up' | 'down' | 'stable' = 'stable';
-        if (prevValue !== undefined && currentValue !== undefined) {
-          const diff = currentValue - prevValue;
-          const threshold = Math.abs(prevValue) * 0.02;
-          if (diff > threshold) trend = 'up';
-          else if (diff < -threshold) trend = 'down';
-        }
-
-        return { ...sensor, previousValue: prevValue, trend };
-      });
+      const sensorsWithTrends = addTrends(filteredSensors, previousSensors);
 
       setPreviousSensors(filteredSensors);
       setSensors(sensorsWithTrends);
@@ -232,25 +221,7 @@ export const Dashboard: React.FC = () => {
         const filteredSensors = filterDashboardSensors(rawSensors);
 
         // Beräkna trender genom att jämföra med föregående värden
-        const sensorsWithTrends = filteredSensors.map(sensor => {
-          const currentValue = Object.values(sensor.values)[0];
-          const prevSensor = previousSensors.find(p => p.sensor_id === sensor.sensor_id);
-          const prevValue = prevSensor ? Object.values(prevSensor.values)[0] : undefined;
-
-          let trend: 'up' | 'down' | 'stable' = 'stable';
-          if (prevValue !== undefined && currentValue !== undefined) {
-            const diff = currentValue - prevValue;
-            const threshold = Math.abs(prevValue) * 0.02; // 2% ändring
-            if (diff > threshold) trend = 'up';
-            else if (diff < -threshold) trend = 'down';
-          }
-
-          return {
-            ...sensor,
-            previousValue: prevValue,
-            trend,
-          };
-        });
+        const sensorsWithTrends = addTrends(filteredSensors, previousSensors);
 
         setPreviousSensors(filteredSensors);
         setSensors(sensorsWithTrends);
@@ -262,35 +233,44 @@ export const Dashboard: React.FC = () => {
       }
     };
 
+    // Polla bara när live-uppdateringar via WebSocket inte är tillgängliga
+    if (sensorsLive) return;
     loadSensors();
     // Uppdatera varje 10 sekunder
     const interval = setInterval(loadSensors, 10000);
     return () => clearInterval(interval);
   // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [showToast]);
+  }, [showToast, sensorsLive]);
 
-  // Hantera WebSocket events
+  // Live sensorvärden från WebSocket (topic 'sensors')
   useEffect(() => {
-    if (lastMessage) {
-      try {
-        const data = JSON.parse(lastMessage.data);
-        if (data.type === 'new_event') {
-          const event = data.event;
-          // Visa toast för kritiska events
-          if (event.severity === 'CRITICAL' || event.severity === 'WARNING') {
-            const severity: 'error' | 'warning' = event.severity === 'CRITICAL' ? 'error' : 'warning';
-            showToast(event.summary, severity, 8000);
-          }
-          // Speciell hantering för panikknapp-events
-          if (event.type === 'BEACON_PANIC_BUTTON') {
-            showToast(`PANIKKNAPP: ${event.summary}`, 'error', 15000);
-          }
-        }
-      } catch (error) {
-        console.error('Failed to parse WebSocket message:', error);
+    if (!liveSensors) return;
+    const rawSensors: SensorData[] = Object.entries(liveSensors.sensors).map(([sensor_id, values]) => ({
+      sensor_id,
+      timestamp: liveSensors.timestamp,
+      values,
+    }));
+    const filteredSensors = filterDashboardSensors(rawSensors);
+    setSensors(currentSensors => addTrends(filteredSensors, currentSensors));
+    setPreviousSensors(filteredSensors);
+    setLoading(false);
+  }, [liveSensors]);
+
+  // Hantera WebSocket events
+  useTopicListener('events', (data) => {
+    if (data.type === 'new_event') {
+      const event = data.event;
+      // Visa toast för kritiska events
+      if (event.severity === 'CRITICAL' || event.severity === 'WARNING') {
+        const severity: 'error' | 'warning' = event.severity === 'CRITICAL' ? 'error' : 'warning';
+        showToast(event.summary, severity, 8000);
+      }
+      // Speciell hantering för panikknapp-events
+      if (event.type === 'BEACON_PANIC_BUTTON') {
+        showToast(`PANIKKNAPP: ${event.summary}`, 'error', 15000);
       }
     }
-  }, [lastMessage, showToast]);
+  });
 
   // Kombinera sensor data med inbyggd konfiguration (prioriteras) eller extern metadata
   const sensorsWithMetadata = sensors.map((sensor) => {
@@ -6,6 +6,7 @@ import { Card } from '../components/ui/Card';
 import { Button } from '../components/ui/Button';
 import { apiService } from '../services/api';
 import { useWebSocket } from '../hooks/useWebSocket';
+import { getEventStreamUrl } from '../services/liveTopics';
 import { useToast } from '../hooks/useToast';
 import { ToastContainer } from '../components/ui/Toast';
 
@@ -37,27 +38,10 @@ export const Events: React.FC = () => {
   });
   const { toasts, showToast, removeToast } = useToast();
 
-  // WebSocket connection för real-time events
-  // Dynamisk URL-konstruktion baserat på window.location
-  const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-  const wsHost = window.location.hostname;
-
-  // Om vi är i produktion (inte localhost), använd relativa URL
-  // så att nginx kan proxya WebSocket till backend
-  // Annars använd samma port som frontend (för utveckling)
-  let wsUrl: string;
-  if (wsHost !== 'localhost' && wsHost !== '127.0.0.1') {
-    // Produktion med nginx proxy: använd relativa URL
-    // Nginx proxar /api/events/stream till backend:8000
-    wsUrl = `${wsProtocol}//${wsHost}${window.location.port ? `:${window.location.port}` : ''}/api/events/stream`;
-  } else {
-    // Utveckling: använd samma host och port
-    const defaultPort = window.location.protocol === 'https:' ? '443' : '80';
-    const wsPort = window.location.port || defaultPort;
-    const portSuffix = wsPort && wsPort !== '80' && wsPort !== '443' ? `:${wsPort}` : '';
-    wsUrl = `${wsProtocol}//${wsHost}${portSuffix}/api/events/stream`;
-  }
-  const { lastMessage } = useWebSocket(wsUrl);
+  // WebSocket connection för real-time events. Vid återanslutning skickar
+  // servern bara missade events (replay); listan hämtas om endast när
+  // luckan inte gick att täcka
+  const { lastMessage } = useWebSocket(getEventStreamUrl());
 
   // Ladda events
   const loadEvents = async () => {
@@ -80,9 +64,6 @@ export const Events: React.FC = () => {
 
   useEffect(() => {
     loadEvents();
-    // Uppdatera varje 30 sekunder
-    const interval = setInterval(loadEvents, 30000);
-    return () => clearInterval(interval);
   }, [filters]);
 
   // Hantera WebSocket events
@@ -90,10 +71,22 @@ export const Events: React.FC = () => {
     if (lastMessage) {
       try {
         const data = JSON.parse(lastMessage.data);
-        if (data.type === 'new_event') {
+        if (data.type === 'replay') {
+          if (data.mode === 'reset' || data.truncated) {
+            loadEvents();
+          } else {
+            const missed = data.messages
+              .filter((message: any) => message.type === 'new_event')
+              .map((message: any) => message.event);
+            setEvents((prev) => {
+              const known = new Set(prev.map((e) => e.id));
+              return [...missed.filter((event: any) => !known.has(event.id)).reverse(), ...prev];
+            });
+          }
+        } else if (data.type === 'new_event') {
           const event = data.event;
-          // Lägg till nytt event i listan
-          setEvents((prev) => [event, ...prev]);
+          // Lägg till nytt event i listan (om det inte redan hämtats)
+          setEvents((prev) => (prev.some((e) => e.id === event.id) ? prev : [event, ...prev]));
           // Visa toast för kritiska events
           if (event.severity === 'CRITICAL' || event.severity === 'WARNING') {
             const severity: 'error' | 'warning' = event.severity === 'CRITICAL' ? 'error' : 'warning';
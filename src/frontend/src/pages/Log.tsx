@@ -146,46 +146,17 @@ export const Log: React.FC = () => {
     setExpandedRows(newExpanded);
   };
 
-  // Export till JSON
-  const exportToJSON = () => {
-    const dataStr = JSON.stringify(paginatedData, null, 2);
-    const dataBlob = new Blob([dataStr], { type: 'application/json' });
-    const url = URL.createObjectURL(dataBlob);
+  // Export av hela intervallet strömmas från servern (ingen radgräns)
+  const downloadExport = (format: 'ndjson' | 'csv') => {
     const link = document.createElement('a');
-    link.href = url;
-    link.download = `log-data-${new Date().toISOString().split('T')[0]}.json`;
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
-    URL.revokeObjectURL(url);
-  };
-
-  // Export till CSV
-  const exportToCSV = () => {
-    const headers = ['Timestamp', 'Measurement', 'ID', 'Value', 'Tags', 'Fields'];
-    const rows = paginatedData.map(entry => [
-      entry.timestamp,
-      entry.measurement,
-      entry.id,
-      entry.value?.toString() || '',
-      JSON.stringify(entry.tags),
-      JSON.stringify(entry.fields)
-    ]);
-
-    const csvContent = [
-      headers.join(','),
-      ...rows.map(row => row.map(cell => `"${cell?.toString().replace(/"/g, '""')}"`).join(','))
-    ].join('\n');
-
-    const dataBlob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-    const url = URL.createObjectURL(dataBlob);
-    const link = document.createElement('a');
-    link.href = url;
-    link.download = `log-data-${new Date().toISOString().split('T')[0]}.csv`;
+    link.href = apiService.getLogExportUrl(
+      selectedMeasurement === 'all' ? undefined : selectedMeasurement,
+      hours,
+      format
+    );
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
-    URL.revokeObjectURL(url);
   };
 
   // Formatera värde
@@ -331,15 +302,15 @@ export const Log: React.FC = () => {
             <Button
               variant="outline"
               size="sm"
-              onClick={exportToJSON}
+              onClick={() => downloadExport('ndjson')}
               style={{ flex: isMobile ? '1' : 'none', minWidth: isMobile ? '0' : 'auto' }}
             >
-              Export JSON
+              Export NDJSON
             </Button>
             <Button
               variant="outline"
               size="sm"
-              onClick={exportToCSV}
+              onClick={() => downloadExport('csv')}
               style={{ flex: isMobile ? '1' : 'none', minWidth: isMobile ? '0' : 'auto' }}
             >
               Export CSV
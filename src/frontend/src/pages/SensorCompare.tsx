@@ -356,7 +356,7 @@ export const SensorCompare: React.FC = () => {
       // Hämta data för alla valda sensorer parallellt
       const dataPromises = selectedSensors.map(async (sensorId) => {
         try {
-          const history = await apiService.getSensorHistory(sensorId, fromTime, toTime, 1000);
+          const history = await apiService.getSensorHistory(sensorId, fromTime, toTime, 1000, 500);
           return { sensorId, data: history || [] };
         } catch (error) {
           console.error(`Failed to load history for ${sensorId}:`, error);
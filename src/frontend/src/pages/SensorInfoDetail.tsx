@@ -110,7 +110,7 @@ export const SensorInfoDetail: React.FC = () => {
         const fromTime = new Date(Date.now() - timeRange * 60 * 60 * 1000).toISOString();
 
         const [history, eventsData] = await Promise.all([
-          apiService.getSensorHistory(historyId, fromTime, toTime, 1000),
+          apiService.getSensorHistory(historyId, fromTime, toTime, 1000, 800),
           apiService.getEvents({ from: fromTime, to: toTime }),
         ]);
 
@@ -273,7 +273,7 @@ export const SensorInfoDetail: React.FC = () => {
                 const fromTime = new Date(Date.now() - hours * 60 * 60 * 1000).toISOString();
 
                 const [history, eventsData] = await Promise.all([
-                  apiService.getSensorHistory(historyId, fromTime, toTime, 1000),
+                  apiService.getSensorHistory(historyId, fromTime, toTime, 1000, 800),
                   apiService.getEvents({ from: fromTime, to: toTime }),
                 ]);
 
@@ -126,6 +126,16 @@ class ApiService {
     return this.fetchJson(`/api/log?${params.toString()}`);
   }
 
+  // Strömmande export (NDJSON/CSV) av hela intervallet, utan radgräns
+  getLogExportUrl(measurement?: string, hours?: number, format: 'ndjson' | 'csv' = 'csv'): string {
+    const params = new URLSearchParams();
+    if (measurement) params.append('measurement', measurement);
+    if (hours) params.append('hours', hours.toString());
+    params.append('format', format);
+
+    return `${this.baseUrl}/api/export/log?${params.toString()}`;
+  }
+
   async getCurrentPresence(): Promise<any[]> {
     return this.fetchJson('/api/beacons/presence/current');
   }
@@ -160,21 +170,40 @@ class ApiService {
     return this.fetchJson('/api/sensors/latest');
   }
 
+  // maxPoints: nedsampla hela intervallet på servern (aggregateWindow + LTTB)
   async getSensorHistory(
     sensorId: string,
     fromTime?: string,
     toTime?: string,
-    limit: number = 1000
+    limit: number = 1000,
+    maxPoints?: number
   ): Promise<any[]> {
     const params = new URLSearchParams();
     params.append('sensor_id', sensorId);
     if (fromTime) params.append('from_time', fromTime);
     if (toTime) params.append('to_time', toTime);
     params.append('limit', limit.toString());
+    if (maxPoints) params.append('max_points', maxPoints.toString());
 
     return this.fetchJson(`/api/sensors/history?${params.toString()}`);
   }
 
+  // Nedsamplad historik för flera sensorer i en request (sparklines)
+  async getSensorHistoryBatch(
+    sensorIds: string[],
+    fromTime?: string,
+    toTime?: string,
+    points: number = 50
+  ): Promise<{ window_s: number; series: Record<string, [number, number][]> }> {
+    const params = new URLSearchParams();
+    sensorIds.forEach((sensorId) => params.append('sensor_id', sensorId));
+    if (fromTime) params.append('from_time', fromTime);
+    if (toTime) params.append('to_time', toTime);
+    params.append('points', points.toString());
+
+    return this.fetchJson(`/api/sensors/history/batch?${params.toString()}`);
+  }
+
   // Occupancy endpoints
   async getOccupancyStatus(deviceId?: string): Promise<OccupancyStatus> {
     const params = new URLSearchParams();
@@ -0,0 +1,211 @@
+/**
+ * liveTopics - Delad WebSocket för topic-prenumerationer
+ *
+ * En anslutning per flik oavsett hur många komponenter som prenumererar.
+ * Servern skickar först en snapshot per topic och därefter fältvisa
+ * deltan, som appliceras här så att komponenterna alltid får hela state.
+ *
+ * Topics: sensors[:device_id], beacons, heartbeat, occupancy, events
+ */
+
+type Listener = (data: any) => void;
+type ConnectionListener = (connected: boolean) => void;
+
+const RECONNECT_INTERVAL = 5000;
+
+export const getEventStreamUrl = (): string => {
+  const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+  const wsHost = window.location.hostname;
+
+  if (wsHost !== 'localhost' && wsHost !== '127.0.0.1') {
+    // Produktion med nginx proxy: nginx proxar /api/events/stream till backend:8000
+    return `${wsProtocol}//${wsHost}${window.location.port ? `:${window.location.port}` : ''}/api/events/stream`;
+  }
+  // Utveckling: använd samma host och port
+  const defaultPort = window.location.protocol === 'https:' ? '443' : '80';
+  const wsPort = window.location.port || defaultPort;
+  const portSuffix = wsPort && wsPort !== '80' && wsPort !== '443' ? `:${wsPort}` : '';
+  return `${wsProtocol}//${wsHost}${portSuffix}/api/events/stream`;
+};
+
+const isObject = (value: unknown): value is Record<string, any> =>
+  typeof value === 'object' && value !== null && !Array.isArray(value);
+
+// Samma logik som apply_delta i backend (api/topics.py)
+export const applyDelta = (
+  state: Record<string, any>,
+  changed: Record<string, any>,
+  removed: string[][]
+): Record<string, any> => {
+  const result: Record<string, any> = { ...state };
+  for (const path of removed) {
+    let target = result;
+    for (const key of path.slice(0, -1)) {
+      if (!isObject(target[key])) break;
+      target[key] = { ...target[key] };
+      target = target[key];
+    }
+    delete target[path[path.length - 1]];
+  }
+  for (const [key, value] of Object.entries(changed)) {
+    result[key] = isObject(value) && isObject(result[key]) ? applyDelta(result[key], value, []) : value;
+  }
+  return result;
+};
+
+class LiveTopics {
+  private ws: WebSocket | null = null;
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+  private listeners = new Map<string, Set<Listener>>();
+  private states = new Map<string, any>();
+  private versions = new Map<string, number>();
+  private connectionListeners = new Set<ConnectionListener>();
+  connected = false;
+
+  subscribe(topic: string, listener: Listener): () => void {
+    let topicListeners = this.listeners.get(topic);
+    if (!topicListeners) {
+      topicListeners = new Set();
+      this.listeners.set(topic, topicListeners);
+      this.send({ type: 'subscribe', topics: [topic] });
+    }
+    topicListeners.add(listener);
+
+    const state = this.states.get(topic);
+    if (state !== undefined) {
+      listener(state);
+    }
+    this.ensureConnected();
+
+    return () => {
+      const current = this.listeners.get(topic);
+      if (!current) return;
+      current.delete(listener);
+      if (current.size === 0) {
+        this.listeners.delete(topic);
+        this.states.delete(topic);
+        this.versions.delete(topic);
+        this.send({ type: 'unsubscribe', topics: [topic] });
+      }
+      if (this.listeners.size === 0) {
+        this.close();
+      }
+    };
+  }
+
+  onConnectionChange(listener: ConnectionListener): () => void {
+    this.connectionListeners.add(listener);
+    return () => {
+      this.connectionListeners.delete(listener);
+    };
+  }
+
+  private send(message: object) {
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify(message));
+    }
+  }
+
+  private setConnected(connected: boolean) {
+    this.connected = connected;
+    this.connectionListeners.forEach((listener) => listener(connected));
+  }
+
+  private ensureConnected() {
+    if (!this.ws && !this.reconnectTimer) {
+      this.connect();
+    }
+  }
+
+  private connect() {
+    try {
+      const ws = new WebSocket(getEventStreamUrl());
+      this.ws = ws;
+
+      ws.onopen = () => {
+        this.setConnected(true);
+        // Servern skickar events till alla klienter som inte avprenumererat
+        if (!this.listeners.has('events')) {
+          this.send({ type: 'unsubscribe', topics: ['events'] });
+        }
+        const topics = Array.from(this.listeners.keys());
+        if (topics.length > 0) {
+          this.send({ type: 'subscribe', topics });
+        }
+      };
+
+      ws.onmessage = (event) => this.handleMessage(event.data);
+
+      ws.onclose = () => {
+        if (this.ws !== ws) return;
+        this.ws = null;
+        this.versions.clear();
+        this.setConnected(false);
+        if (this.listeners.size > 0) {
+          this.reconnectTimer = setTimeout(() => {
+            this.reconnectTimer = null;
+            this.connect();
+          }, RECONNECT_INTERVAL);
+        }
+      };
+    } catch (error) {
+      console.error('WebSocket connection error:', error);
+    }
+  }
+
+  private close() {
+    if (this.reconnectTimer) {
+      clearTimeout(this.reconnectTimer);
+      this.reconnectTimer = null;
+    }
+    if (this.ws) {
+      const ws = this.ws;
+      this.ws = null;
+      ws.close();
+      this.setConnected(false);
+    }
+  }
+
+  private handleMessage(raw: string) {
+    let message: any;
+    try {
+      message = JSON.parse(raw);
+    } catch {
+      return;
+    }
+
+    if (message.type === 'new_event') {
+      this.notify('events', message);
+      return;
+    }
+
+    const topic: string = message.topic;
+    if (!topic || !this.listeners.has(topic)) return;
+
+    let state: any;
+    if (message.type === 'snapshot') {
+      state = message.data;
+    } else if (message.type === 'delta') {
+      const current = this.states.get(topic);
+      if (current === undefined || this.versions.get(topic) !== message.version - 1) {
+        // Missad version - prenumerera om för att få en ny snapshot
+        this.send({ type: 'unsubscribe', topics: [topic] });
+        this.send({ type: 'subscribe', topics: [topic] });
+        return;
+      }
+      state = applyDelta(current, message.changed, message.removed);
+    } else {
+      return;
+    }
+
+    this.states.set(topic, state);
+    this.versions.set(topic, message.version);
+    this.notify(topic, state);
+  }
+
+  private notify(topic: string, data: any) {
+    this.listeners.get(topic)?.forEach((listener) => listener(data));
+  }
+}
+
+export const liveTopics = new LiveTopics();
@@ -0,0 +1,66 @@
+"""
+Unit tests för AdaptiveInterval
+"""
+from collector.adaptive import MODE_BACKOFF, MODE_FAST, MODE_SLOW, AdaptiveInterval
+from collector.event_generator import EventGenerator
+from services.deadband import DeadbandRule
+from services.sensor_data import SensorReading
+
+
+def ctemp(value):
+    """SensorReading för htsensor/ctemp"""
+    return SensorReading("htsensor", "htsensor/ctemp", "ctemp", value)
+
+
+class TestAdaptiveInterval:
+    """Test val av pollintervall"""
+
+    def test_active_events_poll_fast(self):
+        """Test att aktiva events ger snabb polling"""
+        adaptive = AdaptiveInterval(base=10)
+
+        assert adaptive.next_interval(reachable=True, active_events=True) == 2.0
+        assert adaptive.mode == MODE_FAST
+        assert adaptive.next_interval(reachable=True) == 10
+
+    def test_stable_readings_slow_down(self):
+        """Test att stabila värden ger långsammare polling"""
+        adaptive = AdaptiveInterval(base=10, stable_cycles=3)
+
+        intervals = [adaptive.next_interval(reachable=True) for _ in range(4)]
+
+        assert intervals == [10, 10, 30, 30]
+        assert adaptive.mode == MODE_SLOW
+
+    def test_unreachable_backs_off_exponentially_with_cap(self):
+        """Test exponentiell backoff med tak när enheten inte svarar"""
+        adaptive = AdaptiveInterval(base=10, max_backoff=60)
+
+        intervals = [adaptive.next_interval(reachable=False) for _ in range(5)]
+
+        assert intervals == [10, 20, 40, 60, 60]
+        assert adaptive.mode == MODE_BACKOFF
+        assert adaptive.next_interval(reachable=True) == 10
+        assert adaptive.consecutive_failures == 0
+
+    def test_fast_change_detected_from_deadband_rules(self):
+        """Test att snabb ändring jämförs mot deadband-toleransen"""
+        adaptive = AdaptiveInterval(base=10, change_rules={"htsensor/ctemp": DeadbandRule(absolute=0.1)})
+
+        assert adaptive.observe_readings([ctemp(22.0)]) is False
+        assert adaptive.observe_readings([ctemp(22.2)]) is False
+        assert adaptive.observe_readings([ctemp(23.0)]) is True
+
+
+class TestActiveEvents:
+    """Test EventGenerator.has_active_events"""
+
+    def test_active_state_tracked(self):
+        """Test att aktiva Halo-events syns tills de släpper"""
+        generator = EventGenerator(halo_client=None)
+
+        generator._process_halo_event_state("halo-a", {"Vape": {"state": 1, "rawval": 0}})
+        assert generator.has_active_events() is True
+
+        generator._process_halo_event_state("halo-a", {"Vape": {"state": 0, "rawval": 0}})
+        assert generator.has_active_events() is False
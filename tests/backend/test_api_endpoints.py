@@ -49,6 +49,23 @@ class TestSensorEndpoints:
         assert response.status_code in [200, 404]
 
 
+    @patch('api.routes.sensors.get_sensor_service')
+    def test_get_sensor_history_batch(self, mock_get_service):
+        """Test batch-historik med upprepad sensor_id-parameter"""
+        mock_get_service.return_value.get_sensor_history_batch.return_value = {
+            "window_s": 72,
+            "series": {"co2sensor/co2": [[1735732800000, 400.0]], "htsensor/ctemp": []}
+        }
+
+        response = client.get("/api/sensors/history/batch?sensor_id=co2sensor/co2&sensor_id=htsensor/ctemp&points=50")
+
+        assert response.status_code == 200
+        assert set(response.json()["series"]) == {"co2sensor/co2", "htsensor/ctemp"}
+        kwargs = mock_get_service.return_value.get_sensor_history_batch.call_args.kwargs
+        assert kwargs["sensor_ids"] == ["co2sensor/co2", "htsensor/ctemp"]
+        assert kwargs["points"] == 50
+
+
 class TestEventEndpoints:
     """Test event endpoints"""
 
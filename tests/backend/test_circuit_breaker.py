@@ -0,0 +1,229 @@
+"""
+Unit tests för CircuitBreaker och EndpointGuard
+"""
+import pytest
+from unittest.mock import Mock, patch
+import requests
+
+from collector.circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    EndpointGuard,
+)
+from collector.halo_client import HaloClient
+
+
+class FakeClock:
+    """Styrbar monoton klocka"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def response(status_code, data=None):
+    """Mockad response"""
+    mock = Mock()
+    mock.status_code = status_code
+    mock.ok = status_code < 400
+    mock.json.return_value = data if data is not None else {}
+    if status_code >= 400:
+        mock.raise_for_status.side_effect = requests.exceptions.HTTPError(f"HTTP {status_code}")
+    return mock
+
+
+class TestCircuitBreaker:
+    """Test breakerns tillståndsövergångar"""
+
+    def test_opens_after_threshold(self):
+        """Test att breakern öppnas efter failure_threshold fel i rad"""
+        breaker = CircuitBreaker(failure_threshold=3, clock=FakeClock())
+
+        for _ in range(2):
+            breaker.record_failure("timeout")
+        assert breaker.state == STATE_CLOSED
+        assert breaker.allow() is True
+
+        breaker.record_failure("timeout")
+        assert breaker.state == STATE_OPEN
+        assert breaker.allow() is False
+        assert breaker.rejected == 1
+
+    def test_half_open_allows_single_probe(self):
+        """Test att bara en provrequest släpps igenom efter cooldown"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30, clock=clock)
+        breaker.record_failure("timeout")
+
+        clock.now = 30
+        assert breaker.allow() is True
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow() is False
+
+        breaker.record_success()
+        assert breaker.state == STATE_CLOSED
+        assert breaker.allow() is True
+
+    def test_failed_probe_doubles_cooldown(self):
+        """Test att misslyckat prov öppnar igen med dubblad cooldown (med tak)"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30, max_cooldown=50, clock=clock)
+        breaker.record_failure("timeout")
+
+        clock.now = 30
+        assert breaker.allow() is True
+        breaker.record_failure("timeout")
+        assert breaker.state == STATE_OPEN
+        assert breaker.cooldown == 50
+
+        clock.now = 60
+        assert breaker.allow() is False
+        assert breaker.get_state()["retry_in_s"] == 20
+
+    def test_success_resets_failures(self):
+        """Test att lyckad request nollställer felräknaren"""
+        breaker = CircuitBreaker(failure_threshold=2, clock=FakeClock())
+
+        breaker.record_failure("timeout")
+        breaker.record_success()
+        breaker.record_failure("timeout")
+
+        assert breaker.state == STATE_CLOSED
+
+
+class TestEndpointGuard:
+    """Test kapabilitetscache"""
+
+    def test_unsupported_expires_after_ttl(self):
+        """Test att ej stödda sökvägar provas igen efter capability_ttl"""
+        clock = FakeClock()
+        guard = EndpointGuard(capability_ttl=60, clock=clock)
+
+        guard.mark_unsupported("GET", "/api/device/blescan")
+        assert guard.is_unsupported("GET", "/api/device/blescan") is True
+        assert guard.get_states()["unsupported"] == ["GET /api/device/blescan"]
+
+        clock.now = 60
+        assert guard.is_unsupported("GET", "/api/device/blescan") is False
+
+    def test_unsupported_is_per_method(self):
+        """Test att en 405 på POST inte gör GET mot samma sökväg ej stödd"""
+        guard = EndpointGuard(clock=FakeClock())
+
+        guard.mark_unsupported("POST", "/api/config")
+
+        assert guard.is_unsupported("POST", "/api/config") is True
+        assert guard.is_unsupported("GET", "/api/config") is False
+
+
+class TestHaloClientBreaker:
+    """Test circuit breaker i HaloClient"""
+
+    @pytest.fixture
+    def client(self):
+        """HaloClient med låg tröskel"""
+        return HaloClient(ip="10.0.0.1", username="admin", password="x", breaker_threshold=2)
+
+    def test_open_circuit_skips_request(self, client):
+        """Test att en öppen breaker avvisar requests utan nätverksanrop"""
+        with patch.object(client.session, 'get', side_effect=requests.exceptions.ConnectTimeout("timeout")) as mock_get:
+            assert client.get_latest_state() is None
+            assert client.get_latest_state() is None
+            assert client.get_latest_state() is None
+
+            assert mock_get.call_count == 2
+            assert "Circuit open" in client.last_error
+            state = client.get_breaker_states()["endpoints"]["latest"]
+            assert state["state"] == STATE_OPEN
+            assert state["rejected"] == 1
+
+    def test_breakers_are_per_endpoint(self, client):
+        """Test att en trasig endpoint inte stänger av andra"""
+        client.guard.breaker("latest").record_failure("timeout")
+        client.guard.breaker("latest").record_failure("timeout")
+
+        with patch.object(client.session, 'get', return_value=response(200, {"ok": True})):
+            with pytest.raises(CircuitOpenError):
+                client._get("http://10.0.0.1/api/config/gstate/latest", "latest")
+            assert client.get_event_state() == {"ok": True}
+
+    def test_server_errors_count_as_failures(self, client):
+        """Test att HTTP 5xx räknas som fel"""
+        with patch.object(client.session, 'get', return_value=response(503)):
+            client._get("http://10.0.0.1/api/config/gstate/latest", "latest")
+            client._get("http://10.0.0.1/api/config/gstate/latest", "latest")
+
+        assert client.get_breaker_states()["endpoints"]["latest"]["state"] == STATE_OPEN
+
+    def test_ble_skips_unsupported_endpoints(self, client):
+        """Test att BLE-endpoints som svarat 404 inte frågas igen"""
+        def fake_get(url, timeout):
+            if url.endswith("/api/config/gstate/blebcn"):
+                return response(200, [{"id": "beacon-1"}])
+            if url.endswith("/latest"):
+                return response(200, {})
+            return response(404)
+
+        with patch.object(client.session, 'get', side_effect=fake_get) as mock_get:
+            assert client.get_ble_devices() == [{"id": "beacon-1"}]
+            first_calls = mock_get.call_count
+            assert client.get_ble_devices() == [{"id": "beacon-1"}]
+
+            # Andra gången: bara blebcn och latest
+            assert mock_get.call_count - first_calls == 2
+            assert sorted(client.get_breaker_states()["unsupported"]) == [
+                "GET /api/config/blebcn/scan",
+                "GET /api/device/blescan",
+            ]
+            assert client.get_breaker_states()["endpoints"]["ble:/api/config/gstate/blebcn"]["state"] == STATE_CLOSED
+
+    def test_ble_breakers_are_per_url(self, client):
+        """Test att en BLE-väg som timear ut inte stänger av de andra"""
+        def fake_get(url, timeout):
+            if url.endswith("/api/device/blescan"):
+                raise requests.exceptions.ReadTimeout("timeout")
+            if url.endswith("/api/config/gstate/blebcn"):
+                return response(200, [{"id": "beacon-1"}])
+            return response(200, {})
+
+        with patch.object(client.session, 'get', side_effect=fake_get):
+            for _ in range(3):
+                assert client.get_ble_devices() == [{"id": "beacon-1"}]
+
+        endpoints = client.get_breaker_states()["endpoints"]
+        assert endpoints["ble:/api/device/blescan"]["state"] == STATE_OPEN
+        assert endpoints["ble:/api/config/gstate/blebcn"]["state"] == STATE_CLOSED
+        assert endpoints["ble:/api/config/blebcn/scan"]["state"] == STATE_CLOSED
+
+    def test_rejected_config_update_keeps_config_readable(self, client):
+        """Test att en 405 på POST /api/config inte stänger av GET /api/config"""
+        with patch.object(client.session, 'post', return_value=response(405)), \
+                patch.object(client.session, 'get', return_value=response(200, {"name": "halo"})):
+            assert client.update_config({"name": "x"}) is False
+            assert client.get_full_config() == {"name": "halo"}
+
+        assert client.get_breaker_states()["unsupported"] == []
+
+    def test_core_endpoint_404_not_cached(self, client):
+        """Test att en tillfällig 404 på gstate/latest går via breakern istället för kapabilitetscachen"""
+        responses = [response(404), response(200, {"htsensor": {}})]
+        with patch.object(client.session, 'get', side_effect=responses) as mock_get:
+            assert client.get_latest_state() is None
+            assert client.get_latest_state() == {"htsensor": {}}
+
+        assert mock_get.call_count == 2
+        assert client.get_breaker_states()["unsupported"] == []
+        assert client.get_breaker_states()["endpoints"]["latest"]["consecutive_failures"] == 0
+
+    def test_core_endpoint_404s_open_breaker(self, client):
+        """Test att upprepade 404 på en kärn-endpoint räknas som fel"""
+        with patch.object(client.session, 'get', return_value=response(404)):
+            client.get_latest_state()
+            client.get_latest_state()
+
+        assert client.get_breaker_states()["endpoints"]["latest"]["state"] == STATE_OPEN
@@ -0,0 +1,74 @@
+"""
+Unit tests för CollectionPipeline
+"""
+import pytest
+from unittest.mock import Mock
+
+from collector.beacon_handler import BeaconHandler
+from collector.event_generator import EventGenerator
+from collector.pipeline import CollectionPipeline
+
+
+@pytest.fixture
+def halo_payload():
+    """Halo gstate/latest med sensorer, accelerometer och beacon"""
+    return {
+        "htsensor": {"key": "htsensor", "data": {"ctemp": 22.5, "humidity": 41.0, "time": 1764498035}},
+        "accsensor": {"key": "accsensor", "data": {"x": 3, "y": 4, "z": 0, "move": 0}},
+        "blebcn": {"data": {"alert": {"id": "beacon-001", "name": "Test Beacon", "rssi": -60, "battery": 80, "status": 0}}},
+    }
+
+
+@pytest.fixture
+def pipeline():
+    """Pipeline med riktig BeaconHandler/EventGenerator som delar beacon-state"""
+    beacon_handler = BeaconHandler()
+    event_generator = EventGenerator(halo_client=None, beacon_handler=beacon_handler)
+    return CollectionPipeline("halo-device-1", beacon_handler, event_generator)
+
+
+class TestCollectionPipeline:
+    """Test parse -> derive -> detect -> write"""
+
+    def test_parse_and_derive(self, pipeline, halo_payload):
+        """Test att payload avkodas en gång och magnitud härleds"""
+        snapshot = pipeline.parse(halo_payload, {}, 12.0)
+        pipeline.derive(snapshot)
+
+        assert snapshot.get_value("htsensor/ctemp") == 22.5
+        assert snapshot.get_value("htsensor/time") is None
+        assert snapshot.acc_magnitude == 5.0
+        assert snapshot.get_value("accsensor/magnitude") == 5.0
+        assert len(snapshot.beacons) == 1
+
+    def test_beacons_processed_once(self, pipeline, halo_payload):
+        """Test att beacon-events och presence-data bara skapas en gång"""
+        sensor_data_service = Mock()
+        event_service = Mock()
+        event_service.create_event.side_effect = lambda event: event
+
+        created = pipeline.run(halo_payload, {}, 12.0, sensor_data_service, event_service)
+
+        arrived = [e for e in created if e.type.value == "BEACON_ARRIVED"]
+        assert len(arrived) == 1
+        sensor_data_service.write_beacon_data.assert_called_once()
+        assert pipeline.event_generator.beacon_handler.state is pipeline.beacon_handler.state
+
+    def test_halo_event_state_detected(self, pipeline, halo_payload):
+        """Test att event_state från snapshot används utan ny hämtning"""
+        snapshot = pipeline.parse(halo_payload, {"Vape": {"state": 1, "rawval": 0}}, 12.0)
+        events = pipeline.detect(snapshot)
+
+        assert any(e["type"] == "Vape" for e in events)
+
+    def test_failing_detector_does_not_stop_pipeline(self, pipeline, halo_payload):
+        """Test att en trasig detector inte stoppar övriga"""
+        def broken(snapshot):
+            raise RuntimeError("boom")
+
+        pipeline.detectors.insert(0, broken)
+        snapshot = pipeline.parse(halo_payload, {"Vape": {"state": 1, "rawval": 0}}, 12.0)
+
+        events = pipeline.detect(snapshot)
+
+        assert any(e["type"] == "Vape" for e in events)
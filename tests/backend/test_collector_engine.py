@@ -0,0 +1,227 @@
+"""
+Unit tests för CollectorEngine
+"""
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+from collector.engine import CollectorEngine, DeviceCollector, load_device_configs
+from collector.scheduler import TickScheduler, device_phase
+
+
+def make_device(device_id, state=None, delay=0.0, event_state=None):
+    """DeviceCollector med mockad Halo-klient"""
+    halo_client = Mock()
+    halo_client.last_error = None
+
+    def get_latest_state():
+        time.sleep(delay)
+        return state
+
+    def get_event_state():
+        time.sleep(delay)
+        return event_state
+
+    halo_client.get_latest_state.side_effect = get_latest_state
+    halo_client.get_event_state.side_effect = get_event_state
+    halo_client.health_check.return_value = state is not None
+    halo_client.get_breaker_states.return_value = {"endpoints": {}, "unsupported": []}
+
+    beacon_handler = Mock()
+    beacon_handler.extract_beacon_data.return_value = []
+    event_generator = Mock()
+    event_generator.halo_client = halo_client
+    event_generator._process_halo_event_state.return_value = []
+    event_generator.detect_vibration.return_value = []
+
+    return DeviceCollector(device_id, halo_client, beacon_handler, event_generator)
+
+
+class TestLoadDeviceConfigs:
+    """Test enhetslista från miljövariabler"""
+
+    def test_single_device_fallback(self, monkeypatch):
+        """Test att HALO_IP/DEVICE_ID används utan enhetslista"""
+        monkeypatch.delenv("HALO_DEVICES", raising=False)
+        monkeypatch.delenv("HALO_DEVICES_FILE", raising=False)
+        monkeypatch.setenv("HALO_IP", "10.0.0.5")
+        monkeypatch.setenv("DEVICE_ID", "halo-a")
+        monkeypatch.setenv("HALO_PASS", "secret")
+
+        devices = load_device_configs()
+
+        assert devices == [{"device_id": "halo-a", "ip": "10.0.0.5", "username": "admin", "password": "secret"}]
+
+    def test_device_list_skips_duplicates(self, monkeypatch):
+        """Test att dubbletter och ofullständiga poster filtreras bort"""
+        monkeypatch.setenv("HALO_DEVICES", json.dumps([
+            {"device_id": "halo-a", "ip": "10.0.0.1"},
+            {"device_id": "halo-a", "ip": "10.0.0.2"},
+            {"device_id": "halo-b"},
+            {"device_id": "halo-c", "ip": "10.0.0.3", "password": "other"},
+        ]))
+        monkeypatch.setenv("HALO_PASS", "secret")
+
+        devices = load_device_configs()
+
+        assert [d["device_id"] for d in devices] == ["halo-a", "halo-c"]
+        assert devices[1]["password"] == "other"
+
+
+class TestCollectorEngine:
+    """Test samtidig insamling"""
+
+    def test_devices_are_polled_concurrently(self):
+        """Test att enheter pollas parallellt och inte sekventiellt"""
+        devices = [make_device(f"halo-{i}", state={"htsensor": {"data": {"ctemp": 21.0}}}, delay=0.2) for i in range(10)]
+        sensor_data_service = Mock()
+        engine = CollectorEngine(devices, sensor_data_service, Mock(), interval=5, deadline=2, jitter=0, phase_spread=False)
+
+        async def run_once():
+            task = asyncio.create_task(engine.run())
+            await asyncio.sleep(0.5)
+            engine.stop()
+            await task
+
+        start = time.monotonic()
+        asyncio.run(run_once())
+
+        assert time.monotonic() - start < 1.5
+        assert all(d.cycles == 1 for d in devices)
+        written_ids = {c.kwargs["device_id"] for c in sensor_data_service.write_sensor_readings.call_args_list}
+        assert written_ids == {d.device_id for d in devices}
+
+    def test_deadline_exceeded_counts_timeout(self):
+        """Test att en hängande enhet inte blockerar övriga"""
+        slow = make_device("halo-slow", state={}, delay=1.0)
+        fast = make_device("halo-fast", state={"htsensor": {"data": {"ctemp": 21.0}}})
+        engine = CollectorEngine([slow, fast], Mock(), Mock(), interval=5, deadline=0.2, jitter=0, phase_spread=False)
+
+        async def run_once():
+            task = asyncio.create_task(engine.run())
+            await asyncio.sleep(0.4)
+            engine.stop()
+            await task
+
+        asyncio.run(run_once())
+
+        assert slow.timeouts == 1
+        assert fast.cycles == 1
+
+    def test_unreachable_device_writes_disconnected_heartbeat(self):
+        """Test att offline-enhet loggar heartbeat med fel"""
+        device = make_device("halo-offline", state=None)
+        device.halo_client.last_error = "timeout"
+        sensor_data_service = Mock()
+
+        assert device.process(None, 0.0, {}, sensor_data_service, Mock()) is False
+        sensor_data_service.write_heartbeat.assert_called_once()
+        assert sensor_data_service.write_heartbeat.call_args.kwargs["error"] == "timeout"
+        assert device.failures == 1
+
+    def test_latest_and_event_state_fetched_in_parallel(self):
+        """Test att gstate/latest och event_state hämtas samtidigt"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        event_state = {"Vape": {"state": 1, "rawval": 0}}
+        device = make_device("halo-a", state={"htsensor": {"data": {"ctemp": 21.0}}}, delay=0.3, event_state=event_state)
+        executor = ThreadPoolExecutor(max_workers=4)
+
+        start = time.monotonic()
+        result = asyncio.run(device.run_cycle(executor, Mock(), Mock()))
+        elapsed = time.monotonic() - start
+        executor.shutdown()
+
+        assert result is True
+        assert elapsed < 0.5
+        device.event_generator._process_halo_event_state.assert_called_once_with("halo-a", event_state)
+
+
+class TestTickScheduler:
+    """Test driftfria tick"""
+
+    def test_ticks_do_not_drift_with_cycle_time(self):
+        """Test att tick ligger kvar på grid:en trots cykeltid"""
+        scheduler = TickScheduler(interval=10, start=100.0, phase=2.0)
+
+        assert scheduler.delay(100.0) == 2.0
+        scheduler.begin(102.0)
+        assert scheduler.advance(105.5) == 0
+        assert scheduler.delay(105.5) == 6.5
+        scheduler.begin(112.0)
+        scheduler.advance(113.0)
+        assert scheduler.next_tick == 122.0
+
+    def test_overrun_counts_missed_ticks(self):
+        """Test att överhoppade tick räknas och schemat hoppar fram"""
+        scheduler = TickScheduler(interval=10, start=0.0)
+        scheduler.begin(0.0)
+
+        assert scheduler.advance(25.0) == 2
+        assert scheduler.next_tick == 30.0
+        assert scheduler.get_stats()["missed_ticks"] == 2
+
+    def test_late_start_is_reported(self):
+        """Test att sena tick räknas"""
+        scheduler = TickScheduler(interval=10, start=0.0, late_tolerance=0.5)
+
+        scheduler.begin(2.0)
+
+        stats = scheduler.get_stats()
+        assert stats["late_ticks"] == 1
+        assert stats["max_lateness_ms"] == 2000.0
+
+    def test_jitter_stays_within_bounds(self):
+        """Test att jitter inte flyttar grid:en"""
+        import random
+        scheduler = TickScheduler(interval=10, start=0.0, jitter=0.5, rng=random.Random(1))
+
+        for tick in range(1, 20):
+            scheduler.advance(tick * 10 - 5)
+            delay = scheduler.delay(tick * 10.0)
+            assert 0.0 <= delay <= 0.5
+            assert scheduler.next_tick == tick * 10
+
+    def test_device_phases_are_stable_and_spread(self):
+        """Test att fas-offset är stabil per device_id och sprider enheter"""
+        phases = [device_phase(f"halo-{i}", 10) for i in range(50)]
+
+        assert device_phase("halo-1", 10) == phases[1]
+        assert all(0 <= p < 10 for p in phases)
+        assert len({round(p, 1) for p in phases}) > 25
+
+    def test_unreachable_device_is_polled_with_backoff(self):
+        """Test att en offline-enhet inte pollas varje intervall"""
+        from collector.adaptive import AdaptiveInterval
+
+        device = make_device("halo-offline", state=None)
+        engine = CollectorEngine(
+            [device], Mock(), Mock(), interval=0.1, deadline=0.5, jitter=0, phase_spread=False,
+            adaptive_factory=lambda: AdaptiveInterval(base=0.1, max_backoff=10)
+        )
+
+        async def run_for(seconds):
+            task = asyncio.create_task(engine.run())
+            await asyncio.sleep(seconds)
+            engine.stop()
+            await task
+
+        asyncio.run(run_for(0.9))
+
+        # Fast intervall hade gett ~9 försök: 0.1 + 0.1 + 0.2 + 0.4 ger 4-5
+        assert 3 <= device.failures <= 5
+        assert engine.get_stats()[0]["poll_mode"] == "backoff"
+
+    def test_deadline_follows_effective_interval(self):
+        """Test att cykelns deadline aldrig överstiger det aktuella intervallet"""
+        auto = CollectorEngine([], Mock(), Mock(), interval=10)
+        configured = CollectorEngine([], Mock(), Mock(), interval=10, deadline=5)
+
+        assert auto.deadline == 9
+        # Fast-läge (base / 5 = 2s) får inte ärva base-intervallets deadline på 9s
+        assert auto._cycle_deadline(2) == 1
+        assert auto._cycle_deadline(30) == 29
+        assert configured._cycle_deadline(2) == 2
+        assert configured._cycle_deadline(30) == 5
@@ -0,0 +1,78 @@
+"""
+Unit tests för DeadbandFilter
+"""
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from services.deadband import DeadbandFilter, DeadbandRule, load_deadband_rules
+from services.sensor_data import SensorReading
+
+
+def reading(sensor_id, value):
+    """SensorReading för sensor_id på formen "key/field" """
+    key, field = sensor_id.split("/", 1)
+    return SensorReading(key, sensor_id, field, float(value))
+
+
+class TestDeadbandFilter:
+    """Test change-only-filtrering"""
+
+    def test_absolute_deadband_and_keep_alive(self):
+        """Test att små ändringar filtreras tills max_silence löpt ut"""
+        deadband = DeadbandFilter({"htsensor/ctemp": DeadbandRule(absolute=0.1, max_silence=60)})
+        t0 = datetime(2025, 1, 1, 12, 0, 0)
+
+        assert deadband.filter([reading("htsensor/ctemp", 22.0)], t0, "halo-a")
+        assert not deadband.filter([reading("htsensor/ctemp", 22.05)], t0 + timedelta(seconds=10), "halo-a")
+        assert deadband.filter([reading("htsensor/ctemp", 22.2)], t0 + timedelta(seconds=20), "halo-a")
+        assert not deadband.filter([reading("htsensor/ctemp", 22.2)], t0 + timedelta(seconds=70), "halo-a")
+        assert deadband.filter([reading("htsensor/ctemp", 22.2)], t0 + timedelta(seconds=80), "halo-a")
+
+        assert deadband.get_metrics()["suppressed"] == 2
+
+    def test_relative_deadband(self):
+        """Test att relativ tolerans skalar med senaste värdet"""
+        deadband = DeadbandFilter({"luxsensor/alux": DeadbandRule(relative=0.05)})
+        t0 = datetime(2025, 1, 1)
+
+        deadband.filter([reading("luxsensor/alux", 1000)], t0, "halo-a")
+
+        assert not deadband.filter([reading("luxsensor/alux", 1040)], t0 + timedelta(seconds=10), "halo-a")
+        assert deadband.filter([reading("luxsensor/alux", 1060)], t0 + timedelta(seconds=20), "halo-a")
+
+    def test_state_is_per_device_and_unconfigured_sensors_pass(self):
+        """Test att state hålls per enhet och sensorer utan regel alltid skrivs"""
+        deadband = DeadbandFilter({"htsensor/ctemp": DeadbandRule(absolute=1.0)})
+        t0 = datetime(2025, 1, 1)
+        deadband.filter([reading("htsensor/ctemp", 22.0)], t0, "halo-a")
+
+        result = deadband.filter(
+            [reading("htsensor/ctemp", 22.0), reading("accsensor/x", 3)],
+            t0 + timedelta(seconds=10),
+            "halo-b"
+        )
+
+        assert [r.sensor_id for r in result] == ["htsensor/ctemp", "accsensor/x"]
+
+    def test_rules_loaded_from_sensor_metadata(self):
+        """Test att regler läses från data/sensor_metadata.json"""
+        rules = load_deadband_rules()
+
+        assert rules["htsensor/ctemp"].absolute > 0
+        assert "accsensor/x" not in rules
+
+    def test_sensor_data_service_writes_only_changes(self):
+        """Test att SensorDataService skriver färre points med deadband"""
+        with patch('services.sensor_data.InfluxDBService'):
+            from services.sensor_data import SensorDataService
+            write_pipeline = Mock()
+            service = SensorDataService(
+                write_pipeline=write_pipeline,
+                deadband=DeadbandFilter({"htsensor/ctemp": DeadbandRule(absolute=0.1)})
+            )
+            t0 = datetime(2025, 1, 1)
+
+            assert service.write_sensor_readings([reading("htsensor/ctemp", 22.0)], t0, "halo-a")
+            assert service.write_sensor_readings([reading("htsensor/ctemp", 22.0)], t0 + timedelta(seconds=10), "halo-a")
+
+            write_pipeline.add.assert_called_once()
@@ -0,0 +1,160 @@
+"""
+Unit tests för DeviceInfoCache och parallell hämtning av enhetsinformation
+"""
+import asyncio
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from collector.halo_client import HaloClient
+from services.device_info import DeviceInfoCache
+
+
+class FakeClock:
+    """Styrbar monoton klocka"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingFetch:
+    """Fetch-funktion som räknar anrop och kan blockeras"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(2)
+        return None if self.fail else {"version": self.calls}
+
+
+class TestDeviceInfoCache:
+    """Test TTL och stale-while-revalidate"""
+
+    def test_fresh_value_is_cached(self):
+        """Test att värdet cachas inom TTL"""
+        fetch = CountingFetch()
+        cache = DeviceInfoCache(fetch, ttl=30, clock=FakeClock())
+
+        async def run():
+            first = await cache.get()
+            second = await cache.get()
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first == second == {"version": 1}
+        assert fetch.calls == 1
+        assert cache.hits == 1
+
+    def test_stale_value_returned_while_refreshing(self):
+        """Test att gammalt värde returneras direkt och uppdateras i bakgrunden"""
+        clock = FakeClock()
+        fetch = CountingFetch()
+        cache = DeviceInfoCache(fetch, ttl=30, max_stale=600, clock=clock)
+
+        async def run():
+            await cache.get()
+            clock.now = 60
+            fetch.release.clear()
+            stale = await cache.get()
+            fetch.release.set()
+            await cache._refresh_task
+            return stale, await cache.get()
+
+        stale, fresh = asyncio.run(run())
+
+        assert stale == {"version": 1}
+        assert fresh == {"version": 2}
+        assert cache.stale_hits == 1
+
+    def test_concurrent_misses_share_fetch(self):
+        """Test att samtidiga anrop delar på en hämtning"""
+        fetch = CountingFetch()
+        cache = DeviceInfoCache(fetch, ttl=30, clock=FakeClock())
+
+        async def run():
+            return await asyncio.gather(*(cache.get() for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        assert fetch.calls == 1
+        assert all(result == {"version": 1} for result in results)
+
+    def test_failed_refresh_keeps_previous_value(self):
+        """Test att misslyckad hämtning behåller tidigare värde"""
+        clock = FakeClock()
+        fetch = CountingFetch()
+        cache = DeviceInfoCache(fetch, ttl=30, max_stale=30, clock=clock)
+
+        async def run():
+            await cache.get()
+            fetch.fail = True
+            clock.now = 100
+            return await cache.get()
+
+        assert asyncio.run(run()) == {"version": 1}
+        assert cache.refresh_errors == 1
+
+
+class TestConcurrentDeviceInfo:
+    """Test parallell hämtning i HaloClient.get_device_info"""
+
+    def test_parts_fetched_concurrently(self):
+        """Test att delarna hämtas samtidigt och saknade delar hoppas över"""
+        client = HaloClient(ip="10.0.0.1", username="admin", password="x")
+
+        def slow_get(url, timeout):
+            time.sleep(0.2)
+            response = Mock()
+            response.status_code = 404 if url.endswith("/cloud") else 200
+            response.ok = response.status_code == 200
+            response.json.return_value = {"lifetimehrs": 100} if url.endswith("/workers") else {}
+            return response
+
+        with patch.object(client.session, 'get', side_effect=slow_get) as mock_get:
+            started = time.monotonic()
+            info = client.get_device_info()
+            elapsed = time.monotonic() - started
+
+        assert mock_get.call_count == 5
+        assert elapsed < 0.6
+        assert info["lifetime_hours"] == 100
+        assert "cloud" not in info
+        assert {"workers", "network", "time_info", "about"} <= set(info)
+
+    def test_fan_out_capped_at_pool_size(self):
+        """Test att samtidiga hämtningar aldrig överstiger anslutningspoolen"""
+        client = HaloClient(ip="10.0.0.1", username="admin", password="x", pool_size=2)
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def slow_get(url, timeout):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            response = Mock()
+            response.status_code = 200
+            response.ok = True
+            response.json.return_value = {}
+            return response
+
+        with patch.object(client.session, 'get', side_effect=slow_get):
+            client.get_device_info()
+            executor = client._executor
+            client.get_device_info()
+
+        assert peak[0] == 2
+        assert client._executor is executor
+        client.close()
@@ -0,0 +1,126 @@
+"""
+Unit tests för nedsampling av sensorhistorik (aggregateWindow + LTTB)
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from services.downsampling import choose_window, is_valid_resolution, lttb_indices
+from services.sensors import SensorService
+from test_flux_csv import flux_csv_rows
+
+
+class TestLTTB:
+    """Test Largest-Triangle-Three-Buckets"""
+
+    def test_keeps_endpoints_and_size(self):
+        """Test att första/sista punkten behålls och antalet blir threshold"""
+        x = np.arange(1000)
+        y = np.sin(x / 50.0)
+
+        indices = lttb_indices(x, y, 100)
+
+        assert len(indices) == 100
+        assert indices[0] == 0
+        assert indices[-1] == 999
+        assert np.all(np.diff(indices) > 0)
+
+    def test_preserves_spike(self):
+        """Test att en ensam topp finns kvar efter nedsampling"""
+        x = np.arange(5000)
+        y = np.zeros(5000)
+        y[3217] = 100.0
+
+        indices = lttb_indices(x, y, 50)
+
+        assert 3217 in indices
+
+    def test_short_series_unchanged(self):
+        """Test att korta serier returneras oförändrade"""
+        assert list(lttb_indices([1, 2, 3], [1, 2, 3], 10)) == [0, 1, 2]
+        assert list(lttb_indices(range(10), range(10), 2)) == [0, 9]
+
+
+class TestWindow:
+    """Test val av aggregeringsfönster"""
+
+    def test_window_covers_range(self):
+        """Test att fönstret ger högst points punkter över intervallet"""
+        start = datetime(2025, 1, 1)
+
+        window = choose_window(start, start + timedelta(days=7), 4000)
+
+        assert window == 152
+        assert 7 * 86400 / window <= 4000
+        assert choose_window(start, start + timedelta(minutes=10), 4000) is None
+
+    def test_resolution_validation(self):
+        """Test att bara enkla Flux-durations accepteras"""
+        assert is_valid_resolution("5m")
+        assert is_valid_resolution("30s")
+        assert not is_valid_resolution("5m) |> drop(")
+        assert not is_valid_resolution("0s")
+
+
+@pytest.fixture
+def sensor_service(mock_influxdb_service):
+    with patch('services.sensors.InfluxDBService'):
+        yield SensorService()
+
+
+def make_rows(start, count, step_s):
+    return flux_csv_rows(
+        ["_time", "_value", "_field"],
+        ["dateTime:RFC3339", "double", "string"],
+        [
+            (0, [(start + timedelta(seconds=i * step_s)).strftime('%Y-%m-%dT%H:%M:%SZ'), float(i % 17), "value"])
+            for i in range(count)
+        ]
+    )
+
+
+class TestSensorHistoryDownsampling:
+    """Test max_points/resolution i SensorService.get_sensor_history"""
+
+    def test_max_points_uses_aggregate_window_and_lttb(self, sensor_service):
+        """Test att långa intervall aggregeras och förfinas till max_points"""
+        start = datetime(2025, 1, 1)
+        rows = make_rows(start, 2000, 300)
+
+        with patch.object(sensor_service.influxdb.query_api, 'query_csv', return_value=iter(rows)) as mock_query:
+            history = sensor_service.get_sensor_history(
+                "htsensor/ctemp",
+                from_time=start,
+                to_time=start + timedelta(days=7),
+                max_points=500
+            )
+
+        query = mock_query.call_args.kwargs['query']
+        assert 'aggregateWindow(every: 303s, fn: mean' in query
+        assert 'limit(' not in query
+        assert len(history) == 500
+        assert history[0]['timestamp'] == start.replace(tzinfo=timezone.utc).isoformat()
+        assert history[-1]['timestamp'] == (start + timedelta(seconds=1999 * 300)).replace(tzinfo=timezone.utc).isoformat()
+
+    def test_explicit_resolution(self, sensor_service):
+        """Test att resolution används som fönster"""
+        start = datetime(2025, 1, 1)
+
+        with patch.object(sensor_service.influxdb.query_api, 'query_csv', return_value=iter([])) as mock_query:
+            sensor_service.get_sensor_history(
+                "htsensor/ctemp", from_time=start, to_time=start + timedelta(days=1), resolution="1h"
+            )
+
+        assert 'aggregateWindow(every: 1h' in mock_query.call_args.kwargs['query']
+
+    def test_raw_mode_sorts_before_limit(self, sensor_service):
+        """Test att rått läge sorterar före limit"""
+        start = datetime(2025, 1, 1)
+
+        with patch.object(sensor_service.influxdb.query_api, 'query_csv', return_value=iter([])) as mock_query:
+            sensor_service.get_sensor_history("htsensor/ctemp", from_time=start, to_time=start + timedelta(hours=1))
+
+        query = mock_query.call_args.kwargs['query']
+        assert query.index('sort(') < query.index('limit(n: 1000)')
@@ -0,0 +1,196 @@
+"""
+Unit tests för event bus mellan collector och API
+"""
+import asyncio
+import socket
+from datetime import datetime
+from unittest.mock import Mock
+
+from models.events import Event, EventSeverity, EventStatus, EventType
+from services.event_bus import EventBusPublisher, EventBusServer, event_message
+
+
+def make_event(event_id="evt-1"):
+    """Event för tester"""
+    return Event(
+        id=event_id,
+        timestamp=datetime(2025, 1, 1, 12, 0, 0),
+        type=EventType.SYSTEM,
+        severity=EventSeverity.WARNING,
+        source="test",
+        summary="Test event",
+        status=EventStatus.ACTIVE,
+        device_id="halo-1"
+    )
+
+
+async def wait_for(condition, timeout=2.0):
+    """Vänta tills condition() är sann"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        await asyncio.sleep(0.01)
+
+
+class TestEventBus:
+    """Test publicering över Unix-socket"""
+
+    def test_messages_delivered_in_order(self, tmp_path):
+        """Test att meddelanden når servern i ordning"""
+        path = str(tmp_path / "events.sock")
+        received = []
+
+        async def on_message(message):
+            received.append(message)
+
+        async def run():
+            server = EventBusServer(path, on_message=on_message)
+            await server.start()
+            publisher = EventBusPublisher(path)
+            loop = asyncio.get_running_loop()
+            for i in range(3):
+                assert await loop.run_in_executor(None, publisher.publish, event_message(make_event(f"evt-{i}")))
+            await wait_for(lambda: len(received) == 3)
+            publisher.close()
+            await server.stop()
+
+        asyncio.run(run())
+
+        assert [m["event"]["id"] for m in received] == ["evt-0", "evt-1", "evt-2"]
+        assert received[0]["type"] == "new_event"
+        assert received[0]["event"]["severity"] == "WARNING"
+
+    def test_messages_buffered_until_server_available(self, tmp_path):
+        """Test att meddelanden buffras när API:t inte lyssnar"""
+        path = str(tmp_path / "events.sock")
+        publisher = EventBusPublisher(path, max_pending=2, retry_interval=0)
+
+        for i in range(3):
+            assert publisher.publish({"type": "new_event", "n": i}) is False
+
+        metrics = publisher.get_metrics()
+        assert metrics["pending"] == 2
+        assert metrics["dropped"] == 1
+
+        received = []
+
+        async def on_message(message):
+            received.append(message)
+
+        async def run():
+            server = EventBusServer(path, on_message=on_message)
+            await server.start()
+            loop = asyncio.get_running_loop()
+            assert await loop.run_in_executor(None, publisher.publish, {"type": "new_event", "n": 3})
+            await wait_for(lambda: len(received) == 3)
+            publisher.close()
+            await server.stop()
+
+        asyncio.run(run())
+
+        # Äldsta släpptes, resten kom i ordning
+        assert [m["n"] for m in received] == [1, 2, 3]
+
+    def test_resend_after_api_restart(self, tmp_path):
+        """Test att en skrivning på en gammal anslutning återansluter och skickar direkt"""
+        path = str(tmp_path / "events.sock")
+        received = []
+
+        # "Gammalt" API: tar emot anslutningen och stängs sedan
+        old_api = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_api.bind(path)
+        old_api.listen(1)
+        publisher = EventBusPublisher(path, retry_interval=60)
+        assert publisher.publish({"n": 0})
+        connection, _ = old_api.accept()
+        connection.recv(1024)
+        connection.close()
+        old_api.close()
+
+        async def on_message(message):
+            received.append(message)
+
+        async def run():
+            server = EventBusServer(path, on_message=on_message)
+            await server.start()
+            loop = asyncio.get_running_loop()
+            # retry_interval har inte gått ut, men den gamla anslutningen ska ersättas direkt
+            assert await loop.run_in_executor(None, publisher.publish, {"n": 1})
+            await wait_for(lambda: len(received) == 1)
+            publisher.close()
+            await server.stop()
+
+        asyncio.run(run())
+
+        assert [m["n"] for m in received] == [1]
+        assert publisher.get_metrics()["pending"] == 0
+
+    def test_pending_flushed_without_new_publish(self, tmp_path):
+        """Test att bufferten skickas i bakgrunden när API:t kommer upp"""
+        path = str(tmp_path / "events.sock")
+        publisher = EventBusPublisher(path, retry_interval=0.05)
+        assert publisher.publish({"n": 0}) is False
+        received = []
+
+        async def on_message(message):
+            received.append(message)
+
+        async def run():
+            server = EventBusServer(path, on_message=on_message)
+            await server.start()
+            await wait_for(lambda: len(received) == 1)
+            publisher.close()
+            await server.stop()
+
+        asyncio.run(run())
+
+        assert received == [{"n": 0}]
+        assert publisher.get_metrics()["pending"] == 0
+
+    def test_handler_cancelled_quietly(self):
+        """Test att avbrutna anslutningar vid avstängning inte ger fel"""
+        server = EventBusServer("/tmp/unused.sock", on_message=Mock())
+
+        async def run():
+            reader = asyncio.StreamReader()
+            task = asyncio.create_task(server._handle(reader, Mock()))
+            await asyncio.sleep(0)
+            task.cancel()
+            await task
+
+        asyncio.run(run())
+
+        assert server.publishers == 0
+
+    def test_invalid_lines_are_skipped(self):
+        """Test att ogiltiga rader räknas och hoppas över"""
+        server = EventBusServer("/tmp/unused.sock", on_message=Mock())
+
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"not json\n[1, 2]\n")
+            reader.feed_eof()
+            await server._handle(reader, Mock())
+
+        asyncio.run(run())
+
+        assert server.invalid == 2
+        assert server.received == 0
+
+
+class TestDeviceCollectorEvents:
+    """Test att collectorn skickar events via event bus"""
+
+    def test_broadcast_uses_event_bus(self):
+        """Test att skapade events publiceras på event bus"""
+        from collector.engine import DeviceCollector
+
+        event_bus = Mock()
+        device = DeviceCollector("halo-1", Mock(), Mock(), Mock(), event_bus=event_bus)
+
+        device._broadcast_event(make_event())
+
+        message = event_bus.publish.call_args.args[0]
+        assert message["type"] == "new_event"
+        assert message["event"]["id"] == "evt-1"
@@ -0,0 +1,217 @@
+"""
+Unit tests för strömmande export (NDJSON/CSV)
+"""
+import asyncio
+import csv
+import io
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from services.export import ExportService, encode_csv, encode_ndjson
+from services.influxdb import iterate_blocking
+
+client = TestClient(app)
+
+
+def make_record(values):
+    record = MagicMock()
+    record.values = values
+    record.get_time.return_value = values['_time']
+    record.get_measurement.return_value = values['_measurement']
+    record.get_field.return_value = values['_field']
+    record.get_value.return_value = values['_value']
+    return record
+
+
+def sensor_record(second, value, field='ctemp', measurement='sensor_htsensor', sensor_id=None):
+    values = {
+        '_time': datetime(2025, 1, 1, 0, 0, second, tzinfo=timezone.utc),
+        '_measurement': measurement,
+        '_field': field,
+        '_value': value,
+    }
+    if sensor_id:
+        values['sensor_id'] = sensor_id
+    return make_record(values)
+
+
+@pytest.fixture
+def export_service(mock_influxdb_service):
+    with patch('services.export.InfluxDBService'):
+        yield ExportService()
+
+
+class TestEncoders:
+    """Test NDJSON- och CSV-kodning i block"""
+
+    def test_ndjson_chunks(self):
+        """Test att rader delas upp i block om chunk_rows"""
+        chunks = list(encode_ndjson(({"n": n} for n in range(5)), chunk_rows=2))
+
+        assert len(chunks) == 3
+        lines = b"".join(chunks).decode().splitlines()
+        assert [json.loads(line)["n"] for line in lines] == [0, 1, 2, 3, 4]
+
+    def test_csv_header_first(self):
+        """Test att rubrikraden skickas som eget block före queryn körs"""
+        def rows():
+            raise AssertionError("rows read before header was sent")
+            yield
+
+        chunks = encode_csv(rows(), ["timestamp", "value"])
+
+        assert next(chunks) == b"timestamp,value\r\n"
+
+    def test_csv_rows(self):
+        """Test att CSV-raderna följer kolumnordningen"""
+        chunks = encode_csv(({"value": n, "timestamp": f"t{n}", "extra": 1} for n in range(3)), ["timestamp", "value"], 2)
+
+        reader = csv.reader(io.StringIO(b"".join(chunks).decode()))
+
+        assert list(reader) == [["timestamp", "value"], ["t0", "0"], ["t1", "1"], ["t2", "2"]]
+
+
+class TestExportService:
+    """Test ExportService-rader från query_stream"""
+
+    def test_sensor_history_rows(self, export_service):
+        """Test att wide- och narrow-rader mappas till sensor_id"""
+        records = [
+            sensor_record(0, 21.5),
+            sensor_record(1, None),
+            sensor_record(2, 1, field='value', measurement='sensor_pir', sensor_id='pir/max'),
+        ]
+
+        with patch.object(export_service.influxdb.query_api, 'query_stream', return_value=iter(records)) as mock_stream:
+            rows = list(export_service.sensor_history_rows(["htsensor/ctemp", "pir/max"], resolution="1m"))
+
+        assert [(row['sensor_id'], row['value']) for row in rows] == [("htsensor/ctemp", 21.5), ("pir/max", 1)]
+        assert rows[0]['timestamp'] == "2025-01-01T00:00:00+00:00"
+        query = mock_stream.call_args.kwargs['query']
+        assert 'aggregateWindow(every: 1m' in query
+        assert 'limit(' not in query and 'sort(' not in query
+
+    def test_log_csv_flattens_tags(self, export_service):
+        """Test att loggexport som CSV lyfter vanliga taggar till kolumner"""
+        record = make_record({
+            'result': '_result', 'table': 0,
+            '_time': datetime(2025, 1, 1, tzinfo=timezone.utc), '_measurement': 'heartbeat',
+            '_field': 'online', '_value': True, 'device_id': 'halo-device-1', 'location': 'hall',
+        })
+
+        with patch.object(export_service.influxdb.query_api, 'query_stream', return_value=iter([record])):
+            body = b"".join(export_service.export_log("csv", measurement="heartbeat")).decode()
+
+        rows = list(csv.DictReader(io.StringIO(body)))
+        assert rows[0]['measurement'] == 'heartbeat'
+        assert rows[0]['device_id'] == 'halo-device-1'
+        assert rows[0]['value'] == 'True'
+
+    def test_query_error_propagates(self, export_service):
+        """Test att ett query-fel inte ger en tyst avkortad export"""
+        def failing_stream(query):
+            yield make_record({
+                '_time': datetime(2025, 1, 1, tzinfo=timezone.utc), '_measurement': 'heartbeat',
+                '_field': 'online', '_value': True,
+            })
+            raise Exception("boom")
+
+        with patch.object(export_service.influxdb.query_api, 'query_stream', side_effect=failing_stream):
+            with pytest.raises(Exception, match="boom"):
+                list(export_service.export_log("ndjson"))
+
+
+class TestExportEndpoints:
+    """Test export-endpoints"""
+
+    def test_sensor_export_streams(self):
+        """Test att sensorexporten strömmas som nedladdning"""
+        service = MagicMock()
+        service.export_sensor_history.return_value = iter([b"timestamp,device_id,sensor_id,value\r\n", b"a,b,c,1\r\n"])
+
+        with patch('api.routes.export.get_export_service', return_value=service):
+            response = client.get("/api/export/sensors?sensor_id=htsensor/ctemp&format=csv")
+
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/csv')
+        assert 'attachment; filename="sensor-history-' in response.headers['content-disposition']
+        assert response.text.endswith("a,b,c,1\r\n")
+
+    def test_invalid_format(self):
+        """Test att okänt format ger 400"""
+        response = client.get("/api/export/log?format=xlsx")
+
+        assert response.status_code == 400
+
+    def test_log_export_hours(self):
+        """Test att hours används som starttid"""
+        service = MagicMock()
+        service.export_log.return_value = iter([])
+
+        with patch('api.routes.export.get_export_service', return_value=service):
+            response = client.get("/api/export/log?hours=720&measurement=sensor")
+
+        assert response.status_code == 200
+        kwargs = service.export_log.call_args.kwargs
+        assert kwargs['measurement'] == 'sensor'
+        assert (datetime.utcnow() - kwargs['from_time']).days == 30
+
+    def test_failed_export_aborts_response(self):
+        """Test att ett fel mitt i exporten avbryter svaret"""
+        def chunks():
+            yield b"timestamp,device_id,sensor_id,value\r\n"
+            raise Exception("boom")
+
+        service = MagicMock()
+        service.export_sensor_history.return_value = chunks()
+
+        with patch('api.routes.export.get_export_service', return_value=service):
+            with pytest.raises(Exception, match="boom"):
+                client.get("/api/export/sensors?sensor_id=htsensor/ctemp&format=csv")
+
+
+class TestIterateBlocking:
+    """Test iterate_blocking"""
+
+    def test_disconnect_mid_stream_closes_iterator(self):
+        """Test att iteratorn stängs när klienten kopplar ner under ett pågående next()"""
+        started = threading.Event()
+        closed = threading.Event()
+        produced = []
+
+        def slow_chunks():
+            try:
+                for n in range(100):
+                    if n == 1:
+                        started.set()
+                        time.sleep(0.2)
+                    produced.append(n)
+                    yield n
+            finally:
+                closed.set()
+
+        async def run():
+            async def consume():
+                async for _ in iterate_blocking(slow_chunks()):
+                    pass
+
+            task = asyncio.create_task(consume())
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.get_running_loop().run_in_executor(None, closed.wait, 2)
+
+        asyncio.run(run())
+
+        assert closed.is_set()
+        # Det pågående next() fick köra klart, sedan hämtades inget mer
+        assert produced == [0, 1]
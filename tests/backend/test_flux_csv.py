@@ -0,0 +1,142 @@
+"""
+Unit tests för avkodning av annoterad Flux-CSV
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from influxdb_client.client.flux_csv_parser import FluxCsvParser, FluxQueryException, FluxSerializationMode
+
+from services.flux_csv import decode_tables, table_rows
+from services.log import LogService
+
+
+def flux_csv_rows(columns, datatypes, rows, groups=None, defaults=None):
+    """Bygg CSV-rader som query_api.query_csv() returnerar för en tabellschema"""
+    return [
+        ["#datatype", "string", "long"] + list(datatypes),
+        ["#group", "false", "false"] + list(groups or ["false"] * len(columns)),
+        ["#default", "_result", ""] + list(defaults or [""] * len(columns)),
+        ["", "result", "table"] + list(columns),
+    ] + [["", "", str(table)] + [str(value) for value in row] for table, row in rows]
+
+
+def csv_text(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\r\n").writerows(rows)
+    return buffer.getvalue()
+
+
+class TestDecodeTables:
+    """Test decode_tables"""
+
+    def test_types_and_tables(self):
+        """Test att kolumner typkonverteras och delas upp per tabell"""
+        rows = flux_csv_rows(
+            ["_time", "_value", "_field", "ok"],
+            ["dateTime:RFC3339", "double", "string", "boolean"],
+            [
+                (0, ["2025-01-01T00:00:00Z", "1.5", "ctemp", "true"]),
+                (0, ["2025-01-01T00:00:10.123456789Z", "", "ctemp", "false"]),
+                (1, ["2025-01-01T00:00:00Z", "40", "humidity", ""]),
+            ]
+        )
+
+        tables = decode_tables(rows)
+
+        assert len(tables) == 2
+        assert tables[0]["_value"] == [1.5, None]
+        assert tables[0]["ok"] == [True, False]
+        assert tables[0]["_time"][0] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+        assert tables[0]["_time"][1].microsecond == 123456
+        assert tables[1]["_field"] == ["humidity"]
+        assert tables[1]["ok"] == [None]
+        assert table_rows(tables[0]) == 2
+
+    def test_selected_columns(self):
+        """Test att bara efterfrågade kolumner tas med"""
+        rows = flux_csv_rows(["_time", "_value"], ["dateTime:RFC3339", "long"], [(0, ["2025-01-01T00:00:00Z", "7"])])
+
+        tables = decode_tables(rows, columns=("_value",))
+
+        assert tables == [{"_value": [7]}]
+
+    def test_schema_change_and_default(self):
+        """Test att ny #datatype-rad startar nytt schema och att #default används"""
+        rows = flux_csv_rows(["_value"], ["long"], [(0, ["1"])]) + flux_csv_rows(
+            ["_value", "unit"], ["double", "string"], [(1, ["2.5", ""])], defaults=["", "C"]
+        )
+
+        tables = decode_tables(rows, columns=("_value", "unit"))
+
+        assert tables == [{"_value": [1]}, {"_value": [2.5], "unit": ["C"]}]
+
+    def test_error_row_raises(self):
+        """Test att fel i svaret ger FluxQueryException"""
+        rows = [
+            ["#datatype", "string", "string"],
+            ["#group", "true", "true"],
+            ["#default", "", ""],
+            ["", "error", "reference"],
+            ["", "failed to execute query", "897"],
+        ]
+
+        with pytest.raises(FluxQueryException):
+            decode_tables(rows)
+
+    def test_matches_flux_csv_parser(self):
+        """Test att värdena blir desamma som via FluxRecord"""
+        rows = flux_csv_rows(
+            ["_time", "_value", "_field", "sensor_id"],
+            ["dateTime:RFC3339", "double", "string", "string"],
+            [(0, ["2025-01-01T00:00:00Z", "21.5", "value", "htsensor/ctemp"]),
+             (1, ["2025-01-01T00:00:05Z", "1", "value", "pir/max"])]
+        )
+        response = MagicMock(closed=True, data=csv_text(rows).encode())
+        parser = FluxCsvParser(response=response, serialization_mode=FluxSerializationMode.tables)
+        with parser:
+            list(parser.generator())
+
+        expected = [
+            {name: [record.values[name] for record in table.records] for name in ("_time", "_value", "sensor_id")}
+            for table in parser.table_list()
+        ]
+
+        assert decode_tables(rows, columns=("_time", "_value", "sensor_id")) == expected
+
+
+@pytest.fixture
+def log_service(mock_influxdb_service):
+    with patch('services.log.InfluxDBService'):
+        yield LogService()
+
+
+class TestLogData:
+    """Test LogService.get_log_data med CSV-avkodning"""
+
+    def test_pivoted_rows_to_entries(self, log_service):
+        """Test att pivoterade rader delas upp i tags och fields"""
+        rows = flux_csv_rows(
+            ["_start", "_stop", "_time", "_measurement", "device_id", "sensor_id", "value", "unit"],
+            ["dateTime:RFC3339"] * 3 + ["string"] * 3 + ["double", "string"],
+            [
+                (0, ["2025-01-01T00:00:00Z", "2025-01-02T00:00:00Z", "2025-01-01T10:00:00Z",
+                     "sensor_htsensor", "halo-device-1", "htsensor/ctemp", "21.5", ""]),
+                (0, ["2025-01-01T00:00:00Z", "2025-01-02T00:00:00Z", "2025-01-01T11:00:00Z",
+                     "sensor_htsensor", "halo-device-1", "htsensor/ctemp", "22.0", "C"]),
+            ]
+        )
+
+        with patch.object(log_service.influxdb.query_api, 'query_csv', return_value=iter(rows)):
+            result = log_service.get_log_data(measurement="sensor", hours=24, limit=10)
+
+        assert result['total'] == 2
+        latest = result['data'][0]
+        assert latest['timestamp'] == "2025-01-01T11:00:00+00:00"
+        assert latest['id'] == "htsensor/ctemp"
+        assert latest['tags'] == {"device_id": "halo-device-1", "sensor_id": "htsensor/ctemp"}
+        assert latest['fields'] == {"value": 22.0, "unit": "C"}
+        assert latest['value'] == 22.0
+        assert result['data'][1]['fields'] == {"value": 21.5}
@@ -20,7 +20,7 @@ def halo_client():
 class TestHaloClient:
     """Test HaloClient functionality"""
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_health_check_success(self, mock_get, halo_client):
         """Test successful health check"""
         mock_response = Mock()
@@ -33,7 +33,7 @@ class TestHaloClient:
         assert result is True
         mock_get.assert_called_once()
 
-    @patch('collector.halo_client.requests.get')
+    @patch('collector.halo_client.requests.Session.get')
     def test_health_check_failure(self, mock_get, halo_client):
         """Test failed health check"""
         import requests
@@ -43,7 +43,7 @@ class TestHaloClient:
 
         assert result is False
 
-    @patch('collector.halo_client.requests.get')
+    @patch('collector.halo_client.requests.Session.get')
     def test_get_latest_state(self, mock_get, halo_client):
         """Test getting latest state"""
         mock_state = {
@@ -62,3 +62,25 @@ class TestHaloClient:
         assert "temperature" in state
         assert state["temperature"]["value"] == 22.5
 
+
+    def test_session_is_reused(self, halo_client):
+        """Test att alla requests går via samma poolade session"""
+        with patch.object(halo_client.session, 'get') as mock_get:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {}
+            mock_get.return_value = mock_response
+
+            halo_client.get_latest_state()
+            halo_client.get_event_state()
+
+            assert mock_get.call_count == 2
+            # Per-endpoint timeout som (connect, read)
+            assert mock_get.call_args.kwargs['timeout'] == (3.0, 5)
+
+    def test_endpoint_timeout_override(self):
+        """Test att timeouts kan överskridas per endpoint"""
+        client = HaloClient(ip="10.0.0.1", username="admin", password="x", timeouts={"latest": 2})
+
+        assert client._timeout("latest") == (3.0, 2)
+        assert client._timeout("unknown") == (3.0, 10)
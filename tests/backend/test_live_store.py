@@ -0,0 +1,171 @@
+"""
+Unit tests för live-snapshots mellan collector och API
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from collector.engine import CollectorEngine
+from services.live_store import LiveSnapshotPublisher, LiveStore, build_live_snapshot
+from services.sensor_data import SensorReading
+from services.sensors import SensorService
+from test_collector_engine import make_device
+
+
+def snapshot(device_id="halo-1", connected=True):
+    """Live-snapshot med två fält för htsensor"""
+    now = datetime.utcnow()
+    return build_live_snapshot(
+        device_id=device_id,
+        timestamp=now,
+        readings=[
+            SensorReading("htsensor", "htsensor/ctemp", "ctemp", 22.5),
+            SensorReading("htsensor", "htsensor/humidity", "humidity", 41.0),
+        ],
+        connected=connected,
+        last_contact=now,
+        response_time_ms=12.0
+    )
+
+
+class TestLiveStore:
+    """Test publicering och läsning av snapshots"""
+
+    def test_publish_and_read(self, tmp_path):
+        """Test att publicerad snapshot läses i samma form som latest-queryn"""
+        LiveSnapshotPublisher(str(tmp_path)).publish(snapshot())
+        store = LiveStore(str(tmp_path), max_age=60)
+
+        latest = store.get_latest("halo-1")
+
+        assert latest["device_id"] == "halo-1"
+        assert [s["sensor_id"] for s in latest["sensors"]] == ["htsensor/ctemp", "htsensor/humidity"]
+        assert latest["sensors"][0]["values"] == {"ctemp": 22.5}
+        assert store.get_heartbeat("halo-1")["connected"] is True
+        assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+    def test_file_reread_only_when_changed(self, tmp_path):
+        """Test att filen bara läses om när den ändrats"""
+        publisher = LiveSnapshotPublisher(str(tmp_path))
+        publisher.publish(snapshot())
+        store = LiveStore(str(tmp_path), max_age=60)
+
+        store.get("halo-1")
+        store.get("halo-1")
+        assert store.reloads == 1
+
+        time.sleep(0.01)
+        publisher.publish(snapshot(connected=False))
+        assert store.get("halo-1")["heartbeat"]["connected"] is False
+        assert store.reloads == 2
+
+    def test_stale_or_missing_snapshot_returns_none(self, tmp_path):
+        """Test att inaktuell eller saknad snapshot ger None"""
+        old = snapshot()
+        old["published_at"] = time.time() - 120
+        LiveSnapshotPublisher(str(tmp_path)).publish(old)
+        store = LiveStore(str(tmp_path), max_age=60)
+
+        assert store.get("halo-1") is None
+        assert store.get("halo-2") is None
+        assert store.get_metrics()["stale"] == 1
+        assert store.get_metrics()["missing"] == 1
+
+    def test_sensor_service_prefers_live_snapshot(self, tmp_path, mock_influxdb_service):
+        """Test att SensorService använder live-snapshot och faller tillbaka på InfluxDB"""
+        LiveSnapshotPublisher(str(tmp_path)).publish(snapshot())
+        store = LiveStore(str(tmp_path), max_age=60)
+
+        with patch('services.sensors.InfluxDBService'), \
+                patch('services.sensors.get_live_store', return_value=store):
+            service = SensorService()
+            with patch.object(service.influxdb.query_api, 'query', return_value=[]) as mock_query:
+                live = service.get_latest_sensor_values(device_id="halo-1")
+                assert len(live["sensors"]) == 2
+                assert mock_query.call_count == 0
+
+                service.get_latest_sensor_values(device_id="halo-2")
+                assert mock_query.call_count == 1
+
+
+class TestEnginePublishesLive:
+    """Test att collectorn publicerar efter varje cykel"""
+
+    def test_cycle_publishes_snapshot(self, tmp_path):
+        """Test att en lyckad cykel publicerar enhetens värden"""
+        device = make_device("halo-1", state={"htsensor": {"data": {"ctemp": 21.0}}})
+        publisher = LiveSnapshotPublisher(str(tmp_path))
+        engine = CollectorEngine(
+            [device], Mock(), Mock(), interval=5, deadline=2,
+            jitter=0, phase_spread=False, live_publisher=publisher
+        )
+
+        async def run_once():
+            task = asyncio.create_task(engine.run())
+            await asyncio.sleep(0.3)
+            engine.stop()
+            await task
+
+        asyncio.run(run_once())
+
+        store = LiveStore(str(tmp_path), max_age=60)
+        latest = store.get_latest("halo-1")
+        assert latest["sensors"] == [{
+            "sensor_id": "htsensor/ctemp",
+            "timestamp": latest["timestamp"],
+            "values": {"ctemp": 21.0},
+        }]
+        assert store.get_heartbeat("halo-1")["connected"] is True
+        assert store.get_circuit_breakers("halo-1") == {"endpoints": {}, "unsupported": []}
+        assert engine.get_metrics()["live_snapshot"]["published"] == 1
+
+    def test_unreachable_device_publishes_heartbeat_only(self, tmp_path):
+        """Test att gamla värden inte publiceras som färska när enheten inte svarar"""
+        device = make_device("halo-1", state={"htsensor": {"data": {"ctemp": 21.0}}})
+        publisher = LiveSnapshotPublisher(str(tmp_path))
+        threads = []
+        publish = publisher.publish
+
+        def record_thread(snapshot):
+            threads.append(threading.current_thread().name)
+            return publish(snapshot)
+
+        publisher.publish = record_thread
+        engine = CollectorEngine(
+            [device], Mock(), Mock(), interval=0.2, deadline=1,
+            jitter=0, phase_spread=False, live_publisher=publisher
+        )
+
+        async def run_twice():
+            task = asyncio.create_task(engine.run())
+            await asyncio.sleep(0.1)
+            device.halo_client.get_latest_state.side_effect = lambda: None
+            await asyncio.sleep(0.25)
+            engine.stop()
+            await task
+
+        asyncio.run(run_twice())
+
+        store = LiveStore(str(tmp_path), max_age=60)
+        assert store.get_heartbeat("halo-1")["connected"] is False
+        assert "sensors" not in store.get("halo-1")
+        assert store.get_latest("halo-1") is None
+        assert len(threads) >= 2
+        assert all(name.startswith("collector") for name in threads)
+
+    def test_status_reports_collector_breakers(self, tmp_path):
+        """Test att systemstatus visar collectorns breakers från live-snapshot"""
+        from api.routes.system import get_collector_breakers
+
+        breakers = {"endpoints": {"latest": {"state": "open"}}, "unsupported": []}
+        data = snapshot()
+        data["circuit_breakers"] = breakers
+        LiveSnapshotPublisher(str(tmp_path)).publish(data)
+        store = LiveStore(str(tmp_path), max_age=60)
+
+        with patch('services.live_store.get_live_store', return_value=store):
+            assert get_collector_breakers("halo-1") == breakers
+            assert get_collector_breakers("halo-2") is None
@@ -0,0 +1,74 @@
+"""
+Unit tests för QueryExecutor
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.influxdb import QueryExecutor
+
+
+class TestQueryExecutor:
+    """Test begränsad executor för blockerande InfluxDB-anrop"""
+
+    def test_concurrency_is_bounded(self):
+        """Test att högst max_workers anrop körs samtidigt"""
+        executor = QueryExecutor(max_workers=2)
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        def query():
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.05)
+            with lock:
+                running["now"] -= 1
+            return "ok"
+
+        async def run():
+            return await asyncio.gather(*(executor.run(query) for _ in range(6)))
+
+        results = asyncio.run(run())
+        executor.shutdown()
+
+        assert results == ["ok"] * 6
+        assert running["max"] == 2
+        metrics = executor.get_metrics()
+        assert metrics["completed"] == 6
+        assert metrics["active"] == 0
+        assert metrics["pending"] == 0
+
+    def test_event_loop_not_blocked(self):
+        """Test att event-loopen fortsätter medan en query körs"""
+        executor = QueryExecutor(max_workers=1)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(executor.run(time.sleep, 0.2), ticker())
+
+        asyncio.run(run())
+        executor.shutdown()
+
+        assert len(ticks) == 5
+        assert ticks[-1] - ticks[0] < 0.15
+
+    def test_exceptions_propagate(self):
+        """Test att fel från anropet propageras och räknas"""
+        executor = QueryExecutor(max_workers=1)
+
+        def failing_query():
+            raise RuntimeError("query failed")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(executor.run(failing_query))
+        executor.shutdown()
+
+        assert executor.get_metrics()["errors"] == 1
@@ -0,0 +1,161 @@
+"""
+Unit tests för QueryRouter (val mellan rå bucket och rollup-buckets)
+"""
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+import re
+
+import pytest
+
+from services.query_router import ROLLUP_MEASUREMENTS, QueryRouter, RollupTier, rollup_task_flux
+from services.sensors import SensorService
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+TIER_1M = RollupTier(name="1m", bucket="halo-1m", every=60, retention_days=90)
+TIER_1H = RollupTier(name="1h", bucket="halo-1h", every=3600, retention_days=0)
+
+
+def make_router(raw_retention_days=30, enabled=True):
+    return QueryRouter("halo", [TIER_1H, TIER_1M], raw_retention_days=raw_retention_days, enabled=enabled)
+
+
+class TestQueryRouter:
+    """Test val av källa"""
+
+    def test_coarsest_tier_within_window(self):
+        """Test att grövsta nivån med fönster <= begärt väljs"""
+        router = make_router()
+
+        assert router.route(NOW - timedelta(days=7), 7200, now=NOW).bucket == "halo-1h"
+        assert router.route(NOW - timedelta(days=1), 300, now=NOW).bucket == "halo-1m"
+        assert router.route(NOW - timedelta(hours=1), 10, now=NOW).bucket == "halo"
+
+    def test_retention_limits_tier(self):
+        """Test att en nivå vars retention inte täcker starttiden hoppas över"""
+        router = make_router()
+
+        source = router.route(NOW - timedelta(days=120), 300, now=NOW)
+
+        assert source.tier == TIER_1H
+
+    def test_raw_expired_falls_back_to_finest_rollup(self):
+        """Test att rådata äldre än retention läses från finaste rollup"""
+        router = make_router(raw_retention_days=7)
+
+        assert router.route(NOW - timedelta(days=10), None, now=NOW).tier == TIER_1M
+        assert router.route(NOW - timedelta(days=3), None, now=NOW).tier is None
+
+    def test_disabled_always_raw(self):
+        """Test att rå bucket används när rollups inte är aktiverade"""
+        router = make_router(enabled=False)
+
+        source = router.route(NOW - timedelta(days=7), 7200, now=NOW)
+
+        assert source.bucket == "halo"
+        assert source.agg_filter() == ""
+
+    def test_agg_filter(self):
+        """Test att rollup-källor filtrerar på agg-taggen"""
+        source = make_router().route(NOW - timedelta(days=7), 7200, now=NOW)
+
+        assert source.agg_filter("max") == '|> filter(fn: (r) => r["agg"] == "max")'
+
+
+class TestRollupTaskFlux:
+    """Test Flux för rollup-tasks"""
+
+    def test_task_from_raw(self):
+        """Test att 1m-tasken aggregerar rådata till alla aggregat"""
+        flux = rollup_task_flux(TIER_1M, "halo")
+
+        assert 'option task = {name: "rollup-halo-1m", every: 60s' in flux
+        assert 'from(bucket: "halo")' in flux
+        for agg in ("mean", "min", "max", "last"):
+            assert f'fn: {agg}, createEmpty: false' in flux
+            assert f'set(key: "agg", value: "{agg}")' in flux
+        assert 'r["agg"] ==' not in flux
+
+    def test_task_from_finer_tier(self):
+        """Test att 1h-tasken aggregerar respektive aggregat från 1m-nivån"""
+        flux = rollup_task_flux(TIER_1H, "halo-1m", TIER_1M)
+
+        assert 'from(bucket: "halo-1m")' in flux
+        assert 'filter(fn: (r) => r["agg"] == "min") |> drop(columns: ["agg"])' in flux
+        assert flux.count('to(bucket: "halo-1h")') == 4
+
+    def test_measurements_match_written_points(self):
+        """Test att filtret matchar de measurements som collectorn faktiskt skriver"""
+        with patch('services.sensor_data.InfluxDBService'):
+            from services.sensor_data import SensorDataService
+            write_pipeline = Mock()
+            service = SensorDataService(write_pipeline=write_pipeline)
+            service.write_sensor_data({"htsensor": {"data": {"ctemp": 21.5}}})
+            service.write_heartbeat(True, response_time_ms=12.0)
+            service.write_beacon_data([{"tags": {"beacon_id": "b1"}, "fields": {"rssi": -60}}])
+
+        written = set()
+        for call in write_pipeline.add.call_args_list:
+            records = call.args[0] if isinstance(call.args[0], list) else [call.args[0]]
+            written.update(record._name for record in records)
+        pattern = re.compile(ROLLUP_MEASUREMENTS.strip("/"))
+
+        assert written == {"sensor_htsensor", "halo_heartbeat", "beacon_presence"}
+        assert pattern.search("sensor_htsensor")
+        assert pattern.search("halo_heartbeat")
+        assert not pattern.search("beacon_presence")
+        assert not pattern.search("events")
+
+    def test_backfill_range(self):
+        """Test att fast intervall ersätter task-optionen"""
+        flux = rollup_task_flux(TIER_1M, "halo", start="2025-01-01T00:00:00Z", stop="2025-01-02T00:00:00Z")
+
+        assert 'option task' not in flux
+        assert 'range(start: 2025-01-01T00:00:00Z, stop: 2025-01-02T00:00:00Z)' in flux
+
+
+@pytest.fixture
+def sensor_service(mock_influxdb_service):
+    with patch('services.sensors.InfluxDBService'):
+        yield SensorService()
+
+
+class TestSensorHistoryRouting:
+    """Test att sensorhistorik går via QueryRouter"""
+
+    def test_history_uses_rollup_bucket(self, sensor_service):
+        """Test att långa nedsamplade intervall läses från rollup-bucket"""
+        start = datetime.utcnow() - timedelta(days=30)
+
+        with patch('services.sensors.get_query_router', return_value=make_router()), \
+                patch.object(sensor_service.influxdb.query_api, 'query_csv', return_value=iter([])) as mock_query:
+            sensor_service.get_sensor_history(
+                "htsensor/ctemp", from_time=start, to_time=start + timedelta(days=30), resolution="2h"
+            )
+
+        query = mock_query.call_args.kwargs['query']
+        assert 'from(bucket: "halo-1h")' in query
+        assert 'r["agg"] == "mean"' in query
+        assert 'aggregateWindow(every: 2h' in query
+
+    def test_batch_uses_router(self, sensor_service):
+        """Test att batch-historik med stora fönster läses från rollup-bucket"""
+        start = datetime.utcnow() - timedelta(days=1)
+
+        with patch('services.sensors.get_query_router', return_value=make_router()), \
+                patch.object(sensor_service.influxdb.query_api, 'query', return_value=[]) as mock_query:
+            # 1 dygn / 50 punkter = 1728 s fönster -> 1m-nivån
+            sensor_service.get_sensor_history_batch(["htsensor/ctemp"], from_time=start, points=50)
+
+        assert 'from(bucket: "halo-1m")' in mock_query.call_args.kwargs['query']
+
+    def test_heartbeat_history_falls_back_to_rollup(self, sensor_service):
+        """Test att heartbeat-historik äldre än rå retention läses från rollup"""
+        start = datetime.utcnow() - timedelta(days=60)
+
+        with patch('services.sensors.get_query_router', return_value=make_router()), \
+                patch.object(sensor_service.influxdb.query_api, 'query', return_value=[]) as mock_query:
+            sensor_service.get_heartbeat_history(from_time=start)
+
+        query = mock_query.call_args.kwargs['query']
+        assert 'from(bucket: "halo-1m")' in query
+        assert 'r["agg"] == "mean"' in query
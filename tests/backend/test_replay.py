@@ -0,0 +1,125 @@
+"""
+Unit tests för återupptagning av event-strömmen (replay-buffer)
+"""
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+import api.websocket as ws
+from api.replay import ReplayBuffer, replay_message
+from api.websocket import ConnectionManager
+from test_event_bus import make_event
+from test_websocket_fanout import FakeWebSocket, wait_for
+
+
+class TestReplayBuffer:
+    """Test ringbuffer med löpande seq"""
+
+    def test_seq_is_monotonic(self):
+        """Test att varje meddelande får nästa seq"""
+        buffer = ReplayBuffer(size=10)
+
+        texts = [buffer.append({"type": "new_event", "n": n}) for n in range(3)]
+
+        assert [json.loads(text)["seq"] for text in texts] == [1, 2, 3]
+        assert buffer.seq == 3
+
+    def test_since_returns_only_gap(self):
+        """Test att bara meddelanden efter klientens seq returneras"""
+        buffer = ReplayBuffer(size=10)
+        for n in range(5):
+            buffer.append({"n": n})
+
+        assert [json.loads(text)["n"] for text in buffer.since(3)] == [3, 4]
+        assert buffer.since(5) == []
+
+    def test_gap_larger_than_buffer(self):
+        """Test att None returneras när luckan inte täcks av bufferten"""
+        buffer = ReplayBuffer(size=3)
+        for n in range(10):
+            buffer.append({"n": n})
+
+        assert buffer.since(6) is None
+        assert [json.loads(text)["n"] for text in buffer.since(7)] == [7, 8, 9]
+        assert buffer.misses == 1
+
+    def test_other_epoch_not_replayed(self):
+        """Test att seq från en tidigare API-process inte används"""
+        buffer = ReplayBuffer(size=10, epoch="current")
+        buffer.append({"n": 0})
+
+        assert buffer.since(0, epoch="previous") is None
+        assert buffer.since(0, epoch="current") is not None
+        assert buffer.since(5, epoch="current") is None
+
+    def test_replay_message_is_valid_json(self):
+        """Test att replay-meddelandet bäddar in meddelandena som JSON"""
+        buffer = ReplayBuffer(size=10, epoch="e1")
+        texts = [buffer.append({"n": n}) for n in range(2)]
+
+        message = json.loads(replay_message("buffer", "e1", 2, texts))
+
+        assert message["type"] == "replay"
+        assert message["seq"] == 2
+        assert [m["n"] for m in message["messages"]] == [0, 1]
+        assert json.loads(replay_message("reset", "e1", 0, []))["messages"] == []
+
+
+class TestResume:
+    """Test resume-meddelanden på WebSocket-endpointen"""
+
+    def run_resume(self, message, replay, event_service=None):
+        """Skicka ett resume-meddelande och returnera svaret"""
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+
+        async def run():
+            await manager.connect(websocket)
+            await ws.handle_resume(websocket, message)
+            await wait_for(lambda: len(websocket.sent) == 1)
+            manager.disconnect(websocket)
+
+        with patch.object(ws, "manager", manager), patch.object(ws, "replay", replay), \
+                patch("api.routes.events.get_event_service", return_value=event_service):
+            asyncio.run(run())
+        return json.loads(websocket.sent[0])
+
+    def test_resume_from_buffer(self):
+        """Test att klienten bara får luckan från bufferten"""
+        replay = ReplayBuffer(size=10, epoch="e1")
+        for n in range(4):
+            replay.append({"type": "new_event", "n": n})
+
+        response = self.run_resume({"type": "resume", "epoch": "e1", "last_seq": 2}, replay)
+
+        assert response["mode"] == "buffer"
+        assert [m["seq"] for m in response["messages"]] == [3, 4]
+
+    def test_catchup_from_influxdb(self):
+        """Test att events hämtas från InfluxDB när bufferten inte räcker"""
+        replay = ReplayBuffer(size=10, epoch="new")
+        event_service = Mock()
+        event_service.get_events.return_value = [make_event("evt-2"), make_event("evt-1")]
+        event_service.get_events.return_value[1].timestamp = datetime(2025, 1, 1, 11, 0, 0)
+
+        response = self.run_resume(
+            {"type": "resume", "epoch": "old", "last_seq": 40, "since": "2025-01-01T10:00:00Z"},
+            replay,
+            event_service
+        )
+
+        assert response["mode"] == "catchup"
+        assert response["truncated"] is False
+        assert [m["event"]["id"] for m in response["messages"]] == ["evt-1", "evt-2"]
+        kwargs = event_service.get_events.call_args.kwargs
+        assert kwargs["from_time"] == datetime(2025, 1, 1, 10, 0, 0)
+
+    def test_reset_without_since(self):
+        """Test att klienten ombeds ladda om när varken buffert eller tid finns"""
+        replay = ReplayBuffer(size=10, epoch="new")
+
+        response = self.run_resume({"type": "resume", "epoch": "old", "last_seq": 3}, replay)
+
+        assert response["mode"] == "reset"
+        assert response["messages"] == []
@@ -4,12 +4,14 @@ Unit tests för SensorService
 import pytest
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, MagicMock
-from services.sensors import SensorService
+from services.sensors import SensorService, get_latest_cache
+from test_flux_csv import flux_csv_rows
 
 
 @pytest.fixture
 def sensor_service(mock_influxdb_service):
     """SensorService instance med mocked InfluxDB"""
+    get_latest_cache().invalidate()
     with patch('services.sensors.InfluxDBService') as mock_influx:
         service = SensorService()
         yield service
@@ -42,15 +44,13 @@ class TestSensorService:
 
     def test_get_sensor_history(self, sensor_service):
         """Test retrieving sensor history"""
-        mock_record = MagicMock()
-        mock_record.get_time.return_value = datetime.utcnow()
-        mock_record.get_field.return_value = 'value'
-        mock_record.get_value.return_value = 22.5
-
-        mock_table = MagicMock()
-        mock_table.records = [mock_record]
+        rows = flux_csv_rows(
+            ["_time", "_value", "_field"],
+            ["dateTime:RFC3339", "double", "string"],
+            [(0, [datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'), "22.5", "value"])]
+        )
 
-        with patch.object(sensor_service.influxdb.query_api, 'query', return_value=[mock_table]):
+        with patch.object(sensor_service.influxdb.query_api, 'query_csv', return_value=iter(rows)):
             history = sensor_service.get_sensor_history(
                 sensor_id="temperature",
                 from_time=datetime.utcnow() - timedelta(hours=1),
@@ -58,6 +58,129 @@ class TestSensorService:
                 limit=100,
             )
 
+            assert history[0]['value'] == 22.5
             assert isinstance(history, list)
 
 
+
+    def test_get_latest_sensor_values_wide_schema(self, sensor_service):
+        """Test att wide-rader (utan sensor_id-tag) mappas till sensor_id"""
+        now = datetime.utcnow()
+        records = []
+        for field, value in (('ctemp', 22.5), ('humidity', 41.0)):
+            record = MagicMock()
+            record.get_time.return_value = now
+            record.get_measurement.return_value = 'sensor_htsensor'
+            record.values = {'device_id': 'halo-device-1'}
+            record.get_field.return_value = field
+            record.get_value.return_value = value
+            records.append(record)
+
+        mock_table = MagicMock()
+        mock_table.records = records
+
+        with patch.object(sensor_service.influxdb.query_api, 'query', return_value=[mock_table]):
+            result = sensor_service.get_latest_sensor_values(device_id="halo-device-1")
+
+        sensors = {s['sensor_id']: s['values'] for s in result['sensors']}
+        assert sensors == {'htsensor/ctemp': {'ctemp': 22.5}, 'htsensor/humidity': {'humidity': 41.0}}
+
+
+class TestSensorHistoryBatch:
+    """Test batch-historik för flera sensorer"""
+
+    def make_record(self, measurement, field, sensor_id, time, value):
+        record = MagicMock()
+        record.get_time.return_value = time
+        record.get_measurement.return_value = measurement
+        record.get_field.return_value = field
+        record.get_value.return_value = value
+        record.values = {'sensor_id': sensor_id} if sensor_id else {}
+        return record
+
+    def test_single_query_for_all_sensors(self, sensor_service):
+        """Test att alla sensorer hämtas i en query och grupperas per sensor"""
+        start = datetime(2025, 1, 1, 12, 0, 0)
+        narrow = MagicMock()
+        narrow.records = [
+            self.make_record('sensor_co2sensor', 'value', 'co2sensor/co2', start + timedelta(minutes=m), 400 + m)
+            for m in (1, 2)
+        ]
+        wide = MagicMock()
+        wide.records = [self.make_record('sensor_htsensor', 'ctemp', None, start + timedelta(minutes=1), 21.5)]
+
+        with patch.object(sensor_service.influxdb.query_api, 'query', return_value=[narrow, wide]) as mock_query:
+            result = sensor_service.get_sensor_history_batch(
+                ['co2sensor/co2', 'htsensor/ctemp', 'pir/max'],
+                from_time=start,
+                to_time=start + timedelta(hours=1),
+                points=60
+            )
+
+        assert mock_query.call_count == 1
+        query = mock_query.call_args.kwargs['query']
+        assert 'aggregateWindow(every: 60s' in query
+        assert ' or ' in query
+        assert result['window_s'] == 60
+        assert result['series']['co2sensor/co2'] == [
+            [int((start + timedelta(minutes=1)).timestamp() * 1000), 401],
+            [int((start + timedelta(minutes=2)).timestamp() * 1000), 402],
+        ]
+        assert result['series']['htsensor/ctemp'][0][1] == 21.5
+        assert result['series']['pir/max'] == []
+
+
+class TestSensorSchema:
+    """Test narrow/wide-schema för sensor-points"""
+
+    def test_wide_schema_writes_one_point_per_sensor(self):
+        """Test att wide-schema ger en point per sensor utan sensor_id-tag"""
+        from services.sensor_data import SCHEMA_WIDE, build_sensor_points, extract_sensor_readings
+
+        readings = extract_sensor_readings({
+            "htsensor": {"data": {"ctemp": 22.5, "humidity": 41.0}},
+            "co2sensor": {"data": {"co2": 600}},
+            "pir": {"data": 1},
+        })
+        points = build_sensor_points(readings, datetime(2025, 1, 1), "halo-a", SCHEMA_WIDE)
+        lines = [p.to_line_protocol() for p in points]
+
+        assert len(lines) == 3
+        assert lines[0].startswith("sensor_htsensor,device_id=halo-a ctemp=22.5,humidity=41")
+        # Skalära sensorer behåller sensor_id-taggen
+        assert lines[2].startswith("sensor_pir,device_id=halo-a,sensor_id=pir value=1")
+
+    def test_sensor_filter_matches_both_layouts(self):
+        """Test att Flux-filtret täcker både narrow och wide"""
+        from services.sensor_data import flux_sensor_filter, resolve_sensor_id
+
+        flux = flux_sensor_filter("htsensor/ctemp")
+
+        assert 'r["_measurement"] == "sensor_htsensor"' in flux
+        assert 'r["sensor_id"] == "htsensor/ctemp"' in flux
+        assert 'not exists r["sensor_id"] and r["_field"] == "ctemp"' in flux
+        assert resolve_sensor_id("sensor_htsensor", "ctemp") == "htsensor/ctemp"
+        assert resolve_sensor_id("sensor_htsensor", "value", "htsensor/ctemp") == "htsensor/ctemp"
+
+
+class TestLatestValuesCache:
+    """Test cache för senaste sensorvärden"""
+
+    def test_repeated_calls_use_cache(self, sensor_service):
+        """Test att upprepade anrop inom TTL bara kör en query"""
+        with patch.object(sensor_service.influxdb.query_api, 'query', return_value=[]) as mock_query:
+            sensor_service.get_latest_sensor_values(device_id="halo-device-1")
+            sensor_service.get_latest_sensor_values(device_id="halo-device-1")
+            sensor_service.get_latest_sensor_values(device_id="halo-device-2")
+
+            assert mock_query.call_count == 2
+
+    def test_failed_query_is_not_cached(self, sensor_service):
+        """Test att fel inte cachas"""
+        with patch.object(sensor_service.influxdb.query_api, 'query', side_effect=RuntimeError("down")):
+            result = sensor_service.get_latest_sensor_values(device_id="halo-device-1")
+            assert result['sensors'] == []
+
+        with patch.object(sensor_service.influxdb.query_api, 'query', return_value=[]) as mock_query:
+            sensor_service.get_latest_sensor_values(device_id="halo-device-1")
+            assert mock_query.call_count == 1
@@ -0,0 +1,70 @@
+"""
+Unit tests för PayloadSerializer
+"""
+import pytest
+from datetime import datetime
+
+from collector.serializer import PayloadSerializer
+from services.sensor_data import SCHEMA_NARROW, SCHEMA_WIDE, build_sensor_points, extract_sensor_readings
+
+
+@pytest.fixture
+def payload():
+    """Halo gstate/latest med blandade fälttyper"""
+    return {
+        "htsensor": {"key": "htsensor", "data": {"ctemp": 22.5, "humidity": 41.0, "time": 1764498035}},
+        "co2sensor": {"data": {"co2": 600, "status": "ok"}},
+        "pir": {"data": 1},
+        "blebcn": {"data": {"alert": {"id": "beacon-001"}}},
+        "fw": "2.5.1",
+    }
+
+
+class TestPayloadSerializer:
+    """Test plan-inlärning och line protocol"""
+
+    @pytest.mark.parametrize("schema", [SCHEMA_NARROW, SCHEMA_WIDE])
+    def test_output_matches_point_path(self, payload, schema):
+        """Test att serializern ger samma rader som Point-vägen"""
+        serializer = PayloadSerializer()
+        timestamp = datetime(2025, 11, 30, 10, 20, 35, 123456)
+
+        expected = [p.to_line_protocol() for p in build_sensor_points(
+            extract_sensor_readings(payload, include_derived=False), timestamp, "halo a", schema)]
+        readings = serializer.readings(payload)
+
+        assert readings == extract_sensor_readings(payload, include_derived=False)
+        assert serializer.encode(readings, timestamp, "halo a", schema) == expected
+        assert serializer.serialize(payload, timestamp, "halo a", schema) == "\n".join(expected).encode()
+
+    def test_plan_reused_for_same_shape(self, payload):
+        """Test att planen återanvänds när formen är oförändrad"""
+        serializer = PayloadSerializer()
+        serializer.readings(payload)
+
+        payload["htsensor"]["data"]["ctemp"] = 23.0
+        readings = serializer.readings(payload)
+
+        assert readings[0].value == 23.0
+        assert serializer.get_metrics()["relearns"] == 1
+        assert serializer.get_metrics()["plan_hits"] == 1
+
+    @pytest.mark.parametrize("change", ["new_field", "new_sensor", "type_change", "now_numeric", "removed"])
+    def test_shape_change_relearns(self, payload, change):
+        """Test att ändrad form ger omlärning och korrekta värden"""
+        serializer = PayloadSerializer()
+        serializer.readings(payload)
+
+        if change == "new_field":
+            payload["htsensor"]["data"]["dewpoint"] = 9.1
+        elif change == "new_sensor":
+            payload["luxsensor"] = {"data": {"alux": 120.0}}
+        elif change == "type_change":
+            payload["htsensor"]["data"]["humidity"] = "n/a"
+        elif change == "now_numeric":
+            payload["co2sensor"]["data"]["status"] = 1
+        elif change == "removed":
+            del payload["pir"]
+
+        assert serializer.readings(payload) == extract_sensor_readings(payload, include_derived=False)
+        assert serializer.get_metrics()["relearns"] == 2
@@ -0,0 +1,88 @@
+"""
+Unit tests för SnapshotCache
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.snapshot_cache import SnapshotCache
+
+
+class FakeClock:
+    """Styrbar monoton klocka"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSnapshotCache:
+    """Test TTL och single-flight"""
+
+    def test_hit_within_ttl_and_reload_after(self):
+        """Test att värdet cachas i ttl sekunder"""
+        clock = FakeClock()
+        cache = SnapshotCache(ttl=10, clock=clock)
+        loads = []
+
+        def load():
+            loads.append(1)
+            return len(loads)
+
+        assert cache.get("halo-1", load) == 1
+        clock.now = 9
+        assert cache.get("halo-1", load) == 1
+        clock.now = 10
+        assert cache.get("halo-1", load) == 2
+
+        metrics = cache.get_metrics()
+        assert metrics["hits"] == 1
+        assert metrics["misses"] == 2
+
+    def test_concurrent_misses_share_load(self):
+        """Test att samtidiga missar för samma nyckel delar en laddning"""
+        cache = SnapshotCache(ttl=10)
+        release = threading.Event()
+        loads = []
+
+        def load():
+            loads.append(1)
+            release.wait(2)
+            return "snapshot"
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(cache.get, "halo-1", load) for _ in range(10)]
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        assert results == ["snapshot"] * 10
+        assert len(loads) == 1
+        assert cache.get_metrics()["coalesced"] == 9
+
+    def test_errors_propagate_and_are_not_cached(self):
+        """Test att fel propageras och nästa anrop laddar igen"""
+        cache = SnapshotCache(ttl=10)
+
+        def failing():
+            raise RuntimeError("query failed")
+
+        with pytest.raises(RuntimeError):
+            cache.get("halo-1", failing)
+
+        assert cache.get("halo-1", lambda: "ok") == "ok"
+        assert cache.get_metrics()["load_errors"] == 1
+
+    def test_zero_ttl_disables_cache(self):
+        """Test att ttl=0 alltid laddar"""
+        cache = SnapshotCache(ttl=0)
+        loads = []
+
+        cache.get("halo-1", lambda: loads.append(1))
+        cache.get("halo-1", lambda: loads.append(1))
+
+        assert len(loads) == 2
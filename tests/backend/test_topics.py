@@ -0,0 +1,184 @@
+"""
+Unit tests för topic-prenumerationer och delta-push över WebSocket
+"""
+import asyncio
+import json
+
+from api.topics import TopicHub, apply_delta, diff_state, parse_topic
+from api.websocket import ConnectionManager
+from test_websocket_fanout import FakeWebSocket, wait_for
+
+
+class TestDiffState:
+    """Test fältvis delta-kodning"""
+
+    def test_only_changed_fields_included(self):
+        """Test att bara ändrade fält kommer med i deltan"""
+        old = {"timestamp": "t1", "sensors": {"temp": {"c": 21.0, "f": 69.8}, "co2": {"ppm": 400}}}
+        new = {"timestamp": "t2", "sensors": {"temp": {"c": 21.5, "f": 69.8}, "co2": {"ppm": 400}}}
+
+        changed, removed = diff_state(old, new)
+
+        assert changed == {"timestamp": "t2", "sensors": {"temp": {"c": 21.5}}}
+        assert removed == []
+
+    def test_removed_paths(self):
+        """Test att borttagna nycklar rapporteras som sökvägar"""
+        old = {"beacons": {"b1": {"rssi": -60}, "b2": {"rssi": -70}}}
+        new = {"beacons": {"b1": {"rssi": -60}}}
+
+        changed, removed = diff_state(old, new)
+
+        assert changed == {}
+        assert removed == [["beacons", "b2"]]
+
+    def test_apply_delta_roundtrip(self):
+        """Test att apply_delta återskapar nytt state"""
+        old = {"a": 1, "nested": {"x": 1, "y": {"z": 2}}, "gone": True, "list": [1, 2]}
+        new = {"a": 2, "nested": {"x": 1, "y": {"w": 3}}, "list": [1, 2, 3]}
+
+        changed, removed = diff_state(old, new)
+
+        assert apply_delta(old, changed, removed) == new
+        assert old["nested"]["y"] == {"z": 2}
+
+    def test_parse_topic(self):
+        """Test tolkning av topic-namn"""
+        assert parse_topic("sensors:halo-1") == ("sensors", "halo-1")
+        assert parse_topic("heartbeat") == ("heartbeat", None)
+        assert parse_topic("events") == ("events", None)
+        assert parse_topic("unknown") is None
+
+
+def messages(websocket):
+    return [json.loads(message) for message in websocket.sent]
+
+
+class TestTopicHub:
+    """Test snapshot/delta-push till prenumeranter"""
+
+    def test_snapshot_then_delta(self):
+        """Test att första pushen är en snapshot och nästa en delta"""
+        states = [{"sensors": {"temp": {"c": 21.0}, "co2": {"ppm": 400}}},
+                  {"sensors": {"temp": {"c": 21.5}, "co2": {"ppm": 400}}}]
+        loads = []
+
+        async def loader(base, device_id):
+            loads.append((base, device_id))
+            return states[min(len(loads), len(states)) - 1]
+
+        manager = ConnectionManager()
+        hub = TopicHub(manager, loader=loader, interval=60)
+        websocket = FakeWebSocket()
+
+        async def run():
+            await manager.connect(websocket)
+            hub.subscribe(manager.clients[websocket], ["sensors:halo-1"])
+            await hub.push_once()
+            await hub.push_once()
+            await hub.push_once()
+            await wait_for(lambda: len(websocket.sent) == 2)
+            manager.disconnect(websocket)
+
+        asyncio.run(run())
+
+        snapshot, delta = messages(websocket)
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["data"] == states[0]
+        assert delta == {
+            "type": "delta",
+            "topic": "sensors:halo-1",
+            "version": 2,
+            "changed": {"sensors": {"temp": {"c": 21.5}}},
+            "removed": []
+        }
+        assert loads[0] == ("sensors", "halo-1")
+
+    def test_state_loaded_once_for_many_clients(self):
+        """Test att state hämtas en gång oavsett antal prenumeranter"""
+        loads = []
+
+        async def loader(base, device_id):
+            loads.append(base)
+            return {"status": "healthy"}
+
+        manager = ConnectionManager()
+        hub = TopicHub(manager, loader=loader, interval=60)
+        sockets = [FakeWebSocket() for _ in range(5)]
+
+        async def run():
+            for websocket in sockets:
+                await manager.connect(websocket)
+                hub.subscribe(manager.clients[websocket], ["heartbeat"])
+            await hub.push_once()
+            await wait_for(lambda: all(len(ws.sent) == 1 for ws in sockets))
+
+        asyncio.run(run())
+
+        assert loads == ["heartbeat"]
+        assert hub.snapshots == 5
+
+    def test_late_subscriber_gets_current_snapshot(self):
+        """Test att ny prenumerant direkt får senaste state"""
+        async def loader(base, device_id):
+            return {"state": "occupied"}
+
+        manager = ConnectionManager()
+        hub = TopicHub(manager, loader=loader, interval=60)
+        first, late = FakeWebSocket(), FakeWebSocket()
+
+        async def run():
+            await manager.connect(first)
+            hub.subscribe(manager.clients[first], ["occupancy"])
+            await hub.push_once()
+            await manager.connect(late)
+            hub.subscribe(manager.clients[late], ["occupancy"])
+            await wait_for(lambda: len(late.sent) == 1)
+
+        asyncio.run(run())
+
+        assert messages(late)[0]["data"] == {"state": "occupied"}
+
+    def test_dropped_messages_trigger_snapshot(self):
+        """Test att klient som tappat meddelanden får snapshot istället för delta"""
+        counter = {"n": 0}
+
+        async def loader(base, device_id):
+            counter["n"] += 1
+            return {"value": counter["n"]}
+
+        manager = ConnectionManager()
+        hub = TopicHub(manager, loader=loader, interval=60)
+        websocket = FakeWebSocket()
+
+        async def run():
+            await manager.connect(websocket)
+            client = manager.clients[websocket]
+            hub.subscribe(client, ["heartbeat"])
+            await hub.push_once()
+            client.dropped += 1
+            await hub.push_once()
+            await wait_for(lambda: len(websocket.sent) == 2)
+
+        asyncio.run(run())
+
+        assert [m["type"] for m in messages(websocket)] == ["snapshot", "snapshot"]
+
+    def test_events_only_sent_to_subscribers(self):
+        """Test att events bara skickas till klienter som prenumererar på events"""
+        manager = ConnectionManager()
+        hub = TopicHub(manager, interval=60)
+        default, unsubscribed = FakeWebSocket(), FakeWebSocket()
+
+        async def run():
+            await manager.connect(default)
+            await manager.connect(unsubscribed)
+            hub.unsubscribe(manager.clients[unsubscribed], ["events"])
+            await manager.broadcast("event", topic="events")
+            await wait_for(lambda: len(default.sent) == 1)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+
+        assert default.sent == ["event"]
+        assert unsubscribed.sent == []
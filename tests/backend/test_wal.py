@@ -0,0 +1,191 @@
+"""
+Unit tests för WriteAheadLog
+"""
+import os
+import time
+import pytest
+from unittest.mock import Mock
+from influxdb_client.rest import ApiException
+
+from services.wal import REJECTED_FILE, WriteAheadLog
+
+
+def wait_for(predicate, timeout=5.0):
+    """Vänta tills predicate() är sant"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def influxdb():
+    """Mockad InfluxDBService"""
+    return Mock()
+
+
+class TestWriteAheadLog:
+    """Test append, uppspelning och eviction"""
+
+    def test_sealed_segment_is_drained_and_removed(self, tmp_path, influxdb):
+        """Test att förseglat segment skrivs till InfluxDB och tas bort"""
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path))
+        try:
+            wal.append([("halo-sensors", "m f=1 1"), ("halo-sensors", "m f=2 2")])
+            wal.seal()
+
+            assert wait_for(lambda: wal.get_metrics()["backlog_segments"] == 0)
+            influxdb.write_api.write.assert_called_once_with(bucket="halo-sensors", record=["m f=1 1", "m f=2 2"])
+            assert not list(tmp_path.glob("*.wal"))
+        finally:
+            wal.close()
+
+    def test_backlog_kept_while_influxdb_down(self, tmp_path, influxdb):
+        """Test att data ligger kvar på disk när InfluxDB inte svarar"""
+        influxdb.write_api.write.side_effect = Exception("connection refused")
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path), max_backoff=0.1)
+        try:
+            wal.append([("halo-sensors", "m f=1 1")])
+            wal.seal()
+
+            assert wait_for(lambda: wal.get_metrics()["drain_errors"] >= 1)
+            metrics = wal.get_metrics()
+            assert metrics["backlog_segments"] == 1
+            assert metrics["healthy"] is False
+
+            influxdb.write_api.write.side_effect = None
+            assert wait_for(lambda: wal.get_metrics()["backlog_segments"] == 0)
+            assert wal.get_metrics()["healthy"] is True
+        finally:
+            wal.close()
+
+    def test_segments_recovered_after_restart(self, tmp_path, influxdb):
+        """Test att segment från tidigare körning spelas upp, även avbrutet aktivt segment"""
+        (tmp_path / "000000000003.wal").write_bytes(b"halo-sensors\tm f=1 1\n")
+        (tmp_path / "000000000004.wal.open").write_bytes(b"halo-sensors\tm f=2 2\nhalo-sens")
+
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path))
+        try:
+            assert wait_for(lambda: wal.get_metrics()["backlog_segments"] == 0)
+            records = [c.kwargs["record"] for c in influxdb.write_api.write.call_args_list]
+            assert records == [["m f=1 1", "m f=2 2"]]
+            assert wal._next_seq == 5
+        finally:
+            wal.close()
+
+    def test_appends_share_segment_until_due(self, tmp_path, influxdb):
+        """Test att flera appends hamnar i samma segment tills storlek eller ålder nås"""
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path), segment_bytes=60, seal_interval=60)
+        try:
+            wal.append([("halo-sensors", "m f=1 1")])
+            wal.append([("halo-sensors", "m f=2 2")])
+            assert wal.get_metrics()["backlog_segments"] == 0
+            assert len(list(tmp_path.glob("*.wal.open"))) == 1
+
+            # Tredje raden passerar segment_bytes
+            wal.append([("halo-sensors", "m f=3 3")])
+            assert wait_for(lambda: influxdb.write_api.write.call_count == 1)
+            influxdb.write_api.write.assert_called_once_with(
+                bucket="halo-sensors", record=["m f=1 1", "m f=2 2", "m f=3 3"]
+            )
+        finally:
+            wal.close()
+
+    def test_aged_segment_sealed_by_drainer(self, tmp_path, influxdb):
+        """Test att ett aktivt segment utan nya rader förseglas när det blivit gammalt"""
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path), seal_interval=0.1)
+        try:
+            wal.append([("halo-sensors", "m f=1 1")])
+
+            assert wait_for(lambda: influxdb.write_api.write.call_count == 1)
+            assert not list(tmp_path.glob("*.wal*"))
+        finally:
+            wal.close()
+
+    def test_sealed_segments_combined_into_one_write(self, tmp_path, influxdb):
+        """Test att flera förseglade segment spelas upp i en write upp till drain_batch_size"""
+        for seq in range(5):
+            (tmp_path / f"{seq:012d}.wal").write_bytes(f"halo-sensors\tm f={seq} {seq}\n".encode())
+
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path), drain_batch_size=3)
+        try:
+            assert wait_for(lambda: wal.get_metrics()["backlog_segments"] == 0)
+            records = [c.kwargs["record"] for c in influxdb.write_api.write.call_args_list]
+            assert records == [["m f=0 0", "m f=1 1", "m f=2 2"], ["m f=3 3", "m f=4 4"]]
+        finally:
+            wal.close()
+
+    def test_rejected_lines_quarantined_and_backlog_drained(self, tmp_path, influxdb):
+        """Test att en rad som InfluxDB avvisar (4xx) inte blockerar segmenten efter den"""
+        (tmp_path / "000000000000.wal").write_bytes(b"halo-sensors\tm f=\"text\" 0\n")
+        for seq in range(1, 6):
+            (tmp_path / f"{seq:012d}.wal").write_bytes(f"halo-sensors\tm f={seq} {seq}\n".encode())
+
+        def write(bucket, record):
+            if any('"' in line for line in record):
+                raise ApiException(status=422, reason="field type conflict")
+
+        influxdb.write_api.write.side_effect = write
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path))
+        try:
+            assert wait_for(lambda: wal.get_metrics()["backlog_segments"] == 0)
+            metrics = wal.get_metrics()
+            assert metrics["drained_points"] == 5
+            assert metrics["rejected_points"] == 1
+            assert metrics["healthy"] is True
+            assert (tmp_path / REJECTED_FILE).read_text() == 'halo-sensors\tm f="text" 0\n'
+        finally:
+            wal.close()
+
+    def test_rate_limit_is_retried(self, tmp_path, influxdb):
+        """Test att 429 räknas som tillfälligt fel och inte flyttar rader"""
+        influxdb.write_api.write.side_effect = ApiException(status=429, reason="Too Many Requests")
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path), max_backoff=0.1)
+        try:
+            wal.append([("halo-sensors", "m f=1 1")])
+            wal.seal()
+
+            assert wait_for(lambda: wal.get_metrics()["drain_errors"] >= 1)
+            assert wal.get_metrics()["rejected_points"] == 0
+            assert wal.get_metrics()["backlog_segments"] == 1
+            assert not (tmp_path / REJECTED_FILE).exists()
+        finally:
+            wal.close(timeout=1)
+
+    def test_seal_does_not_wake_drainer_during_outage(self, tmp_path, influxdb):
+        """Test att nya segment inte kringgår backoff när InfluxDB är nere"""
+        influxdb.write_api.write.side_effect = Exception("connection refused")
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path), max_backoff=60)
+        try:
+            wal.append([("halo-sensors", "m f=1 1")])
+            wal.seal()
+            assert wait_for(lambda: wal.get_metrics()["drain_errors"] == 1)
+
+            for i in range(3):
+                wal.append([("halo-sensors", f"m f={i} {i}")])
+                wal.seal()
+            time.sleep(0.3)
+
+            assert influxdb.write_api.write.call_count == 1
+        finally:
+            wal._stopping = True
+            wal._wakeup.set()
+
+    def test_oldest_segment_evicted_when_full(self, tmp_path, influxdb):
+        """Test att äldsta segment släpps när WAL är full"""
+        influxdb.write_api.write.side_effect = Exception("connection refused")
+        wal = WriteAheadLog(influxdb, wal_dir=str(tmp_path), max_bytes=60, max_backoff=60)
+        try:
+            for i in range(4):
+                wal.append([("halo-sensors", f"measurement f={i} {i}")])
+                wal.seal()
+
+            metrics = wal.get_metrics()
+            assert metrics["evicted_segments"] >= 1
+            assert metrics["backlog_bytes"] <= 60
+            assert not os.path.exists(os.path.join(str(tmp_path), "000000000000.wal"))
+        finally:
+            wal._stopping = True
+            wal._wakeup.set()
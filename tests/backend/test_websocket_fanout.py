@@ -0,0 +1,127 @@
+"""
+Unit tests för WebSocket-fan-out med begränsad utkö per klient
+"""
+import asyncio
+
+from api.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    """WebSocket som samlar skickade meddelanden och kan blockeras"""
+
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed_code = None
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_code = code
+
+
+async def wait_for(condition, timeout=2.0):
+    """Vänta tills condition() är sann"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        await asyncio.sleep(0.01)
+
+
+class TestConnectionManager:
+    """Test broadcast via per-klient-köer"""
+
+    def test_slow_client_does_not_block_others(self):
+        """Test att en blockerad klient inte fördröjer övriga"""
+        manager = ConnectionManager(max_queue=10)
+        fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+
+        async def run():
+            await manager.connect(fast)
+            await manager.connect(slow)
+            for n in range(3):
+                await manager.broadcast(f"msg-{n}")
+            await wait_for(lambda: len(fast.sent) == 3)
+            depth = manager.get_metrics()["queue_depth"]
+            slow.release.set()
+            await wait_for(lambda: len(slow.sent) == 3)
+            manager.disconnect(fast)
+            manager.disconnect(slow)
+            return depth
+
+        depth = asyncio.run(run())
+
+        assert fast.sent == slow.sent == ["msg-0", "msg-1", "msg-2"]
+        # Första meddelandet väntar i send_text, övriga i kön
+        assert depth == 2
+
+    def test_drop_oldest_policy(self):
+        """Test att äldsta meddelandena släpps när kön är full"""
+        manager = ConnectionManager(max_queue=2, policy="drop_oldest")
+        websocket = FakeWebSocket(blocked=True)
+
+        async def run():
+            await manager.connect(websocket)
+            await asyncio.sleep(0)
+            await manager.broadcast("msg-0")
+            await asyncio.sleep(0)  # writer tar msg-0 och väntar i send_text
+            for n in range(1, 5):
+                await manager.broadcast(f"msg-{n}")
+            websocket.release.set()
+            await wait_for(lambda: len(websocket.sent) == 3)
+            return manager.get_metrics()
+
+        metrics = asyncio.run(run())
+
+        assert websocket.sent == ["msg-0", "msg-3", "msg-4"]
+        assert metrics["dropped"] == 2
+        assert metrics["connections"] == 1
+
+    def test_disconnect_policy(self):
+        """Test att långsam klient kopplas bort med disconnect-policy"""
+        manager = ConnectionManager(max_queue=1, policy="disconnect")
+        websocket = FakeWebSocket(blocked=True)
+
+        async def run():
+            await manager.connect(websocket)
+            await asyncio.sleep(0)
+            for n in range(3):
+                await manager.broadcast(f"msg-{n}")
+                await asyncio.sleep(0)
+            await wait_for(lambda: websocket.closed_code is not None)
+            return manager.get_metrics()
+
+        metrics = asyncio.run(run())
+
+        assert metrics["connections"] == 0
+        assert metrics["slow_disconnects"] == 1
+        assert websocket.closed_code == 1013
+
+    def test_send_error_disconnects_client(self):
+        """Test att fel vid send kopplar bort klienten"""
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+
+        async def failing_send(message):
+            raise RuntimeError("connection reset")
+
+        websocket.send_text = failing_send
+
+        async def run():
+            await manager.connect(websocket)
+            await manager.broadcast("msg")
+            await wait_for(lambda: not manager.clients)
+            return manager.get_metrics()
+
+        metrics = asyncio.run(run())
+
+        assert metrics["send_errors"] == 1
+        assert metrics["connections"] == 0
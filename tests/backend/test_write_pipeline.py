@@ -0,0 +1,122 @@
+"""
+Unit tests för WritePipeline
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+from influxdb_client import Point
+from influxdb_client.rest import ApiException
+
+from services.write_pipeline import WritePipeline
+
+
+@pytest.fixture
+def influxdb():
+    """Mockad InfluxDBService"""
+    service = Mock()
+    service.get_bucket.return_value = "halo-sensors"
+    return service
+
+
+@pytest.fixture
+def pipeline(influxdb):
+    """WritePipeline med långt intervall så att bara explicita flushar skriver"""
+    pipeline = WritePipeline(influxdb=influxdb, batch_size=1000, flush_interval=60)
+    yield pipeline
+    pipeline.close()
+
+
+class TestWritePipeline:
+    """Test batchning och flush"""
+
+    def test_points_from_all_writers_flushed_in_one_write(self, pipeline, influxdb):
+        """Test att flera add() blir en write per bucket"""
+        ts = datetime(2025, 1, 1)
+        pipeline.add(Point("halo_heartbeat").tag("device_id", "halo-a").field("connected", 1.0).time(ts))
+        pipeline.add([
+            Point("sensor_htsensor").tag("sensor_id", "htsensor/ctemp").field("ctemp", 22.5).time(ts),
+            Point("sensor_htsensor").tag("sensor_id", "htsensor/humidity").field("humidity", 41.0).time(ts),
+        ])
+        pipeline.add(Point("events").tag("type", "Vape").field("summary", "x").time(ts), bucket="halo-events")
+
+        assert pipeline.flush(wait=True, timeout=5)
+
+        assert influxdb.write_api.write.call_count == 2
+        by_bucket = {c.kwargs["bucket"]: c.kwargs["record"] for c in influxdb.write_api.write.call_args_list}
+        assert len(by_bucket["halo-sensors"]) == 3
+        assert by_bucket["halo-sensors"][0].startswith("halo_heartbeat,device_id=halo-a")
+        assert len(by_bucket["halo-events"]) == 1
+
+        metrics = pipeline.get_metrics()
+        assert metrics["queue_depth"] == 0
+        assert metrics["points_written"] == 4
+        assert metrics["last_flush_latency_ms"] is not None
+
+    def test_batch_size_triggers_flush(self, influxdb):
+        """Test att full batch flushas utan explicit flush()"""
+        pipeline = WritePipeline(influxdb=influxdb, batch_size=2, flush_interval=60)
+        try:
+            pipeline.add(["m f=1 1", "m f=2 2"])
+            pipeline.flush(wait=True, timeout=5)
+            assert influxdb.write_api.write.call_args.kwargs["record"] == ["m f=1 1", "m f=2 2"]
+        finally:
+            pipeline.close()
+
+    def test_failed_write_is_requeued(self, pipeline, influxdb):
+        """Test att points ligger kvar i kön när InfluxDB inte svarar"""
+        influxdb.write_api.write.side_effect = Exception("connection refused")
+        pipeline.add(["m f=1 1", "m f=2 2"])
+
+        pipeline.flush(wait=True, timeout=5)
+
+        metrics = pipeline.get_metrics()
+        assert metrics["queue_depth"] == 2
+        assert metrics["write_errors"] == 1
+
+        influxdb.write_api.write.side_effect = None
+        pipeline.flush(wait=True, timeout=5)
+        assert influxdb.write_api.write.call_args.kwargs["record"] == ["m f=1 1", "m f=2 2"]
+        assert pipeline.get_metrics()["queue_depth"] == 0
+
+    def test_rejected_points_dropped_not_requeued(self, pipeline, influxdb):
+        """Test att points som InfluxDB avvisar (4xx) släpps och resten skrivs"""
+        written = []
+
+        def write(bucket, record):
+            if any("bad" in line for line in record):
+                raise ApiException(status=400, reason="unable to parse")
+            written.extend(record)
+
+        influxdb.write_api.write.side_effect = write
+        pipeline.add(["m f=1 1", "m bad 2", "m f=3 3"])
+
+        pipeline.flush(wait=True, timeout=5)
+
+        metrics = pipeline.get_metrics()
+        assert written == ["m f=1 1", "m f=3 3"]
+        assert metrics["queue_depth"] == 0
+        assert metrics["rejected"] == 1
+        assert metrics["points_written"] == 2
+        assert metrics["write_errors"] == 0
+
+    def test_server_errors_are_requeued(self, pipeline, influxdb):
+        """Test att 5xx och 429 läggs tillbaka i kön"""
+        for status in (503, 429):
+            influxdb.write_api.write.side_effect = ApiException(status=status)
+            pipeline.add(["m f=1 1"])
+            pipeline.flush(wait=True, timeout=5)
+
+        metrics = pipeline.get_metrics()
+        assert metrics["queue_depth"] == 2
+        assert metrics["rejected"] == 0
+
+    def test_queue_is_bounded(self, influxdb):
+        """Test att äldsta points släpps när kön är full"""
+        pipeline = WritePipeline(influxdb=influxdb, batch_size=100, flush_interval=60, max_queue_size=3)
+        try:
+            pipeline.add([f"m f={i} {i}" for i in range(5)])
+            metrics = pipeline.get_metrics()
+            assert metrics["queue_depth"] == 3
+            assert metrics["dropped"] == 2
+        finally:
+            pipeline.close()